@@ -168,7 +168,27 @@ TOOLS = [
         {
             "type": "function",
             "name": "graph_query",
-            "description": "Execute a Cypher query against the Neo4j graph. Use for reads and writes.",
+            "description": (
+                "Execute a Cypher query against the Neo4j graph. Use for reads and writes. "
+                "Indexes available for fast lookups: "
+                "a full-text index 'drawing_text' over text, source_snippet, text_snippet, source_text, "
+                "standard_ref, value and tolerance on Note, ToleranceSpec, InspectionRequirement, WeldSpec, "
+                "Dimension and Callout nodes; query it with "
+                "CALL db.index.fulltext.queryNodes('drawing_text', $query) YIELD node, score "
+                "instead of CONTAINS scans. "
+                "Dimension nodes carry numeric value_nominal, value_min and value_max (parsed from value and "
+                "tolerance, in the dimension's unit) with range indexes; use them for numeric comparisons, "
+                "e.g. WHERE d.value_min <= $x AND d.value_max >= $x. "
+                "Every node type has indexes on source_doc_id plus its identifier (part_id, feature_id, ...). "
+                "Conflicts between dimensions and tolerance specs, notes or weld sizes are precomputed after each load "
+                "as CONFLICTS_WITH edges (properties rule, rationale, materialized: true); read them with "
+                "MATCH (a)-[c:CONFLICTS_WITH]->(b) WHERE c.source_doc_id = $doc RETURN a, c.rationale, b "
+                "before exploring for conflicts yourself. "
+                "Results come back as {\"columns\": [...], \"rows\": [[...], ...]} with non-zero write counters; "
+                "returned nodes are split into one \"var.property\" column per property, columns with the same value in "
+                "every row are listed once under \"same\", and long text is cut. "
+                "If \"truncated\" is present, more rows matched than fit: return fewer columns, filter further or page with SKIP/LIMIT."
+            ),
             "parameters": {
                 "type": "object",
                 "properties": {
@@ -189,4 +209,35 @@ TOOLS = [
                 "additionalProperties": False,
             },
         }
-    ]
\ No newline at end of file
+    ]
+QUERY_PLAN_TOOL = {
+    "type": "function",
+    "name": "graph_query_plan",
+    "description": (
+        "Run several graph_query statements in one step. When you can tell which queries a question needs, "
+        "list them all here at once instead of asking for one per round: reads run concurrently, writes run in "
+        "list order after the reads before them. The output is a JSON list with one graph_query result per "
+        "query, in the same order."
+    ),
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "queries": {
+                "type": "array",
+                "description": "The queries to run, each with the same arguments as graph_query.",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "cypher": {"type": "string", "description": "Single Cypher statement to execute."},
+                        "parameters": {"type": "object", "description": "Optional parameters for the Cypher query."},
+                        "limit": {"type": "integer", "description": "Optional max rows to return when the query uses RETURN."},
+                    },
+                    "required": ["cypher"],
+                    "additionalProperties": False,
+                },
+            },
+        },
+        "required": ["queries"],
+        "additionalProperties": False,
+    },
+}
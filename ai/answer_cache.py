@@ -0,0 +1,158 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+_DIGIT = re.compile(r"\d")
+# Words that can differ between two phrasings of the same question. Negations and
+# prepositions such as "without", "above" or "before" are not here: they change the answer.
+STOPWORDS = frozenset({
+    "a", "an", "the", "s", "is", "are", "was", "were", "be", "do", "does", "did",
+    "what", "whats", "which", "of", "for", "from", "in", "on", "to", "at", "by", "with",
+    "this", "that", "these", "those", "it", "its", "there", "please", "me", "show", "tell",
+})
+
+
+def normalize_question(question: str) -> str:
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", question.lower())).strip()
+
+
+def identifier_tokens(tokens: frozenset) -> frozenset:
+    """
+    The tokens that name a specific entity or value: part and note numbers, sizes, revisions.
+    """
+    return frozenset(token for token in tokens if _DIGIT.search(token))
+
+
+def content_tokens(tokens: frozenset) -> frozenset:
+    """
+    The tokens that carry the question's meaning: everything but STOPWORDS. Identifier
+    tokens are always kept.
+    """
+    return frozenset(token for token in tokens if token not in STOPWORDS) | identifier_tokens(tokens)
+
+
+def _similarity(left: frozenset, right: frozenset) -> float:
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+class AnswerCache:
+    """
+    Caches final answers keyed on (normalized question, graph version). A new version stamp
+    makes every older entry unreachable, so any write the stamp sees invalidates the cache.
+    lib.db.graph_version sees writes made through lib.db and node/relationship count changes,
+    but not property-only updates made by other processes; those are picked up when entries
+    expire after ttl_s.
+
+    With similarity_threshold set, a miss falls back to the most similar cached question
+    (token Jaccard) under the same version, which catches rephrasings such as
+    "What's the OD of the funnel?" vs "what is the funnel OD". Only questions with the same
+    content words (content_tokens) are compared, so they may differ in word order and
+    stopwords only: "part 12" never reuses the answer for "part 13", nor "which welds satisfy
+    note 3" the answer for "which welds violate note 3".
+    """
+
+    def __init__(
+        self,
+        version: Callable[[], Hashable],
+        max_entries: int = 256,
+        ttl_s: float = 3600.0,
+        similarity_threshold: Optional[float] = None,
+    ):
+        self.version = version
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.similarity_threshold = similarity_threshold
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.hit_seconds = 0.0
+        self.miss_seconds = 0.0
+
+    def _expired(self, stored_at: float) -> bool:
+        return time.monotonic() - stored_at > self.ttl_s
+
+    def get(self, question: str, version: Hashable) -> Optional[str]:
+        normalized = normalize_question(question)
+        with self._lock:
+            entry = self._entries.get((normalized, version))
+            if entry is not None and self._expired(entry[3]):
+                del self._entries[(normalized, version)]
+                self.expirations += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end((normalized, version))
+                self.hits += 1
+                return entry[2]
+            if self.similarity_threshold is not None:
+                tokens = frozenset(normalized.split())
+                content = content_tokens(tokens)
+                best_key, best_score = None, self.similarity_threshold
+                for key, (entry_tokens, entry_content, _, stored_at) in self._entries.items():
+                    if key[1] != version or entry_content != content or self._expired(stored_at):
+                        continue
+                    score = _similarity(tokens, entry_tokens)
+                    if score >= best_score:
+                        best_key, best_score = key, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.similar_hits += 1
+                    return self._entries[best_key][2]
+            self.misses += 1
+            return None
+
+    def put(self, question: str, version: Hashable, answer: str) -> None:
+        normalized = normalize_question(question)
+        with self._lock:
+            tokens = frozenset(normalized.split())
+            self._entries[(normalized, version)] = (tokens, content_tokens(tokens), answer, time.monotonic())
+            self._entries.move_to_end((normalized, version))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def record_latency(self, hit: bool, seconds: float) -> None:
+        with self._lock:
+            if hit:
+                self.hit_seconds += seconds
+            else:
+                self.miss_seconds += seconds
+
+    def get_or_compute(self, question: str, compute: Callable[[str], str]) -> str:
+        start = time.perf_counter()
+        answer = self.get(question, self.version())
+        if answer is not None:
+            self.record_latency(True, time.perf_counter() - start)
+            return answer
+        answer = compute(question)
+        self.put(question, self.version(), answer)
+        self.record_latency(False, time.perf_counter() - start)
+        return answer
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        hits = self.hits + self.similar_hits
+        lookups = hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "avg_hit_ms": 1000 * self.hit_seconds / hits if hits else 0.0,
+            "avg_miss_ms": 1000 * self.miss_seconds / self.misses if self.misses else 0.0,
+        }
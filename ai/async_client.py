@@ -0,0 +1,123 @@
+import asyncio
+import os
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Optional
+
+from dotenv import load_dotenv
+
+from .client import (
+    _expand_tool_calls,
+    _reasoning_steps,
+    _record_reasoning,
+    _record_response,
+    _record_round,
+    _round_outputs,
+)
+from .planner import reasoning_mode
+from lib.db import is_read_only
+from lib.tracing import span
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+RunQuery = Callable[..., Awaitable[dict]]
+
+_async_client: Optional["AsyncOpenAI"] = None
+
+
+def get_async_client() -> "AsyncOpenAI":
+    global _async_client
+    if _async_client is None:
+        load_dotenv()
+        from openai import AsyncOpenAI
+        _async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _async_client
+
+
+async def _run_tool_call(run_query: RunQuery, payload: dict) -> tuple[dict, float]:
+    start = time.perf_counter()
+    try:
+        result = await run_query(
+            payload.get("cypher", ""),
+            parameters=payload.get("parameters"),
+            limit=payload.get("limit", 25),
+        )
+    except Exception as e:
+        result = {"error": str(e)}
+    return result, 1000 * (time.perf_counter() - start)
+
+
+async def _run_tool_calls(run_query: RunQuery, tool_calls: list) -> tuple[list, dict]:
+    """
+    Same ordering rules and outputs as ai.client._run_tool_calls: consecutive reads are
+    gathered, writes run alone after the reads before them, outputs keep call order.
+    """
+    with span("reasoning.round", calls=len(tool_calls)) as round_span:
+        start = time.perf_counter()
+        queries = _expand_tool_calls(tool_calls)
+        results: list = [None] * len(queries)
+        pending: list = []
+        writes = 0
+
+        async def drain() -> None:
+            if pending:
+                done = await asyncio.gather(*(_run_tool_call(run_query, payload) for _, payload in pending))
+                for (index, _), result in zip(pending, done):
+                    results[index] = result
+                pending.clear()
+
+        for index, (_, _, payload) in enumerate(queries):
+            if is_read_only(payload.get("cypher", "")):
+                pending.append((index, payload))
+                continue
+            await drain()
+            results[index] = await _run_tool_call(run_query, payload)
+            writes += 1
+        await drain()
+        tool_outputs, round_stats = _round_outputs(tool_calls, queries, results, writes, start)
+        _record_round(round_span, tool_outputs, round_stats)
+    return tool_outputs, round_stats
+
+
+async def _create_response(client: Any, request: dict) -> Any:
+    with span("model.call", purpose="reasoning", model=request.get("model")) as call_span:
+        response = await client.responses.create(**request)
+        _record_response(call_span, response)
+    return response
+
+
+async def async_call_openai_with_graph_reasoning(
+    user_query: str,
+    run_query: Optional[RunQuery] = None,
+    client: Optional[Any] = None,
+    model: Optional[str] = None,
+    retrieve: bool = True,
+    mode: Optional[str] = None,
+) -> str:
+    """
+    Async version of call_openai_with_graph_reasoning for serving many sessions from one
+    event loop: the same routing, budget, tool-result encoding and spans, driven by
+    ai.client._reasoning_steps. run_query is an async run_cypher (lib.async_db.async_run_cypher
+    by default); template lookups and retrieval run on worker threads.
+    """
+    if run_query is None:
+        from lib.async_db import async_run_cypher
+        run_query = async_run_cypher
+    client = client or get_async_client()
+    mode = reasoning_mode(mode)
+    with span("reasoning", question=user_query, retrieve=retrieve, mode=mode) as reasoning_span:
+        steps = _reasoning_steps(user_query, model, retrieve, mode)
+        result = None
+        try:
+            while True:
+                step = steps.send(result)
+                if step[0] == "graph":
+                    result = await asyncio.to_thread(step[1], *step[2])
+                elif step[0] == "model":
+                    result = await _create_response(client, step[1])
+                else:
+                    result = await _run_tool_calls(run_query, step[1])
+        except StopIteration as stop:
+            answer = stop.value
+        _record_reasoning(reasoning_span, answer)
+    return answer
@@ -0,0 +1,113 @@
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_CACHE_DIR = ".cache/extractions"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def extraction_cache_key(image_bytes: bytes, model: str, system_prompt: str, detail: str = "high") -> str:
+    """
+    Content address for one extraction: the image bytes, model name, image detail level
+    and a hash of the system prompt, so editing PROMPT.py invalidates old entries.
+    """
+    prompt_hash = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+    digest = hashlib.sha256()
+    digest.update(hashlib.sha256(image_bytes).digest())
+    digest.update(f"\0{model}\0{detail}\0{prompt_hash}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """
+    On-disk cache of raw model responses, one file per key. Entries are touched on every
+    hit and the least recently used ones are evicted once the directory exceeds max_bytes.
+    The directory's size is scanned once and then tracked across puts, so only a put that
+    crosses max_bytes lists the directory; entries written by other processes are counted
+    at that scan.
+    """
+
+    def __init__(self, directory: str | Path = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.txt"
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            text = path.read_text(encoding="utf-8")
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        temp_path.write_text(text, encoding="utf-8")
+        size = temp_path.stat().st_size
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = sum(size for _, size, _ in self._entries())
+            try:
+                self._bytes -= path.stat().st_size
+            except FileNotFoundError:
+                pass
+            os.replace(temp_path, path)
+            self._bytes += size
+            if self._bytes > self.max_bytes:
+                self._evict_locked()
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        for path in self.directory.glob("*/*.txt"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict_locked(self) -> None:
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            self.evictions += 1
+        self._bytes = total
+
+    def clear(self) -> None:
+        with self._lock:
+            for _, _, path in self._entries():
+                path.unlink(missing_ok=True)
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
@@ -1,64 +1,302 @@
 import base64
+import contextvars
 import json
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Optional
+from typing import TYPE_CHECKING, Any, Generator, Iterator, Optional
 
 from dotenv import load_dotenv
-from openai import OpenAI
 
-from .PROMPT import INSTRUCTIONS, OUTPUT_FORMAT, TOOLS, ENTITIES_AND_RELATIONSHIPS
-from lib.db import run_cypher
+from .cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, ExtractionCache, extraction_cache_key
+from .preprocess import guess_mime_type, merge_extractions, preprocess_image, preprocess_settings, preprocess_tiles
+from .planner import ReasoningBudget, answer_lookup, default_model, light_model, reasoning_mode, route_question
+from .PROMPT import INSTRUCTIONS, OUTPUT_FORMAT, QUERY_PLAN_TOOL, TOOLS, ENTITIES_AND_RELATIONSHIPS
+from .retrieval import retrieve_context
+from .tool_results import encode_tool_result, estimate_tokens
+from lib.db import is_read_only, run_cypher
+from lib.json_stream import extract_first_json
+from lib.tracing import span
 
-_client: Optional[OpenAI] = None
+if TYPE_CHECKING:
+    from openai import OpenAI
 
+_client: Optional["OpenAI"] = None
+_extraction_cache: Optional[ExtractionCache] = None
+_tool_pool: Optional[ThreadPoolExecutor] = None
+_tile_pool: Optional[ThreadPoolExecutor] = None
 
-def _get_client() -> OpenAI:
+TOOL_CALL_WORKERS = int(os.getenv("TOOL_CALL_WORKERS", "4"))
+TILE_WORKERS = int(os.getenv("TILE_WORKERS", "4"))
+PREPROCESS_REPORTS_SIZE = int(os.getenv("PREPROCESS_REPORTS_SIZE", "1024"))
+GRAPH_TOOL_NAMES = {tool["name"] for tool in (*TOOLS, QUERY_PLAN_TOOL)}
+# (report, per-round stats) of the last question answered in this context. A context variable
+# rather than a module global, so concurrent questions on other threads or tasks keep their own.
+_reasoning_state: contextvars.ContextVar[tuple[dict, list[dict]]] = contextvars.ContextVar("reasoning_state")
+# Bytes before/after preprocessing per drawing, most recent PREPROCESS_REPORTS_SIZE only.
+preprocess_reports: OrderedDict[str, dict] = OrderedDict()
+_preprocess_lock = threading.Lock()
+
+
+def _get_client() -> "OpenAI":
+    """
+    The openai package takes most of a second to import, so it is loaded here on first use
+    rather than when this module is imported.
+    """
     global _client
     if _client is None:
         load_dotenv()
+        from openai import OpenAI
         _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
     return _client
 
 
-def _guess_mime_type(image_path: Path) -> str:
-    extension = image_path.suffix.lower()
-    if extension in {".jpg", ".jpeg"}:
-        return "image/jpeg"
-    return f"image/{extension}"
+def get_extraction_cache() -> ExtractionCache:
+    global _extraction_cache
+    if _extraction_cache is None:
+        load_dotenv()
+        _extraction_cache = ExtractionCache(
+            os.getenv("EXTRACTION_CACHE_DIR", DEFAULT_CACHE_DIR),
+            int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+        )
+    return _extraction_cache
+
+
+def _get_tile_pool() -> ThreadPoolExecutor:
+    global _tile_pool
+    if _tile_pool is None:
+        _tile_pool = ThreadPoolExecutor(max_workers=TILE_WORKERS, thread_name_prefix="extract-tile")
+    return _tile_pool
+
+
+def _guess_mime_type(image_path: Path, image_bytes: Optional[bytes] = None) -> str:
+    return guess_mime_type(image_path, image_bytes)
+
+
+def _encode_image_base64(image_bytes: bytes) -> str:
+    return base64.b64encode(image_bytes).decode("ascii")
+
+
+def _image_extraction_input(image_bytes: bytes, mime_type: str, system_instructions: str, tile: Optional[dict] = None) -> list:
+    with span("image.encode", bytes=len(image_bytes), mime_type=mime_type) as encode_span:
+        image_b64 = _encode_image_base64(image_bytes)
+        encode_span.set(encoded_bytes=len(image_b64))
+    text = "Analyze this technical document."
+    if tile is not None:
+        left, top, right, bottom = tile["box"]
+        width, height = tile["sheet_size"]
+        text += (
+            f" This image is the region ({left}, {top})-({right}, {bottom}) of a {width}x{height} pixel sheet; "
+            "other regions are extracted separately. Use the source_view_id and identifiers printed on the "
+            "drawing so results can be merged, and give bounding boxes in full-sheet pixel coordinates."
+        )
+    return [
+        {"role": "system", "content": system_instructions},
+        {
+            "role": "user",
+            "content": [
+                {"type": "input_text", "text": text},
+                {
+                    "type": "input_image",
+                    "image_url": f"data:{mime_type};base64,{image_b64}",
+                    "detail": "high",
+                },
+            ],
+        },
+    ]
+
+
+def _extraction_cache_key(image_bytes: bytes, model_name: str, system_instructions: str, use_cache: bool) -> Optional[str]:
+    if not use_cache or os.getenv("EXTRACTION_CACHE", "on") == "off":
+        return None
+    return extraction_cache_key(image_bytes, model_name, system_instructions + preprocess_settings())
+
+
+def _record_preprocess(image_path: str, image_bytes: bytes, parts: list[dict]) -> None:
+    report = {
+        "bytes_before": len(image_bytes),
+        "bytes_after": sum(part["bytes_after"] for part in parts),
+        "tiles": len(parts),
+        "mime_type": parts[0]["mime_type"],
+        "elapsed_ms": sum(part["elapsed_ms"] for part in parts),
+    }
+    with _preprocess_lock:
+        preprocess_reports[image_path] = report
+        preprocess_reports.move_to_end(image_path)
+        while len(preprocess_reports) > PREPROCESS_REPORTS_SIZE:
+            preprocess_reports.popitem(last=False)
+
+
+def _create_response(purpose: str, **request) -> Any:
+    """
+    responses.create inside a "model.call" span recording the model, output size and, when
+    the response reports usage, input and output tokens.
+    """
+    with span("model.call", purpose=purpose, model=request.get("model")) as call_span:
+        response = _get_client().responses.create(**request)
+        _record_response(call_span, response)
+    return response
 
 
-def _encode_image_base64(image_path: Path) -> str:
-    return base64.b64encode(image_path.read_bytes()).decode("ascii")
+def _stream_response(purpose: str, parts: list, client: Optional[Any] = None, **request) -> Generator[str, None, Any]:
+    """
+    Streaming counterpart of _create_response, in the same "model.call" span: yields output
+    text deltas as they arrive (also appending them to parts) and returns the completed
+    response.
+    """
+    with span("model.call", purpose=purpose, model=request.get("model"), stream=True) as call_span:
+        response = None
+        chars = 0
+        for event in (client or _get_client()).responses.create(stream=True, **request):
+            event_type = _get_item_value(event, "type")
+            if event_type == "response.output_text.delta":
+                delta = _get_item_value(event, "delta", "")
+                parts.append(delta)
+                chars += len(delta)
+                yield delta
+            elif event_type == "response.completed":
+                response = _get_item_value(event, "response")
+        _record_response(call_span, response)
+        call_span.set(output_chars=chars)
+    return response
+
+
+def _record_response(call_span: Any, response: Any) -> None:
+    usage = _get_item_value(response, "usage")
+    call_span.set(
+        response_id=_get_item_value(response, "id"),
+        output_chars=len(_get_item_value(response, "output_text", "") or ""),
+        input_tokens=_get_item_value(usage, "input_tokens") if usage is not None else None,
+        output_tokens=_get_item_value(usage, "output_tokens") if usage is not None else None,
+    )
+
+
+def _extract_json(output_text: str) -> Any:
+    with span("json.extract", chars=len(output_text)) as extract_span:
+        payload = extract_first_json([output_text])
+        if isinstance(payload, dict):
+            extract_span.set(
+                entities=len(payload.get("entities", [])),
+                relationships=len(payload.get("relationships", [])),
+            )
+    return payload
 
 
-def call_openai_with_image(image_path: str, model: Optional[str] = None) -> str:
+def _extract_tile(tile: dict, model_name: str, system_instructions: str) -> dict:
+    response = _create_response(
+        "extraction",
+        model=model_name,
+        input=_image_extraction_input(tile["bytes"], tile["mime_type"], system_instructions, tile=tile),
+    )
+    payload = _extract_json(response.output_text)
+    if not isinstance(payload, dict):
+        raise ValueError(f"no JSON object in model output for tile {tuple(tile['box'])}")
+    return payload
+
+
+def call_openai_with_image(image_path: str, model: Optional[str] = None, use_cache: bool = True) -> str:
+    """
+    Extracts entities and relationships from one drawing file; see call_openai_with_image_bytes.
+    """
     image_file = Path(image_path)
-    image_b64 = _encode_image_base64(image_file)
-    mime_type = _guess_mime_type(image_file)
+    image_bytes = image_file.read_bytes()
+    mime_type = _guess_mime_type(image_file, image_bytes)
+    return call_openai_with_image_bytes(image_bytes, mime_type, str(image_path), model=model, use_cache=use_cache)
+
+
+def call_openai_with_image_bytes(
+    image_bytes: bytes,
+    mime_type: str,
+    name: str,
+    model: Optional[str] = None,
+    use_cache: bool = True,
+) -> str:
+    """
+    Extracts entities and relationships from one rendered drawing. The image is preprocessed
+    (ai/preprocess.py) before upload; sheets above IMAGE_TILE_THRESHOLD pixels are split
+    into tiles that are extracted in parallel and merged into one JSON payload. If any tile's
+    output has no JSON object, the extraction raises ValueError and nothing is cached.
+    Bytes sent before and after preprocessing are recorded in preprocess_reports[name]
+    (the last PREPROCESS_REPORTS_SIZE drawings).
+    """
+    with span("extract.image", name=name, bytes=len(image_bytes), mime_type=mime_type) as extract_span:
+        output_text = _extract_image_bytes(image_bytes, mime_type, name, model, use_cache, extract_span)
+        extract_span.set(output_chars=len(output_text))
+    return output_text
+
 
+def _extract_image_bytes(image_bytes: bytes, mime_type: str, name: str, model: Optional[str], use_cache: bool, extract_span) -> str:
     system_instructions = f"{INSTRUCTIONS}\n\n{OUTPUT_FORMAT}"
     model_name = model or os.getenv("OPENAI_MODEL", "gpt-5-mini")
-    print("Before response with model", model_name)
-    response = _get_client().responses.create(
-        model=model_name,
-        input=[
-            {"role": "system", "content": system_instructions},
-            {
-                "role": "user",
-                "content": [
-                    {"type": "input_text", "text": "Analyze this technical document."},
-                    {
-                        "type": "input_image",
-                        "image_url": f"data:{mime_type};base64,{image_b64}",
-                        "detail": "high",
-                    },
-                ],
-            },
-        ],
-    )
-    print("After response with model")
-    return response.output_text
+    cache_key = _extraction_cache_key(image_bytes, model_name, system_instructions, use_cache)
+    if cache_key is not None:
+        cached = get_extraction_cache().get(cache_key)
+        extract_span.set(cache_hit=cached is not None)
+        if cached is not None:
+            return cached
+
+    with span("image.preprocess", bytes_before=len(image_bytes)) as preprocess_span:
+        parts = preprocess_tiles(image_bytes, mime_type)
+        preprocess_span.set(bytes_after=sum(part["bytes_after"] for part in parts), tiles=len(parts))
+    _record_preprocess(name, image_bytes, parts)
+    if len(parts) > 1:
+        futures = [
+            _get_tile_pool().submit(contextvars.copy_context().run, _extract_tile, tile, model_name, system_instructions)
+            for tile in parts
+        ]
+        output_text = json.dumps(merge_extractions([future.result() for future in futures]), ensure_ascii=False)
+    else:
+        response = _create_response(
+            "extraction",
+            model=model_name,
+            input=_image_extraction_input(parts[0]["bytes"], parts[0]["mime_type"], system_instructions),
+        )
+        output_text = response.output_text
+    if cache_key is not None:
+        get_extraction_cache().put(cache_key, output_text)
+    return output_text
+
+
+def stream_openai_with_image(image_path: str, model: Optional[str] = None, use_cache: bool = True) -> Iterator[str]:
+    """
+    Same request as call_openai_with_image, but yields output text deltas as the model
+    writes them. A cached response is yielded as a single chunk. The image is preprocessed
+    but never tiled, since tiles are merged only once every tile has finished.
+    """
+    image_file = Path(image_path)
+    image_bytes = image_file.read_bytes()
+    mime_type = _guess_mime_type(image_file, image_bytes)
+
+    system_instructions = f"{INSTRUCTIONS}\n\n{OUTPUT_FORMAT}"
+    model_name = model or os.getenv("OPENAI_MODEL", "gpt-5-mini")
+    with span("extract.image", name=str(image_path), bytes=len(image_bytes), mime_type=mime_type, stream=True) as extract_span:
+        cache_key = _extraction_cache_key(image_bytes, model_name, system_instructions, use_cache)
+        if cache_key is not None:
+            cached = get_extraction_cache().get(cache_key)
+            extract_span.set(cache_hit=cached is not None)
+            if cached is not None:
+                extract_span.set(output_chars=len(cached))
+                yield cached
+                return
+
+        with span("image.preprocess", bytes_before=len(image_bytes)) as preprocess_span:
+            prepared = preprocess_image(image_bytes, mime_type)
+            preprocess_span.set(bytes_after=prepared["bytes_after"], tiles=1)
+        _record_preprocess(image_path, image_bytes, [prepared])
+        parts = []
+        yield from _stream_response(
+            "extraction",
+            parts,
+            model=model_name,
+            input=_image_extraction_input(prepared["bytes"], prepared["mime_type"], system_instructions),
+        )
+        output_text = "".join(parts)
+        extract_span.set(output_chars=len(output_text))
+    if cache_key is not None:
+        get_extraction_cache().put(cache_key, output_text)
 
 
 def _get_item_value(item: Any, key: str, default: Any = None) -> Any:
@@ -67,8 +305,144 @@ def _get_item_value(item: Any, key: str, default: Any = None) -> Any:
     return getattr(item, key, default)
 
 
-def call_openai_with_graph_reasoning(user_query: str, model: Optional[str] = None) -> str:
-    system_instructions = (
+def _get_tool_pool() -> ThreadPoolExecutor:
+    global _tool_pool
+    if _tool_pool is None:
+        _tool_pool = ThreadPoolExecutor(max_workers=TOOL_CALL_WORKERS, thread_name_prefix="graph-query")
+    return _tool_pool
+
+
+def _parse_tool_arguments(call: Any) -> dict:
+    arguments = _get_item_value(call, "arguments", "{}")
+    try:
+        payload = json.loads(arguments) if isinstance(arguments, str) else arguments
+    except json.JSONDecodeError:
+        payload = {"cypher": str(arguments)}
+    return payload
+
+
+def _graph_tool_calls(output: Any) -> list:
+    return [
+        item
+        for item in output or []
+        if _get_item_value(item, "type") == "function_call"
+        and _get_item_value(item, "name") in GRAPH_TOOL_NAMES
+    ]
+
+
+def _expand_tool_calls(tool_calls: list) -> list[tuple[int, str, dict]]:
+    """
+    One (call index, query id, arguments) entry per query: a graph_query call is one
+    query, a graph_query_plan call one per listed query (ids call_id#0, call_id#1, ...).
+    """
+    queries = []
+    for index, call in enumerate(tool_calls):
+        call_id = _get_item_value(call, "call_id")
+        arguments = _parse_tool_arguments(call)
+        if _get_item_value(call, "name") != QUERY_PLAN_TOOL["name"]:
+            queries.append((index, call_id, arguments))
+            continue
+        planned = arguments.get("queries")
+        for position, query in enumerate(planned if isinstance(planned, list) else []):
+            queries.append((index, f"{call_id}#{position}", query if isinstance(query, dict) else {"cypher": str(query)}))
+    return queries
+
+
+def _run_tool_call(payload: dict) -> tuple[dict, float]:
+    start = time.perf_counter()
+    cypher = payload.get("cypher", "")
+    parameters = payload.get("parameters")
+    limit = payload.get("limit", 25)
+    try:
+        result = run_cypher(cypher, parameters=parameters, limit=limit)
+    except Exception as e:
+        print(f"Error running Cypher: {e}")
+        result = {"error": str(e)}
+    return result, 1000 * (time.perf_counter() - start)
+
+
+def _run_tool_calls(tool_calls: list) -> tuple[list, dict]:
+    """
+    Runs one round of graph_query and graph_query_plan calls, a plan's queries in line
+    with the calls around it. Consecutive read-only queries run concurrently on a bounded
+    pool (each in its own driver session); a write waits for the reads before it and runs
+    alone, so writes keep their order relative to everything else. Outputs are returned
+    in the original call order, encoded with ai.tool_results.encode_tool_result; a plan's
+    output is the JSON list of its queries' results.
+    """
+    with span("reasoning.round", calls=len(tool_calls)) as round_span:
+        tool_outputs, round_stats = _run_tool_round(tool_calls)
+        _record_round(round_span, tool_outputs, round_stats)
+    return tool_outputs, round_stats
+
+
+def _record_round(round_span: Any, tool_outputs: list, round_stats: dict) -> None:
+    round_span.set(
+        queries=round_stats["calls"],
+        plans=round_stats["plans"],
+        reads=round_stats["reads"],
+        writes=round_stats["writes"],
+        result_tokens=round_stats["result_tokens"],
+        result_chars=sum(len(output["output"]) for output in tool_outputs),
+    )
+
+
+def _run_tool_round(tool_calls: list) -> tuple[list, dict]:
+    start = time.perf_counter()
+    queries = _expand_tool_calls(tool_calls)
+    payloads = [payload for _, _, payload in queries]
+    results: list = [None] * len(payloads)
+    pending = []
+    writes = 0
+    for index, payload in enumerate(payloads):
+        if is_read_only(payload.get("cypher", "")):
+            pending.append((index, _get_tool_pool().submit(contextvars.copy_context().run, _run_tool_call, payload)))
+            continue
+        for pending_index, future in pending:
+            results[pending_index] = future.result()
+        pending = []
+        results[index] = _run_tool_call(payload)
+        writes += 1
+    for pending_index, future in pending:
+        results[pending_index] = future.result()
+    return _round_outputs(tool_calls, queries, results, writes, start)
+
+
+def _round_outputs(tool_calls: list, queries: list, results: list, writes: int, start: float) -> tuple[list, dict]:
+    """
+    The function_call_output items and stats of one round, from each query's (result,
+    elapsed ms) in _expand_tool_calls order.
+    """
+    payloads = [payload for _, _, payload in queries]
+    encoded: list[list[str]] = [[] for _ in tool_calls]
+    for (index, _, _), (result, _) in zip(queries, results):
+        encoded[index].append(encode_tool_result(result))
+    plans = 0
+    tool_outputs = []
+    for call, outputs in zip(tool_calls, encoded):
+        is_plan = _get_item_value(call, "name") == QUERY_PLAN_TOOL["name"]
+        plans += is_plan
+        tool_outputs.append({
+            "type": "function_call_output",
+            "call_id": _get_item_value(call, "call_id"),
+            "output": "[" + ",".join(outputs) + "]" if is_plan else outputs[0],
+        })
+    round_stats = {
+        "calls": len(payloads),
+        "plans": plans,
+        "reads": len(payloads) - writes,
+        "writes": writes,
+        "elapsed_ms": 1000 * (time.perf_counter() - start),
+        "result_tokens": sum(estimate_tokens(output["output"]) for output in tool_outputs),
+        "query_ids": [query_id for _, query_id, _ in queries],
+        "call_ms": [elapsed_ms for _, elapsed_ms in results],
+        "results": [result for result, _ in results],
+    }
+    return tool_outputs, round_stats
+
+
+def _graph_reasoning_instructions() -> str:
+    return (
         "You are a technical reasoning assistant with access to a Neo4j graph database of "
         "engineering drawings, parts, features, dimensions, notes, and relationships. "
         "Use the graph_query tool to read or update the graph. "
@@ -78,61 +452,261 @@ def call_openai_with_graph_reasoning(user_query: str, model: Optional[str] = Non
         "If you use RETURN, keep results small and use LIMIT when possible. "
         "Provide tool arguments as JSON."
         f"Here is the basic schema of the graph: {ENTITIES_AND_RELATIONSHIPS}"
-        "Some of these entities and relationships may not be present in the graph, if so just assume its not present in the drawing."
-    )
-    model_name = model or os.getenv("OPENAI_MODEL", "gpt-5.2")
-
-    response = _get_client().responses.create(
-        model=model_name,
-        input=[
-            {"role": "system", "content": system_instructions},
-            {"role": "user", "content": user_query},
-        ],
-        tools=TOOLS,
+        "Some of these entities and relationships may not be present in the graph, if so just assume its not present in the drawing. "
+        "Material, Process, WeldSpec and Part nodes are per drawing; each links with RESOLVES_TO to a shared "
+        "CanonicalMaterial, CanonicalProcess, CanonicalWeldSpec or CanonicalPart node (property key). "
+        "For questions across drawings, e.g. which drawings use the same material, join through those nodes."
     )
 
-    max_rounds = 3
-    for _ in range(max_rounds):
-        tool_calls = [
-            item
-            for item in response.output
-            if _get_item_value(item, "type") == "function_call"
-            and _get_item_value(item, "name") == "graph_query"
-        ]
-        if not tool_calls:
-            return response.output_text
 
-        tool_outputs = []
-        for call in tool_calls:
-            arguments = _get_item_value(call, "arguments", "{}")
-            try:
-                payload = json.loads(arguments) if isinstance(arguments, str) else arguments
-            except json.JSONDecodeError:
-                payload = {"cypher": str(arguments)}
-            cypher = payload.get("cypher", "")
-            parameters = payload.get("parameters")
-            limit = payload.get("limit", 25)
+def _reasoning_input(user_query: str, retrieve: bool, plan: bool = False) -> list:
+    system_instructions = _graph_reasoning_instructions()
+    if plan:
+        system_instructions += (
+            " Each round of tool calls costs time, so plan ahead: when you can tell which queries the "
+            "question needs, send them together in one graph_query_plan call rather than one per round, "
+            "and answer as soon as the results are enough."
+        )
+    if retrieve:
+        # Retrieval only seeds the prompt: on failure the model queries the graph itself, and
+        # the error is left on the "retrieve" span.
+        with span("retrieve") as retrieve_span:
             try:
-                result = run_cypher(cypher, parameters=parameters, limit=limit)
+                context = retrieve_context(user_query)
             except Exception as e:
-                print(f"Error running Cypher: {e}")
-                result = {"error": str(e)}
-            tool_outputs.append(
-                {
-                    "type": "function_call_output",
-                    "call_id": _get_item_value(call, "call_id"),
-                    "output": json.dumps(result, ensure_ascii=False),
-                }
+                retrieve_span.set(error=f"{type(e).__name__}: {e}")
+                context = ""
+            retrieve_span.set(context_chars=len(context))
+        if context:
+            system_instructions += (
+                " The following subgraph was retrieved for this question (nodes matching its terms and "
+                "their neighbourhood). Answer from it directly when it is sufficient and only query "
+                f"the graph for what is missing.\n{context}"
             )
+    return [
+        {"role": "system", "content": system_instructions},
+        {"role": "user", "content": user_query},
+    ]
 
-        response = _get_client().responses.create(
-            model=model_name,
-            input=tool_outputs,
-            previous_response_id=response.id,
-            tools=TOOLS,
+
+def _usage_tokens(response: Any, request_input: Any) -> tuple[int, int]:
+    """
+    Input and output tokens from the response's usage, estimated from the request and the
+    output when the response does not report them.
+    """
+    usage = _get_item_value(response, "usage")
+    input_tokens = _get_item_value(usage, "input_tokens") if usage is not None else None
+    output_tokens = _get_item_value(usage, "output_tokens") if usage is not None else None
+    if input_tokens is None:
+        input_tokens = estimate_tokens(json.dumps(request_input, ensure_ascii=False, default=str))
+    if output_tokens is None:
+        arguments = "".join(str(_get_item_value(call, "arguments", "")) for call in _graph_tool_calls(_get_item_value(response, "output")))
+        output_tokens = estimate_tokens((_get_item_value(response, "output_text", "") or "") + arguments)
+    return input_tokens, output_tokens
+
+
+def _budget_exhausted_input(tool_calls: list, reason: str) -> list:
+    budget = {"max_rounds": "round", "latency": "latency", "tokens": "token"}[reason]
+    error = json.dumps({"error": f"not run: the {budget} budget for this question is used up"})
+    return [
+        {"type": "function_call_output", "call_id": _get_item_value(call, "call_id"), "output": error}
+        for call in tool_calls
+    ] + [{"role": "system", "content": "Answer now from the results you already have and say briefly what could not be checked."}]
+
+
+def reasoning_report() -> dict:
+    """
+    The strategy, model, rounds, model calls, queries, input/output/result tokens, wall time
+    and stop reason of the last question answered in the current thread or task; {} if none.
+    """
+    state = _reasoning_state.get(None)
+    return state[0] if state is not None else {}
+
+
+def reasoning_rounds() -> list[dict]:
+    """
+    Per-round tool call stats (calls, call_ms, result_tokens, ...) of the last question
+    answered in the current thread or task.
+    """
+    state = _reasoning_state.get(None)
+    return state[1] if state is not None else []
+
+
+def _begin_report(user_query: str, mode: str, strategy: str, model_name: Optional[str]) -> None:
+    _reasoning_state.set(({
+        "question": user_query, "mode": mode, "strategy": strategy, "model": model_name, "rounds": 0, "queries": 0,
+        "model_calls": 0, "input_tokens": 0, "output_tokens": 0, "result_tokens": 0, "wall_ms": 0.0, "stopped": None,
+    }, []))
+
+
+def _end_report(start: float, stopped: str, budget: Optional[ReasoningBudget] = None) -> None:
+    report, rounds = _reasoning_state.get()
+    if budget is not None:
+        report.update(
+            rounds=budget.rounds,
+            model_calls=budget.model_calls,
+            input_tokens=budget.input_tokens,
+            output_tokens=budget.output_tokens,
+            queries=sum(round_stats["calls"] for round_stats in rounds),
+            result_tokens=sum(round_stats["result_tokens"] for round_stats in rounds),
         )
+    report.update(wall_ms=1000 * (time.perf_counter() - start), stopped=stopped)
+
+
+def _route_model(route: dict, model: Optional[str]) -> str:
+    return model or (light_model() if route["strategy"] == "light" else default_model())
+
+
+def _reasoning_steps(user_query: str, model: Optional[str], retrieve: bool, mode: str) -> Generator[tuple, Any, str]:
+    """
+    Routing, budget and tool rounds for one question, shared by the sync, streaming and
+    async entry points. It does no I/O itself; it yields each step for the caller to run and
+    send the result back:
+    - ("graph", fn, args): a graph read (template lookup, retrieval); send fn(*args);
+    - ("model", request): a responses.create request; send the completed response;
+    - ("tools", tool_calls): a round of graph tool calls; send (tool_outputs, round_stats)
+      as _run_tool_calls returns them.
+    Returns the answer and leaves the strategy, rounds, tokens and wall time in
+    reasoning_report().
+    """
+    start = time.perf_counter()
+    route = route_question(user_query) if mode == "adaptive" else {"strategy": "fixed"}
+    if route["strategy"] == "template":
+        _begin_report(user_query, mode, "template", None)
+        answer = yield ("graph", answer_lookup, (route,))
+        if answer is not None:
+            reasoning_report()["queries"] = 1
+            _end_report(start, "template")
+            return answer
+        route = {"strategy": "light"}
+    model_name = _route_model(route, model)
+    adaptive = mode == "adaptive"
+    budget = ReasoningBudget() if adaptive else ReasoningBudget.fixed()
+    tools = [*TOOLS, QUERY_PLAN_TOOL] if adaptive else TOOLS
+    request: dict = {"input": (yield ("graph", _reasoning_input, (user_query, retrieve, adaptive)))}
+    _begin_report(user_query, mode, route["strategy"], model_name)
+
+    stopped = None
+    while True:
+        response = yield ("model", {"model": model_name, "tools": tools, **request})
+        budget.charge(*_usage_tokens(response, request["input"]))
+        tool_calls = [] if stopped else _graph_tool_calls(_get_item_value(response, "output", []))
+        if not tool_calls:
+            break
+        stopped = budget.stop_reason()
+        if stopped is not None:
+            if not adaptive:
+                break
+            request = {
+                "input": _budget_exhausted_input(tool_calls, stopped),
+                "previous_response_id": _get_item_value(response, "id"),
+                "tool_choice": "none",
+            }
+            continue
+
+        tool_outputs, round_stats = yield ("tools", tool_calls)
+        reasoning_rounds().append({key: value for key, value in round_stats.items() if key != "results"})
+        budget.rounds += 1
+        request = {"input": tool_outputs, "previous_response_id": _get_item_value(response, "id")}
+
+    _end_report(start, stopped or "answered", budget)
+    return _get_item_value(response, "output_text", "") or ""
+
+
+def _record_reasoning(reasoning_span: Any, answer: Optional[str]) -> None:
+    report = reasoning_report()
+    reasoning_span.set(
+        answer_chars=len(answer or ""),
+        **{key: report.get(key) for key in ("strategy", "model", "rounds", "model_calls", "input_tokens", "output_tokens", "stopped")},
+    )
+
+
+def call_openai_with_graph_reasoning(
+    user_query: str,
+    model: Optional[str] = None,
+    retrieve: bool = True,
+    mode: Optional[str] = None,
+) -> str:
+    """
+    Answers a question from the graph. mode (REASONING_MODE by default) is "adaptive":
+    identifier lookups are answered from templated Cypher, other questions go to
+    OPENAI_LIGHT_MODEL or OPENAI_MODEL (see ai.planner.route_question), the model may batch
+    its queries with graph_query_plan and rounds continue while ai.planner.ReasoningBudget
+    allows, after which the model is asked to answer from what it has. "fixed" is up to
+    three rounds of graph_query calls on OPENAI_MODEL. model overrides the routed model.
+    The strategy, rounds, tokens and wall time used are left in reasoning_report().
+    """
+    mode = reasoning_mode(mode)
+    with span("reasoning", question=user_query, retrieve=retrieve, mode=mode) as reasoning_span:
+        steps = _reasoning_steps(user_query, model, retrieve, mode)
+        result = None
+        try:
+            while True:
+                step = steps.send(result)
+                if step[0] == "graph":
+                    result = step[1](*step[2])
+                elif step[0] == "model":
+                    result = _create_response("reasoning", **step[1])
+                else:
+                    result = _run_tool_calls(step[1])
+        except StopIteration as stop:
+            answer = stop.value
+        _record_reasoning(reasoning_span, answer)
+    return answer
+
 
-    return response.output_text
+def stream_openai_with_graph_reasoning(
+    user_query: str,
+    model: Optional[str] = None,
+    client: Optional[Any] = None,
+    retrieve: bool = True,
+    mode: Optional[str] = None,
+) -> Iterator[dict]:
+    """
+    Streaming counterpart of call_openai_with_graph_reasoning. Yields events as they arrive:
+    {"type": "token", "text"}, {"type": "tool_call_start", "call_id", "cypher"},
+    {"type": "tool_call_end", "call_id", "elapsed_ms", "rows" | "error"} and a final
+    {"type": "done", "text"}. The done text is every token streamed, across all rounds (text
+    the model wrote before calling a tool included), so it always equals the concatenated
+    token events; a template answer is sent as one token. Queries in a graph_query_plan call get
+    call ids call_id#0, call_id#1, ... client defaults to the shared OpenAI client and can
+    be replaced by anything with a compatible responses.create(stream=True).
+    """
+    mode = reasoning_mode(mode)
+    steps = _reasoning_steps(user_query, model, retrieve, mode)
+    text_parts: list[str] = []
+    result = None
+    try:
+        while True:
+            step = steps.send(result)
+            if step[0] == "graph":
+                result = step[1](*step[2])
+            elif step[0] == "model":
+                deltas = _stream_response("reasoning", text_parts, client, **step[1])
+                while True:
+                    try:
+                        delta = next(deltas)
+                    except StopIteration as stop:
+                        result = stop.value
+                        break
+                    yield {"type": "token", "text": delta}
+            else:
+                for _, query_id, payload in _expand_tool_calls(step[1]):
+                    yield {"type": "tool_call_start", "call_id": query_id, "cypher": payload.get("cypher", "")}
+                result = _run_tool_calls(step[1])
+                round_stats = result[1]
+                for query_id, query_result, elapsed_ms in zip(round_stats["query_ids"], round_stats["results"], round_stats["call_ms"]):
+                    event = {"type": "tool_call_end", "call_id": query_id, "elapsed_ms": elapsed_ms}
+                    if "error" in query_result:
+                        event["error"] = query_result["error"]
+                    else:
+                        event["rows"] = len(query_result.get("records", []))
+                    yield event
+    except StopIteration as stop:
+        if not text_parts:
+            text_parts.append(stop.value)
+            yield {"type": "token", "text": stop.value}
+    yield {"type": "done", "text": "".join(text_parts)}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,199 @@
+"""
+Adaptive graph reasoning: a router that answers identifier lookups ("show part P-100")
+from templated Cypher without a model round and sends other short, single-step questions
+to a cheaper model, and a latency/token budget that decides whether another tool round
+fits instead of a fixed round count.
+"""
+import math
+import os
+import re
+import time
+from typing import Optional
+
+from lib.db import run_cypher
+from lib.schema import DOC_KEY, identifier_keys
+
+MODES = ("adaptive", "fixed")
+FIXED_MAX_ROUNDS = 3
+LIGHT_MAX_WORDS = 14
+TEMPLATE_LIMIT = 50
+SKIPPED_PROPERTIES = {"bounding_box", DOC_KEY}
+
+LABEL_WORDS = {
+    "part": "Part",
+    "feature": "Feature",
+    "dimension": "Dimension",
+    "dim": "Dimension",
+    "note": "Note",
+    "material": "Material",
+    "process": "Process",
+    "weld": "WeldSpec",
+    "weld spec": "WeldSpec",
+    "weldspec": "WeldSpec",
+    "tolerance spec": "ToleranceSpec",
+    "tolspec": "ToleranceSpec",
+    "view": "View",
+    "callout": "Callout",
+}
+# Words that make a question more than a one-step lookup, however short it is.
+ANALYTIC_WORDS = {
+    "all", "allowed", "and", "between", "check", "compare", "conflict", "conflicts", "differ", "each",
+    "every", "how", "many", "most", "same", "satisfy", "violate", "which", "why",
+}
+
+_LOOKUP = re.compile(
+    r"^\s*(?:(?:what|which)(?:'s|\s+is|\s+are)?|show(?:\s+me)?|describe|get|find|look\s*up|"
+    r"tell\s+me\s+about|details?\s+(?:of|for|on))\s+(?:the\s+)?"
+    r"(?P<label>" + "|".join(word.replace(" ", r"\s+") for word in sorted(LABEL_WORDS, key=len, reverse=True)) + r")"
+    r"\s+(?:(?:id|no\.?|number|#)\s*)?(?P<id>[A-Za-z0-9][\w./-]*)"
+    r"(?:\s+(?:in|on|of|from)\s+(?:(?:drawing|doc|document)\s+)?(?P<doc>[A-Za-z0-9][\w./-]*))?"
+    r"\s*[?.!]*\s*$",
+    re.IGNORECASE,
+)
+_WORD = re.compile(r"[a-z]+")
+
+
+def reasoning_mode(mode: Optional[str] = None) -> str:
+    mode = mode or os.getenv("REASONING_MODE", "adaptive")
+    if mode not in MODES:
+        raise ValueError(f"unknown reasoning mode {mode!r}; expected one of {MODES}")
+    return mode
+
+
+def default_model() -> str:
+    return os.getenv("OPENAI_MODEL", "gpt-5.2")
+
+
+def light_model() -> str:
+    return os.getenv("OPENAI_LIGHT_MODEL", "gpt-5-mini")
+
+
+def lookup_query(label: str, key: str, scoped: bool) -> str:
+    where = f"n.`{key}` IN $ids" + (f" AND n.{DOC_KEY} = $doc" if scoped else "")
+    return (
+        f"MATCH (n:`{label}`) WHERE {where} "
+        "OPTIONAL MATCH (n)-[r]-(m) "
+        "RETURN elementId(n) AS id, properties(n) AS node, type(r) AS relationship, "
+        "startNode(r) = n AS outgoing, labels(m)[0] AS label, properties(m) AS neighbour "
+        f"LIMIT {TEMPLATE_LIMIT}"
+    )
+
+
+def route_question(question: str) -> dict:
+    """
+    Picks a strategy for a question:
+    - "template": "show part P-100", "what is dimension D-101 in FD-1042?" and similar
+      single-identifier lookups, answered by answer_lookup with no model call;
+    - "light": short questions without comparison, counting or conflict words, answered
+      by light_model();
+    - "full": everything else, answered by default_model().
+    """
+    match = _LOOKUP.match(question)
+    if match and any(char.isdigit() for char in match["id"]):
+        label = LABEL_WORDS[" ".join(match["label"].lower().split())]
+        keys = identifier_keys().get(label)
+        if keys:
+            identifier = match["id"].rstrip(".")
+            parameters: dict = {"ids": sorted({identifier, identifier.upper()})}
+            if match["doc"]:
+                parameters["doc"] = match["doc"].rstrip(".")
+            return {
+                "strategy": "template",
+                "label": label,
+                "id": identifier,
+                "cypher": lookup_query(label, keys[0], bool(match["doc"])),
+                "parameters": parameters,
+            }
+    words = _WORD.findall(question.lower())
+    if len(words) <= LIGHT_MAX_WORDS and not ANALYTIC_WORDS.intersection(words):
+        return {"strategy": "light"}
+    return {"strategy": "full"}
+
+
+def _describe_node(label: Optional[str], properties: dict) -> str:
+    keys = identifier_keys().get(label or "", ())
+    identifier = next((properties[key] for key in keys if properties.get(key) is not None), None)
+    name = properties.get("name") or properties.get("label")
+    text = f"{label} {identifier}" if identifier is not None else str(label)
+    return f"{text} ({name})" if name and name != identifier else text
+
+
+def answer_lookup(route: dict) -> Optional[str]:
+    """
+    Runs a "template" route and renders the matched nodes, their properties and their
+    neighbours as the answer. None when nothing matched, so the caller can fall back to a
+    model.
+    """
+    result = run_cypher(route["cypher"], parameters=route["parameters"], limit=TEMPLATE_LIMIT)
+    nodes: dict = {}
+    for record in result.get("records", []):
+        entry = nodes.setdefault(record["id"], {"properties": record["node"], "links": []})
+        if record.get("relationship"):
+            arrow = "->" if record.get("outgoing") else "<-"
+            entry["links"].append(f"{arrow} {record['relationship']} {_describe_node(record.get('label'), record.get('neighbour') or {})}")
+    if not nodes:
+        return None
+    blocks = []
+    for entry in nodes.values():
+        properties = entry["properties"]
+        doc = properties.get(DOC_KEY)
+        lines = [_describe_node(route["label"], properties) + (f" in {doc}" if doc else "") + ":"]
+        lines.extend(
+            f"  {key}: {value}"
+            for key, value in sorted(properties.items())
+            if key not in SKIPPED_PROPERTIES and value not in (None, "", [])
+        )
+        lines.extend(f"  {link}" for link in sorted(set(entry["links"])))
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+
+class ReasoningBudget:
+    """
+    Latency, token and round allowance for one question (defaults from
+    REASONING_LATENCY_BUDGET_S, REASONING_TOKEN_BUDGET and REASONING_MAX_ROUNDS). Each
+    model call is charged with charge(); stop_reason() projects the next round from the
+    most expensive one so far and says why it would not fit, or None while it does.
+    """
+
+    def __init__(self, latency_s: Optional[float] = None, tokens: Optional[int] = None, max_rounds: Optional[int] = None):
+        self.latency_s = latency_s if latency_s is not None else float(os.getenv("REASONING_LATENCY_BUDGET_S", "30"))
+        self.tokens = tokens if tokens is not None else int(os.getenv("REASONING_TOKEN_BUDGET", "60000"))
+        self.max_rounds = max_rounds if max_rounds is not None else int(os.getenv("REASONING_MAX_ROUNDS", "6"))
+        self.rounds = 0
+        self.model_calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._start = time.perf_counter()
+        self._mark = self._start
+        self._step_s = 0.0
+        self._step_tokens = 0
+
+    @classmethod
+    def fixed(cls) -> "ReasoningBudget":
+        return cls(latency_s=math.inf, tokens=math.inf, max_rounds=FIXED_MAX_ROUNDS)
+
+    def elapsed_s(self) -> float:
+        return time.perf_counter() - self._start
+
+    def charge(self, input_tokens: int, output_tokens: int) -> None:
+        """
+        Records one model call; the time since the previous call (tool queries included)
+        counts as that call's step.
+        """
+        now = time.perf_counter()
+        self._step_s = max(self._step_s, now - self._mark)
+        self._step_tokens = max(self._step_tokens, input_tokens + output_tokens)
+        self._mark = now
+        self.model_calls += 1
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+
+    def stop_reason(self) -> Optional[str]:
+        if self.rounds >= self.max_rounds:
+            return "max_rounds"
+        if self.elapsed_s() + self._step_s > self.latency_s:
+            return "latency"
+        if self.input_tokens + self.output_tokens + self._step_tokens > self.tokens:
+            return "tokens"
+        return None
@@ -0,0 +1,273 @@
+import io
+import json
+import mimetypes
+import os
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "2048"))
+MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(4 * 1024 * 1024)))
+JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+TIME_BUDGET_S = float(os.getenv("IMAGE_TIME_BUDGET_S", "5"))
+TILE_THRESHOLD = int(os.getenv("IMAGE_TILE_THRESHOLD", "0"))
+TILE_OVERLAP = float(os.getenv("IMAGE_TILE_OVERLAP", "0.1"))
+LINE_ART_FRACTION = 0.9
+SHRINK_STEP = 0.75
+
+_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+    (b"BM", "image/bmp"),
+    (b"%PDF", "application/pdf"),
+)
+_PROVENANCE_PROPERTIES = {"bounding_box", "source_snippet", "text_snippet", "source_text"}
+
+
+def sniff_mime_type(data: bytes) -> Optional[str]:
+    """
+    Detects the format from the file's magic bytes rather than its extension.
+    """
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    for signature, mime_type in _SIGNATURES:
+        if data.startswith(signature):
+            return mime_type
+    return None
+
+
+def guess_mime_type(path: Path, data: Optional[bytes] = None) -> str:
+    sniffed = sniff_mime_type(data) if data else None
+    return sniffed or mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+
+
+def preprocess_settings() -> str:
+    """
+    Identifies the settings that shape the bytes sent, so cached extractions made with
+    different settings are kept apart. Empty when preprocessing is off.
+    """
+    if not preprocessing_enabled():
+        return ""
+    return f"preprocess:{MAX_SIDE}:{MAX_BYTES}:{JPEG_QUALITY}:{TILE_THRESHOLD}:{TILE_OVERLAP}"
+
+
+@lru_cache(maxsize=1)
+def _pil_image():
+    """
+    Pillow's Image module, imported on first use; None when Pillow is not installed.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image
+
+
+def preprocessing_enabled() -> bool:
+    return os.getenv("IMAGE_PREPROCESS", "on") != "off" and _pil_image() is not None
+
+
+def _otsu_threshold(histogram: list[int]) -> int:
+    total = sum(histogram)
+    weighted_total = sum(level * count for level, count in enumerate(histogram))
+    background = weighted_background = 0
+    best_level, best_variance = 128, -1.0
+    for level, count in enumerate(histogram):
+        background += count
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        weighted_background += level * count
+        mean_background = weighted_background / background
+        mean_foreground = (weighted_total - weighted_background) / foreground
+        variance = background * foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_level, best_variance = level, variance
+    return best_level
+
+
+def is_line_art(gray) -> bool:
+    """
+    True when nearly all pixels are close to black or white, as on scanned drawings.
+    """
+    histogram = gray.histogram()
+    extremes = sum(histogram[:64]) + sum(histogram[192:])
+    return extremes >= LINE_ART_FRACTION * sum(histogram)
+
+
+def _encode(gray, binarize: bool, quality: int) -> tuple[bytes, str]:
+    buffer = io.BytesIO()
+    if binarize:
+        threshold = _otsu_threshold(gray.histogram())
+        gray.point(lambda level: 255 if level > threshold else 0, mode="1").save(buffer, format="PNG", optimize=True)
+        return buffer.getvalue(), "image/png"
+    gray.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue(), "image/jpeg"
+
+
+def _fit(image, max_side: int):
+    scale = max_side / max(image.size)
+    if scale >= 1:
+        return image
+    return image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))), _pil_image().LANCZOS)
+
+
+def _preprocess(image, original_bytes: int, max_side: int, max_bytes: int, quality: int, time_budget_s: float, binarize: bool) -> dict:
+    start = time.perf_counter()
+    gray = image.convert("L")
+    binarize = binarize and is_line_art(gray)
+    steps = ["grayscale"] + (["binarize"] if binarize else [])
+    side = max_side
+    while True:
+        fitted = _fit(gray, side)
+        data, mime_type = _encode(fitted, binarize, quality)
+        steps.append(f"{fitted.width}x{fitted.height}:{len(data)}")
+        over_time = time.perf_counter() - start > time_budget_s
+        if len(data) <= max_bytes or over_time or min(fitted.size) < 256:
+            break
+        side = int(max(fitted.size) * SHRINK_STEP)
+    return {
+        "bytes": data,
+        "mime_type": mime_type,
+        "size": fitted.size,
+        "bytes_before": original_bytes,
+        "bytes_after": len(data),
+        "elapsed_ms": 1000 * (time.perf_counter() - start),
+        "steps": steps,
+    }
+
+
+def _unchanged(image_bytes: bytes, mime_type: str, reason: str) -> dict:
+    return {
+        "bytes": image_bytes,
+        "mime_type": mime_type,
+        "size": None,
+        "bytes_before": len(image_bytes),
+        "bytes_after": len(image_bytes),
+        "elapsed_ms": 0.0,
+        "steps": [reason],
+    }
+
+
+def preprocess_image(
+    image_bytes: bytes,
+    mime_type: str,
+    max_side: int = MAX_SIDE,
+    max_bytes: int = MAX_BYTES,
+    quality: int = JPEG_QUALITY,
+    time_budget_s: float = TIME_BUDGET_S,
+    binarize: bool = True,
+) -> dict:
+    """
+    Shrinks a drawing before upload: grayscale, downscale so the longest side is at most
+    max_side, then encode line art as a 1-bit PNG (Otsu threshold) and anything else as
+    JPEG at quality. While the result is over max_bytes the side is cut by SHRINK_STEP,
+    until time_budget_s runs out. Returns the bytes, their real mime type and a
+    bytes_before/bytes_after report. Without Pillow the original bytes are returned.
+    """
+    if not preprocessing_enabled():
+        return _unchanged(image_bytes, mime_type, "skipped")
+    with _pil_image().open(io.BytesIO(image_bytes)) as image:
+        return _preprocess(image, len(image_bytes), max_side, max_bytes, quality, time_budget_s, binarize)
+
+
+def tile_boxes(width: int, height: int, tile_side: int, overlap: float = TILE_OVERLAP) -> list[tuple[int, int, int, int]]:
+    """
+    Grid of (left, top, right, bottom) boxes at most tile_side wide and high, overlapping
+    by the given fraction so a view on a seam appears whole in at least one tile.
+    """
+    def starts(length: int) -> list[int]:
+        if length <= tile_side:
+            return [0]
+        step = max(1, int(tile_side * (1 - overlap)))
+        positions = list(range(0, length - tile_side, step))
+        return positions + [length - tile_side]
+
+    return [
+        (left, top, min(left + tile_side, width), min(top + tile_side, height))
+        for top in starts(height)
+        for left in starts(width)
+    ]
+
+
+def preprocess_tiles(image_bytes: bytes, mime_type: str, tile_threshold: int = TILE_THRESHOLD, **budget) -> list[dict]:
+    """
+    Splits sheets whose longest side exceeds tile_threshold pixels into overlapping tiles,
+    each preprocessed with preprocess_image's budget and tagged with its "box" in the
+    original sheet and the sheet "sheet_size". Smaller sheets, tile_threshold 0 or a missing
+    Pillow give a single untiled entry.
+    """
+    if not preprocessing_enabled() or tile_threshold <= 0:
+        return [preprocess_image(image_bytes, mime_type, **budget)]
+    with _pil_image().open(io.BytesIO(image_bytes)) as image:
+        if max(image.size) <= tile_threshold:
+            return [_preprocess(image, len(image_bytes), **_budget(budget))]
+        image.load()
+        boxes = tile_boxes(image.width, image.height, tile_threshold)
+        tiles = []
+        for box in boxes:
+            tile = _preprocess(image.crop(box), len(image_bytes) // len(boxes), **_budget(budget))
+            tiles.append({**tile, "box": box, "sheet_size": image.size})
+        return tiles
+
+
+def _budget(budget: dict) -> dict:
+    return {
+        "max_side": budget.get("max_side", MAX_SIDE),
+        "max_bytes": budget.get("max_bytes", MAX_BYTES),
+        "quality": budget.get("quality", JPEG_QUALITY),
+        "time_budget_s": budget.get("time_budget_s", TIME_BUDGET_S),
+        "binarize": budget.get("binarize", True),
+    }
+
+
+@lru_cache(maxsize=1)
+def _identifier_keys() -> dict:
+    from lib.schema import identifier_keys
+    return identifier_keys()
+
+
+def _entity_key(entity: dict) -> tuple:
+    label = entity.get("type")
+    properties = entity.get("properties") or {}
+    view = properties.get("source_view_id")
+    if label == "View" and view is not None:
+        return label, view
+    ids = tuple((key, properties[key]) for key in _identifier_keys().get(label, ()) if properties.get(key) is not None)
+    if not ids:
+        ids = tuple(sorted(
+            (key, json.dumps(value, sort_keys=True, default=str))
+            for key, value in properties.items()
+            if key not in _PROVENANCE_PROPERTIES
+        ))
+    return label, view, ids
+
+
+def merge_extractions(payloads: list[dict]) -> dict:
+    """
+    Merges per-tile extractions of one sheet. Views are merged on source_view_id, other
+    entities on (type, source_view_id, identifier values), so an entity seen in two
+    overlapping tiles is kept once; later tiles only fill properties the first lacked.
+    Relationships are deduplicated on their full content.
+    """
+    entities: dict[tuple, dict] = {}
+    relationships: dict[str, dict] = {}
+    for payload in payloads:
+        for entity in payload.get("entities", []):
+            key = _entity_key(entity)
+            if key in entities:
+                merged = entities[key]["properties"]
+                for name, value in (entity.get("properties") or {}).items():
+                    merged.setdefault(name, value)
+            else:
+                entities[key] = {**entity, "properties": dict(entity.get("properties") or {})}
+        for relationship in payload.get("relationships", []):
+            relationships.setdefault(json.dumps(relationship, sort_keys=True, default=str), relationship)
+    return {"entities": list(entities.values()), "relationships": list(relationships.values())}
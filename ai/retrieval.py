@@ -0,0 +1,138 @@
+import re
+from collections import Counter
+
+from lib.db import run_cypher, uses_neo4j
+from lib.schema import FULLTEXT_INDEX, TERMS_INDEX
+
+SKIPPED_PROPERTIES = {"bounding_box", "source_snippet", "text_snippet", "source_text"}
+STOPWORDS = {
+    "a", "an", "and", "any", "are", "as", "at", "be", "by", "does", "do", "for", "from", "how", "in",
+    "is", "it", "of", "on", "or", "shown", "that", "the", "there", "this", "to", "what", "whats",
+    "where", "which", "with",
+}
+
+_TERM = re.compile(r"[\w\-./Ø±]+")
+
+# Seeds come from the server's full-text indexes (lib.schema.search_index_statements): note
+# and spec text in drawing_text, names and identifiers in drawing_terms. Both are maintained
+# by Neo4j on every write, so there is nothing to rebuild or version-check per question.
+SEED_QUERY = " UNION ALL ".join(
+    f"CALL db.index.fulltext.queryNodes('{index}', $query, {{limit: $limit}}) YIELD node, score "
+    "RETURN elementId(node) AS id, score"
+    for index in (FULLTEXT_INDEX, TERMS_INDEX)
+)
+
+
+def neighbourhood_query(hops: int) -> str:
+    return (
+        "UNWIND $ids AS id MATCH (n) WHERE elementId(n) = id "
+        "RETURN elementId(n) AS source_id, labels(n)[0] AS source_label, properties(n) AS source_properties, "
+        "null AS type, null AS target_id, null AS target_label, null AS target_properties "
+        "UNION ALL "
+        "UNWIND $ids AS id MATCH (n) WHERE elementId(n) = id "
+        f"MATCH p = (n)-[*1..{int(hops)}]-() "
+        "WITH p LIMIT $max_paths "
+        "UNWIND relationships(p) AS r "
+        "WITH DISTINCT r, startNode(r) AS s, endNode(r) AS t "
+        "RETURN elementId(s) AS source_id, labels(s)[0] AS source_label, properties(s) AS source_properties, "
+        "type(r) AS type, elementId(t) AS target_id, labels(t)[0] AS target_label, properties(t) AS target_properties "
+        "LIMIT $max_edges"
+    )
+
+
+def question_terms(text: str) -> set[str]:
+    terms = set()
+    for term in _TERM.findall(text.lower()):
+        terms.add(term.strip(".-/"))
+        if "/" in term:
+            terms.update(part.strip(".-") for part in term.split("/"))
+    return {term for term in terms if len(term) > 1 and term not in STOPWORDS}
+
+
+def search_query(question: str) -> str:
+    """
+    The question's terms as a Lucene query: each term quoted, so identifiers such as
+    "p-100" or "12.5" match as phrases of the analyzer's tokens, joined with OR.
+    """
+    return " OR ".join(f'"{term}"' for term in sorted(question_terms(question)))
+
+
+def search_seeds(question: str, limit: int = 10) -> list[str]:
+    """
+    Element ids of the nodes that best match the question's terms, by summed full-text score.
+    """
+    query = search_query(question)
+    if not query:
+        return []
+    scores: Counter = Counter()
+    for record in run_cypher(SEED_QUERY, parameters={"query": query, "limit": limit}, limit=None)["records"]:
+        scores[record["id"]] += record["score"]
+    return [node_id for node_id, _ in scores.most_common(limit)]
+
+
+def _describe(label: str, properties: dict, max_value_chars: int) -> str:
+    fields = []
+    for key in sorted(properties):
+        if key in SKIPPED_PROPERTIES or key == "source_doc_id":
+            continue
+        value = str(properties[key])
+        if len(value) > max_value_chars:
+            value = value[:max_value_chars] + "..."
+        fields.append(f"{key}={value}")
+    doc = properties.get("source_doc_id")
+    scope = f"@{doc}" if doc is not None else ""
+    return f"{label}{scope}({', '.join(fields)})"
+
+
+def serialize_subgraph(rows: list[dict], max_chars: int = 6000, max_value_chars: int = 120) -> str:
+    """
+    Compact text form: each node once as "N<k> Label@doc(key=value, ...)", then edges as
+    "N<a> -TYPE-> N<b>". Rows without a type are seed nodes. Stops at max_chars.
+    """
+    handles: dict[str, str] = {}
+    node_lines: list[str] = []
+    edge_lines: list[str] = []
+
+    def handle(node_id: str, label: str, properties: dict) -> str:
+        if node_id not in handles:
+            handles[node_id] = f"N{len(handles)}"
+            node_lines.append(f"{handles[node_id]} {_describe(label, properties, max_value_chars)}")
+        return handles[node_id]
+
+    for row in rows:
+        source = handle(row["source_id"], row["source_label"], row["source_properties"])
+        if row["type"] is None:
+            continue
+        target = handle(row["target_id"], row["target_label"], row["target_properties"])
+        edge_lines.append(f"{source} -{row['type']}-> {target}")
+
+    lines = ["Nodes:"] + node_lines + ["Edges:"] + edge_lines
+    output = []
+    size = 0
+    for line in lines:
+        if size + len(line) + 1 > max_chars:
+            output.append(f"... truncated ({len(lines) - len(output)} more lines)")
+            break
+        output.append(line)
+        size += len(line) + 1
+    return "\n".join(output)
+
+
+def retrieve_context(question: str, seeds: int = 10, hops: int = 2, max_paths: int = 200, max_edges: int = 150, max_chars: int = 6000) -> str:
+    """
+    Finds nodes whose text, names or identifiers share terms with the question and returns
+    their 1..hops neighbourhood, fetched with one batched query, as compact text for the
+    prompt. Returns an empty string when nothing matches, and on the in-memory backend, which
+    has neither full-text indexes nor variable-length paths.
+    """
+    if not uses_neo4j():
+        return ""
+    seed_ids = search_seeds(question, limit=seeds)
+    if not seed_ids:
+        return ""
+    rows = run_cypher(
+        neighbourhood_query(hops),
+        parameters={"ids": seed_ids, "max_paths": max_paths, "max_edges": max_edges},
+        limit=None,
+    )["records"]
+    return serialize_subgraph(rows, max_chars=max_chars)
@@ -0,0 +1,125 @@
+import json
+import os
+from functools import lru_cache
+from typing import Any
+
+TOOL_RESULT_FORMAT = os.getenv("TOOL_RESULT_FORMAT", "table")
+TOOL_RESULT_MAX_TOKENS = int(os.getenv("TOOL_RESULT_MAX_TOKENS", "1500"))
+SNIPPET_PROPERTIES = {"source_text", "source_snippet", "text_snippet"}
+SNIPPET_CHARS = 160
+VALUE_CHARS = 400
+
+
+@lru_cache(maxsize=1)
+def _tokenizer():
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken.get_encoding("o200k_base")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Token count with tiktoken when it is installed, otherwise about four characters per token.
+    """
+    tokenizer = _tokenizer()
+    if tokenizer is None:
+        return (len(text) + 3) // 4
+    return len(tokenizer.encode(text))
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _shorten(value: Any, key: str = "") -> Any:
+    if isinstance(value, str):
+        limit = SNIPPET_CHARS if key in SNIPPET_PROPERTIES else VALUE_CHARS
+        return value if len(value) <= limit else f"{value[:limit]}...(+{len(value) - limit} chars)"
+    if isinstance(value, float):
+        return float(f"{value:.10g}")
+    if isinstance(value, dict):
+        return {name: _shorten(item, name) for name, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_shorten(item, key) for item in value]
+    return value
+
+
+def _columns(records: list[dict]) -> list[tuple[str, str | None]]:
+    """
+    (column, key) pairs in first-seen order. A returned column whose values are all property
+    maps (RETURN p) is split into one "p.key" column per property, so the keys are written
+    once in the header instead of once per row.
+    """
+    names: dict[str, None] = {}
+    for record in records:
+        names.update(dict.fromkeys(record))
+    columns = []
+    for name in names:
+        values = [record.get(name) for record in records if record.get(name) is not None]
+        if values and all(isinstance(value, dict) for value in values):
+            keys: dict[str, None] = {}
+            for value in values:
+                keys.update(dict.fromkeys(value))
+            columns.extend((name, key) for key in keys)
+        else:
+            columns.append((name, None))
+    return columns
+
+
+def _cell(record: dict, name: str, key: str | None) -> Any:
+    value = record.get(name)
+    if key is None:
+        return _shorten(value, name)
+    return _shorten(value.get(key), key) if isinstance(value, dict) else None
+
+
+def encode_tool_result(result: dict, max_tokens: int = TOOL_RESULT_MAX_TOKENS, result_format: str = TOOL_RESULT_FORMAT) -> str:
+    """
+    Serializes a run_cypher result for the model as compact JSON:
+    {"columns": [...], "rows": [[...], ...], "counters": {...}, "truncated": "..."}.
+    Only non-zero counters are kept and timing and cache fields are dropped. Long strings are
+    cut (source_text and snippets to SNIPPET_CHARS, anything else to VALUE_CHARS). Rows are
+    added until the estimated size reaches max_tokens; the rest are reported in "truncated".
+    Columns holding the same value in every row (typically source_doc_id) are moved to
+    "same" and left out of the rows. Floats lose their binary noise (28.619999999999997 ->
+    28.62). result_format "json" returns the unmodified json.dumps of the result.
+    """
+    if result_format == "json":
+        return json.dumps(result, ensure_ascii=False, default=str)
+    if "error" in result:
+        return _dumps({"error": _shorten(str(result["error"]))})
+    records = result.get("records") or []
+    counters = {
+        key: value
+        for key, value in ((result.get("summary") or {}).get("counters") or {}).items()
+        if value and not isinstance(value, bool)
+    }
+    columns = _columns(records)
+    labels = [name if key is None else f"{name}.{key}" for name, key in columns]
+    same = {}
+    if len(records) > 1:
+        for (name, key), label in zip(columns, labels):
+            if len({_dumps(_cell(record, name, key)) for record in records}) == 1:
+                same[label] = _cell(records[0], name, key)
+    shown = [(column, label) for column, label in zip(columns, labels) if label not in same]
+    payload: dict = {}
+    if shown:
+        payload["columns"] = [label for _, label in shown]
+    if same:
+        payload["same"] = same
+    payload["rows"] = []
+    if counters:
+        payload["counters"] = counters
+    budget = max_tokens - estimate_tokens(_dumps(payload))
+    for index, record in enumerate(records):
+        row = [_cell(record, name, key) for (name, key), _ in shown]
+        cost = estimate_tokens(_dumps(row)) + 1
+        if payload["rows"] and cost > budget:
+            remaining = len(records) - index
+            payload["truncated"] = f"{remaining} more rows not shown; narrow the query or page with SKIP/LIMIT"
+            break
+        payload["rows"].append(row)
+        budget -= cost
+    return _dumps(payload)
@@ -1,20 +1,96 @@
-from ai.client import call_openai_with_graph_reasoning
+import os
+import time
+from typing import Iterator
 
+from ai.answer_cache import AnswerCache
+from ai.client import call_openai_with_graph_reasoning, reasoning_report, stream_openai_with_graph_reasoning
+from lib.db import graph_version
 
-def query_kg(user_query: str) -> str:
-    return call_openai_with_graph_reasoning(user_query)
+_similarity = os.getenv("ANSWER_CACHE_SIMILARITY")
+answer_cache = AnswerCache(
+    version=graph_version,
+    max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "256")),
+    ttl_s=float(os.getenv("ANSWER_CACHE_TTL_S", "3600")),
+    similarity_threshold=float(_similarity) if _similarity else None,
+)
+
+
+def query_kg(user_query: str, use_cache: bool = True) -> str:
+    if not use_cache:
+        return call_openai_with_graph_reasoning(user_query)
+    return answer_cache.get_or_compute(user_query, call_openai_with_graph_reasoning)
+
+
+def stream_query_kg(user_query: str, use_cache: bool = True) -> Iterator[dict]:
+    """
+    Event stream for one question (see stream_openai_with_graph_reasoning). A cached answer
+    is replayed as a single token; a fresh answer is stored once its "done" event arrives.
+    """
+    start = time.perf_counter()
+    if use_cache:
+        cached = answer_cache.get(user_query, graph_version())
+        if cached is not None:
+            answer_cache.record_latency(True, time.perf_counter() - start)
+            yield {"type": "token", "text": cached}
+            yield {"type": "done", "text": cached}
+            return
+    for event in stream_openai_with_graph_reasoning(user_query):
+        if event["type"] == "done" and use_cache:
+            answer_cache.put(user_query, graph_version(), event["text"])
+            answer_cache.record_latency(False, time.perf_counter() - start)
+        yield event
+
+
+def print_cache_stats() -> None:
+    for key, value in answer_cache.stats().items():
+        print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
+
+
+def print_reasoning_report() -> None:
+    for key, value in reasoning_report().items():
+        print(f"{key}: {value:.1f}" if isinstance(value, float) else f"{key}: {value}")
+
+
+def render_events(events: Iterator[dict], response_style: str, tool_style: str, reset_style: str) -> None:
+    start = time.perf_counter()
+    first_token_ms = None
+    at_line_start = True
+    for event in events:
+        if event["type"] == "token":
+            if first_token_ms is None:
+                first_token_ms = 1000 * (time.perf_counter() - start)
+            print(f"{response_style}{event['text']}{reset_style}", end="", flush=True)
+            at_line_start = event["text"].endswith("\n")
+            continue
+        if not at_line_start:
+            print()
+            at_line_start = True
+        if event["type"] == "tool_call_start":
+            cypher = " ".join(event["cypher"].split())
+            print(f"{tool_style}  > graph_query {cypher[:100]}{reset_style}", flush=True)
+        elif event["type"] == "tool_call_end":
+            outcome = f"error: {event['error']}" if "error" in event else f"{event['rows']} rows"
+            print(f"{tool_style}  < {outcome} in {event['elapsed_ms']:.0f} ms{reset_style}", flush=True)
+    if first_token_ms is not None:
+        print(f"{tool_style}(first token after {first_token_ms:.0f} ms){reset_style}")
 
 
 def main() -> None:
     prompt_style = "\033[1;34m"
     response_style = "\033[1;32m"
+    tool_style = "\033[2m"
     reset_style = "\033[0m"
     while True:
         user_query = input(
             f"{prompt_style}What would you like to know about your technical documents? {reset_style}\n"
         )
-        result = query_kg(user_query)
-        print(f"{response_style}{result}{reset_style}")
+        if user_query.strip() == ":stats":
+            print_cache_stats()
+            continue
+        if user_query.strip() == ":report":
+            print_reasoning_report()
+            continue
+        render_events(stream_query_kg(user_query), response_style, tool_style, reset_style)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,127 @@
+"""
+Compares ingest and lookup speed of the in-memory graph backend with Neo4j on a synthetic
+drawing payload. Neo4j is included when NEO4J_URI is set.
+
+    python bench/bench_backends.py --parts 200 --lookups 2000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from lib.db import Neo4jBackend, bulk_load, run_cypher, set_backend  # noqa: E402
+from lib.memory_graph import MemoryGraph  # noqa: E402
+
+LOOKUPS = [
+    ("part by id", "MATCH (p:Part {source_doc_id: $doc, part_id: $part}) RETURN p.name AS name"),
+    (
+        "part dimensions",
+        "MATCH (p:Part {source_doc_id: $doc, part_id: $part})-[:HAS_FEATURE]->(f:Feature)-[:HAS_DIMENSION]->(d:Dimension) "
+        "RETURN f.feature_id AS feature, d.value AS value",
+    ),
+    ("dimension range", "MATCH (d:Dimension) WHERE d.value_nominal >= $low AND d.value_nominal <= $high RETURN count(d) AS n"),
+]
+
+
+def synthetic_payload(doc: str, parts: int, features_per_part: int = 3) -> dict:
+    """
+    A drawing with one Drawing and View, `parts` parts, and per part a note and
+    features_per_part features that each carry one dimension.
+    """
+    entities = [
+        {"type": "Drawing", "properties": {"source_doc_id": doc, "drawing_number": doc, "title": f"Drawing {doc}"}},
+        {"type": "View", "properties": {"source_doc_id": doc, "source_view_id": "V1", "label": "FRONT"}},
+    ]
+    relationships = [{
+        "source": "Drawing", "relationship": "HAS_VIEW", "target": "View",
+        "source_properties": {"source_doc_id": doc, "drawing_number": doc},
+        "target_properties": {"source_doc_id": doc, "source_view_id": "V1"},
+    }]
+    for part_index in range(parts):
+        part_id = f"P{part_index}"
+        note_id = f"N{part_index}"
+        entities.append({"type": "Part", "properties": {"source_doc_id": doc, "part_id": part_id, "name": f"Part {part_index}"}})
+        entities.append({"type": "Note", "properties": {"source_doc_id": doc, "note_id": note_id, "text": f"WALL THICKNESS {part_index % 7 + 1} MAX"}})
+        relationships.append({
+            "source": "View", "relationship": "DEPICTS", "target": "Part",
+            "source_properties": {"source_doc_id": doc, "source_view_id": "V1"},
+            "target_properties": {"source_doc_id": doc, "part_id": part_id},
+        })
+        relationships.append({
+            "source": "Note", "relationship": "APPLIES_TO", "target": "Part",
+            "source_properties": {"source_doc_id": doc, "note_id": note_id},
+            "target_properties": {"source_doc_id": doc, "part_id": part_id},
+        })
+        for feature_index in range(features_per_part):
+            feature_id = f"{part_id}-F{feature_index}"
+            dimension_id = f"{feature_id}-D"
+            nominal = round(random.uniform(1, 100), 2)
+            entities.append({"type": "Feature", "properties": {"source_doc_id": doc, "feature_id": feature_id, "geometry_type": "hole"}})
+            entities.append({"type": "Dimension", "properties": {
+                "source_doc_id": doc, "dimension_id": dimension_id, "value": f"Ø{nominal}", "tolerance": "±0.1",
+                "unit": "mm", "type": "diameter",
+                "value_nominal": nominal, "value_min": nominal - 0.1, "value_max": nominal + 0.1,
+            }})
+            relationships.append({
+                "source": "Part", "relationship": "HAS_FEATURE", "target": "Feature",
+                "source_properties": {"source_doc_id": doc, "part_id": part_id},
+                "target_properties": {"source_doc_id": doc, "feature_id": feature_id},
+            })
+            relationships.append({
+                "source": "Feature", "relationship": "HAS_DIMENSION", "target": "Dimension",
+                "source_properties": {"source_doc_id": doc, "feature_id": feature_id},
+                "target_properties": {"source_doc_id": doc, "dimension_id": dimension_id},
+            })
+    return {"entities": entities, "relationships": relationships}
+
+
+def run_backend(name: str, backend, payload: dict, doc: str, parts: int, lookups: int) -> dict:
+    set_backend(backend)
+    if name == "neo4j":
+        run_cypher("MATCH (n {source_doc_id: $doc}) DETACH DELETE n", {"doc": doc}, use_cache=False)
+    start = time.perf_counter()
+    bulk_load(payload)
+    ingest_s = time.perf_counter() - start
+    results = {"backend": name, "ingest_s": ingest_s, "items_per_s": (len(payload["entities"]) + len(payload["relationships"])) / ingest_s}
+    rng = random.Random(0)
+    for label, cypher in LOOKUPS:
+        timings = []
+        for _ in range(lookups):
+            low = rng.uniform(1, 90)
+            parameters = {"doc": doc, "part": f"P{rng.randrange(parts)}", "low": low, "high": low + 5}
+            start = time.perf_counter()
+            run_cypher(cypher, parameters, limit=None, use_cache=False)
+            timings.append(1000 * (time.perf_counter() - start))
+        results[label] = statistics.median(timings)
+    if name == "neo4j":
+        run_cypher("MATCH (n {source_doc_id: $doc}) DETACH DELETE n", {"doc": doc}, use_cache=False)
+    return results
+
+
+def main(args: argparse.Namespace) -> None:
+    random.seed(0)
+    doc = "bench-backends"
+    payload = synthetic_payload(doc, args.parts)
+    print(f"payload: {len(payload['entities'])} entities, {len(payload['relationships'])} relationships")
+    backends = [("memory", MemoryGraph())]
+    if os.getenv("NEO4J_URI"):
+        backends.append(("neo4j", Neo4jBackend()))
+    else:
+        print("NEO4J_URI not set; benchmarking the memory backend only")
+    for name, backend in backends:
+        results = run_backend(name, backend, payload, doc, args.parts, args.lookups)
+        print(f"{name:<7} ingest {results['ingest_s']:.3f}s ({results['items_per_s']:.0f} items/s)")
+        for label, _ in LOOKUPS:
+            print(f"        {label:<16} p50 {results[label]:.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--parts", type=int, default=200)
+    parser.add_argument("--lookups", type=int, default=2000)
+    main(parser.parse_args())
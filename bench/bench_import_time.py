@@ -0,0 +1,84 @@
+"""
+Measures how long `import app` and `import pipeline` take in a fresh interpreter, and which
+heavy packages (openai, neo4j, PIL, pymupdf) each import pulls in. With --baseline the same
+measurement runs against an older revision extracted with git archive, for comparison.
+
+    python bench/bench_import_time.py --runs 10 --baseline HEAD~1
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+MODULES = ("app", "pipeline")
+HEAVY_PACKAGES = ("openai", "neo4j", "PIL", "pymupdf")
+
+# The repo has a top-level types.py, so the tree goes at the end of sys.path and the child
+# runs from a neutral directory to keep it from shadowing the standard library module.
+_PROBE = """
+import json, sys, time
+sys.path.append({root!r})
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": 1000 * elapsed, "loaded": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def measure(root: Path, module: str) -> dict:
+    # Older revisions build the driver at import time and need a URI; nothing connects.
+    env = {**os.environ, "NEO4J_URI": os.getenv("NEO4J_URI") or "bolt://localhost:7687"}
+    code = _PROBE.format(root=str(root), module=module, heavy=HEAVY_PACKAGES)
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=tempfile.gettempdir(), env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def profile(root: Path, runs: int) -> dict:
+    results = {}
+    for module in MODULES:
+        samples = [measure(root, module) for _ in range(runs)]
+        timings = [sample["ms"] for sample in samples]
+        results[module] = {"p50_ms": statistics.median(timings), "min_ms": min(timings), "loaded": samples[-1]["loaded"]}
+    return results
+
+
+def export_revision(revision: str, target: Path) -> Path:
+    archive = subprocess.run(["git", "archive", revision], cwd=ROOT, capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(target, filter="data")
+    return target
+
+
+def print_results(label: str, results: dict) -> None:
+    for module, result in results.items():
+        loaded = ", ".join(result["loaded"]) or "-"
+        print(f"{label:<10} {module:<9} p50 {result['p50_ms']:7.1f} ms  min {result['min_ms']:7.1f} ms  heavy: {loaded}")
+
+
+def main(args: argparse.Namespace) -> None:
+    current = profile(ROOT, args.runs)
+    print_results("current", current)
+    if not args.baseline:
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        baseline = profile(export_revision(args.baseline, Path(directory)), args.runs)
+    print_results(args.baseline, baseline)
+    for module in MODULES:
+        saved = baseline[module]["p50_ms"] - current[module]["p50_ms"]
+        print(f"{module}: {saved:.1f} ms saved ({baseline[module]['p50_ms'] / current[module]['p50_ms']:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--baseline", help="git revision to compare against, e.g. HEAD~1")
+    main(parser.parse_args())
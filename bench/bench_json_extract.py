@@ -0,0 +1,92 @@
+"""
+Micro-benchmark: single-pass streaming JSON extraction vs. the previous raw_decode scan.
+
+    python bench/bench_json_extract.py --sizes 1 4 --legacy-max-mb 0.5
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from lib.json_stream import extract_first_json  # noqa: E402
+
+
+def legacy_extract(text: str) -> Any | None:
+    decoder = json.JSONDecoder()
+    for index, char in enumerate(text):
+        if char not in "{[":
+            continue
+        try:
+            result, _ = decoder.raw_decode(text[index:])
+        except json.JSONDecodeError:
+            continue
+        return result
+    return None
+
+
+def streaming_extract(text: str, chunk_size: int = 4096) -> Any | None:
+    return extract_first_json(text[start:start + chunk_size] for start in range(0, len(text), chunk_size))
+
+
+def make_payload(target_bytes: int) -> str:
+    entity = {
+        "type": "Dimension",
+        "properties": {
+            "source_doc_id": "DWG-001",
+            "dimension_id": "D0",
+            "value": "Ø12.5 ±0.1",
+            "unit": "mm",
+            "source_snippet": 'OD "A" {ref} [see view 2]',
+        },
+    }
+    entity_size = len(json.dumps(entity)) + 2
+    count = max(1, target_bytes // entity_size)
+    entities = [{**entity, "properties": {**entity["properties"], "dimension_id": f"D{i}"}} for i in range(count)]
+    return json.dumps({"entities": entities, "relationships": []})
+
+
+def make_inputs(megabytes: float) -> dict[str, str]:
+    payload = make_payload(int(megabytes * 1024 * 1024))
+    noise = "Callout {A} refers to {feature F-} in view {" * (len(payload) // 400)
+    return {
+        "well-formed": "Here is the extraction {as requested}:\n" + payload + "\nDone.",
+        "truncated": "Here is the extraction:\n" + payload[: len(payload) * 3 // 4],
+        "brace-noise": noise + "\n" + payload,
+    }
+
+
+def time_call(fn: Callable[[str], Any], text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1.0, 4.0], help="Input sizes in MB.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--legacy-max-mb", type=float, default=1.0, help="Skip the quadratic legacy scan on noisy inputs above this size.")
+    args = parser.parse_args()
+
+    print(f"{'input':<12} {'MB':>6} {'legacy s':>10} {'stream s':>10} {'speedup':>8}")
+    for size in args.sizes:
+        for name, text in make_inputs(size).items():
+            if name != "truncated":
+                assert streaming_extract(text) == json.loads(make_payload(int(size * 1024 * 1024)))
+            stream_s = time_call(streaming_extract, text, args.repeat)
+            if name != "well-formed" and size > args.legacy_max_mb:
+                print(f"{name:<12} {size:>6.1f} {'skipped':>10} {stream_s:>10.3f} {'':>8}")
+                continue
+            legacy_s = time_call(legacy_extract, text, args.repeat)
+            print(f"{name:<12} {size:>6.1f} {legacy_s:>10.3f} {stream_s:>10.3f} {legacy_s / stream_s:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Reasoning strategies side by side on the recorded Q&A sessions (bench/e2e/fixtures) plus a
+few identifier lookups, through ai.client.call_openai_with_graph_reasoning with the OpenAI
+client replaced by bench.e2e.fake_openai:
+- fixed: up to three rounds of graph_query calls on one model;
+- adaptive: routed (template lookups, light or full model), budgeted rounds;
+- adaptive+plan: as adaptive, with the model sending all its queries in one
+  graph_query_plan call.
+Prints each question's report (route, rounds, model calls, tokens, wall time) and a total
+per strategy.
+
+    python bench/bench_reasoning.py
+    python bench/bench_reasoning.py --model-latency-ms 800 --max-rounds 1
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import ai.client as client  # noqa: E402
+from bench.e2e.fake_openai import FakeOpenAI  # noqa: E402
+from bench.e2e.synthetic import load_fixture, scale_extraction  # noqa: E402
+from lib.db import clear_result_cache, set_backend  # noqa: E402
+from lib.memory_graph import MemoryGraph  # noqa: E402
+from pipeline import load_db_objects  # noqa: E402
+
+STRATEGIES = (("fixed", "fixed", False), ("adaptive", "adaptive", False), ("adaptive+plan", "adaptive", True))
+REPORT_COLUMNS = ("rounds", "model_calls", "queries", "input_tokens", "output_tokens", "wall_ms")
+
+
+def lookup_sessions(doc: str) -> list[dict]:
+    """
+    Identifier lookups, recorded as the one-query sessions the fixed loop goes through.
+    """
+    lookups = [("Show part P-100", "Part", "part_id", "P-100"), ("What is dimension D-101?", "Dimension", "dimension_id", "D-101"), (f"Describe weld W1 in {doc}", "WeldSpec", "weldspec_id", "W1")]
+    return [
+        {
+            "question": question,
+            "rounds": [[{"cypher": f"MATCH (n:{label} {{source_doc_id: $doc, {key}: $id}}) OPTIONAL MATCH (n)-[r]-(m) RETURN n, type(r), m", "parameters": {"doc": doc, "id": identifier}}]],
+            "answer": f"{label} {identifier} details.",
+        }
+        for question, label, key, identifier in lookups
+    ]
+
+
+def main(args: argparse.Namespace) -> None:
+    recorded = load_fixture("qa_sessions.json")
+    sessions = recorded["sessions"] + lookup_sessions(recorded["doc"])
+    fixture = load_fixture("extraction.json")
+    set_backend(MemoryGraph())
+    load_db_objects(scale_extraction(fixture, recorded["doc"], args.qa_entities))
+    if args.max_rounds is not None:
+        os.environ["REASONING_MAX_ROUNDS"] = str(args.max_rounds)
+
+    totals = {}
+    print(f"{'strategy':<14} {'question':<42} {'route':<9} {'stopped':<11} " + " ".join(f"{column:>13}" for column in REPORT_COLUMNS))
+    for name, mode, plan in STRATEGIES:
+        client._client = FakeOpenAI(sessions, latency_s=args.model_latency_ms / 1000, plan=plan)
+        totals[name] = dict.fromkeys(REPORT_COLUMNS, 0)
+        for session in sessions:
+            clear_result_cache()
+            client.call_openai_with_graph_reasoning(session["question"], retrieve=False, mode=mode)
+            report = client.reasoning_report()
+            for column in REPORT_COLUMNS:
+                totals[name][column] += report[column]
+            print(
+                f"{name:<14} {session['question'][:42]:<42} {report['strategy']:<9} {report['stopped']:<11} "
+                + " ".join(f"{report[column]:>13.0f}" for column in REPORT_COLUMNS)
+            )
+    print()
+    print(f"{'total':<14} {len(sessions):>3} questions" + " " * 61 + " ".join(f"{column:>13}" for column in REPORT_COLUMNS))
+    for name, total in totals.items():
+        print(f"{name:<14}" + " " * 77 + " ".join(f"{total[column]:>13.0f}" for column in REPORT_COLUMNS))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model-latency-ms", type=float, default=300, help="Simulated time per model call.")
+    parser.add_argument("--qa-entities", type=int, default=1000, help="Size of the drawing the questions run against.")
+    parser.add_argument("--max-rounds", type=int, default=None, help="REASONING_MAX_ROUNDS for the adaptive strategies.")
+    main(parser.parse_args())
@@ -0,0 +1,120 @@
+"""
+Cross-document resolution at scale: synthetic drawings that share a small catalogue of
+materials, processes and welds (written the different ways drawings write them) and a large
+catalogue of part numbers whose names carry abbreviations and typos. Reports the dedup
+ratio, run time per drawing and the part-name comparisons blocking needed against the
+all-pairs count. --graph also writes the RESOLVES_TO links to an in-memory graph.
+
+    python bench/bench_resolution.py --drawings 1000 10000 100000
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from lib.db import set_backend  # noqa: E402
+from lib.memory_graph import MemoryGraph  # noqa: E402
+from lib.resolution import (  # noqa: E402
+    ResolutionIndex,
+    get_resolution_index,
+    reset_resolution_index,
+    resolution_rows,
+    resolve_entities,
+)
+
+MATERIALS = [
+    (["316L", "SS 316L", "Type 316L", "316 L STAINLESS"], ["ASTM A240", "ASTM-A240/A240M", "astm a240"]),
+    (["304", "SS304", "AISI 304"], ["ASTM A240", "ASTM A240-20"]),
+    (["6061-T6", "6061 T6", "AL 6061-T6"], ["ASTM B209", "ASTM-B209"]),
+    (["A36", "ASTM A36"], ["ASTM A36"]),
+    (["17-4PH", "17-4 PH"], ["AMS 5643", "AMS-5643"]),
+]
+PROCESSES = [
+    (["Passivate", "PASSIVATION", "Passivated"], ["per ASTM A967", "PER ASTM-A967 AFTER WELDING"]),
+    (["Anodize", "Anodizing", "ANODIZED"], ["per MIL-A-8625", "MIL-A-8625 TYPE II"]),
+    (["Heat treat", "HEAT TREATMENT"], ["per AMS 2759", ""]),
+    (["Deburr", "DEBURRING"], [""]),
+]
+WELDS = [
+    (["fillet", "FILLET"], ["3", "3 mm", "3.0"], ["AWS D1.1", "AWS D1.1:2020"]),
+    (["fillet", "Fillet"], ["4", "4.0 mm"], ["AWS D1.6", "aws d1.6"]),
+    (["groove", "GROOVE"], ["6"], ["AWS D1.1"]),
+]
+PART_WORDS = ["BRACKET", "PLATE", "HOUSING", "COVER", "FLANGE", "SUPPORT", "FUNNEL", "MOUTH", "CAGE", "FILTER", "RING", "SHAFT", "BASE", "ARM"]
+ABBREVIATED = {"BRACKET": "BRKT", "PLATE": "PL", "HOUSING": "HSG", "COVER": "CVR", "FLANGE": "FLG", "SUPPORT": "SUPP"}
+
+
+def _variant_name(name: str, rng: random.Random) -> str:
+    words = [ABBREVIATED.get(word, word) if rng.random() < 0.3 else word for word in name.split()]
+    if rng.random() < 0.1:
+        index = rng.randrange(len(words))
+        word = words[index]
+        if len(word) > 4:
+            position = rng.randrange(3, len(word))
+            words[index] = word[:position] + word[position + 1:]
+    text = " ".join(words)
+    return text.title() if rng.random() < 0.3 else text
+
+
+def synthetic_drawing(doc_id: str, catalogue: list[tuple[str, str]], rng: random.Random, parts: int) -> dict:
+    entities = []
+    grades, specs = rng.choice(MATERIALS)
+    entities.append({"type": "Material", "properties": {"source_doc_id": doc_id, "material_id": "M1", "grade": rng.choice(grades), "spec": rng.choice(specs)}})
+    for index, (names, descriptions) in enumerate(rng.sample(PROCESSES, 2)):
+        entities.append({"type": "Process", "properties": {"source_doc_id": doc_id, "process_id": f"PR{index}", "name": rng.choice(names), "description": rng.choice(descriptions)}})
+    for index in range(2):
+        types, sizes, standards = rng.choice(WELDS)
+        entities.append({"type": "WeldSpec", "properties": {
+            "source_doc_id": doc_id, "weldspec_id": f"W{index}", "type": rng.choice(types), "size": rng.choice(sizes),
+            "spacing": "continuous", "standard_ref": rng.choice(standards),
+        }})
+    for part_id, name in rng.sample(catalogue, parts):
+        entities.append({"type": "Part", "properties": {"source_doc_id": doc_id, "part_id": part_id, "name": _variant_name(name, rng)}})
+    return {"entities": entities, "relationships": []}
+
+
+def part_catalogue(size: int, rng: random.Random) -> list[tuple[str, str]]:
+    return [(f"P-{number:06d}", " ".join(rng.sample(PART_WORDS, rng.randint(1, 3)))) for number in range(size)]
+
+
+def run(drawings: int, parts: int, graph: bool, seed: int) -> dict:
+    rng = random.Random(seed)
+    catalogue = part_catalogue(max(parts * 4, drawings // 2), rng)
+    if graph:
+        set_backend(MemoryGraph())
+        reset_resolution_index()
+        index = get_resolution_index()
+    else:
+        index = ResolutionIndex()
+    start = time.perf_counter()
+    for number in range(drawings):
+        payload = synthetic_drawing(f"doc-{number:06d}", catalogue, rng, parts)
+        if graph:
+            resolve_entities(payload)
+        else:
+            resolution_rows(payload["entities"], index)
+    elapsed = time.perf_counter() - start
+    names = len(index.parts)
+    return {"drawings": drawings, "elapsed_s": elapsed, "all_pairs": names * (names - 1) // 2, **index.stats()}
+
+
+def main(args: argparse.Namespace) -> None:
+    print(f"{'drawings':>9} {'occurrences':>12} {'canonical':>10} {'dedup':>6} {'ms/drawing':>11} {'comparisons':>12} {'all-pairs':>14} {'fuzzy':>7}")
+    for drawings in args.drawings:
+        result = run(drawings, args.parts, args.graph, args.seed)
+        print(
+            f"{result['drawings']:>9} {result['occurrences']:>12} {result['canonical']:>10} {result['dedup_ratio']:>6.1%} "
+            f"{1000 * result['elapsed_s'] / drawings:>11.3f} {result['comparisons']:>12} {result['all_pairs']:>14} {result['fuzzy_matches']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--drawings", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--parts", type=int, default=5, help="Parts per drawing.")
+    parser.add_argument("--graph", action="store_true", help="Also write RESOLVES_TO links to an in-memory graph.")
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
@@ -0,0 +1,69 @@
+"""
+Compares graph reasoning with and without pre-retrieved subgraph context on a fixed question
+set. Needs a loaded Neo4j graph and OpenAI credentials.
+
+    python bench/bench_retrieval.py
+    python bench/bench_retrieval.py --questions my_questions.txt
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import ai.client as client  # noqa: E402
+from lib.db import clear_result_cache  # noqa: E402
+
+QUESTIONS = [
+    "What's the OD/ID of the funnel mouth and where is that shown?",
+    "Which welds are specified, and what processes are allowed?",
+    "Does any note conflict with a dimension or section detail?",
+    "What material is the main part made of?",
+    "List the dimensions on the largest feature and their tolerances.",
+    "Which views depict the cage filter body?",
+    "What general tolerances apply to this drawing?",
+    "Which notes apply to the weld specifications?",
+]
+
+
+def run(questions: list[str], retrieve: bool) -> list[dict]:
+    results = []
+    for question in questions:
+        clear_result_cache()
+        start = time.perf_counter()
+        client.call_openai_with_graph_reasoning(question, retrieve=retrieve)
+        rounds = client.reasoning_rounds()
+        results.append({
+            "rounds": len(rounds),
+            "tool_calls": sum(item["calls"] for item in rounds),
+            "seconds": time.perf_counter() - start,
+        })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=Path, help="File with one question per line.")
+    args = parser.parse_args()
+    questions = args.questions.read_text().splitlines() if args.questions else QUESTIONS
+    questions = [question for question in questions if question.strip()]
+
+    baseline = run(questions, retrieve=False)
+    retrieved = run(questions, retrieve=True)
+    print(f"{'':<12} {'rounds':>8} {'tool calls':>11} {'mean s':>8} {'median s':>9}")
+    for name, results in (("baseline", baseline), ("retrieval", retrieved)):
+        seconds = [item["seconds"] for item in results]
+        print(
+            f"{name:<12} {sum(item['rounds'] for item in results):>8} "
+            f"{sum(item['tool_calls'] for item in results):>11} "
+            f"{statistics.mean(seconds):>8.2f} {statistics.median(seconds):>9.2f}"
+        )
+    saved_rounds = sum(item["rounds"] for item in baseline) - sum(item["rounds"] for item in retrieved)
+    saved_seconds = sum(item["seconds"] for item in baseline) - sum(item["seconds"] for item in retrieved)
+    print(f"saved {saved_rounds} tool rounds and {saved_seconds:.1f}s over {len(questions)} questions")
+
+
+if __name__ == "__main__":
+    main()
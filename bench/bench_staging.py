@@ -0,0 +1,137 @@
+"""
+Staging throughput on large payloads: synthetic drawings built from the recorded extraction
+(bench/e2e/fixtures), round-tripped through JSON like parsed model output, with a share of
+rows damaged the ways model output goes wrong (label spelling, numeric values for string
+fields, padded strings, map-valued properties, unknown types, empty relationship endpoints).
+Reports rows validated per second, rows repaired and rejected, the time to build the UNWIND
+groups from the plain payload and from the staged columns and, in a separate tracemalloc
+pass, the Python heap each holds.
+
+    python bench/bench_staging.py --entities 10000 100000 1000000
+"""
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from bench.e2e.synthetic import load_fixture, scale_extraction  # noqa: E402
+from lib.db import group_entities, group_relationships  # noqa: E402
+from lib.numeric import enrich_entity  # noqa: E402
+from lib.staging import stage_payload  # noqa: E402
+
+
+def damage_entity(entity: dict, rng: random.Random) -> dict:
+    properties = dict(entity["properties"])
+    kind = rng.randrange(5)
+    if kind == 0:
+        return {**entity, "type": entity["type"].lower(), "properties": properties}
+    if kind == 1:
+        key = next(iter(properties))
+        properties[key] = f"  {properties[key]} "
+    elif kind == 2:
+        properties["bounding_box"] = {"x": 1, "y": 2, "w": 3, "h": 4}
+    elif kind == 3:
+        return {**entity, "type": "Gizmo"}
+    else:
+        properties["revision"] = rng.randrange(10)
+    return {**entity, "properties": properties}
+
+
+def damage_relationship(relationship: dict, rng: random.Random) -> dict:
+    if rng.random() < 0.5:
+        return {**relationship, "relationship": relationship["relationship"].lower().replace("_", " ")}
+    return {**relationship, "target_properties": {}}
+
+
+def synthetic_payload(entities: int, defect_rate: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    payload = scale_extraction(load_fixture("extraction.json"), "FD-BENCH", entities)
+    payload["entities"] = [damage_entity(entity, rng) if rng.random() < defect_rate else entity for entity in payload["entities"]]
+    payload["relationships"] = [
+        damage_relationship(relationship, rng) if rng.random() < defect_rate else relationship
+        for relationship in payload["relationships"]
+    ]
+    return json.loads(json.dumps(payload))
+
+
+def heap_mb(text: str) -> tuple[float, float]:
+    """
+    Python heap held by the parsed payload, and by its StagedPayload once the payload is gone.
+    """
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    payload = json.loads(text)
+    dict_mb = (tracemalloc.get_traced_memory()[0] - base) / (1024 * 1024)
+    staged = stage_payload(payload)
+    del payload
+    gc.collect()
+    staged_mb = (tracemalloc.get_traced_memory()[0] - base) / (1024 * 1024)
+    tracemalloc.stop()
+    del staged
+    return dict_mb, staged_mb
+
+
+def run(entities: int, defect_rate: float, seed: int, memory: bool) -> dict:
+    text = json.dumps(synthetic_payload(entities, defect_rate, seed))
+    payload = json.loads(text)
+    rows = len(payload["entities"]) + len(payload["relationships"])
+    start = time.perf_counter()
+    staged = stage_payload(payload)
+    stage_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    group_entities(enrich_entity(entity) for entity in payload["entities"] if isinstance(entity, dict) and entity.get("type") != "Gizmo")
+    group_relationships(payload["relationships"])
+    dict_groups_s = time.perf_counter() - start
+    start = time.perf_counter()
+    staged.entity_groups()
+    staged.relationship_groups()
+    staged_groups_s = time.perf_counter() - start
+    report = staged.report
+    del payload, staged
+    dict_mb, staged_mb = heap_mb(text) if memory else (None, None)
+    return {
+        "entities": entities,
+        "rows": rows,
+        "rows_per_s": rows / stage_s,
+        "stage_ms": 1000 * stage_s,
+        "repaired": report["repaired"],
+        "rejected": report["rejected"],
+        "dict_mb": dict_mb,
+        "staged_mb": staged_mb,
+        "dict_groups_ms": 1000 * dict_groups_s,
+        "staged_groups_ms": 1000 * staged_groups_s,
+    }
+
+
+def _mb(value) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+
+def main(args: argparse.Namespace) -> None:
+    print(
+        f"{'entities':>9} {'rows':>9} {'rows/s':>10} {'stage ms':>9} {'repaired':>9} {'rejected':>9} "
+        f"{'dict MB':>8} {'staged MB':>10} {'groups ms (dict/staged)':>24}"
+    )
+    for entities in args.entities:
+        result = run(entities, args.defect_rate, args.seed, not args.no_memory)
+        print(
+            f"{result['entities']:>9} {result['rows']:>9} {result['rows_per_s']:>10.0f} {result['stage_ms']:>9.0f} "
+            f"{result['repaired']:>9} {result['rejected']:>9} {_mb(result['dict_mb']):>8} {_mb(result['staged_mb']):>10} "
+            f"{result['dict_groups_ms']:>11.0f} / {result['staged_groups_ms']:<10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entities", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--defect-rate", type=float, default=0.02, help="Share of rows damaged before staging.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc heap pass.")
+    main(parser.parse_args())
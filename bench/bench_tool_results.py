@@ -0,0 +1,99 @@
+"""
+Tokens sent back to the model per question: the previous json.dumps of each run_cypher
+result against ai.tool_results.encode_tool_result. Each question is replayed as the
+graph_query calls the agent typically makes for it, on an in-memory synthetic drawing, so
+no Neo4j or OpenAI access is needed.
+
+    python bench/bench_tool_results.py --parts 60 --max-tokens 1500
+"""
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from ai.tool_results import encode_tool_result, estimate_tokens  # noqa: E402
+from bench.bench_backends import synthetic_payload  # noqa: E402
+from lib.db import bulk_load, run_cypher, set_backend  # noqa: E402
+from lib.memory_graph import MemoryGraph  # noqa: E402
+
+DOC = "bench-tool-results"
+SOURCE_TEXT = (
+    "OCR: NOTES UNLESS OTHERWISE SPECIFIED 1. REMOVE ALL BURRS AND SHARP EDGES 2. ALL DIMENSIONS IN MM "
+    "3. SURFACE FINISH 3.2 UM 4. INSPECT PER ISO 2768-MK 5. WELD PER AWS D1.1 "
+) * 3
+
+QUESTIONS = [
+    ("List every part on the drawing.", [
+        {"cypher": "MATCH (p:Part {source_doc_id: $doc}) RETURN p", "limit": 25},
+    ]),
+    ("What dimensions does part P3 have and what are their tolerances?", [
+        {"cypher": "MATCH (p:Part {source_doc_id: $doc, part_id: 'P3'}) RETURN p", "limit": 25},
+        {"cypher": "MATCH (p:Part {source_doc_id: $doc, part_id: 'P3'})-[:HAS_FEATURE]->(f:Feature)-[:HAS_DIMENSION]->(d:Dimension) RETURN f, d", "limit": 25},
+    ]),
+    ("Which notes apply to which parts?", [
+        {"cypher": "MATCH (n:Note {source_doc_id: $doc})-[:APPLIES_TO]->(p:Part) RETURN n, p.part_id AS part", "limit": 50},
+    ]),
+    ("Which diameters are between 40 and 60 mm?", [
+        {"cypher": "MATCH (d:Dimension) WHERE d.source_doc_id = $doc AND d.value_nominal >= 40 AND d.value_nominal <= 60 RETURN d", "limit": None},
+    ]),
+    ("How many features does each part have?", [
+        {"cypher": "MATCH (p:Part {source_doc_id: $doc})-[:HAS_FEATURE]->(f:Feature) RETURN p.part_id AS part, count(f) AS features", "limit": 100},
+    ]),
+    ("Do any notes conflict with a dimension?", [
+        {"cypher": "MATCH (a)-[c:CONFLICTS_WITH]->(b) WHERE c.source_doc_id = $doc RETURN a, c.rationale, b", "limit": 25},
+        {"cypher": "MATCH (n:Note {source_doc_id: $doc}) RETURN n.note_id AS note, n.text AS text, n.source_text AS source", "limit": 25},
+    ]),
+    ("Record that P1 and P2 are welded together.", [
+        {"cypher": "MATCH (a:Part {source_doc_id: $doc, part_id: 'P1'}), (b:Part {source_doc_id: $doc, part_id: 'P2'}) "
+                   "MERGE (a)-[r:WELDED_TO]->(b) SET r.inferred = true, r.rationale = 'shared weld note'", "limit": 25},
+    ]),
+]
+
+
+def load_graph(parts: int) -> None:
+    random.seed(0)
+    set_backend(MemoryGraph())
+    payload = synthetic_payload(DOC, parts)
+    for entity in payload["entities"]:
+        if entity["type"] in ("Note", "Dimension"):
+            entity["properties"]["source_text"] = SOURCE_TEXT
+    bulk_load(payload)
+
+
+def measure(max_tokens: int) -> list[dict]:
+    results = []
+    for question, calls in QUESTIONS:
+        raw = compact = 0
+        truncated = 0
+        for call in calls:
+            result = run_cypher(call["cypher"], {"doc": DOC}, limit=call["limit"], use_cache=False)
+            encoded = encode_tool_result(result, max_tokens=max_tokens)
+            raw += estimate_tokens(json.dumps(result, ensure_ascii=False))
+            compact += estimate_tokens(encoded)
+            truncated += "truncated" in json.loads(encoded)
+        results.append({"question": question, "raw": raw, "compact": compact, "truncated": truncated})
+    return results
+
+
+def main(args: argparse.Namespace) -> None:
+    load_graph(args.parts)
+    results = measure(args.max_tokens)
+    print(f"{'question':<66} {'raw':>7} {'compact':>8} {'saved':>6}")
+    for item in results:
+        saved = 1 - item["compact"] / item["raw"] if item["raw"] else 0.0
+        note = "  (truncated)" if item["truncated"] else ""
+        print(f"{item['question'][:66]:<66} {item['raw']:>7} {item['compact']:>8} {saved:>6.0%}{note}")
+    raw = sum(item["raw"] for item in results)
+    compact = sum(item["compact"] for item in results)
+    print(f"{'total':<66} {raw:>7} {compact:>8} {1 - compact / raw:>6.0%}")
+    print(f"mean tokens saved per question: {(raw - compact) / len(results):.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--parts", type=int, default=60)
+    parser.add_argument("--max-tokens", type=int, default=1500)
+    main(parser.parse_args())
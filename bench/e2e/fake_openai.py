@@ -0,0 +1,124 @@
+"""
+Stand-in for the OpenAI client that replays recorded responses, so the pipeline and the
+reasoning loop can be timed without network calls or model variance.
+"""
+import base64
+import hashlib
+import json
+import threading
+import time
+from types import SimpleNamespace
+from typing import Optional
+
+from ai.tool_results import estimate_tokens
+
+
+def image_digest(image_bytes: bytes) -> str:
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def _request_image(request_input: list) -> Optional[bytes]:
+    for message in request_input:
+        content = message.get("content") if isinstance(message, dict) else None
+        if not isinstance(content, list):
+            continue
+        for part in content:
+            if part.get("type") == "input_image":
+                return base64.b64decode(part["image_url"].split(",", 1)[1])
+    return None
+
+
+def _request_question(request_input: list) -> Optional[str]:
+    for message in request_input:
+        if isinstance(message, dict) and message.get("role") == "user" and isinstance(message.get("content"), str):
+            return message["content"]
+    return None
+
+
+def _function_call(session: int, round_index: int, index: int, call: dict, name: str = "graph_query") -> SimpleNamespace:
+    return SimpleNamespace(
+        type="function_call",
+        name=name,
+        call_id=f"call-{session}-{round_index}-{index}",
+        arguments=json.dumps(call),
+    )
+
+
+def _offers_plan(request: dict) -> bool:
+    return any(tool.get("name") == "graph_query_plan" for tool in request.get("tools") or [])
+
+
+class FakeResponses:
+    """
+    responses.create for the two request shapes the project sends:
+    - image extraction: the image bytes are hashed and the output_text registered for that
+      digest with add_extraction is returned;
+    - graph reasoning: the user question picks a recorded session, and each follow-up
+      request (previous_response_id) returns that session's next round of graph_query
+      calls, then its answer. With plan=True and graph_query_plan offered, all remaining
+      rounds come back as one graph_query_plan call; with tool_choice="none" the answer
+      comes back straight away.
+    Every call sleeps latency_s first to stand in for model time. Reasoning responses report
+    usage like the API does: input tokens cover the whole conversation so far, since a
+    previous_response_id request is billed for the context it continues.
+    """
+
+    def __init__(self, sessions: list[dict], latency_s: float = 0.0, plan: bool = False):
+        self.latency_s = latency_s
+        self.plan = plan
+        self.extractions: dict[str, str] = {}
+        self.sessions = {session["question"]: (index, session) for index, session in enumerate(sessions)}
+        self.by_index = dict(self.sessions.values())
+        self.calls = 0
+        self._context_tokens: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add_extraction(self, image_bytes: bytes, output_text: str) -> None:
+        self.extractions[image_digest(image_bytes)] = output_text
+
+    def create(self, **request) -> SimpleNamespace:
+        with self._lock:
+            self.calls += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        if request.get("stream"):
+            raise NotImplementedError("FakeResponses does not stream")
+        request_input = request.get("input") or []
+        previous = request.get("previous_response_id")
+        if previous is not None:
+            _, session, round_index = previous.split(":")
+            return self._round(int(session), int(round_index) + 1, request, self._context_tokens.get(previous, 0))
+        image = _request_image(request_input)
+        if image is not None:
+            digest = image_digest(image)
+            if digest not in self.extractions:
+                raise KeyError(f"no recorded extraction for image {digest[:12]}")
+            return SimpleNamespace(id=f"extract:{digest[:12]}", output=[], output_text=self.extractions[digest])
+        question = _request_question(request_input)
+        if question not in self.sessions:
+            raise KeyError(f"no recorded session for question {question!r}")
+        return self._round(self.sessions[question][0], 0, request, 0)
+
+    def _round(self, session: int, round_index: int, request: dict, context_tokens: int) -> SimpleNamespace:
+        recorded = self.by_index[session]
+        rounds = recorded["rounds"]
+        if request.get("tool_choice") == "none" or round_index >= len(rounds):
+            response_id, output, output_text = f"qa:{session}:{len(rounds)}", [], recorded["answer"]
+        elif self.plan and _offers_plan(request):
+            queries = [call for planned in rounds[round_index:] for call in planned]
+            response_id, output_text = f"qa:{session}:{len(rounds) - 1}", ""
+            output = [_function_call(session, round_index, 0, {"queries": queries}, name="graph_query_plan")]
+        else:
+            response_id, output_text = f"qa:{session}:{round_index}", ""
+            output = [_function_call(session, round_index, index, call) for index, call in enumerate(rounds[round_index])]
+        input_tokens = context_tokens + estimate_tokens(json.dumps(request.get("input"), ensure_ascii=False, default=str))
+        output_tokens = estimate_tokens(output_text + "".join(call.arguments for call in output))
+        with self._lock:
+            self._context_tokens[response_id] = input_tokens + output_tokens
+        usage = SimpleNamespace(input_tokens=input_tokens, output_tokens=output_tokens)
+        return SimpleNamespace(id=response_id, output=output, output_text=output_text, usage=usage)
+
+
+class FakeOpenAI:
+    def __init__(self, sessions: list[dict], latency_s: float = 0.0, plan: bool = False):
+        self.responses = FakeResponses(sessions, latency_s, plan)
@@ -0,0 +1,285 @@
+"""
+End-to-end benchmark: ingestion of synthetic drawings at several sizes and scripted Q&A
+sessions, both through the real pipeline.py / ai.client / lib.db code with the OpenAI
+client replaced by bench.e2e.fake_openai (recorded responses from bench/e2e/fixtures).
+Reports throughput, p50/p95/p99 latency and peak Python heap per stage, and compares
+against a stored baseline.
+
+    python bench/e2e/run.py
+    python bench/e2e/run.py --scales 10 1000 100000 --model-latency-ms 50
+    python bench/e2e/run.py --save-baseline bench/e2e/baseline.json
+    python bench/e2e/run.py --baseline bench/e2e/baseline.json --fail-on-regression
+
+Stages:
+- ingest@<n>: ingest_many over drawings totalling n entities (at most --entities-per-drawing
+  each); throughput is entities/s, with extract, parse and write sub-stages per drawing.
+- qa: each recorded session asked --repeats times via call_openai_with_graph_reasoning
+  (retrieval off, since the in-memory backend cannot run the retrieval query); the
+  qa/graph_query sub-stage times each tool call.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT))
+
+import ai.client as client  # noqa: E402
+from bench.e2e.fake_openai import FakeOpenAI  # noqa: E402
+from bench.e2e.synthetic import load_fixture, model_output, scale_extraction  # noqa: E402
+from lib.db import Neo4jBackend, clear_result_cache, run_cypher, set_backend  # noqa: E402
+from lib.memory_graph import MemoryGraph  # noqa: E402
+from pipeline import ingest_many, load_db_objects  # noqa: E402
+from server import percentile  # noqa: E402
+
+DEFAULT_SCALES = (10, 100, 1_000, 10_000, 100_000)
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+HIGHER_IS_BETTER = {"throughput", "items_per_s"}
+LOWER_IS_BETTER = {"p50_ms", "p95_ms", "p99_ms", "peak_mb"}
+# Settings that must match for a baseline comparison to mean anything.
+COMPARABLE_META = ("backend", "model_latency_ms", "entities_per_drawing", "heap_tracing")
+# Changes smaller than this are noise whatever their relative size.
+ABSOLUTE_FLOOR = {"ms": 1.0, "mb": 1.0}
+
+
+def new_backend(name: str, doc_prefix: str):
+    if name == "memory":
+        return MemoryGraph()
+    backend = Neo4jBackend()
+    set_backend(backend)
+    run_cypher("MATCH (n) WHERE n.source_doc_id STARTS WITH $prefix DETACH DELETE n", {"prefix": doc_prefix}, use_cache=False)
+    return backend
+
+
+@contextlib.contextmanager
+def heap_peak(result: dict):
+    """
+    Stores the Python heap growth at its peak inside the block in result["peak_mb"]
+    (None when tracemalloc is off).
+    """
+    if not tracemalloc.is_tracing():
+        result["peak_mb"] = None
+        yield
+        return
+    start = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    yield
+    result["peak_mb"] = (tracemalloc.get_traced_memory()[1] - start) / (1024 * 1024)
+
+
+def latency_stats(latencies_ms: list[float]) -> dict:
+    return {
+        "p50_ms": percentile(latencies_ms, 50),
+        "p95_ms": percentile(latencies_ms, 95),
+        "p99_ms": percentile(latencies_ms, 99),
+    }
+
+
+def drawing_sizes(entities: int, per_drawing: int) -> list[int]:
+    sizes = [per_drawing] * (entities // per_drawing)
+    if entities % per_drawing:
+        sizes.append(entities % per_drawing)
+    return sizes
+
+
+def run_ingest(args: argparse.Namespace, fake: FakeOpenAI, fixture: dict, entities: int) -> dict:
+    prefix = f"e2e-{entities}-"
+    set_backend(new_backend(args.backend, prefix))
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for index, size in enumerate(drawing_sizes(entities, args.entities_per_drawing)):
+            doc_id = f"{prefix}{index:04d}"
+            image = PNG_SIGNATURE + doc_id.encode("utf-8")
+            path = Path(directory) / f"{doc_id}.png"
+            path.write_bytes(image)
+            fake.responses.add_extraction(image, model_output(scale_extraction(fixture, doc_id, size, tag=f"{entities}.{index}")))
+            paths.append(path)
+        result: dict = {}
+        with heap_peak(result):
+            summary = ingest_many(paths, extract_workers=args.extract_workers, write_workers=1)
+    errors = [error for stage in summary["stages"].values() for error in stage["errors"]]
+    if errors:
+        raise RuntimeError(f"ingest@{entities} failed: {errors[:3]}")
+    stages = {
+        f"ingest@{entities}": {
+            "throughput": entities / summary["elapsed_s"],
+            "unit": "entities/s",
+            "drawings": summary["drawings"],
+            "elapsed_s": summary["elapsed_s"],
+            "peak_mb": result["peak_mb"],
+        }
+    }
+    for name, stage in summary["stages"].items():
+        stages[f"ingest@{entities}/{name}"] = {
+            "items_per_s": stage["items_per_s"],
+            "unit": "drawings/s",
+            **latency_stats(stage["latencies_ms"]),
+        }
+    return stages
+
+
+def run_qa(args: argparse.Namespace, fixture: dict, sessions: dict) -> dict:
+    set_backend(new_backend(args.backend, sessions["doc"]))
+    load_db_objects(scale_extraction(fixture, sessions["doc"], args.qa_entities))
+    questions = [session for _ in range(args.repeats) for session in sessions["sessions"]]
+    latencies, call_latencies, tokens = [], [], []
+    result: dict = {}
+    start = time.perf_counter()
+    with heap_peak(result):
+        for session in questions:
+            clear_result_cache()
+            question_start = time.perf_counter()
+            answer = client.call_openai_with_graph_reasoning(session["question"], retrieve=False)
+            latencies.append(1000 * (time.perf_counter() - question_start))
+            if answer != session["answer"]:
+                raise RuntimeError(f"unexpected answer for {session['question']!r}: {answer!r}")
+            for round_stats in client.reasoning_rounds():
+                call_latencies.extend(round_stats["call_ms"])
+                tokens.append(round_stats["result_tokens"])
+    elapsed = time.perf_counter() - start
+    return {
+        "qa": {
+            "throughput": len(questions) / elapsed,
+            "unit": "questions/s",
+            "questions": len(questions),
+            "result_tokens_per_question": sum(tokens) / len(questions),
+            "peak_mb": result["peak_mb"],
+            **latency_stats(latencies),
+        },
+        "qa/graph_query": {
+            "items_per_s": len(call_latencies) / (sum(call_latencies) / 1000) if call_latencies else 0.0,
+            "unit": "calls/s (serial)",
+            **latency_stats(call_latencies),
+        },
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[dict]:
+    """
+    Per-metric change against the baseline. A metric regresses when it is worse by more
+    than tolerance (relative) and by more than ABSOLUTE_FLOOR for its unit.
+    """
+    rows = []
+    for stage, metrics in current["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if previous is None:
+            continue
+        for metric, value in metrics.items():
+            before = previous.get(metric)
+            if metric not in HIGHER_IS_BETTER | LOWER_IS_BETTER or not before or value is None:
+                continue
+            change = (value - before) / before
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            floor = ABSOLUTE_FLOOR.get(metric.rsplit("_", 1)[-1], 0.0)
+            rows.append({
+                "stage": stage,
+                "metric": metric,
+                "baseline": before,
+                "current": value,
+                "change": change,
+                "regression": worse > tolerance and abs(value - before) > floor,
+            })
+    return rows
+
+
+def _revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _format(value) -> str:
+    if value is None:
+        return "-"
+    return f"{value:.1f}" if isinstance(value, float) else str(value)
+
+
+def print_report(report: dict) -> None:
+    columns = ("throughput", "items_per_s", "p50_ms", "p95_ms", "p99_ms", "peak_mb")
+    print(f"{'stage':<24} {'rate':>11} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak MB':>8}  unit")
+    for stage, metrics in report["stages"].items():
+        rate = metrics.get("throughput", metrics.get("items_per_s"))
+        values = [_format(rate)] + [_format(metrics.get(column)) for column in columns[2:]]
+        print(f"{stage:<24} {values[0]:>11} {values[1]:>9} {values[2]:>9} {values[3]:>9} {values[4]:>8}  {metrics['unit']}")
+
+
+def print_comparison(rows: list[dict]) -> None:
+    regressions = [row for row in rows if row["regression"]]
+    for row in regressions:
+        print(
+            f"REGRESSION {row['stage']} {row['metric']}: {row['baseline']:.2f} -> {row['current']:.2f} "
+            f"({row['change']:+.0%})"
+        )
+    print(f"{len(rows)} metrics compared, {len(regressions)} regressions")
+
+
+def main(args: argparse.Namespace) -> int:
+    # The fake client matches images by their bytes, so they must reach it unmodified.
+    os.environ["IMAGE_PREPROCESS"] = "off"
+    os.environ["EXTRACTION_CACHE"] = "off"
+    fixture = load_fixture("extraction.json")
+    sessions = load_fixture("qa_sessions.json")
+    fake = FakeOpenAI(sessions["sessions"], latency_s=args.model_latency_ms / 1000)
+    client._client = fake
+    if not args.no_memory:
+        tracemalloc.start()
+
+    stages: dict = {}
+    for entities in args.scales:
+        stages.update(run_ingest(args, fake, fixture, entities))
+    stages.update(run_qa(args, fixture, sessions))
+    report = {
+        "meta": {
+            "revision": _revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": args.backend,
+            "model_latency_ms": args.model_latency_ms,
+            "entities_per_drawing": args.entities_per_drawing,
+            "heap_tracing": not args.no_memory,
+        },
+        "stages": stages,
+    }
+    print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"baseline written to {args.save_baseline}")
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        for key in COMPARABLE_META:
+            if baseline["meta"].get(key) != report["meta"][key]:
+                print(f"warning: baseline {key}={baseline['meta'].get(key)!r}, this run {report['meta'][key]!r}")
+        rows = compare(report, baseline, args.tolerance)
+        print_comparison(rows)
+        if args.fail_on_regression and any(row["regression"] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", type=int, nargs="+", default=list(DEFAULT_SCALES), help="Total entities per ingest run.")
+    parser.add_argument("--entities-per-drawing", type=int, default=1000)
+    parser.add_argument("--extract-workers", type=int, default=4)
+    parser.add_argument("--qa-entities", type=int, default=1000, help="Size of the drawing the Q&A sessions run against.")
+    parser.add_argument("--repeats", type=int, default=20, help="Times each Q&A session is asked.")
+    parser.add_argument("--model-latency-ms", type=float, default=0.0, help="Delay added to every fake model call.")
+    parser.add_argument("--backend", choices=("memory", "neo4j"), default="memory")
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc (faster, no peak_mb).")
+    parser.add_argument("--output", type=Path, help="Write the report JSON here.")
+    parser.add_argument("--baseline", type=Path, help="Baseline report to compare against.")
+    parser.add_argument("--save-baseline", type=Path, help="Write this run as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Relative change that counts as a regression.")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    sys.exit(main(parser.parse_args()))
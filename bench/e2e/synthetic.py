@@ -0,0 +1,88 @@
+"""
+Synthetic drawings of a chosen size, built by replicating the part subtree of the recorded
+extraction fixture.
+"""
+import json
+from pathlib import Path
+
+from lib.json_stream import extract_first_json
+from lib.schema import DOC_KEY, identifier_keys
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+
+def load_fixture(name: str) -> dict:
+    return json.loads((FIXTURES / name).read_text(encoding="utf-8"))
+
+
+def _rename(label: str, properties: dict, suffix: str, doc_id: str, ids: dict) -> dict:
+    renamed = {**properties, DOC_KEY: doc_id} if DOC_KEY in properties else dict(properties)
+    if suffix:
+        for key in ids.get(label, ()):
+            if renamed.get(key) is not None:
+                renamed[key] = f"{renamed[key]}{suffix}"
+    return renamed
+
+
+def scale_extraction(fixture: dict, doc_id: str, entities: int, tag: str = "") -> dict:
+    """
+    A payload of exactly `entities` entities for doc_id. Entities of the fixture's
+    shared_types (Drawing, View, ...) appear once; the rest are copied with "~<n>" appended
+    to their identifiers until the target is reached. Relationships are copied the same way
+    and kept only when both ends exist. A tag is appended to every identifier, so drawings
+    built with different tags share no ids; relationship targets are matched by id alone, so
+    shared ids would link every drawing to every other.
+    """
+    payload = extract_first_json([fixture["output_text"]])
+    shared = set(fixture["shared_types"])
+    ids = identifier_keys()
+    tagged = f"-{tag}" if tag else ""
+
+    def suffix(label: str, copy: int) -> str:
+        return tagged if label in shared or copy == 0 else f"{tagged}~{copy}"
+
+    result = [
+        {**entity, "properties": _rename(entity["type"], entity["properties"], tagged, doc_id, ids)}
+        for entity in payload["entities"] if entity["type"] in shared
+    ]
+    repeated = [entity for entity in payload["entities"] if entity["type"] not in shared]
+    relationships = []
+    copy = 0
+    while len(result) < entities and repeated:
+        result.extend(
+            {**entity, "properties": _rename(entity["type"], entity["properties"], suffix(entity["type"], copy), doc_id, ids)}
+            for entity in repeated
+        )
+        relationships.extend(
+            {
+                **relationship,
+                "source_properties": _rename(relationship["source"], relationship["source_properties"], suffix(relationship["source"], copy), doc_id, ids),
+                "target_properties": _rename(relationship["target"], relationship["target_properties"], suffix(relationship["target"], copy), doc_id, ids),
+            }
+            for relationship in payload["relationships"]
+            if copy == 0 or relationship["source"] not in shared or relationship["target"] not in shared
+        )
+        copy += 1
+    result = result[:entities]
+    present = {
+        (entity["type"], key, entity["properties"].get(key))
+        for entity in result
+        for key in ids.get(entity["type"], ())
+    }
+
+    def exists(label: str, properties: dict) -> bool:
+        return all((label, key, value) in present for key, value in properties.items() if key != DOC_KEY)
+
+    relationships = [
+        relationship for relationship in relationships
+        if exists(relationship["source"], relationship["source_properties"])
+        and exists(relationship["target"], relationship["target_properties"])
+    ]
+    return {"entities": result, "relationships": relationships}
+
+
+def model_output(payload: dict) -> str:
+    """
+    The payload wrapped the way the model writes it: a sentence, then a ```json fence.
+    """
+    return "Here is the extracted graph.\n\n```json\n" + json.dumps(payload, ensure_ascii=False) + "\n```\n"
@@ -0,0 +1,91 @@
+"""
+Load test for server.ReasoningService with stub backends: a fake async OpenAI client that
+asks for one graph_query round and a fake async run_cypher, both with configurable latency.
+
+    python bench/load_test_service.py --clients 50 --requests 20 --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from ai.async_client import async_call_openai_with_graph_reasoning  # noqa: E402
+from server import ReasoningService, percentile, serve  # noqa: E402
+
+
+class StubResponses:
+    def __init__(self, model_latency_s: float):
+        self.model_latency_s = model_latency_s
+
+    async def create(self, **kwargs) -> dict:
+        await asyncio.sleep(self.model_latency_s)
+        if "previous_response_id" not in kwargs:
+            call = {
+                "type": "function_call",
+                "name": "graph_query",
+                "call_id": "call-1",
+                "arguments": json.dumps({"cypher": "MATCH (p:Part) RETURN p.part_id LIMIT 5"}),
+            }
+            return {"id": "resp-1", "output": [call], "output_text": ""}
+        return {"id": "resp-2", "output": [], "output_text": "Stub answer."}
+
+
+class StubClient:
+    def __init__(self, model_latency_s: float):
+        self.responses = StubResponses(model_latency_s)
+
+
+def make_stub_query(query_latency_s: float):
+    async def run_query(cypher: str, parameters=None, limit=25) -> dict:
+        await asyncio.sleep(query_latency_s)
+        return {"records": [{"p.part_id": "P-1"}], "summary": {}}
+    return run_query
+
+
+async def run_client(port: int, requests: int, client_id: int, latencies: list[float]) -> None:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for index in range(requests):
+        start = time.perf_counter()
+        writer.write(json.dumps({"id": f"{client_id}-{index}", "question": "Which parts are shown?"}).encode() + b"\n")
+        await writer.drain()
+        await reader.readline()
+        latencies.append(1000 * (time.perf_counter() - start))
+    writer.close()
+
+
+async def main(args: argparse.Namespace) -> None:
+    client = StubClient(args.model_ms / 1000)
+    run_query = make_stub_query(args.query_ms / 1000)
+
+    async def answer(question: str) -> str:
+        return await async_call_openai_with_graph_reasoning(question, run_query=run_query, client=client, retrieve=False)
+
+    service = ReasoningService(answer, max_concurrency=args.concurrency, timeout_s=args.timeout)
+    server = await serve(service, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    latencies: list[float] = []
+    start = time.perf_counter()
+    async with server:
+        await asyncio.gather(*(run_client(port, args.requests, index, latencies) for index in range(args.clients)))
+    elapsed = time.perf_counter() - start
+
+    total = args.clients * args.requests
+    print(f"requests: {total} in {elapsed:.2f}s -> {total / elapsed:.1f} req/s")
+    print(f"client latency p50={percentile(latencies, 50):.1f} ms p95={percentile(latencies, 95):.1f} ms")
+    for key, value in service.metrics().items():
+        print(f"  {key}: {value:.1f}" if isinstance(value, float) else f"  {key}: {value}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--model-ms", type=float, default=50.0, help="Stub latency per model call.")
+    parser.add_argument("--query-ms", type=float, default=5.0, help="Stub latency per Cypher query.")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,17 @@
+import asyncio
+from typing import Optional
+
+from lib.db import close_driver, run_cypher
+
+
+async def async_run_cypher(cypher: str, parameters: Optional[dict] = None, limit: Optional[int] = 25) -> dict:
+    """
+    Async counterpart of lib.db.run_cypher with the same return shape. It runs run_cypher on
+    a worker thread over the shared driver pool, so reads go through the result cache and
+    writes invalidate it and move graph_version() like any other write.
+    """
+    return await asyncio.to_thread(run_cypher, cypher, parameters, limit)
+
+
+async def close_async_driver() -> None:
+    await asyncio.to_thread(close_driver)
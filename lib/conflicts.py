@@ -0,0 +1,279 @@
+import hashlib
+import json
+import re
+from typing import Iterable, Optional
+
+from lib.db import DEFAULT_BATCH_SIZE, _record_write, _write_groups, get_backend, graph_session
+from lib.numeric import decimal_places, parse_dimension, parse_limits, parse_spec_tolerance
+from lib.schema import CONFLICT_PASS_LABEL as PASS_LABEL
+from lib.schema import CONFLICT_RELATIONSHIP as RELATIONSHIP
+from lib.schema import DOC_KEY
+
+EPSILON = 1e-9
+
+DIMENSIONS_QUERY = (
+    "MATCH (d:Dimension {source_doc_id: $doc}) "
+    "OPTIONAL MATCH (d)-[:GOVERNED_BY]->(t:ToleranceSpec) "
+    "OPTIONAL MATCH (f:Feature)-[:HAS_DIMENSION]->(d) "
+    "OPTIONAL MATCH (p:Part)-[:HAS_FEATURE]->(f) "
+    "WITH d, collect(DISTINCT CASE WHEN t IS NULL THEN null ELSE {id: elementId(t), text: t.text} END) AS specs, "
+    "collect(DISTINCT elementId(f)) AS features, collect(DISTINCT elementId(p)) AS parts "
+    "RETURN elementId(d) AS id, d.dimension_id AS key, d.value AS value, d.type AS kind, d.unit AS unit, "
+    "d.value_nominal AS nominal, d.value_min AS min, d.value_max AS max, specs, features, parts "
+    "ORDER BY id"
+)
+NOTES_QUERY = (
+    "MATCH (n:Note {source_doc_id: $doc}) "
+    "OPTIONAL MATCH (n)-[:APPLIES_TO]->(x) "
+    "WITH n, collect(DISTINCT x) AS applies "
+    "OPTIONAL MATCH (w:WeldSpec)-[:REFERENCED_BY]->(n) "
+    "WITH n, applies, collect(DISTINCT w) AS welds "
+    "RETURN elementId(n) AS id, n.note_id AS key, n.text AS text, "
+    "[t IN applies + welds | {id: elementId(t), label: labels(t)[0]}] AS targets ORDER BY id"
+)
+WELDS_QUERY = (
+    "MATCH (w:WeldSpec {source_doc_id: $doc}) "
+    "OPTIONAL MATCH (f:Feature)-[:HAS_WELD]->(w) "
+    "RETURN elementId(w) AS id, w.weldspec_id AS key, w.size AS size, w.type AS kind, "
+    "collect(DISTINCT elementId(f)) AS features ORDER BY id"
+)
+FINGERPRINT_QUERY = f"MATCH (c:{PASS_LABEL} {{source_doc_id: $doc}}) RETURN c.fingerprint AS fingerprint"
+# Saves the new fingerprint and clears the document's materialized edges in one statement,
+# so the two cannot disagree.
+REPLACE_QUERY = (
+    f"MERGE (c:{PASS_LABEL} {{source_doc_id: $doc}}) SET c.fingerprint = $fingerprint "
+    f"WITH c OPTIONAL MATCH ()-[r:{RELATIONSHIP} {{materialized: true}}]->() WHERE r.source_doc_id = $doc DELETE r"
+)
+DOCUMENTS_QUERY = f"MATCH (n) WHERE n.source_doc_id IS NOT NULL AND NOT n:{PASS_LABEL} RETURN DISTINCT n.source_doc_id AS doc"
+WRITE_QUERY = (
+    "UNWIND $rows AS row "
+    "MATCH (a) WHERE elementId(a) = row.source "
+    "MATCH (b) WHERE elementId(b) = row.target "
+    f"MERGE (a)-[r:{RELATIONSHIP} {{rule: row.rule}}]->(b) "
+    "SET r.rationale = row.rationale, r.source_doc_id = row.source_doc_id, r.inferred = true, r.materialized = true"
+)
+
+# Words a note uses for each Dimension.type, matched case-insensitively.
+DIMENSION_KEYWORDS = {
+    "diameter": ("diameter", "dia", "ø", "⌀", "od", "id", "bore"),
+    "radius": ("radius", "rad", "fillet"),
+    "thickness": ("thickness", "thk", "wall", "gauge", "gage"),
+    "length": ("length", "long"),
+    "width": ("width", "wide"),
+    "height": ("height", "high"),
+    "depth": ("depth", "deep"),
+    "angle": ("angle", "°", "deg"),
+}
+WELD_KEYWORDS = ("weld", "fillet", "leg", "throat", "size")
+# load_incremental counts that mean a document's stored subgraph changed.
+CHANGE_COUNTS = ("nodes_inserted", "nodes_updated", "nodes_deleted", "relationships_inserted", "relationships_deleted")
+
+
+def _words(words: Iterable[str]) -> re.Pattern:
+    return re.compile("|".join(rf"(?<!\w){re.escape(word)}(?!\w)" for word in words))
+
+
+# The type name counts as one of its own words, as a whole word: "rectangle" is not an angle.
+_KIND_PATTERNS = {kind: _words((kind, *words)) for kind, words in DIMENSION_KEYWORDS.items()}
+_WELD_PATTERN = _words(WELD_KEYWORDS)
+
+
+def _kind(value: Optional[str]) -> Optional[str]:
+    text = str(value or "").lower()
+    for kind, pattern in _KIND_PATTERNS.items():
+        if pattern.search(text):
+            return kind
+    return None
+
+
+def _fmt(value: float) -> str:
+    return f"{value:g}"
+
+
+def _conflict(source: str, target: str, rule: str, rationale: str) -> dict:
+    return {"source": source, "target": target, "rule": rule, "rationale": rationale}
+
+
+def tolerance_conflicts(dimensions: list[dict]) -> list[dict]:
+    """
+    Dimension -> ToleranceSpec: the dimension's own tolerance band is wider than the
+    governing spec allows for its number of decimal places.
+    """
+    conflicts = []
+    for dimension in dimensions:
+        if dimension["min"] is None or dimension["max"] is None:
+            continue
+        half_band = (dimension["max"] - dimension["min"]) / 2
+        if half_band <= EPSILON:
+            continue
+        for spec in dimension["specs"]:
+            allowed = parse_spec_tolerance(spec.get("text"), decimal_places(dimension["value"]))
+            if allowed is not None and half_band > allowed + EPSILON:
+                conflicts.append(_conflict(
+                    dimension["id"], spec["id"], "tolerance_exceeds_spec",
+                    f"Dimension {dimension['key'] or dimension['value']} allows ±{_fmt(half_band)} "
+                    f"but its tolerance spec allows ±{_fmt(allowed)}",
+                ))
+    return conflicts
+
+
+def _limit_violation(low: float, high: float, kind: str, limit: float) -> Optional[str]:
+    if kind == "max" and high > limit + EPSILON:
+        return f"up to {_fmt(high)} exceeds MAX {_fmt(limit)}"
+    if kind == "min" and low < limit - EPSILON:
+        return f"down to {_fmt(low)} is below MIN {_fmt(limit)}"
+    return None
+
+
+def note_conflicts(notes: list[dict], dimensions: list[dict], welds: list[dict]) -> list[dict]:
+    """
+    Note -> Dimension: a MAX/MIN limit in a note that names a dimension type ("WALL 3 MAX")
+    is violated by a matching dimension of the part or feature the note applies to.
+    Note -> WeldSpec: a limit in a note attached to a weld is violated by the weld size.
+    """
+    by_target: dict[str, list[dict]] = {}
+    for dimension in dimensions:
+        for owner in (dimension["id"], *dimension["features"], *dimension["parts"]):
+            by_target.setdefault(owner, []).append(dimension)
+    welds_by_id = {weld["id"]: weld for weld in welds}
+    conflicts = []
+    for note in notes:
+        limits = parse_limits(note["text"])
+        if not limits:
+            continue
+        note_kind = _kind(note["text"])
+        label = note["key"] or "note"
+        for target in note["targets"]:
+            weld = welds_by_id.get(target["id"])
+            if weld is not None:
+                size = parse_dimension(weld["size"]).get("value_nominal")
+                if size is None or not _WELD_PATTERN.search(note["text"].lower()):
+                    continue
+                for kind, limit in limits:
+                    problem = _limit_violation(size, size, kind, limit)
+                    if problem:
+                        conflicts.append(_conflict(
+                            note["id"], weld["id"], "weld_note_limit",
+                            f"Weld {weld['key'] or weld['size']} size {problem} in {label}",
+                        ))
+                continue
+            if note_kind is None:
+                continue
+            for dimension in by_target.get(target["id"], ()):
+                if dimension["nominal"] is None or _kind(dimension["kind"]) != note_kind:
+                    continue
+                low = dimension["min"] if dimension["min"] is not None else dimension["nominal"]
+                high = dimension["max"] if dimension["max"] is not None else dimension["nominal"]
+                for kind, limit in limits:
+                    problem = _limit_violation(low, high, kind, limit)
+                    if problem:
+                        conflicts.append(_conflict(
+                            note["id"], dimension["id"], "note_limit",
+                            f"{note_kind.capitalize()} {dimension['key'] or dimension['value']} {problem} in {label}",
+                        ))
+    return conflicts
+
+
+def weld_conflicts(welds: list[dict], dimensions: list[dict]) -> list[dict]:
+    """
+    WeldSpec -> Dimension: the weld size is larger than a thickness dimension of a feature
+    the weld is on.
+    """
+    thickness: dict[str, list[dict]] = {}
+    for dimension in dimensions:
+        if dimension["nominal"] is not None and _kind(dimension["kind"]) == "thickness":
+            for feature in dimension["features"]:
+                thickness.setdefault(feature, []).append(dimension)
+    conflicts = []
+    for weld in welds:
+        size = parse_dimension(weld["size"]).get("value_nominal")
+        if size is None:
+            continue
+        for feature in weld["features"]:
+            for dimension in thickness.get(feature, ()):
+                if size > dimension["nominal"] + EPSILON:
+                    conflicts.append(_conflict(
+                        weld["id"], dimension["id"], "weld_exceeds_thickness",
+                        f"Weld {weld['key'] or weld['size']} size {_fmt(size)} exceeds "
+                        f"thickness {dimension['key'] or dimension['value']} ({_fmt(dimension['nominal'])})",
+                    ))
+    return conflicts
+
+
+def find_conflicts(inputs: dict) -> list[dict]:
+    """
+    Applies every rule to one document's inputs ({"dimensions", "notes", "welds"}).
+    Deterministic: the same inputs always give the same conflicts in the same order.
+    """
+    dimensions, notes, welds = inputs["dimensions"], inputs["notes"], inputs["welds"]
+    conflicts = tolerance_conflicts(dimensions) + note_conflicts(notes, dimensions, welds) + weld_conflicts(welds, dimensions)
+    unique = {(c["source"], c["target"], c["rule"]): c for c in conflicts}
+    return [unique[key] for key in sorted(unique)]
+
+
+def fetch_inputs(source_doc_id: str) -> dict:
+    """
+    Reads the dimensions, notes and welds of one document with their spec, feature and
+    part links. Each read is a source_doc_id index seek.
+    """
+    backend = get_backend()
+    return {
+        name: backend.run(query, {"doc": source_doc_id})[0]
+        for name, query in (("dimensions", DIMENSIONS_QUERY), ("notes", NOTES_QUERY), ("welds", WELDS_QUERY))
+    }
+
+
+def fingerprint(inputs: dict) -> str:
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _stored_fingerprint(source_doc_id: str) -> Optional[str]:
+    records, _ = get_backend().run(FINGERPRINT_QUERY, {"doc": source_doc_id})
+    return records[0]["fingerprint"] if records else None
+
+
+def materialize_document(source_doc_id: str, batch_size: int = DEFAULT_BATCH_SIZE, force: bool = False) -> dict:
+    """
+    Recomputes CONFLICTS_WITH edges for one document. The inputs are hashed and compared
+    with the hash stored on the document's ConflictPass node, so an unchanged document
+    costs three reads and no writes. Otherwise the document's materialized edges are
+    replaced, in batch_size batches.
+    """
+    inputs = fetch_inputs(source_doc_id)
+    digest = fingerprint(inputs)
+    if not force and digest == _stored_fingerprint(source_doc_id):
+        return {"status": "unchanged", "conflicts": None, "batches": []}
+    conflicts = find_conflicts(inputs)
+    rows = [{**conflict, DOC_KEY: source_doc_id} for conflict in conflicts]
+    get_backend().run(REPLACE_QUERY, {"doc": source_doc_id, "fingerprint": digest})
+    _record_write()
+    batches = _write_groups({RELATIONSHIP: (RELATIONSHIP, WRITE_QUERY)}, {RELATIONSHIP: rows}, batch_size) if rows else []
+    return {"status": "updated", "conflicts": len(conflicts), "batches": batches}
+
+
+def changed_documents(load_report: dict) -> list[str]:
+    """
+    Document ids from a load_incremental report whose load inserted, updated or deleted anything.
+    """
+    return sorted(
+        doc_id for doc_id, report in load_report.items()
+        if any(report["counts"][key] for key in CHANGE_COUNTS)
+    )
+
+
+def materialize_conflicts(source_doc_ids: Iterable[str], batch_size: int = DEFAULT_BATCH_SIZE, force: bool = False) -> dict:
+    """
+    Runs materialize_document for each document id; returns per-document reports.
+    """
+    with graph_session():
+        return {doc_id: materialize_document(doc_id, batch_size=batch_size, force=force) for doc_id in sorted(set(source_doc_ids))}
+
+
+def all_documents() -> list[str]:
+    records, _ = get_backend().run(DOCUMENTS_QUERY)
+    return [record["doc"] for record in records]
+
+
+if __name__ == "__main__":
+    for doc_id, report in materialize_conflicts(all_documents()).items():
+        print(f"{doc_id}: {report['status']} ({report['conflicts'] if report['conflicts'] is not None else '-'} conflicts)")
@@ -1,57 +1,551 @@
-from neo4j import GraphDatabase
 from dotenv import load_dotenv
+import copy
 import os
-import hashlib
-import time
 import json
-from typing import Optional
-load_dotenv()
-
-URI = os.getenv("NEO4J_URI")
-AUTH = ("neo4j", os.getenv("NEO4J_PASSWORD"))
-driver = GraphDatabase.driver(URI, auth=AUTH)
-
-def make_uid(key):
-    now = str(time.time_ns())
-    base = f"{key}-{now}"
-    hash_digest = hashlib.sha256(base.encode()).hexdigest()[:8]
-    return f"{key}_{now}_{hash_digest}"
-
-def prepare_properties(properties: dict) -> dict:
-    f"""
-    Ensures each property has a unique UUID and returns a string of the properties and a map of UUIDs to values.
-    """
-    properties_string = []
-    uuid_to_value_map = {}
-    for key, value in properties.items():
-        if value is not None:
-            uuid = make_uid(key)
-            properties_string.append(f"{key}: ${uuid}")
-            uuid_to_value_map[uuid] = value
-    return ", ".join(properties_string), uuid_to_value_map
-    
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterable, Iterator, Optional
+
+from lib.tracing import span
+
+DEFAULT_BATCH_SIZE = 500
+STATEMENT_CACHE_SIZE = 1024
+
+_write_lock = threading.Lock()
+_local_writes = 0
+_backend = None
+_driver = None
+_session_state = threading.local()
+
+GRAPH_COUNTS_QUERY = (
+    "CALL { MATCH (n) RETURN count(n) AS nodes } "
+    "CALL { MATCH ()-[r]->() RETURN count(r) AS relationships } "
+    "RETURN nodes, relationships"
+)
+
+RESULT_CACHE_SIZE = 256
+RESULT_CACHE_TTL_S = 300.0
+_result_cache: OrderedDict = OrderedDict()
+_result_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+_STRING_OR_COMMENT = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`|//[^\n]*|/\*.*?\*/", re.DOTALL)
+_WRITE_CLAUSE = re.compile(
+    r"\b(CREATE|MERGE|DELETE|DETACH|SET|REMOVE|DROP|FOREACH|LOAD\s+CSV|IN\s+TRANSACTIONS|GRANT|DENY|REVOKE|ALTER|RENAME|START|STOP|TERMINATE)\b",
+    re.IGNORECASE,
+)
+_PROCEDURE_CALL = re.compile(r"\bCALL\s+([\w.]+)", re.IGNORECASE)
+READ_ONLY_PROCEDURES = {
+    "db.labels",
+    "db.relationshiptypes",
+    "db.propertykeys",
+    "db.schema.visualization",
+    "db.schema.nodetypeproperties",
+    "db.schema.reltypeproperties",
+    "db.index.fulltext.querynodes",
+    "db.index.fulltext.queryrelationships",
+}
+
+COUNTER_KEYS = (
+    "nodes_created",
+    "nodes_deleted",
+    "relationships_created",
+    "relationships_deleted",
+    "properties_set",
+    "labels_added",
+    "labels_removed",
+    "indexes_added",
+    "indexes_removed",
+    "constraints_added",
+    "constraints_removed",
+    "contains_updates",
+    "contains_system_updates",
+)
+
+class GraphBackend:
+    """
+    What the functions in this module need from a graph store.
+    - run returns (records, summary); summary has "counters" (COUNTER_KEYS), "query_type"
+      ("r", "w", "rw" or "s") and result_available_after_ms / result_consumed_after_ms.
+    - write_batches runs (cypher, rows) statements with $rows bound and yields each
+      batch's counters as it commits.
+    - counts returns (nodes, relationships).
+    """
+
+    name = "backend"
+
+    def run(self, cypher: str, parameters: Optional[dict] = None) -> tuple[list[dict], dict]:
+        raise NotImplementedError
+
+    def write_batches(self, statements: Iterable[tuple[str, list]]) -> Iterator[dict]:
+        raise NotImplementedError
+
+    def counts(self) -> tuple[int, int]:
+        raise NotImplementedError
+
+def neo4j_settings() -> dict:
+    """
+    Connection and pool settings for the Neo4j drivers, read from the environment (and
+    .env) on first use rather than at import:
+    - NEO4J_URI, NEO4J_USER (default neo4j), NEO4J_PASSWORD
+    - NEO4J_MAX_POOL_SIZE: connections kept per server (default 50)
+    - NEO4J_ACQUISITION_TIMEOUT_S: how long a session waits for a free connection (default 30)
+    - NEO4J_CONNECTION_TIMEOUT_S: TCP connect timeout (default 15)
+    - NEO4J_LIVENESS_CHECK_S: idle time after which a pooled connection is pinged before reuse (default 60)
+    - NEO4J_MAX_LIFETIME_S: connections older than this are closed (default 3600)
+    """
+    load_dotenv()
+    return {
+        "uri": os.getenv("NEO4J_URI"),
+        "auth": (os.getenv("NEO4J_USER", "neo4j"), os.getenv("NEO4J_PASSWORD")),
+        "max_connection_pool_size": int(os.getenv("NEO4J_MAX_POOL_SIZE", "50")),
+        "connection_acquisition_timeout": float(os.getenv("NEO4J_ACQUISITION_TIMEOUT_S", "30")),
+        "connection_timeout": float(os.getenv("NEO4J_CONNECTION_TIMEOUT_S", "15")),
+        "liveness_check_timeout": float(os.getenv("NEO4J_LIVENESS_CHECK_S", "60")),
+        "max_connection_lifetime": float(os.getenv("NEO4J_MAX_LIFETIME_S", "3600")),
+    }
+
+def get_driver():
+    """
+    The shared Neo4j driver, built on first call with neo4j_settings(). Importing this
+    module neither imports the neo4j package nor opens a connection.
+    """
+    global _driver
+    if _driver is None:
+        with _write_lock:
+            if _driver is None:
+                settings = neo4j_settings()
+                uri = settings.pop("uri")
+                if not uri:
+                    raise RuntimeError("NEO4J_URI is not set; set it or use GRAPH_BACKEND=memory")
+                from neo4j import GraphDatabase
+                _driver = GraphDatabase.driver(uri, **settings)
+    return _driver
+
+def close_driver() -> None:
+    global _driver
+    with _write_lock:
+        if _driver is not None:
+            _driver.close()
+            _driver = None
+
+class Neo4jBackend(GraphBackend):
+    """
+    Runs on the shared driver from get_driver() unless one is passed in. Calls made inside a
+    graph_session block on the same thread share that block's session or transaction;
+    otherwise each call opens a short-lived session.
+    """
+
+    name = "neo4j"
+
+    def __init__(self, neo4j_driver=None):
+        if neo4j_driver is None and not neo4j_settings()["uri"]:
+            raise RuntimeError("NEO4J_URI is not set; set it or use GRAPH_BACKEND=memory")
+        self._driver = neo4j_driver
+
+    @property
+    def driver(self):
+        return self._driver or get_driver()
+
+    @contextmanager
+    def _runner(self):
+        current = getattr(_session_state, "runner", None)
+        if current is not None:
+            yield current
+            return
+        with self.driver.session() as session:
+            yield session
+
+    def run(self, cypher: str, parameters: Optional[dict] = None) -> tuple[list[dict], dict]:
+        with self._runner() as runner:
+            result = runner.run(cypher, **(parameters or {}))
+            records = [record.data() for record in result]
+            summary = result.consume()
+        return records, {
+            "counters": _counters_payload(summary.counters),
+            "query_type": summary.query_type,
+            "result_available_after_ms": summary.result_available_after,
+            "result_consumed_after_ms": summary.result_consumed_after,
+        }
+
+    def execute_write(self, work, *args):
+        """
+        Runs work(tx, *args) in a retried write transaction, or directly in the enclosing
+        graph_session transaction.
+        """
+        with self._runner() as runner:
+            if getattr(_session_state, "transaction", False):
+                return work(runner, *args)
+            return runner.execute_write(work, *args)
+
+    def write_batches(self, statements: Iterable[tuple[str, list]]) -> Iterator[dict]:
+        for cypher, rows in statements:
+            yield self.execute_write(_run_batch, cypher, rows)
+
+    def counts(self) -> tuple[int, int]:
+        with self._runner() as runner:
+            record = runner.run(GRAPH_COUNTS_QUERY).single()
+        return record["nodes"], record["relationships"]
+
+def get_backend() -> GraphBackend:
+    """
+    The graph store behind create_node, create_relationship, run_cypher and the bulk
+    writers. GRAPH_BACKEND=memory selects lib.memory_graph.MemoryGraph; the default wraps
+    the Neo4j driver.
+    """
+    global _backend
+    if _backend is None:
+        load_dotenv()
+        with _write_lock:
+            if _backend is None:
+                if os.getenv("GRAPH_BACKEND", "neo4j") == "memory":
+                    from lib.memory_graph import MemoryGraph
+                    _backend = MemoryGraph()
+                else:
+                    _backend = Neo4jBackend()
+    return _backend
+
+def set_backend(backend: GraphBackend) -> GraphBackend:
+    """
+    Swaps the graph store (e.g. a fresh MemoryGraph in a benchmark) and returns the previous one.
+    """
+    global _backend
+    previous = _backend
+    _backend = backend
+    clear_result_cache()
+    return previous
+
+def uses_neo4j() -> bool:
+    return get_backend().name == "neo4j"
+
+@contextmanager
+def graph_session(transaction: bool = False):
+    """
+    Shares one Neo4j session across every call made through this module on the current
+    thread inside the block, instead of a session (and pool checkout) per statement. With
+    transaction=True the block runs in one explicit transaction that commits on exit and
+    rolls back on error. Nested blocks join the outermost one. Yields the session or
+    transaction for direct .run calls; on the in-memory backend it yields None.
+    """
+    current = getattr(_session_state, "runner", None)
+    if current is not None:
+        yield current
+        return
+    backend = get_backend()
+    if not isinstance(backend, Neo4jBackend):
+        yield None
+        return
+    with backend.driver.session() as session:
+        runner = session.begin_transaction() if transaction else session
+        _session_state.runner, _session_state.transaction = runner, transaction
+        try:
+            yield runner
+            if transaction:
+                runner.commit()
+        except BaseException:
+            if transaction:
+                runner.rollback()
+            raise
+        finally:
+            _session_state.runner, _session_state.transaction = None, False
+            if transaction:
+                runner.close()
+
+def _record_write() -> None:
+    global _local_writes
+    with _write_lock:
+        _local_writes += 1
+        if _result_cache:
+            _result_cache.clear()
+            _result_cache_stats["invalidations"] += 1
+
+def is_read_only(cypher: str) -> bool:
+    """
+    Parser-level check: no write clause and no procedure outside READ_ONLY_PROCEDURES,
+    ignoring string literals, quoted names and comments.
+    """
+    stripped = _STRING_OR_COMMENT.sub(" ", cypher)
+    if _WRITE_CLAUSE.search(stripped):
+        return False
+    return all(name.lower() in READ_ONLY_PROCEDURES for name in _PROCEDURE_CALL.findall(stripped))
+
+def _result_cache_key(cypher: str, parameters: Optional[dict], limit: Optional[int]) -> str:
+    normalized = " ".join(cypher.split()).rstrip(";")
+    return json.dumps([normalized, parameters or {}, limit], sort_keys=True, default=str)
+
+def result_cache_stats() -> dict:
+    lookups = _result_cache_stats["hits"] + _result_cache_stats["misses"]
+    return {
+        **_result_cache_stats,
+        "entries": len(_result_cache),
+        "hit_rate": _result_cache_stats["hits"] / lookups if lookups else 0.0,
+    }
+
+def clear_result_cache() -> None:
+    with _write_lock:
+        _result_cache.clear()
+
+def graph_version() -> tuple:
+    """
+    Version stamp for caches over graph reads: writes made through this module plus the
+    server's node and relationship counts (answered from the count store), so inserts and
+    deletes from other processes also change the stamp. A property-only SET from another
+    process leaves the counts unchanged and is not seen.
+    """
+    return (_local_writes, *get_backend().counts())
+
+def _quote(name: str) -> str:
+    return "`" + name.replace("`", "``") + "`"
+
+def _present(properties: dict) -> dict:
+    return {key: value for key, value in properties.items() if value is not None}
+
+def _shape(properties: dict) -> tuple:
+    return tuple(sorted(properties))
+
+def _param_map(prefix: str, keys: tuple) -> str:
+    return ", ".join(f"{_quote(key)}: ${prefix}{index}" for index, key in enumerate(keys))
+
+def _row_map(row_name: str, keys: tuple) -> str:
+    return ", ".join(f"{_quote(key)}: {row_name}.{_quote(key)}" for key in keys)
+
+def prepare_properties(properties: dict, prefix: str = "p") -> tuple[str, dict]:
+    """
+    Returns a property-map string and its parameters. Parameter names depend only on the
+    sorted property keys, so the same key shape always produces the same Cypher text.
+    """
+    present = _present(properties)
+    keys = _shape(present)
+    parameters = {f"{prefix}{index}": present[key] for index, key in enumerate(keys)}
+    return _param_map(prefix, keys), parameters
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def build_node_merge_query(label: str, keys: tuple) -> str:
+    return f"MERGE (n:{_quote(label)} {{ {_param_map('n', keys)} }})"
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def build_relationship_merge_query(source: str, relationship: str, target: str, source_keys: tuple, target_keys: tuple) -> str:
+    return (
+        f"MATCH (s:{_quote(source)} {{ {_param_map('s', source_keys)} }}) "
+        f"MATCH (t:{_quote(target)} {{ {_param_map('t', target_keys)} }}) "
+        f"MERGE (s)-[:{_quote(relationship)}]->(t)"
+    )
+
+def _run_statement(cypher: str, parameters: Optional[dict] = None) -> tuple[list[dict], dict]:
+    with span("cypher", cypher=cypher) as statement_span:
+        records, summary = get_backend().run(cypher, parameters)
+        statement_span.set(
+            rows=len(records),
+            result_available_after_ms=summary["result_available_after_ms"],
+            result_consumed_after_ms=summary["result_consumed_after_ms"],
+        )
+    return records, summary
+
 def create_node(label: str, properties: dict) -> None:
-    properties_string, uuid_to_value_map = prepare_properties(properties)
-    with driver.session() as session:
-        creation_string = f"MERGE (n:{label} {{ {properties_string} }})"
-        session.run(creation_string, **uuid_to_value_map)
+    _, parameters = prepare_properties(properties, prefix="n")
+    creation_string = build_node_merge_query(label, _shape(_present(properties)))
+    _run_statement(creation_string, parameters)
+    _record_write()
 
 def create_relationship(source: str, source_properties: dict, relationship: str, target: str, target_properties: dict) -> None:
-    with driver.session() as session:
-        source_properties_string, source_uuid_to_value_map = prepare_properties(source_properties)
-        target_properties_string, target_uuid_to_value_map = prepare_properties(target_properties)
-        print(source_properties_string)
-        print(target_properties_string)
-        creation_string = f"MATCH (s:{source} {{ {source_properties_string} }}) MATCH (t:{target} {{ {target_properties_string} }}) MERGE (s)-[:{relationship}]->(t)"
-        session.run(creation_string, **source_uuid_to_value_map, **target_uuid_to_value_map)
+    source_properties, target_properties = scope_endpoints(_present(source_properties), _present(target_properties))
+    source_properties_string, source_parameters = prepare_properties(source_properties, prefix="s")
+    target_properties_string, target_parameters = prepare_properties(target_properties, prefix="t")
+    creation_string = build_relationship_merge_query(
+        source,
+        relationship,
+        target,
+        _shape(_present(source_properties)),
+        _shape(_present(target_properties)),
+    )
+    _run_statement(creation_string, {**source_parameters, **target_parameters})
+    _record_write()
+
+def _chunked(rows: list, size: int) -> Iterator[list]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+def group_entities(entities: Iterable[dict]) -> dict:
+    """
+    Groups entities so each group can share one UNWIND statement. Entities of a documented
+    type that carry its node key (lib.schema.node_keys) are grouped as ("upsert", label, keys)
+    with {"key", "properties"} rows, MERGEd on the key with the other properties SET, so a
+    revised drawing updates its nodes in place. The rest are grouped by (label, property keys)
+    and MERGEd on their full property map.
+    """
+    from lib.schema import node_keys
+
+    merge_keys = node_keys()
+    groups: dict = {}
+    for entity in entities:
+        label = entity["type"]
+        properties = _present(entity.get("properties") or {})
+        keys = merge_keys.get(label)
+        if keys is not None and all(key in properties for key in keys):
+            groups.setdefault(("upsert", label, keys), []).append(
+                {"key": {key: properties[key] for key in keys}, "properties": properties}
+            )
+        else:
+            groups.setdefault((label, _shape(properties)), []).append(properties)
+    return groups
+
+def scope_endpoints(source_properties: dict, target_properties: dict, source_doc_id: Optional[str] = None) -> tuple[dict, dict]:
+    """
+    Gives an endpoint without source_doc_id the other endpoint's (or source_doc_id). Nodes are
+    keyed by (source_doc_id, <id>), so an unscoped {"feature_id": "F1"} would match F1 in
+    every drawing. Returns new maps; the inputs are not changed.
+    """
+    from lib.schema import DOC_KEY
+
+    doc = source_properties.get(DOC_KEY) or target_properties.get(DOC_KEY) or source_doc_id
+    if doc is None:
+        return source_properties, target_properties
+    return {DOC_KEY: doc, **source_properties}, {DOC_KEY: doc, **target_properties}
+
+def group_relationships(relationships: Iterable[dict]) -> dict:
+    """
+    Groups relationships by (source label, rel type, target label) and the identifier keys used to match each end.
+    Endpoints are scoped to their drawing first (see scope_endpoints), using the relationship's
+    own source_doc_id when neither endpoint has one.
+    """
+    groups: dict = {}
+    for relationship in relationships:
+        source_properties, target_properties = scope_endpoints(
+            _present(relationship.get("source_properties") or {}),
+            _present(relationship.get("target_properties") or {}),
+            relationship.get("source_doc_id"),
+        )
+        key = (
+            relationship["source"],
+            relationship["relationship"],
+            relationship["target"],
+            _shape(source_properties),
+            _shape(target_properties),
+        )
+        groups.setdefault(key, []).append({"source": source_properties, "target": target_properties})
+    return groups
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def build_unwind_node_query(label: str, keys: tuple) -> str:
+    return f"UNWIND $rows AS row MERGE (n:{_quote(label)} {{ {_row_map('row', keys)} }})"
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def build_unwind_relationship_query(source: str, relationship: str, target: str, source_keys: tuple, target_keys: tuple) -> str:
+    return (
+        f"UNWIND $rows AS row "
+        f"MATCH (s:{_quote(source)} {{ {_row_map('row.source', source_keys)} }}) "
+        f"MATCH (t:{_quote(target)} {{ {_row_map('row.target', target_keys)} }}) "
+        f"MERGE (s)-[:{_quote(relationship)}]->(t)"
+    )
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def build_unwind_upsert_query(label: str, keys: tuple) -> str:
+    return f"UNWIND $rows AS row MERGE (n:{_quote(label)} {{ {_row_map('row.key', keys)} }}) SET n = row.properties"
+
+_STATEMENT_BUILDERS = (
+    build_node_merge_query,
+    build_relationship_merge_query,
+    build_unwind_node_query,
+    build_unwind_relationship_query,
+    build_unwind_upsert_query,
+)
+
+def statement_cache_stats() -> dict:
+    """
+    Hit/miss counts for the built-statement LRU. Every miss is a new Cypher text the server
+    has to plan; in steady-state ingestion the hit rate should approach 1.0.
+    """
+    builders = {}
+    for builder in _STATEMENT_BUILDERS:
+        info = builder.cache_info()
+        builders[builder.__name__] = {"hits": info.hits, "misses": info.misses, "size": info.currsize}
+    hits = sum(item["hits"] for item in builders.values())
+    misses = sum(item["misses"] for item in builders.values())
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / lookups if lookups else 0.0,
+        "builders": builders,
+    }
+
+def clear_statement_cache() -> None:
+    for builder in _STATEMENT_BUILDERS:
+        builder.cache_clear()
+
+def _run_batch(tx, cypher: str, rows: list) -> dict:
+    summary = tx.run(cypher, rows=rows).consume()
+    return _counters_payload(summary.counters)
+
+def _write_groups(queries: dict, groups: dict, batch_size: int) -> list:
+    statements = [
+        (queries[group_key][0], queries[group_key][1], batch)
+        for group_key, rows in groups.items()
+        for batch in _chunked(rows, batch_size)
+    ]
+    batches = []
+    with graph_session():
+        committed = iter(get_backend().write_batches((cypher, batch) for _, cypher, batch in statements))
+        for group_name, cypher, batch in statements:
+            with span("cypher.batch", cypher=cypher, group=group_name, rows=len(batch)) as batch_span:
+                counters = next(committed)
+                batch_span.set(
+                    nodes_created=counters.get("nodes_created"),
+                    relationships_created=counters.get("relationships_created"),
+                    properties_set=counters.get("properties_set"),
+                )
+            _record_write()
+            batches.append({"group": group_name, "rows": len(batch), "counters": counters})
+    return batches
+
+def entity_group_queries(groups: dict) -> dict:
+    """
+    {group key: (group name, UNWIND statement)} for groups shaped like group_entities returns.
+    """
+    return {
+        key: (key[1], build_unwind_upsert_query(*key[1:])) if key[0] == "upsert" else (key[0], build_unwind_node_query(*key))
+        for key in groups
+    }
+
+def bulk_create_nodes(entities: Iterable[dict], batch_size: int = DEFAULT_BATCH_SIZE) -> list:
+    """
+    Writes entities with one parameterized UNWIND statement per group_entities batch.
+    Each batch runs in its own write transaction; returns per-batch counters.
+    """
+    groups = group_entities(entities)
+    return _write_groups(entity_group_queries(groups), groups, batch_size)
+
+def bulk_create_relationships(relationships: Iterable[dict], batch_size: int = DEFAULT_BATCH_SIZE) -> list:
+    """
+    MERGEs relationships with one parameterized UNWIND statement per (source, rel, target) batch.
+    Each batch runs in its own write transaction; returns per-batch counters.
+    """
+    groups = group_relationships(relationships)
+    queries = {key: ("-".join(key[:3]), build_unwind_relationship_query(*key)) for key in groups}
+    return _write_groups(queries, groups, batch_size)
+
+def bulk_load(db_objects: dict, batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    """
+    Loads an extraction payload ({"entities": [...], "relationships": [...]}) in batches.
+    Nodes are written before relationships so the MATCH clauses can resolve them.
+    """
+    with graph_session():
+        return {
+            "nodes": bulk_create_nodes(db_objects.get("entities", []), batch_size=batch_size),
+            "relationships": bulk_create_relationships(db_objects.get("relationships", []), batch_size=batch_size),
+        }
 
 def delete_node(label: str, properties: dict) -> None:
-    with driver.session() as session:
-        session.run(f"MATCH (n:{label} {properties}) DELETE n")
+    properties_string, parameters = prepare_properties(properties, prefix="n")
+    _run_statement(f"MATCH (n:{_quote(label)} {{ {properties_string} }}) DETACH DELETE n", parameters)
+    _record_write()
 
 def delete_relationship(source: str, relationship: str, target: str) -> None:
-    with driver.session() as session:
-        session.run(f"MATCH (s:{source})-[:{relationship}]->(t:{target}) DELETE (s)-[:{relationship}]->(t)")
+    _run_statement(f"MATCH (:{_quote(source)})-[r:{_quote(relationship)}]->(:{_quote(target)}) DELETE r")
+    _record_write()
 
 def _apply_limit(cypher: str, limit: Optional[int]) -> str:
     if limit is None:
@@ -62,39 +556,69 @@ def _apply_limit(cypher: str, limit: Optional[int]) -> str:
         return f"{cypher_clean} LIMIT {int(limit)}"
     return cypher_clean
 
-def run_cypher(cypher: str, parameters: Optional[dict] = None, limit: Optional[int] = 25) -> dict:
+def _counters_payload(counters) -> dict:
+    return {key: getattr(counters, key) for key in COUNTER_KEYS}
+
+def run_cypher(cypher: str, parameters: Optional[dict] = None, limit: Optional[int] = 25, use_cache: bool = True) -> dict:
     """
     Executes a single Cypher statement and returns records and summary stats.
+    Results of read-only statements are cached on (normalized text, parameters, limit) until
+    the next write or RESULT_CACHE_TTL_S; summary["cache"] says whether this call was a hit.
+    A read that overlaps a write is returned but not cached, and callers get their own copy
+    of cached records.
     """
+    with span("cypher", cypher=cypher, limit=limit) as statement_span:
+        result = _run_cypher(cypher, parameters, limit, use_cache)
+        statement_span.set(
+            rows=len(result["records"]),
+            cache_hit=result["summary"]["cache"]["hit"],
+            result_available_after_ms=result["summary"]["result_available_after_ms"],
+            result_consumed_after_ms=result["summary"]["result_consumed_after_ms"],
+        )
+    return result
+
+def _run_cypher(cypher: str, parameters: Optional[dict], limit: Optional[int], use_cache: bool) -> dict:
+    cacheable = use_cache and is_read_only(cypher)
+    cache_key = _result_cache_key(cypher, parameters, limit) if cacheable else None
+    if cacheable:
+        with _write_lock:
+            entry = _result_cache.get(cache_key)
+            if entry is not None and time.monotonic() - entry[0] <= RESULT_CACHE_TTL_S:
+                _result_cache.move_to_end(cache_key)
+                _result_cache_stats["hits"] += 1
+                payload = entry[1]
+                return {
+                    "records": copy.deepcopy(payload["records"]),
+                    "summary": {**payload["summary"], "cache": {"hit": True, "hits": _result_cache_stats["hits"]}},
+                }
+            _result_cache_stats["misses"] += 1
+            writes_before = _local_writes
+
     cypher_to_run = _apply_limit(cypher, limit)
-    with driver.session() as session:
-        result = session.run(cypher_to_run, **(parameters or {}))
-        records = [record.data() for record in result]
-        summary = result.consume()
-    counters = summary.counters
-    counters_payload = {
-        "nodes_created": counters.nodes_created,
-        "nodes_deleted": counters.nodes_deleted,
-        "relationships_created": counters.relationships_created,
-        "relationships_deleted": counters.relationships_deleted,
-        "properties_set": counters.properties_set,
-        "labels_added": counters.labels_added,
-        "labels_removed": counters.labels_removed,
-        "indexes_added": counters.indexes_added,
-        "indexes_removed": counters.indexes_removed,
-        "constraints_added": counters.constraints_added,
-        "constraints_removed": counters.constraints_removed,
-        "contains_updates": counters.contains_updates,
-        "contains_system_updates": counters.contains_system_updates,
-    }
-    return {
+    records, summary = get_backend().run(cypher_to_run, parameters)
+    if summary["counters"]["contains_updates"]:
+        _record_write()
+    payload = {
         "records": records,
         "summary": {
-            "counters": counters_payload,
-            "result_available_after_ms": summary.result_available_after,
-            "result_consumed_after_ms": summary.result_consumed_after,
+            "counters": summary["counters"],
+            "result_available_after_ms": summary["result_available_after_ms"],
+            "result_consumed_after_ms": summary["result_consumed_after_ms"],
         },
     }
+    if cacheable and summary["query_type"] == "r":
+        with _write_lock:
+            # A write made while the read ran may or may not be in records.
+            if _local_writes == writes_before:
+                _result_cache[cache_key] = (time.monotonic(), payload)
+                _result_cache.move_to_end(cache_key)
+                while len(_result_cache) > RESULT_CACHE_SIZE:
+                    _result_cache.popitem(last=False)
+                records = copy.deepcopy(records)
+    return {
+        "records": records,
+        "summary": {**payload["summary"], "cache": {"hit": False, "hits": _result_cache_stats["hits"]}},
+    }
 
 if __name__ == "__main__":
     with open("./lib/db_objects.json", "r") as f:
@@ -0,0 +1,210 @@
+import json
+from typing import Iterable, Optional
+
+from lib.db import (
+    DEFAULT_BATCH_SIZE,
+    _present,
+    _quote,
+    _write_groups,
+    build_unwind_node_query,
+    build_unwind_relationship_query,
+    build_unwind_upsert_query,
+    get_backend,
+    graph_session,
+    group_relationships,
+)
+from lib.schema import DOC_KEY, identifier_keys, load_entity_types
+
+DELETE_NODES_QUERY = "UNWIND $rows AS id MATCH (n) WHERE elementId(n) = id DETACH DELETE n"
+DELETE_RELATIONSHIPS_QUERY = "UNWIND $rows AS id MATCH ()-[r]->() WHERE elementId(r) = id DELETE r"
+CURRENT_RELATIONSHIPS_QUERY = (
+    "UNWIND $ids AS id MATCH (s)-[r]->(t) WHERE elementId(s) = id AND coalesce(r.inferred, false) = false "
+    "RETURN elementId(r) AS id, elementId(s) AS source, type(r) AS type, elementId(t) AS target"
+)
+
+
+def _identity_keys(label: str, properties: dict, ids: dict) -> Optional[tuple]:
+    if label not in ids:
+        return None
+    keys = (DOC_KEY,) + ids[label]
+    if any(properties.get(key) is None for key in keys):
+        return None
+    return keys
+
+
+def node_identity(label: str, properties: dict, ids: dict) -> tuple:
+    """
+    (label, source_doc_id, id values) for documented types, otherwise (label, full content) so
+    undocumented types are replaced rather than updated.
+    """
+    keys = _identity_keys(label, properties, ids)
+    if keys is None:
+        return (label, json.dumps(properties, sort_keys=True, default=str))
+    return (label,) + tuple(properties[key] for key in keys)
+
+
+def _current_subgraph_query(labels: Iterable[str]) -> str:
+    return " UNION ALL ".join(
+        f"MATCH (n:{_quote(label)}) WHERE n.{DOC_KEY} = $doc "
+        "RETURN elementId(n) AS id, labels(n)[0] AS label, properties(n) AS properties"
+        for label in sorted(set(labels))
+    )
+
+
+def fetch_document(source_doc_id: str, labels: Iterable[str]) -> tuple[list, list]:
+    """
+    Reads the nodes and non-inferred relationships currently stored for one document.
+    """
+    backend = get_backend()
+    nodes, _ = backend.run(_current_subgraph_query(labels), {"doc": source_doc_id})
+    node_ids = [node["id"] for node in nodes]
+    relationships, _ = backend.run(CURRENT_RELATIONSHIPS_QUERY, {"ids": node_ids})
+    return nodes, relationships
+
+
+def _scoped(properties: dict, source_doc_id: str) -> dict:
+    scoped = _present(properties)
+    scoped.setdefault(DOC_KEY, source_doc_id)
+    return scoped
+
+
+def diff_document(db_objects: dict, source_doc_id: str, nodes: list, relationships: list, ids: dict) -> dict:
+    """
+    Compares a new extraction against the stored subgraph. Returns node upserts, node inserts
+    (for types without identifiers), node and relationship deletes, relationship inserts, and
+    the number of unchanged rows skipped.
+    """
+    current = {}
+    for node in nodes:
+        current[node_identity(node["label"], node["properties"], ids)] = node
+    identity_by_element = {node["id"]: identity for identity, node in current.items()}
+
+    upserts: dict = {}
+    inserts = []
+    seen = set()
+    skipped_nodes = 0
+    updated = 0
+    for entity in db_objects.get("entities", []):
+        label = entity["type"]
+        properties = _scoped(entity.get("properties") or {}, source_doc_id)
+        if properties[DOC_KEY] != source_doc_id:
+            continue
+        identity = node_identity(label, properties, ids)
+        if identity in seen:
+            continue
+        seen.add(identity)
+        existing = current.get(identity)
+        if existing is not None and _present(existing["properties"]) == properties:
+            skipped_nodes += 1
+            continue
+        keys = _identity_keys(label, properties, ids)
+        if keys is None:
+            inserts.append({"type": label, "properties": properties})
+            continue
+        if existing is not None:
+            updated += 1
+        upserts.setdefault((label, keys), []).append(
+            {"key": {key: properties[key] for key in keys}, "properties": properties}
+        )
+    node_deletes = [node["id"] for identity, node in current.items() if identity not in seen]
+
+    existing_relationships = {}
+    for relationship in relationships:
+        source = identity_by_element.get(relationship["source"])
+        target = identity_by_element.get(relationship["target"])
+        if source is None or target is None:
+            continue
+        existing_relationships[(source, relationship["type"], target)] = relationship["id"]
+
+    relationship_inserts = []
+    wanted = set()
+    skipped_relationships = 0
+    for relationship in db_objects.get("relationships", []):
+        source_properties = _scoped(relationship.get("source_properties") or {}, source_doc_id)
+        target_properties = _scoped(relationship.get("target_properties") or {}, source_doc_id)
+        key = (
+            node_identity(relationship["source"], source_properties, ids),
+            relationship["relationship"],
+            node_identity(relationship["target"], target_properties, ids),
+        )
+        if key in wanted:
+            continue
+        wanted.add(key)
+        if key in existing_relationships:
+            skipped_relationships += 1
+            continue
+        relationship_inserts.append({
+            **relationship,
+            "source_properties": source_properties,
+            "target_properties": target_properties,
+        })
+    relationship_deletes = [rel_id for key, rel_id in existing_relationships.items() if key not in wanted]
+
+    return {
+        "node_upserts": upserts,
+        "node_inserts": inserts,
+        "node_deletes": node_deletes,
+        "relationship_inserts": relationship_inserts,
+        "relationship_deletes": relationship_deletes,
+        "counts": {
+            "nodes_inserted": sum(len(rows) for rows in upserts.values()) - updated + len(inserts),
+            "nodes_updated": updated,
+            "nodes_deleted": len(node_deletes),
+            "nodes_skipped": skipped_nodes,
+            "relationships_inserted": len(relationship_inserts),
+            "relationships_deleted": len(relationship_deletes),
+            "relationships_skipped": skipped_relationships,
+        },
+    }
+
+
+def apply_diff(diff: dict, batch_size: int = DEFAULT_BATCH_SIZE) -> list:
+    """
+    Writes a diff as batched statements: relationship deletes, node deletes, node upserts and
+    inserts, then relationship inserts.
+    """
+    queries: dict = {}
+    groups: dict = {}
+    if diff["relationship_deletes"]:
+        queries["delete_relationships"] = ("delete relationships", DELETE_RELATIONSHIPS_QUERY)
+        groups["delete_relationships"] = diff["relationship_deletes"]
+    if diff["node_deletes"]:
+        queries["delete_nodes"] = ("delete nodes", DELETE_NODES_QUERY)
+        groups["delete_nodes"] = diff["node_deletes"]
+    for (label, keys), rows in diff["node_upserts"].items():
+        queries[("upsert", label, keys)] = (label, build_unwind_upsert_query(label, keys))
+        groups[("upsert", label, keys)] = rows
+    for entity in diff["node_inserts"]:
+        properties = entity["properties"]
+        key = ("insert", entity["type"], tuple(sorted(properties)))
+        queries[key] = (entity["type"], build_unwind_node_query(entity["type"], key[2]))
+        groups.setdefault(key, []).append(properties)
+    for key, rows in group_relationships(diff["relationship_inserts"]).items():
+        queries[key] = ("-".join(key[:3]), build_unwind_relationship_query(*key))
+        groups[key] = rows
+    return _write_groups(queries, groups, batch_size)
+
+
+def load_incremental(db_objects: dict, source_doc_id: Optional[str] = None, batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    """
+    Re-ingests one document by diffing the payload against what is already stored under
+    source_doc_id and writing only the changes. When source_doc_id is omitted, every
+    document id found in the payload's entities is processed in turn.
+    """
+    ids = identifier_keys()
+    if source_doc_id is None:
+        doc_ids = sorted({
+            entity["properties"][DOC_KEY]
+            for entity in db_objects.get("entities", [])
+            if (entity.get("properties") or {}).get(DOC_KEY) is not None
+        })
+    else:
+        doc_ids = [source_doc_id]
+    labels = set(load_entity_types()) | {entity["type"] for entity in db_objects.get("entities", [])}
+    documents = {}
+    with graph_session():
+        for doc_id in doc_ids:
+            nodes, relationships = fetch_document(doc_id, labels)
+            diff = diff_document(db_objects, doc_id, nodes, relationships, ids)
+            documents[doc_id] = {"counts": diff["counts"], "batches": apply_diff(diff, batch_size=batch_size)}
+    return documents
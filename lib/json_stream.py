@@ -0,0 +1,232 @@
+import json
+import re
+from typing import Any, Iterable, Iterator, Optional
+
+_OPENERS = re.compile(r"[{\[]")
+_TOKEN = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\]"]', re.DOTALL)
+_ROOT_GAP = re.compile(r"(?:[\s,:0-9.+\-eE]+|true|false|null)*")
+# The same at the end of a chunk, where a literal may continue in the next one.
+_OPEN_ROOT_GAP = re.compile(r"(?:[\s,:0-9.+\-eE]+|true|false|null)*(t|tr|tru|f|fa|fal|fals|n|nu|nul)?")
+_STRING_END = re.compile(r'["\\]')
+_CLOSERS = {"}": "{", "]": "["}
+
+
+class _Segment:
+    """
+    Collects the text of one span that may cross chunk boundaries without re-joining the
+    whole stream.
+    """
+
+    __slots__ = ("parts", "start")
+
+    def __init__(self, start: int):
+        self.parts: list[str] = []
+        self.start = start
+
+    def close(self, chunk: str, end: int) -> str:
+        return "".join([*self.parts, chunk[self.start:end]])
+
+    def carry(self, chunk: str) -> None:
+        self.parts.append(chunk[self.start:])
+        self.start = 0
+
+
+class JsonStreamExtractor:
+    """
+    Single-pass, bracket- and string-aware scanner for the first complete JSON object or
+    array in a stream of text chunks.
+
+    feed() can be called with arbitrarily split chunks. When item_keys is given, elements of
+    top-level arrays under those keys (e.g. "entities", "relationships") are decoded and
+    returned from feed() as soon as each one closes, before the enclosing object is complete.
+
+    A candidate is dropped as soon as its top level holds something other than JSON
+    punctuation, numbers and the literals true, false and null (prose such as "{see note 3}"
+    or an unclosed "in view {"), when an object holds a nested value without a key, when its
+    brackets do not match, when it balances but does not decode, or when the stream ends
+    before it closes (see finish). Scanning then resumes at the next opening bracket after
+    the candidate's own, as a raw_decode scan from each bracket would, so "[see {...}]" and
+    'x {: ["P-1"] {y' still find the inner value. Well-formed output is examined once.
+    """
+
+    def __init__(self, item_keys: Iterable[str] = ()):
+        self.item_keys = set(item_keys)
+        self.result: Any = None
+        self.done = False
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escape = False
+        self._capture: Optional[_Segment] = None
+        self._item: Optional[_Segment] = None
+        self._item_key: Optional[str] = None
+        self._string: Optional[_Segment] = None
+        self._last_key: Optional[str] = None
+        self._after_colon = False
+        self._gap_tail = ""
+
+    def _reset_capture(self) -> None:
+        self._in_string = False
+        self._escape = False
+        self._stack = []
+        self._capture = None
+        self._item = None
+        self._item_key = None
+        self._string = None
+        self._last_key = None
+        self._after_colon = False
+        self._gap_tail = ""
+
+    def feed(self, chunk: str) -> list[tuple[str, Any]]:
+        items: list[tuple[str, Any]] = []
+        if self.done or not chunk:
+            return items
+        pos = 0
+        length = len(chunk)
+        while pos < length and not self.done:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    pos += 1
+                    continue
+                match = _STRING_END.search(chunk, pos)
+                if match is None:
+                    pos = length
+                    break
+                pos = match.end()
+                if match.group() == "\\":
+                    self._escape = True
+                    continue
+                self._in_string = False
+                if self._string is not None:
+                    self._last_key = self._string.close(chunk, pos - 1)
+                    self._string = None
+                continue
+
+            if not self._stack:
+                match = _OPENERS.search(chunk, pos)
+                if match is None:
+                    pos = length
+                    break
+                self._capture = _Segment(match.start())
+                self._stack.append(match.group())
+                pos = match.end()
+                continue
+
+            match = _TOKEN.search(chunk, pos)
+            depth = len(self._stack)
+            if depth == 1:
+                gap_end = match.start() if match else length
+                gap = self._gap_tail + chunk[pos:gap_end] if self._gap_tail else chunk
+                start, end = (0, len(gap)) if self._gap_tail else (pos, gap_end)
+                checked = (_ROOT_GAP if match is not None else _OPEN_ROOT_GAP).fullmatch(gap, start, end)
+                if checked is None:
+                    pos = self._drop(chunk, pos, items)
+                    continue
+                self._gap_tail = (checked.group(1) or "") if match is None else ""
+                after_colon = self._after_colon or ":" in chunk[pos:gap_end]
+                self._after_colon = after_colon and match is None
+                if match is not None and match.group() in "{[" and self._stack[0] == "{" and not after_colon:
+                    # A nested value without a key: the root was prose.
+                    pos = self._drop(chunk, match.start(), items)
+                    continue
+            if match is None:
+                pos = length
+                break
+            char = match.group()
+            pos = match.end()
+            if len(char) > 1:
+                if depth == 1:
+                    self._last_key = char[1:-1]
+                continue
+            if char == '"':
+                self._in_string = True
+                if depth == 1:
+                    self._string = _Segment(pos)
+                continue
+            if char in "{[":
+                if depth == 1 and char == "[" and self._last_key in self.item_keys:
+                    self._item_key = self._last_key
+                elif depth == 2 and self._item_key is not None:
+                    self._item = _Segment(match.start())
+                self._stack.append(char)
+                continue
+            if self._stack[-1] != _CLOSERS[char]:
+                pos = self._drop(chunk, pos, items)
+                continue
+            self._stack.pop()
+            if depth == 3 and self._item is not None:
+                try:
+                    items.append((self._item_key, json.loads(self._item.close(chunk, pos))))
+                except json.JSONDecodeError:
+                    pass
+                self._item = None
+            elif depth == 2:
+                self._item_key = None
+            elif depth == 1:
+                try:
+                    self.result = json.loads(self._capture.close(chunk, pos))
+                except json.JSONDecodeError:
+                    pos = self._drop(chunk, pos, items)
+                else:
+                    self.done = True
+                    self._reset_capture()
+
+        if not self.done:
+            for segment in (self._capture, self._item, self._string):
+                if segment is not None:
+                    segment.carry(chunk)
+        return items
+
+    def _drop(self, chunk: str, pos: int, items: list) -> int:
+        """
+        Drops the current candidate, which ends at pos, and returns where to resume in chunk:
+        at the next opening bracket after the candidate's own. Text carried from earlier
+        chunks is fed again from its next bracket first, without joining it to chunk; items
+        that completes are added to items.
+        """
+        capture = self._capture
+        self._reset_capture()
+        if capture.parts:
+            carried = "".join(capture.parts)
+            match = _OPENERS.search(carried, 1)
+            if match is not None:
+                items.extend(self.feed(carried[match.start():]))
+                return 0
+            start = 0
+        else:
+            start = capture.start + 1
+        match = _OPENERS.search(chunk, start, pos)
+        return match.start() if match is not None else pos
+
+    def finish(self) -> list[tuple[str, Any]]:
+        """
+        Ends the stream. A candidate that never closed is dropped and the text after its
+        opening bracket is scanned again; returns any items that completes.
+        """
+        items: list[tuple[str, Any]] = []
+        while not self.done and self._capture is not None:
+            self._drop("", 0, items)
+        return items
+
+
+def extract_first_json(chunks: Iterable[str]) -> Optional[Any]:
+    extractor = JsonStreamExtractor()
+    for chunk in chunks:
+        extractor.feed(chunk)
+        if extractor.done:
+            return extractor.result
+    extractor.finish()
+    return extractor.result
+
+
+def iter_json_items(chunks: Iterable[str], item_keys: Iterable[str] = ("entities", "relationships")) -> Iterator[tuple[str, Any]]:
+    """
+    Yields (key, item) pairs from the first JSON object in a chunk stream as each item
+    completes.
+    """
+    extractor = JsonStreamExtractor(item_keys=item_keys)
+    for chunk in chunks:
+        yield from extractor.feed(chunk)
+        if extractor.done:
+            return
+    yield from extractor.finish()
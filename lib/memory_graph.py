@@ -0,0 +1,1316 @@
+import operator
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from lib.db import COUNTER_KEYS, STATEMENT_CACHE_SIZE, GraphBackend
+
+
+class UnsupportedCypher(ValueError):
+    """
+    Raised for Cypher outside the subset MemoryGraph understands.
+    """
+
+
+class Node:
+    __slots__ = ("id", "labels", "properties", "out", "inc")
+
+    def __init__(self, node_id: int, labels: tuple, properties: dict):
+        self.id = node_id
+        self.labels = labels
+        self.properties = properties
+        self.out: list = []
+        self.inc: list = []
+
+
+class Edge:
+    __slots__ = ("id", "type", "source", "target", "properties")
+
+    def __init__(self, edge_id: int, edge_type: str, source: Node, target: Node, properties: dict):
+        self.id = edge_id
+        self.type = edge_type
+        self.source = source
+        self.target = target
+        self.properties = properties
+
+
+def _hashable(value: Any) -> Any:
+    if isinstance(value, list):
+        return tuple(_hashable(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _hashable(item)) for key, item in value.items()))
+    if isinstance(value, (Node, Edge)):
+        return (type(value).__name__, value.id)
+    return value
+
+
+def _export(value: Any) -> Any:
+    """
+    Converts nodes and edges the way neo4j's Record.data() does: a node becomes its
+    property dict, a relationship (start properties, type, end properties).
+    """
+    if isinstance(value, Node):
+        return dict(value.properties)
+    if isinstance(value, Edge):
+        return (dict(value.source.properties), value.type, dict(value.target.properties))
+    if isinstance(value, list):
+        return [_export(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _export(item) for key, item in value.items()}
+    return value
+
+
+def _element_id(value: Any) -> Optional[str]:
+    if isinstance(value, Node):
+        return f"n{value.id}"
+    if isinstance(value, Edge):
+        return f"e{value.id}"
+    return None
+
+
+_TOKEN = re.compile(
+    r"(?P<skip>\s+|//[^\n]*|/\*.*?\*/)"
+    r"|(?P<string>'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")"
+    r"|(?P<number>\d+\.\d+(?:[eE][-+]?\d+)?|\d+(?:[eE][-+]?\d+)?)"
+    r"|(?P<param>\$\w+)"
+    r"|(?P<quoted>`(?:[^`]|``)*`)"
+    r"|(?P<word>[A-Za-z_]\w*)"
+    r"|(?P<op><>|<=|>=|=~|\+=|\.\.|[-+*/%=<>(){}\[\],.:|;])",
+    re.DOTALL,
+)
+_ESCAPE = re.compile(r"\\(.)")
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r"}
+_END = ("end", None, -1, -1)
+_CLAUSE_WORDS = {
+    "MATCH", "OPTIONAL", "WHERE", "RETURN", "WITH", "UNWIND", "MERGE", "CREATE", "SET", "DELETE",
+    "DETACH", "REMOVE", "ORDER", "SKIP", "LIMIT", "ON", "AS", "UNION", "CALL",
+}
+_SCHEMA_WORDS = {"INDEX", "CONSTRAINT", "FULLTEXT", "RANGE", "TEXT", "POINT", "LOOKUP", "VECTOR", "DATABASE"}
+_UNSUPPORTED_CLAUSES = {
+    "CALL": "CALL subqueries or procedures",
+    "FOREACH": "FOREACH",
+    "LOAD": "LOAD CSV",
+    "USE": "USE",
+    "SHOW": "SHOW commands",
+    "DROP": "index and constraint commands",
+    "EXPLAIN": "EXPLAIN",
+    "PROFILE": "PROFILE",
+    "FINISH": "FINISH",
+}
+AGGREGATES = {"count", "collect", "sum", "avg", "min", "max"}
+_COMPARISONS = {
+    "=": operator.eq,
+    "<>": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def _tokenize(text: str) -> list[tuple]:
+    tokens = []
+    position = 0
+    for match in _TOKEN.finditer(text):
+        if match.start() != position:
+            break
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group()
+        if kind == "skip":
+            continue
+        if kind == "string":
+            value = _ESCAPE.sub(lambda escape: _ESCAPES.get(escape.group(1), escape.group(1)), value[1:-1])
+        elif kind == "number":
+            value = float(value) if any(char in value for char in ".eE") else int(value)
+        elif kind == "param":
+            value = value[1:]
+        elif kind == "quoted":
+            kind, value = "name", value[1:-1].replace("``", "`")
+        tokens.append((kind, value, match.start(), match.end()))
+    if position != len(text):
+        raise UnsupportedCypher(f"unexpected character {text[position]!r} at {position}")
+    return tokens
+
+
+def _truth(value: Any) -> Optional[bool]:
+    return None if value is None else bool(value)
+
+
+def _and(left: Any, right: Any) -> Optional[bool]:
+    left, right = _truth(left), _truth(right)
+    if left is False or right is False:
+        return False
+    return None if left is None or right is None else True
+
+
+def _or(left: Any, right: Any) -> Optional[bool]:
+    left, right = _truth(left), _truth(right)
+    if left is True or right is True:
+        return True
+    return None if left is None or right is None else False
+
+
+def _compare(op: Callable, left: Any, right: Any) -> Optional[bool]:
+    if left is None or right is None:
+        return None
+    try:
+        return op(left, right)
+    except TypeError:
+        return None
+
+
+def _strings(op: Callable, left: Any, right: Any) -> Optional[bool]:
+    if not isinstance(left, str) or not isinstance(right, str):
+        return None
+    return op(left, right)
+
+
+def _arithmetic(op: Callable, left: Any, right: Any) -> Any:
+    if left is None or right is None:
+        return None
+    if op is operator.add and isinstance(left, str) != isinstance(right, str) and not isinstance(left, list):
+        return str(left) + str(right)
+    if op is operator.truediv and isinstance(left, int) and isinstance(right, int):
+        return int(left / right)
+    return op(left, right)
+
+
+def _property(value: Any, key: str) -> Any:
+    if isinstance(value, (Node, Edge)):
+        return value.properties.get(key)
+    if isinstance(value, dict):
+        return value.get(key)
+    if value is None:
+        return None
+    raise UnsupportedCypher(f"cannot read property {key!r} of {type(value).__name__}")
+
+
+def _has_labels(value: Any, labels: tuple) -> Optional[bool]:
+    if value is None:
+        return None
+    if not isinstance(value, Node):
+        raise UnsupportedCypher("label predicates need a node")
+    return all(label in value.labels for label in labels)
+
+
+def _to_number(cast: Callable) -> Callable:
+    def convert(value: Any) -> Any:
+        if value is None:
+            return None
+        try:
+            return cast(float(value)) if cast is int else cast(value)
+        except (TypeError, ValueError):
+            return None
+    return convert
+
+
+def _none_safe(fn: Callable) -> Callable:
+    return lambda value: None if value is None else fn(value)
+
+
+FUNCTIONS: dict[str, Callable] = {
+    "labels": lambda value: list(value.labels) if isinstance(value, Node) else None,
+    "type": lambda value: value.type if isinstance(value, Edge) else None,
+    "properties": lambda value: dict(value.properties) if isinstance(value, (Node, Edge)) else value,
+    "elementid": _element_id,
+    "id": lambda value: value.id if isinstance(value, (Node, Edge)) else None,
+    "keys": lambda value: list(value.properties) if isinstance(value, (Node, Edge)) else list(value or {}),
+    "startnode": lambda value: value.source if isinstance(value, Edge) else None,
+    "endnode": lambda value: value.target if isinstance(value, Edge) else None,
+    "tolower": _none_safe(lambda value: str(value).lower()),
+    "toupper": _none_safe(lambda value: str(value).upper()),
+    "trim": _none_safe(lambda value: str(value).strip()),
+    "tostring": _none_safe(str),
+    "tointeger": _to_number(int),
+    "tofloat": _to_number(float),
+    "size": _none_safe(len),
+    "abs": _none_safe(abs),
+    "head": lambda value: value[0] if value else None,
+    "last": lambda value: value[-1] if value else None,
+    "exists": lambda value: value is not None,
+}
+
+
+class _Context:
+    def __init__(self, graph: "MemoryGraph", parameters: dict):
+        self.graph = graph
+        self.parameters = parameters
+        self.counters = dict.fromkeys(COUNTER_KEYS, 0)
+        self.wrote = False
+        self.columns: list[str] = []
+
+    def count(self, key: str, amount: int = 1) -> None:
+        if amount:
+            self.counters[key] += amount
+            self.wrote = True
+
+
+class _Parser:
+    """
+    Recursive-descent parser that compiles one Cypher statement into closures. Expressions
+    become fn(row, ctx) -> value and clauses become fn(rows, ctx) -> rows.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.pos = 0
+
+    def peek(self, offset: int = 0) -> tuple:
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else _END
+
+    def is_op(self, value: str, offset: int = 0) -> bool:
+        token = self.peek(offset)
+        return token[0] == "op" and token[1] == value
+
+    def is_word(self, word: str, offset: int = 0) -> bool:
+        token = self.peek(offset)
+        return token[0] == "word" and token[1].upper() == word
+
+    def accept(self, value: str) -> bool:
+        if self.is_op(value):
+            self.pos += 1
+            return True
+        return False
+
+    def expect(self, value: str) -> None:
+        if not self.accept(value):
+            self.fail(f"expected {value!r}")
+
+    def keyword(self, *words: str) -> bool:
+        if all(self.is_word(word, offset) for offset, word in enumerate(words)):
+            self.pos += len(words)
+            return True
+        return False
+
+    def expect_keyword(self, *words: str) -> None:
+        if not self.keyword(*words):
+            self.fail(f"expected {' '.join(words)}")
+
+    def name(self) -> str:
+        kind, value, _, _ = self.peek()
+        if kind in ("word", "name"):
+            self.pos += 1
+            return value
+        self.fail("expected a name")
+
+    def fail(self, message: str):
+        kind, value, start, _ = self.peek()
+        where = f"at {start}" if start >= 0 else "at end"
+        raise UnsupportedCypher(f"{message} {where} (got {value!r}) in: {self.text}")
+
+    def unsupported(self, feature: str):
+        start = self.peek()[2]
+        where = f"at {start}" if start >= 0 else "at end"
+        raise UnsupportedCypher(f"MemoryGraph does not support {feature} ({where}) in: {self.text}")
+
+    def at_pattern(self) -> bool:
+        """
+        True when the tokens from here read as a node pattern followed by a relationship,
+        "(a)-[...]->" or "(a)<-", rather than a parenthesized expression.
+        """
+        if not self.is_op("("):
+            return False
+        depth = 0
+        index = self.pos
+        while index < len(self.tokens):
+            kind, value, _, _ = self.tokens[index]
+            if kind == "op" and value in "()":
+                depth += 1 if value == "(" else -1
+                if depth == 0:
+                    break
+            index += 1
+        following = [self.peek(index + offset - self.pos) for offset in (1, 2)]
+        if following[0][:2] == ("op", "<"):
+            return following[1][:2] == ("op", "-")
+        return following[0][:2] == ("op", "-") and following[1][0] == "op" and following[1][1] in ("[", "-", ">")
+
+    # Statement
+
+    def statement(self) -> Callable:
+        parts = [self.single_query()]
+        deduplicate = False
+        while self.keyword("UNION"):
+            deduplicate |= not self.keyword("ALL")
+            parts.append(self.single_query())
+        self.accept(";")
+        if self.peek() is not _END:
+            self.fail("unexpected trailing input")
+        if len(parts) == 1:
+            return parts[0][0]
+        if not all(returns for _, returns in parts):
+            self.fail("every part of a UNION must end with RETURN")
+
+        def run(ctx: _Context) -> list[dict]:
+            records = []
+            columns = None
+            for part, _ in parts:
+                records.extend(part(ctx))
+                if columns is not None and ctx.columns != columns:
+                    raise UnsupportedCypher("every part of a UNION must return the same columns")
+                columns = ctx.columns
+            if deduplicate:
+                seen = set()
+                records = [record for record in records if not (_hashable(record) in seen or seen.add(_hashable(record)))]
+            return records
+        return run
+
+    def single_query(self) -> tuple[Callable, bool]:
+        """
+        The clauses up to UNION or the end of the statement, and whether they end in RETURN.
+        """
+        clauses = []
+        returns = False
+        while self.peek() is not _END and not self.is_op(";") and not self.is_word("UNION"):
+            if returns:
+                self.fail("clause after RETURN")
+            if self.keyword("UNWIND"):
+                clauses.append(self.unwind())
+            elif self.keyword("OPTIONAL", "MATCH"):
+                clauses.append(self.match(optional=True))
+            elif self.keyword("MATCH"):
+                clauses.append(self.match(optional=False))
+            elif self.keyword("MERGE"):
+                clauses.append(self.merge())
+            elif self.is_word("CREATE") and self.peek(1)[0] == "word" and self.peek(1)[1].upper() in _SCHEMA_WORDS:
+                self.unsupported("index and constraint commands")
+            elif self.keyword("CREATE"):
+                clauses.append(self.create())
+            elif self.keyword("SET"):
+                clauses.append(self.set_clause())
+            elif self.keyword("REMOVE"):
+                clauses.append(self.remove())
+            elif self.keyword("DETACH", "DELETE"):
+                clauses.append(self.delete(detach=True))
+            elif self.keyword("DELETE"):
+                clauses.append(self.delete(detach=False))
+            elif self.keyword("WITH"):
+                clauses.append(self.projection(final=False))
+            elif self.keyword("RETURN"):
+                clauses.append(self.projection(final=True))
+                returns = True
+            elif self.peek()[0] == "word" and self.peek()[1].upper() in _UNSUPPORTED_CLAUSES:
+                self.unsupported(_UNSUPPORTED_CLAUSES[self.peek()[1].upper()])
+            else:
+                self.fail("unsupported clause")
+
+        def run(ctx: _Context) -> list[dict]:
+            rows: list[dict] = [{}]
+            for clause in clauses:
+                rows = clause(rows, ctx)
+            return [{key: _export(value) for key, value in row.items()} for row in rows] if returns else []
+        return run, returns
+
+    def unwind(self) -> Callable:
+        source = self.expression()
+        self.expect_keyword("AS")
+        name = self.name()
+
+        def run(rows: list[dict], ctx: _Context) -> list[dict]:
+            out = []
+            for row in rows:
+                values = source(row, ctx)
+                if values is None:
+                    continue
+                for value in values if isinstance(values, list) else [values]:
+                    out.append({**row, name: value})
+            return out
+        return run
+
+    def match(self, optional: bool) -> Callable:
+        patterns = [self.pattern()]
+        while self.accept(","):
+            patterns.append(self.pattern())
+        where = self.expression() if self.keyword("WHERE") else None
+        names = [spec["var"] for pattern in patterns for spec in pattern if spec["var"]]
+
+        def run(rows: list[dict], ctx: _Context) -> list[dict]:
+            out = []
+            for row in rows:
+                matches = [row]
+                for pattern in patterns:
+                    matches = [found for partial in matches for found in _match_pattern(pattern, partial, ctx)]
+                if where is not None:
+                    matches = [found for found in matches if where(found, ctx) is True]
+                if optional and not matches:
+                    matches = [{**row, **{name: None for name in names if name not in row}}]
+                out.extend(matches)
+            return out
+        return run
+
+    def merge(self) -> Callable:
+        pattern = self.pattern()
+        on_create: list = []
+        on_match: list = []
+        while self.keyword("ON"):
+            if self.keyword("CREATE", "SET"):
+                on_create.extend(self.set_items())
+            else:
+                self.expect_keyword("MATCH", "SET")
+                on_match.extend(self.set_items())
+
+        def run(rows: list[dict], ctx: _Context) -> list[dict]:
+            out = []
+            for row in rows:
+                matches = list(_match_pattern(pattern, row, ctx))
+                if matches:
+                    for found in matches:
+                        _apply_set(on_match, found, ctx)
+                    out.extend(matches)
+                else:
+                    created = _create_pattern(pattern, row, ctx)
+                    _apply_set(on_create, created, ctx)
+                    out.append(created)
+            return out
+        return run
+
+    def create(self) -> Callable:
+        patterns = [self.pattern()]
+        while self.accept(","):
+            patterns.append(self.pattern())
+
+        def run(rows: list[dict], ctx: _Context) -> list[dict]:
+            out = []
+            for row in rows:
+                for pattern in patterns:
+                    row = _create_pattern(pattern, row, ctx)
+                out.append(row)
+            return out
+        return run
+
+    def set_items(self) -> list:
+        items = [self.set_item()]
+        while self.accept(","):
+            items.append(self.set_item())
+        return items
+
+    def set_item(self) -> tuple:
+        var = self.name()
+        if self.accept("."):
+            key = self.name()
+            self.expect("=")
+            return ("property", var, key, self.expression())
+        if self.accept(":"):
+            labels = [self.name()]
+            while self.accept(":"):
+                labels.append(self.name())
+            return ("labels", var, tuple(labels), None)
+        if self.accept("+="):
+            return ("merge", var, None, self.expression())
+        self.expect("=")
+        return ("replace", var, None, self.expression())
+
+    def set_clause(self) -> Callable:
+        items = self.set_items()
+
+        def run(rows: list[dict], ctx: _Context) -> list[dict]:
+            for row in rows:
+                _apply_set(items, row, ctx)
+            return rows
+        return run
+
+    def remove(self) -> Callable:
+        items = []
+        while True:
+            var = self.name()
+            self.expect(".")
+            items.append(("property", var, self.name(), lambda row, ctx: None))
+            if not self.accept(","):
+                break
+
+        def run(rows: list[dict], ctx: _Context) -> list[dict]:
+            for row in rows:
+                _apply_set(items, row, ctx)
+            return rows
+        return run
+
+    def delete(self, detach: bool) -> Callable:
+        targets = [self.expression()]
+        while self.accept(","):
+            targets.append(self.expression())
+
+        def run(rows: list[dict], ctx: _Context) -> list[dict]:
+            for row in rows:
+                for target in targets:
+                    value = target(row, ctx)
+                    if isinstance(value, Edge):
+                        ctx.graph._delete_edge(value, ctx)
+                    elif isinstance(value, Node):
+                        ctx.graph._delete_node(value, detach, ctx)
+                    elif value is not None:
+                        raise UnsupportedCypher("DELETE expects a node or relationship")
+            return rows
+        return run
+
+    # Projection
+
+    def projection(self, final: bool) -> Callable:
+        distinct = self.keyword("DISTINCT")
+        items = []
+        star = self.accept("*")
+        if not star or self.accept(","):
+            while True:
+                start = self.peek()[2]
+                aggregate = self.aggregate()
+                expression = None if aggregate else self.expression()
+                end = self.tokens[self.pos - 1][3]
+                alias = self.name() if self.keyword("AS") else self.text[start:end]
+                items.append((alias, expression, aggregate))
+                if not self.accept(","):
+                    break
+        order = []
+        if self.keyword("ORDER", "BY"):
+            while True:
+                expression = self.expression()
+                descending = self.keyword("DESC") or self.keyword("DESCENDING")
+                if not descending:
+                    self.keyword("ASC") or self.keyword("ASCENDING")
+                order.append((expression, descending))
+                if not self.accept(","):
+                    break
+        skip = self.expression() if self.keyword("SKIP") else None
+        limit = self.expression() if self.keyword("LIMIT") else None
+        where = self.expression() if not final and self.keyword("WHERE") else None
+        grouped = any(aggregate for _, _, aggregate in items)
+
+        def run(rows: list[dict], ctx: _Context) -> list[dict]:
+            if grouped:
+                projected = _aggregate(items, rows, ctx)
+                pairs = [(row, row) for row in projected]
+            else:
+                pairs = []
+                for row in rows:
+                    values = dict(row) if star else {}
+                    for alias, expression, _ in items:
+                        values[alias] = expression(row, ctx)
+                    pairs.append((values, {**row, **values}))
+            if distinct:
+                seen = set()
+                unique = []
+                for values, scope in pairs:
+                    key = _hashable(values)
+                    if key not in seen:
+                        seen.add(key)
+                        unique.append((values, scope))
+                pairs = unique
+            for expression, descending in reversed(order):
+                pairs.sort(key=lambda pair: _sort_key(expression(pair[1], ctx), descending))
+            start = skip(None, ctx) if skip else 0
+            stop = start + limit(None, ctx) if limit else None
+            projected = [values for values, _ in pairs[start:stop]]
+            if where is not None:
+                projected = [values for values in projected if where(values, ctx) is True]
+            if final:
+                ctx.columns = [alias for alias, _, _ in items]
+            return projected
+        return run
+
+    def _at_clause(self) -> bool:
+        token = self.peek()
+        return token is _END or token[0] == "word" and token[1].upper() in _CLAUSE_WORDS
+
+    def aggregate(self) -> Optional[tuple]:
+        kind, value, _, _ = self.peek()
+        if kind != "word" or value.lower() not in AGGREGATES or not self.is_op("(", 1):
+            return None
+        self.pos += 2
+        distinct = self.keyword("DISTINCT")
+        argument = None if self.accept("*") else self.expression()
+        self.expect(")")
+        if not (self._at_clause() or self.is_op(",") or self.is_word("AS")):
+            self.unsupported("aggregates inside expressions (only whole projection items)")
+        return value.lower(), argument, distinct
+
+    # Patterns
+
+    def pattern(self) -> list[dict]:
+        if self.peek()[0] in ("word", "name") and self.is_op("=", 1):
+            self.unsupported("path variables")
+        pattern = [self.node_pattern()]
+        while self.is_op("-") or self.is_op("<"):
+            pattern.append(self.relationship_pattern())
+            pattern.append(self.node_pattern())
+        return pattern
+
+    def _var_labels_props(self, closing: str) -> tuple:
+        var = None
+        if self.peek()[0] in ("word", "name"):
+            var = self.name()
+        labels = []
+        if self.accept(":"):
+            labels.append(self.name())
+            while self.accept(":") or self.accept("|"):
+                self.accept(":")
+                labels.append(self.name())
+        if self.is_op("*"):
+            self.unsupported("variable-length relationships")
+        properties = self.map_items() if self.is_op("{") else []
+        self.expect(closing)
+        return var, tuple(labels), properties
+
+    def node_pattern(self) -> dict:
+        self.expect("(")
+        var, labels, properties = self._var_labels_props(")")
+        return {"var": var, "labels": labels, "properties": properties}
+
+    def relationship_pattern(self) -> dict:
+        incoming = self.accept("<")
+        self.expect("-")
+        var, types, properties = None, (), []
+        if self.accept("["):
+            var, types, properties = self._var_labels_props("]")
+        self.expect("-")
+        outgoing = self.accept(">")
+        direction = "out" if outgoing and not incoming else "in" if incoming and not outgoing else "both"
+        return {"var": var, "types": types, "properties": properties, "direction": direction}
+
+    def map_items(self) -> list[tuple]:
+        self.expect("{")
+        items = []
+        if not self.accept("}"):
+            while True:
+                kind, value, _, _ = self.peek()
+                if kind == "string":
+                    self.pos += 1
+                    key = value
+                else:
+                    key = self.name()
+                self.expect(":")
+                items.append((key, self.expression()))
+                if not self.accept(","):
+                    break
+            self.expect("}")
+        return items
+
+    # Expressions
+
+    def expression(self) -> Callable:
+        left = self.xor_expression()
+        while self.keyword("OR"):
+            right = self.xor_expression()
+            left = (lambda a, b: lambda row, ctx: _or(a(row, ctx), b(row, ctx)))(left, right)
+        return left
+
+    def xor_expression(self) -> Callable:
+        left = self.and_expression()
+        while self.keyword("XOR"):
+            right = self.and_expression()
+
+            def xor(row, ctx, a=left, b=right):
+                x, y = _truth(a(row, ctx)), _truth(b(row, ctx))
+                return None if x is None or y is None else x != y
+            left = xor
+        return left
+
+    def and_expression(self) -> Callable:
+        left = self.not_expression()
+        while self.keyword("AND"):
+            right = self.not_expression()
+            left = (lambda a, b: lambda row, ctx: _and(a(row, ctx), b(row, ctx)))(left, right)
+        return left
+
+    def not_expression(self) -> Callable:
+        if self.keyword("NOT"):
+            inner = self.not_expression()
+
+            def negate(row, ctx):
+                value = _truth(inner(row, ctx))
+                return None if value is None else not value
+            return negate
+        return self.comparison()
+
+    def comparison(self) -> Callable:
+        left = self.additive()
+        while True:
+            token = self.peek()
+            if token[0] == "op" and token[1] in _COMPARISONS:
+                self.pos += 1
+                op, right = _COMPARISONS[token[1]], self.additive()
+                left = (lambda op, a, b: lambda row, ctx: _compare(op, a(row, ctx), b(row, ctx)))(op, left, right)
+            elif self.accept("=~"):
+                right = self.additive()
+                left = (lambda a, b: lambda row, ctx: _strings(
+                    lambda text, pattern: re.fullmatch(pattern, text) is not None, a(row, ctx), b(row, ctx)
+                ))(left, right)
+            elif self.keyword("IN"):
+                right = self.additive()
+
+                def contained(row, ctx, a=left, b=right):
+                    value, values = a(row, ctx), b(row, ctx)
+                    return None if value is None or values is None else value in values
+                left = contained
+            elif self.keyword("STARTS", "WITH"):
+                right = self.additive()
+                left = (lambda a, b: lambda row, ctx: _strings(str.startswith, a(row, ctx), b(row, ctx)))(left, right)
+            elif self.keyword("ENDS", "WITH"):
+                right = self.additive()
+                left = (lambda a, b: lambda row, ctx: _strings(str.endswith, a(row, ctx), b(row, ctx)))(left, right)
+            elif self.keyword("CONTAINS"):
+                right = self.additive()
+                left = (lambda a, b: lambda row, ctx: _strings(operator.contains, a(row, ctx), b(row, ctx)))(left, right)
+            elif self.keyword("IS", "NOT", "NULL"):
+                left = (lambda a: lambda row, ctx: a(row, ctx) is not None)(left)
+            elif self.keyword("IS", "NULL"):
+                left = (lambda a: lambda row, ctx: a(row, ctx) is None)(left)
+            else:
+                return left
+
+    def additive(self) -> Callable:
+        left = self.multiplicative()
+        while self.is_op("+") or self.is_op("-"):
+            op = operator.add if self.peek()[1] == "+" else operator.sub
+            self.pos += 1
+            right = self.multiplicative()
+            left = (lambda op, a, b: lambda row, ctx: _arithmetic(op, a(row, ctx), b(row, ctx)))(op, left, right)
+        return left
+
+    def multiplicative(self) -> Callable:
+        left = self.unary()
+        ops = {"*": operator.mul, "/": operator.truediv, "%": operator.mod}
+        while self.peek()[0] == "op" and self.peek()[1] in ops:
+            op = ops[self.peek()[1]]
+            self.pos += 1
+            right = self.unary()
+            left = (lambda op, a, b: lambda row, ctx: _arithmetic(op, a(row, ctx), b(row, ctx)))(op, left, right)
+        return left
+
+    def unary(self) -> Callable:
+        if self.accept("-"):
+            inner = self.unary()
+            return lambda row, ctx: None if (value := inner(row, ctx)) is None else -value
+        self.accept("+")
+        return self.postfix()
+
+    def postfix(self) -> Callable:
+        value = self.atom()
+        while True:
+            if self.is_op(":"):
+                labels = []
+                while self.accept(":"):
+                    labels.append(self.name())
+                value = (lambda inner, labels: lambda row, ctx: _has_labels(inner(row, ctx), labels))(value, tuple(labels))
+            elif self.is_op("{"):
+                self.unsupported("map projections")
+            elif self.accept("."):
+                key = self.name()
+                value = (lambda inner, key: lambda row, ctx: _property(inner(row, ctx), key))(value, key)
+            elif self.accept("["):
+                index = self.expression()
+                self.expect("]")
+
+                def subscript(row, ctx, inner=value, index=index):
+                    container, key = inner(row, ctx), index(row, ctx)
+                    if container is None or key is None:
+                        return None
+                    if isinstance(container, (Node, Edge, dict)):
+                        return _property(container, key)
+                    try:
+                        return container[key]
+                    except IndexError:
+                        return None
+                value = subscript
+            else:
+                return value
+
+    def atom(self) -> Callable:
+        kind, value, _, _ = self.peek()
+        if kind in ("string", "number"):
+            self.pos += 1
+            return lambda row, ctx: value
+        if kind == "param":
+            self.pos += 1
+            return lambda row, ctx: ctx.parameters.get(value)
+        if self.at_pattern():
+            self.unsupported("pattern predicates")
+        if self.accept("("):
+            inner = self.expression()
+            self.expect(")")
+            return inner
+        if self.accept("["):
+            if self.at_pattern():
+                self.unsupported("pattern comprehensions")
+            if self.peek()[0] in ("word", "name") and self.is_word("IN", 1):
+                return self.list_comprehension()
+            items = []
+            if not self.accept("]"):
+                items.append(self.expression())
+                while self.accept(","):
+                    items.append(self.expression())
+                self.expect("]")
+            return lambda row, ctx: [item(row, ctx) for item in items]
+        if self.is_op("{"):
+            entries = self.map_items()
+            return lambda row, ctx: {key: item(row, ctx) for key, item in entries}
+        if kind == "word":
+            upper = value.upper()
+            if upper in ("TRUE", "FALSE"):
+                self.pos += 1
+                return lambda row, ctx: upper == "TRUE"
+            if upper == "NULL":
+                self.pos += 1
+                return lambda row, ctx: None
+            if upper == "CASE":
+                self.pos += 1
+                return self.case()
+            if upper in ("EXISTS", "COUNT", "COLLECT") and self.is_op("{", 1):
+                self.unsupported(f"{upper} subqueries")
+            if upper in ("ALL", "ANY", "NONE", "SINGLE", "REDUCE") and self.is_op("(", 1):
+                self.unsupported(f"{upper.lower()}() list predicates")
+            if self.is_op("(", 1):
+                return self.function_call()
+        if kind in ("word", "name"):
+            self.pos += 1
+
+            def variable(row, ctx, name=value):
+                if name not in row:
+                    raise UnsupportedCypher(f"variable {name!r} is not defined")
+                return row[name]
+            return variable
+        self.fail("expected an expression")
+
+    def case(self) -> Callable:
+        subject = None if self.is_word("WHEN") else self.expression()
+        branches = []
+        while self.keyword("WHEN"):
+            condition = self.expression()
+            self.expect_keyword("THEN")
+            branches.append((condition, self.expression()))
+        if not branches:
+            self.fail("expected WHEN")
+        default = self.expression() if self.keyword("ELSE") else None
+        self.expect_keyword("END")
+
+        def run(row, ctx):
+            value = subject(row, ctx) if subject is not None else None
+            for condition, result in branches:
+                if subject is None:
+                    matched = condition(row, ctx) is True
+                else:
+                    matched = _compare(operator.eq, value, condition(row, ctx)) is True
+                if matched:
+                    return result(row, ctx)
+            return default(row, ctx) if default is not None else None
+        return run
+
+    def list_comprehension(self) -> Callable:
+        name = self.name()
+        self.expect_keyword("IN")
+        source = self.expression()
+        where = self.expression() if self.keyword("WHERE") else None
+        projection = self.expression() if self.accept("|") else None
+        self.expect("]")
+
+        def run(row, ctx):
+            values = source(row, ctx)
+            if values is None:
+                return None
+            out = []
+            for value in values:
+                scope = {**row, name: value}
+                if where is not None and where(scope, ctx) is not True:
+                    continue
+                out.append(projection(scope, ctx) if projection is not None else value)
+            return out
+        return run
+
+    def function_call(self) -> Callable:
+        name = self.name().lower()
+        self.expect("(")
+        if name in AGGREGATES:
+            self.unsupported("aggregates inside expressions (only whole projection items)")
+        arguments = []
+        if not self.accept(")"):
+            arguments.append(self.expression())
+            while self.accept(","):
+                arguments.append(self.expression())
+            self.expect(")")
+        if name == "coalesce":
+            def coalesce(row, ctx):
+                for argument in arguments:
+                    value = argument(row, ctx)
+                    if value is not None:
+                        return value
+                return None
+            return coalesce
+        if name not in FUNCTIONS or len(arguments) != 1:
+            self.unsupported(f"function {name}() with {len(arguments)} argument(s)")
+        fn, argument = FUNCTIONS[name], arguments[0]
+        return lambda row, ctx: fn(argument(row, ctx))
+
+
+def _sort_key(value: Any, descending: bool) -> tuple:
+    if value is None:
+        return (not descending, "", 0)
+    if isinstance(value, bool):
+        rank = "bool"
+    elif isinstance(value, (int, float)):
+        rank = "number"
+    else:
+        rank = type(value).__name__
+    if descending:
+        if rank == "number":
+            return (False, rank, -value)
+        return (False, rank, _Reversed(value))
+    return (False, rank, value)
+
+
+class _Reversed:
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __lt__(self, other: "_Reversed") -> bool:
+        return other.value < self.value
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Reversed) and other.value == self.value
+
+
+def _aggregate(items: list, rows: list[dict], ctx: _Context) -> list[dict]:
+    groups: OrderedDict = OrderedDict()
+    keys = [(alias, expression) for alias, expression, aggregate in items if not aggregate]
+    for row in rows:
+        values = {alias: expression(row, ctx) for alias, expression in keys}
+        group = groups.setdefault(_hashable(values), (values, {alias: [] for alias, _, aggregate in items if aggregate}))
+        for alias, _, aggregate in items:
+            if aggregate:
+                _, argument, _ = aggregate
+                group[1][alias].append(1 if argument is None else argument(row, ctx))
+    if not groups and not keys:
+        groups[()] = ({}, {alias: [] for alias, _, aggregate in items if aggregate})
+    out = []
+    for values, collected in groups.values():
+        row = dict(values)
+        for alias, _, aggregate in items:
+            if not aggregate:
+                continue
+            name, _, distinct = aggregate
+            present = [value for value in collected[alias] if value is not None]
+            if distinct:
+                seen = set()
+                present = [value for value in present if not (_hashable(value) in seen or seen.add(_hashable(value)))]
+            if name == "count":
+                row[alias] = len(present)
+            elif name == "collect":
+                row[alias] = present
+            elif not present:
+                row[alias] = 0 if name == "sum" else None
+            elif name == "sum":
+                row[alias] = sum(present)
+            elif name == "avg":
+                row[alias] = sum(present) / len(present)
+            else:
+                row[alias] = (min if name == "min" else max)(present)
+        out.append({alias: row[alias] for alias, _, _ in items})
+    return out
+
+
+def _evaluate_properties(spec: dict, row: dict, ctx: _Context) -> dict:
+    return {key: expression(row, ctx) for key, expression in spec["properties"]}
+
+
+def _node_matches(node: Node, spec: dict, wanted: dict, row: dict) -> bool:
+    if spec["var"] and spec["var"] in row and row[spec["var"]] is not node:
+        return False
+    if any(label not in node.labels for label in spec["labels"]):
+        return False
+    return all(value is not None and node.properties.get(key) == value for key, value in wanted.items())
+
+
+_REVERSED = {"out": "in", "in": "out", "both": "both"}
+
+
+def _reverse(pattern: list[dict]) -> list[dict]:
+    return [
+        {**spec, "direction": _REVERSED[spec["direction"]]} if index % 2 else spec
+        for index, spec in enumerate(reversed(pattern))
+    ]
+
+
+def _match_pattern(pattern: list[dict], row: dict, ctx: _Context) -> Iterator[dict]:
+    first, last = pattern[0], pattern[-1]
+    if len(pattern) > 1 and not (first["var"] and first["var"] in row) and last["var"] and isinstance(row.get(last["var"]), Node):
+        # (f:Feature)-[:HAS_DIMENSION]->(d) with d bound: walk from d instead of every Feature.
+        pattern = _reverse(pattern)
+        first = pattern[0]
+    wanted = _evaluate_properties(first, row, ctx)
+    bound = row.get(first["var"]) if first["var"] else None
+    if bound is not None:
+        candidates = [bound] if isinstance(bound, Node) else []
+    elif first["var"] and first["var"] in row:
+        candidates = []
+    else:
+        candidates = ctx.graph._candidates(first["labels"], wanted)
+    for node in candidates:
+        if _node_matches(node, first, wanted, row):
+            start = {**row, first["var"]: node} if first["var"] else row
+            yield from _extend(pattern, 1, node, start, (), ctx)
+
+
+def _extend(pattern: list[dict], index: int, node: Node, row: dict, used: tuple, ctx: _Context) -> Iterator[dict]:
+    if index >= len(pattern):
+        yield row
+        return
+    relationship, next_spec = pattern[index], pattern[index + 1]
+    relationship_wanted = _evaluate_properties(relationship, row, ctx)
+    node_wanted = _evaluate_properties(next_spec, row, ctx)
+    bound_edge = row.get(relationship["var"]) if relationship["var"] else None
+    bound_node = row.get(next_spec["var"]) if next_spec["var"] else None
+    steps = []
+    if relationship["direction"] in ("out", "both"):
+        if isinstance(bound_node, Node) and len(bound_node.inc) < len(node.out):
+            steps.extend((edge, bound_node) for edge in bound_node.inc if edge.source is node)
+        else:
+            steps.extend((edge, edge.target) for edge in node.out)
+    if relationship["direction"] in ("in", "both"):
+        if isinstance(bound_node, Node) and len(bound_node.out) < len(node.inc):
+            steps.extend((edge, bound_node) for edge in bound_node.out if edge.target is node)
+        else:
+            steps.extend((edge, edge.source) for edge in node.inc)
+    for edge, other in steps:
+        if edge.id in used or relationship["types"] and edge.type not in relationship["types"]:
+            continue
+        if relationship["var"] and relationship["var"] in row and bound_edge is not edge:
+            continue
+        if not all(value is not None and edge.properties.get(key) == value for key, value in relationship_wanted.items()):
+            continue
+        if not _node_matches(other, next_spec, node_wanted, row):
+            continue
+        extended = dict(row)
+        if relationship["var"]:
+            extended[relationship["var"]] = edge
+        if next_spec["var"]:
+            extended[next_spec["var"]] = other
+        yield from _extend(pattern, index + 2, other, extended, used + (edge.id,), ctx)
+
+
+def _create_pattern(pattern: list[dict], row: dict, ctx: _Context) -> dict:
+    row = dict(row)
+    nodes = []
+    for index in range(0, len(pattern), 2):
+        spec = pattern[index]
+        existing = row.get(spec["var"]) if spec["var"] else None
+        if isinstance(existing, Node):
+            nodes.append(existing)
+            continue
+        node = ctx.graph._add_node(spec["labels"], _evaluate_properties(spec, row, ctx), ctx)
+        if spec["var"]:
+            row[spec["var"]] = node
+        nodes.append(node)
+    for index in range(1, len(pattern), 2):
+        spec = pattern[index]
+        if len(spec["types"]) != 1:
+            raise UnsupportedCypher("relationships must be created with exactly one type")
+        source, target = nodes[index // 2], nodes[index // 2 + 1]
+        if spec["direction"] == "in":
+            source, target = target, source
+        edge = ctx.graph._add_edge(spec["types"][0], source, target, _evaluate_properties(spec, row, ctx), ctx)
+        if spec["var"]:
+            row[spec["var"]] = edge
+    return row
+
+
+def _apply_set(items: list, row: dict, ctx: _Context) -> None:
+    for kind, var, key, expression in items:
+        target = row.get(var)
+        if target is None:
+            continue
+        if not isinstance(target, (Node, Edge)):
+            raise UnsupportedCypher(f"SET target {var!r} is not a node or relationship")
+        if kind == "property":
+            ctx.graph._set_properties(target, {key: expression(row, ctx)}, replace=False, ctx=ctx)
+        elif kind == "labels":
+            ctx.graph._add_labels(target, key, ctx)
+        else:
+            value = expression(row, ctx)
+            if isinstance(value, (Node, Edge)):
+                value = value.properties
+            ctx.graph._set_properties(target, dict(value or {}), replace=kind == "replace", ctx=ctx)
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def compile_cypher(cypher: str) -> Callable:
+    """
+    Parses one statement into a function of a _Context. Cached on the statement text,
+    which the loader's builders keep stable.
+    """
+    return _Parser(cypher).statement()
+
+
+class MemoryGraph(GraphBackend):
+    """
+    In-process graph store implementing the lib.db backend interface. Nodes and edges are
+    __slots__ objects with adjacency lists; nodes are indexed per label and, once a
+    (label, property) pair is looked up, per property value. Indexes are maintained on
+    every write after that.
+
+    The Cypher subset covers what the loader and typical agent reads use: MATCH / OPTIONAL
+    MATCH over fixed-length patterns, WHERE, UNWIND, MERGE (with ON CREATE / ON MATCH SET),
+    CREATE, SET, REMOVE, [DETACH] DELETE, WITH and RETURN with DISTINCT, count / collect /
+    sum / avg / min / max, ORDER BY, SKIP and LIMIT, UNION [ALL], CASE, list comprehensions
+    and label predicates (n:Label). Anything else (CALL, FOREACH, EXISTS {...}, path
+    variables, variable-length relationships, ...) raises UnsupportedCypher naming the
+    feature when the statement is compiled, before any row is touched.
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        self.nodes: dict[int, Node] = {}
+        self.edges: dict[int, Edge] = {}
+        self._labels: dict[str, dict[int, Node]] = {}
+        self._key_index: dict[tuple[str, str], dict[Any, dict[int, Node]]] = {}
+        self._next_id = 0
+        self._lock = threading.RLock()
+
+    def _new_id(self) -> int:
+        self._next_id += 1
+        return self._next_id
+
+    def _index(self, label: str, key: str) -> dict:
+        index = self._key_index.get((label, key))
+        if index is None:
+            index = {}
+            for node in self._labels.get(label, {}).values():
+                value = node.properties.get(key)
+                if value is not None:
+                    index.setdefault(_hashable(value), {})[node.id] = node
+            self._key_index[(label, key)] = index
+        return index
+
+    def _index_node(self, node: Node, keys: Iterable[str], add: bool) -> None:
+        for label in node.labels:
+            for key in keys:
+                index = self._key_index.get((label, key))
+                value = node.properties.get(key)
+                if index is None or value is None:
+                    continue
+                bucket = index.setdefault(_hashable(value), {})
+                if add:
+                    bucket[node.id] = node
+                else:
+                    bucket.pop(node.id, None)
+                    if not bucket:
+                        del index[_hashable(value)]
+
+    def _candidates(self, labels: tuple, wanted: dict) -> list[Node]:
+        if any(value is None for value in wanted.values()):
+            return []
+        if not labels:
+            return list(self.nodes.values())
+        if not wanted:
+            return list(self._labels.get(labels[0], {}).values())
+        best = None
+        for key, value in wanted.items():
+            bucket = self._index(labels[0], key).get(_hashable(value), {})
+            if best is None or len(bucket) < len(best):
+                best = bucket
+            if not best:
+                return []
+        return list(best.values())
+
+    def _add_node(self, labels: tuple, properties: dict, ctx: _Context) -> Node:
+        node = Node(self._new_id(), tuple(labels), {key: value for key, value in properties.items() if value is not None})
+        self.nodes[node.id] = node
+        for label in node.labels:
+            self._labels.setdefault(label, {})[node.id] = node
+        self._index_node(node, node.properties, add=True)
+        ctx.count("nodes_created")
+        ctx.count("labels_added", len(node.labels))
+        ctx.count("properties_set", len(node.properties))
+        return node
+
+    def _add_edge(self, edge_type: str, source: Node, target: Node, properties: dict, ctx: _Context) -> Edge:
+        edge = Edge(self._new_id(), edge_type, source, target, {key: value for key, value in properties.items() if value is not None})
+        self.edges[edge.id] = edge
+        source.out.append(edge)
+        target.inc.append(edge)
+        ctx.count("relationships_created")
+        ctx.count("properties_set", len(edge.properties))
+        return edge
+
+    def _set_properties(self, target: Any, values: dict, replace: bool, ctx: _Context) -> None:
+        is_node = isinstance(target, Node)
+        if is_node:
+            self._index_node(target, list(target.properties), add=False)
+        if replace:
+            ctx.count("properties_set", len(target.properties))
+            target.properties.clear()
+        for key, value in values.items():
+            if value is None:
+                if target.properties.pop(key, None) is not None:
+                    ctx.count("properties_set")
+            else:
+                target.properties[key] = value
+                ctx.count("properties_set")
+        if is_node:
+            self._index_node(target, list(target.properties), add=True)
+
+    def _add_labels(self, node: Any, labels: tuple, ctx: _Context) -> None:
+        if not isinstance(node, Node):
+            raise UnsupportedCypher("labels can only be set on nodes")
+        new = tuple(label for label in labels if label not in node.labels)
+        if not new:
+            return
+        node.labels = node.labels + new
+        for label in new:
+            self._labels.setdefault(label, {})[node.id] = node
+            for (index_label, key), index in self._key_index.items():
+                value = node.properties.get(key)
+                if index_label == label and value is not None:
+                    index.setdefault(_hashable(value), {})[node.id] = node
+        ctx.count("labels_added", len(new))
+
+    def _delete_edge(self, edge: Edge, ctx: _Context) -> None:
+        if self.edges.pop(edge.id, None) is None:
+            return
+        edge.source.out.remove(edge)
+        edge.target.inc.remove(edge)
+        ctx.count("relationships_deleted")
+
+    def _delete_node(self, node: Node, detach: bool, ctx: _Context) -> None:
+        if node.id not in self.nodes:
+            return
+        if node.out or node.inc:
+            if not detach:
+                raise ValueError(f"Cannot delete node n{node.id}, because it still has relationships. Use DETACH DELETE.")
+            for edge in list(node.out) + list(node.inc):
+                self._delete_edge(edge, ctx)
+        self._index_node(node, list(node.properties), add=False)
+        for label in node.labels:
+            self._labels[label].pop(node.id, None)
+        del self.nodes[node.id]
+        ctx.count("nodes_deleted")
+
+    def run(self, cypher: str, parameters: Optional[dict] = None) -> tuple[list[dict], dict]:
+        start = time.perf_counter()
+        statement = compile_cypher(cypher)
+        with self._lock:
+            ctx = _Context(self, parameters or {})
+            records = statement(ctx)
+        elapsed_ms = int(1000 * (time.perf_counter() - start))
+        ctx.counters["contains_updates"] = ctx.wrote
+        ctx.counters["contains_system_updates"] = False
+        return records, {
+            "counters": ctx.counters,
+            "query_type": ("rw" if records or ctx.columns else "w") if ctx.wrote else "r",
+            "result_available_after_ms": elapsed_ms,
+            "result_consumed_after_ms": 0,
+        }
+
+    def write_batches(self, statements: Iterable[tuple[str, list]]) -> Iterator[dict]:
+        for cypher, rows in statements:
+            yield self.run(cypher, {"rows": rows})[1]["counters"]
+
+    def counts(self) -> tuple[int, int]:
+        return len(self.nodes), len(self.edges)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.__init__()
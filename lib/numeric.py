@@ -0,0 +1,145 @@
+import re
+from typing import Optional
+
+# Fractions need a non-zero denominator; "1/0" is read as 1 followed by text.
+_DENOMINATOR = r"0*[1-9]\d*"
+_NUMBER = rf"[-+]?(?:\d+\s+\d+/{_DENOMINATOR}|\d+/{_DENOMINATOR}|\d*\.\d+|\d+)"
+_PREFIX = re.compile(r"^\s*(?:\d+\s*[xX×]\s*)?(?:[Øø⌀Rr]|M(?=\d)|SR|DIA\.?\s*)?\s*")
+_LIMITS = re.compile(rf"^({_NUMBER})\s*(?:-|–|to)\s*({_NUMBER})(?!\s*/)")
+_SYMMETRIC = re.compile(rf"^(?:±|\+/-|\+-)\s*({_NUMBER})")
+_BILATERAL = re.compile(rf"^\+\s*({_NUMBER})\s*/?\s*-\s*({_NUMBER})")
+_BILATERAL_REVERSED = re.compile(rf"^-\s*({_NUMBER})\s*/?\s*\+\s*({_NUMBER})")
+_LEADING_NUMBER = re.compile(rf"^({_NUMBER})")
+
+
+def parse_number(text: str) -> float:
+    """
+    Parses decimals, fractions ("3/8") and mixed numbers ("1 1/2"). Raises ValueError for
+    text that is not a number, including a fraction with a zero denominator.
+    """
+    text = text.strip()
+    sign = -1.0 if text.startswith("-") else 1.0
+    text = text.lstrip("+-")
+    if "/" in text:
+        whole, _, fraction = text.rpartition(" ")
+        numerator, denominator = (float(part) for part in fraction.split("/"))
+        if denominator == 0:
+            raise ValueError(f"zero denominator in {text!r}")
+        return sign * ((float(whole) if whole else 0.0) + numerator / denominator)
+    return sign * float(text)
+
+
+def parse_tolerance(text: Optional[str]) -> Optional[tuple[float, float]]:
+    """
+    Returns (minus, plus) deviations, both non-negative, from "±0.1", "+0.2/-0.1", "-0 +0.05"
+    or a bare "0.1" (read as symmetric). Fit classes such as "H7" return None.
+    """
+    if not text:
+        return None
+    text = text.strip()
+    match = _SYMMETRIC.match(text)
+    if match:
+        deviation = abs(parse_number(match.group(1)))
+        return deviation, deviation
+    match = _BILATERAL.match(text)
+    if match:
+        return abs(parse_number(match.group(2))), abs(parse_number(match.group(1)))
+    match = _BILATERAL_REVERSED.match(text)
+    if match:
+        return abs(parse_number(match.group(1))), abs(parse_number(match.group(2)))
+    match = _LEADING_NUMBER.match(text)
+    if match and match.end() == len(text.rstrip()):
+        deviation = abs(parse_number(match.group(1)))
+        return deviation, deviation
+    return None
+
+
+def parse_dimension(value: Optional[str], tolerance: Optional[str] = None) -> dict:
+    """
+    Derives numeric value_nominal, value_min and value_max from a Dimension's value and
+    tolerance strings, e.g. "Ø12.5 ±0.1", "3X R5", "12.4-12.6", "1/2", "45°" with "+0.2/-0". A
+    tolerance embedded in value takes precedence over the tolerance field. When neither gives
+    a readable tolerance (e.g. a fit class, "Ø12 H7") only value_nominal is set; a bare value
+    with no tolerance is exact (min = max = nominal); no readable number yields {}.
+    """
+    if value is None:
+        return {}
+    text = str(value).replace(",", ".").strip()
+    text = _PREFIX.sub("", text, count=1)
+    limits = _LIMITS.match(text)
+    if limits:
+        low, high = sorted((parse_number(limits.group(1)), parse_number(limits.group(2))))
+        return {"value_nominal": (low + high) / 2, "value_min": low, "value_max": high}
+    match = _LEADING_NUMBER.match(text)
+    if match is None:
+        return {}
+    nominal = parse_number(match.group(1))
+    rest = text[match.end():].strip()
+    rest = re.sub(r"^(?:mm|in|inch|cm|m|°|deg|\")\s*", "", rest)
+    deviations = parse_tolerance(rest) if rest else None
+    if deviations is None and tolerance:
+        deviations = parse_tolerance(str(tolerance))
+    if deviations is None and (rest or tolerance):
+        return {"value_nominal": nominal}
+    minus, plus = deviations or (0.0, 0.0)
+    return {"value_nominal": nominal, "value_min": nominal - minus, "value_max": nominal + plus}
+
+
+def enrich_entity(entity: dict) -> dict:
+    """
+    Adds parsed numeric fields to Dimension entities; other entities are returned unchanged.
+    """
+    if entity.get("type") != "Dimension":
+        return entity
+    properties = entity.get("properties") or {}
+    parsed = parse_dimension(properties.get("value"), properties.get("tolerance"))
+    if not parsed:
+        return entity
+    return {**entity, "properties": {**properties, **parsed}}
+
+
+_UPPER_LIMIT = re.compile(
+    rf"(?:\bMAX(?:IMUM)?\.?|\bNOT\s+TO\s+EXCEED|\bNTE|\bUP\s+TO|≤|<=|<)\s*({_NUMBER})|({_NUMBER})\s*(?:MM|IN|\")?\s*MAX(?:IMUM)?\b",
+    re.IGNORECASE,
+)
+_LOWER_LIMIT = re.compile(
+    rf"(?:\bMIN(?:IMUM)?\.?|\bAT\s+LEAST|≥|>=|>)\s*({_NUMBER})|({_NUMBER})\s*(?:MM|IN|\")?\s*MIN(?:IMUM)?\b",
+    re.IGNORECASE,
+)
+_DECIMAL_TOLERANCE = re.compile(rf"\bX*\.(X+)\s*(?:±|\+/-|\+-)\s*({_NUMBER})", re.IGNORECASE)
+_ANY_SYMMETRIC = re.compile(rf"(?:±|\+/-|\+-)\s*({_NUMBER})")
+
+
+def parse_limits(text: Optional[str]) -> list[tuple[str, float]]:
+    """
+    Upper and lower bounds stated in note text: "MAX 12", "12 MM MAX", "NOT TO EXCEED 10",
+    "≤ 3", "MIN 2", "AT LEAST 1.5". Returns [("max" | "min", value), ...].
+    """
+    if not text:
+        return []
+    limits = []
+    for kind, pattern in (("max", _UPPER_LIMIT), ("min", _LOWER_LIMIT)):
+        for match in pattern.finditer(text):
+            limits.append((kind, parse_number(match.group(1) or match.group(2))))
+    return limits
+
+
+def decimal_places(value: Optional[str]) -> int:
+    match = re.search(r"\d*\.(\d+)", str(value or ""))
+    return len(match.group(1)) if match else 0
+
+
+def parse_spec_tolerance(text: Optional[str], decimals: int = 0) -> Optional[float]:
+    """
+    Allowed symmetric tolerance from a tolerance spec. A block such as "X.X ±0.1  X.XX ±0.05"
+    is resolved by the dimension's decimal places; otherwise the first "±n" applies.
+    """
+    if not text:
+        return None
+    table = {len(match.group(1)): abs(parse_number(match.group(2))) for match in _DECIMAL_TOLERANCE.finditer(text)}
+    if table:
+        if decimals in table:
+            return table[decimals]
+        return None
+    match = _ANY_SYMMETRIC.search(text)
+    return abs(parse_number(match.group(1))) if match else None
@@ -0,0 +1,104 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterator, Optional
+
+PDF_DPI = int(os.getenv("PDF_DPI", "150"))
+RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+DOC_KEY = "source_doc_id"
+
+_render_pool: Optional[ProcessPoolExecutor] = None
+
+
+class PdfPage:
+    """
+    One sheet of a drawing package. Only the file path and page number are held; the page
+    is rasterized when render() is called, so queued pages cost almost no memory.
+    """
+
+    def __init__(self, pdf_path: Path, index: int, sheet_count: int):
+        self.pdf_path = Path(pdf_path)
+        self.index = index
+        self.sheet_count = sheet_count
+
+    @property
+    def sheet_number(self) -> int:
+        return self.index + 1
+
+    @property
+    def source_doc_id(self) -> str:
+        return f"{self.pdf_path.stem}-sheet-{self.sheet_number:03d}"
+
+    @property
+    def stem(self) -> str:
+        return self.source_doc_id
+
+    def __str__(self) -> str:
+        return f"{self.pdf_path}#page={self.sheet_number}"
+
+    def render(self, dpi: int = PDF_DPI) -> bytes:
+        return _get_render_pool().submit(render_page, str(self.pdf_path), self.index, dpi).result()
+
+
+@lru_cache(maxsize=1)
+def _pymupdf():
+    """
+    PyMuPDF, imported on first use so image-only runs never load it.
+    """
+    try:
+        import pymupdf
+    except ImportError:
+        raise ImportError("PDF ingestion needs PyMuPDF: pip install pymupdf") from None
+    return pymupdf
+
+
+def _get_render_pool() -> ProcessPoolExecutor:
+    """
+    MuPDF is not thread-safe, so pages are rendered in worker processes. Each render opens
+    the file on its own and returns PNG bytes.
+    """
+    global _render_pool
+    if _render_pool is None:
+        _pymupdf()
+        _render_pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS)
+    return _render_pool
+
+
+def page_count(pdf_path: Path) -> int:
+    with _pymupdf().open(pdf_path) as document:
+        return document.page_count
+
+
+def render_page(pdf_path: str, index: int, dpi: int = PDF_DPI) -> bytes:
+    with _pymupdf().open(pdf_path) as document:
+        return document[index].get_pixmap(dpi=dpi).tobytes("png")
+
+
+def iter_pages(pdf_path: Path) -> Iterator[PdfPage]:
+    count = page_count(pdf_path)
+    for index in range(count):
+        yield PdfPage(pdf_path, index, count)
+
+
+def assign_document(payload: dict, page: PdfPage) -> dict:
+    """
+    Scopes one page's extraction to its sheet: every entity and relationship endpoint gets
+    the page's source_doc_id (replacing whatever the model wrote), and Drawing entities
+    get sheet_number and sheet_count.
+    """
+    entities = []
+    for entity in payload.get("entities", []):
+        properties = {**(entity.get("properties") or {}), DOC_KEY: page.source_doc_id}
+        if entity.get("type") == "Drawing":
+            properties.update(sheet_number=page.sheet_number, sheet_count=page.sheet_count)
+        entities.append({**entity, "properties": properties})
+    relationships = [
+        {
+            **relationship,
+            "source_properties": {**(relationship.get("source_properties") or {}), DOC_KEY: page.source_doc_id},
+            "target_properties": {**(relationship.get("target_properties") or {}), DOC_KEY: page.source_doc_id},
+        }
+        for relationship in payload.get("relationships", [])
+    ]
+    return {**payload, "entities": entities, "relationships": relationships}
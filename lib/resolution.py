@@ -0,0 +1,393 @@
+"""
+Cross-document entity resolution. Every drawing gets its own Material, Process, WeldSpec and
+Part nodes, so "316L per ASTM A240" is stored once per drawing that uses it. This pass keeps
+those occurrences (they carry the drawing's snippet and bounding box) and links each one with
+RESOLVES_TO to a shared canonical node (CanonicalMaterial, ...) keyed on a normalized form:
+
+- Material: grade and spec ("SS 316 L" / "ASTM-A240/A240M" -> "316L|ASTM A240");
+- Process: stemmed name plus any standards it cites ("Passivation per ASTM A967");
+- WeldSpec: type, numeric size, spacing and standard;
+- Part: part number plus a fuzzy name match. Names are compared only within blocks that
+  share the part number and the first letters of a word, so each new name is compared with
+  a handful of candidates rather than every part seen so far.
+
+Cross-drawing questions then go through the canonical node instead of comparing strings.
+"""
+import difflib
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from lib.db import DEFAULT_BATCH_SIZE, _quote, _write_groups, get_backend, graph_session
+from lib.numeric import parse_dimension
+from lib.schema import (
+    CANONICAL_KEY,
+    CANONICAL_RELATIONSHIP,
+    DOC_KEY,
+    RESOLVED_LABELS,
+    canonical_label,
+    identifier_keys,
+)
+from lib.tracing import span
+
+PART_NAME_THRESHOLD = 0.88
+MAX_BLOCK = 256
+
+_STANDARD = re.compile(
+    r"\b(ASTM|ASME|AMS|AWS|SAE|ISO|DIN|EN|JIS|BS|ANSI|API|NACE)\s*[-_ ]?\s*"
+    r"((?:[A-Z]{1,3}[- ]?)?\d+(?:\.\d+)*[A-Z]?)"
+    r"|\b(MIL)-((?:STD|PRF|DTL|SPEC|[A-Z])-?\d+[A-Z]?)"
+)
+_GRADE_NOISE = re.compile(
+    r"\b(?:TYPE|GRADE|GR|AISI|UNS|ALLOY|STAINLESS|STEEL|SST|SS|CRES|AL|ALUMINUM|ALUMINIUM|MATERIAL)\b\.?"
+)
+_GRADE_PREFIX = re.compile(r"^(?:SS|SST|AISI|AL)(?=\d)")
+_WORD = re.compile(r"[A-Z0-9]+(?:\.[0-9]+)?")
+_STOPWORDS = {"A", "AN", "THE", "OF", "AND", "PER", "TO", "FOR", "WITH", "AFTER", "BEFORE", "ALL", "IN", "ON"}
+_STEM_SUFFIXES = (("MENT", ""), ("ATION", "AT"), ("ING", ""), ("ED", ""), ("ES", ""), ("E", ""), ("S", ""))
+ABBREVIATIONS = {
+    "ASSY": "ASSEMBLY",
+    "ASM": "ASSEMBLY",
+    "BRKT": "BRACKET",
+    "BRK": "BRACKET",
+    "PL": "PLATE",
+    "PLT": "PLATE",
+    "SHT": "SHEET",
+    "SUPP": "SUPPORT",
+    "SPRT": "SUPPORT",
+    "HSG": "HOUSING",
+    "CVR": "COVER",
+    "FLG": "FLANGE",
+    "WLDMT": "WELDMENT",
+    "MTG": "MOUNTING",
+}
+
+_lock = threading.Lock()
+_index: Optional["ResolutionIndex"] = None
+
+
+def _upper(value) -> str:
+    return str(value or "").upper()
+
+
+def _stem(word: str) -> str:
+    for suffix, replacement in _STEM_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)] + replacement
+    return word
+
+
+def canonical_standards(*texts) -> list[str]:
+    """
+    Standard references in texts as "BODY DESIGNATION", sorted and de-duplicated:
+    "ASTM-A240/A240M" and "astm a240" both give "ASTM A240".
+    """
+    found = set()
+    for text in texts:
+        for match in _STANDARD.finditer(_upper(text)):
+            body, designation = match.group(1, 2) if match.group(1) else match.group(3, 4)
+            found.add(f"{body} {re.sub(r'[- ]', '', designation)}")
+    return sorted(found)
+
+
+def canonical_grade(grade) -> str:
+    """
+    "SS 316 L", "Type 316L" -> "316L"; a grade given as a standard ("ASTM A36") keeps its
+    designation ("A36").
+    """
+    text = _STANDARD.sub(" ", _upper(grade))
+    text = _GRADE_NOISE.sub(" ", text)
+    text = _GRADE_PREFIX.sub("", re.sub(r"[^A-Z0-9.]+", "", text))
+    if not text:
+        standards = canonical_standards(grade)
+        return standards[0].split(" ", 1)[1] if standards else ""
+    return text
+
+
+def _compact(value) -> str:
+    return re.sub(r"[^A-Z0-9.]+", "", _upper(value))
+
+
+def _words(value) -> list[str]:
+    return [word for word in _WORD.findall(_upper(value)) if word not in _STOPWORDS]
+
+
+def material_key(properties: dict) -> Optional[tuple[str, dict]]:
+    grade = canonical_grade(properties.get("grade"))
+    standards = canonical_standards(properties.get("spec"), properties.get("grade"))
+    spec = standards[0] if standards else _compact(properties.get("spec"))
+    if not grade and not spec:
+        return None
+    return f"{grade}|{spec}", {"grade": grade or None, "spec": spec or None}
+
+
+def process_key(properties: dict) -> Optional[tuple[str, dict]]:
+    name = " ".join(_stem(word) for word in _words(_STANDARD.sub(" ", _upper(properties.get("name")))))
+    if not name:
+        return None
+    standards = canonical_standards(properties.get("name"), properties.get("description"))
+    return f"{name}|{','.join(standards)}", {"name": name, "standards": standards}
+
+
+def weldspec_key(properties: dict) -> Optional[tuple[str, dict]]:
+    weld_type = " ".join(_stem(word) for word in _words(properties.get("type") or properties.get("weld_type")))
+    size = parse_dimension(properties.get("size")).get("value_nominal")
+    if not weld_type and size is None:
+        return None
+    size_text = f"{size:g}" if size is not None else ""
+    spacing = _compact(properties.get("spacing"))
+    standards = canonical_standards(properties.get("standard_ref"))
+    standard = standards[0] if standards else _compact(properties.get("standard_ref"))
+    canonical = {"type": weld_type or None, "size": size, "spacing": spacing or None, "standard_ref": standard or None}
+    return f"{weld_type}|{size_text}|{spacing}|{standard}", canonical
+
+
+def part_number(part_id) -> str:
+    """
+    Upper-cased with runs of spaces, underscores and hyphens folded to one hyphen. Other
+    separators are kept: "P-100-10" and "P-10010" are different parts.
+    """
+    return re.sub(r"[\s_-]+", "-", _upper(part_id).strip(" _-"))
+
+
+def part_name(name) -> str:
+    return " ".join(ABBREVIATIONS.get(word, word) for word in _words(name))
+
+
+def part_blocks(part_id: str, name: str) -> set[tuple]:
+    """
+    Blocking keys for a normalized part name: the part number with the first three letters
+    of each word. Two names are compared only if they share one, so a typo has to hit the
+    start of every word to hide a match.
+    """
+    return {(part_id, word[:3]) for word in name.split()}
+
+
+class ResolutionIndex:
+    """
+    In-memory map from normalized keys to canonical keys, plus the part-name blocks used for
+    fuzzy matching. Thread-safe; counts occurrences, canonical keys and name comparisons.
+    Occurrences are keyed by (source_doc_id, local id), so re-ingesting a drawing does not
+    count its entities again, and a revised entity counts under its latest canonical key.
+    """
+
+    def __init__(self, threshold: float = PART_NAME_THRESHOLD, max_block: int = MAX_BLOCK):
+        self.threshold = threshold
+        self.max_block = max_block
+        self.parts: dict[tuple, str] = {}
+        self.blocks: dict[tuple, list] = defaultdict(list)
+        self.occurrences: dict[str, dict[tuple, str]] = defaultdict(dict)
+        self.comparisons = 0
+        self.fuzzy_matches = 0
+        self._lock = threading.Lock()
+
+    def add_part(self, part_id: str, name: str, key: str) -> None:
+        if (part_id, name) in self.parts:
+            return
+        self.parts[(part_id, name)] = key
+        for block in part_blocks(part_id, name):
+            members = self.blocks[block]
+            if len(members) < self.max_block:
+                members.append((name, key))
+
+    def _part_key(self, properties: dict) -> Optional[tuple[str, dict]]:
+        part_id = part_number(properties.get("part_id"))
+        name = part_name(properties.get("name"))
+        if not part_id or not name:
+            return None
+        key = self.parts.get((part_id, name))
+        if key is None:
+            best, best_ratio = None, self.threshold
+            seen = set()
+            for block in part_blocks(part_id, name):
+                for candidate, candidate_key in self.blocks.get(block, ()):
+                    if candidate in seen:
+                        continue
+                    seen.add(candidate)
+                    self.comparisons += 1
+                    matcher = difflib.SequenceMatcher(None, name, candidate)
+                    if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+                        continue
+                    ratio = matcher.ratio()
+                    if ratio >= best_ratio:
+                        best, best_ratio = candidate_key, ratio
+            if best is not None:
+                self.fuzzy_matches += 1
+            key = best or f"{part_id}|{name}"
+            self.add_part(part_id, name, key)
+        canonical_id, canonical_name = key.split("|", 1)
+        return key, {"part_id": canonical_id, "name": canonical_name}
+
+    def resolve(self, label: str, properties: dict) -> Optional[tuple[str, dict]]:
+        """
+        (canonical key, canonical properties) for one entity, or None when it has too little
+        to resolve on.
+        """
+        with self._lock:
+            if label == "Part":
+                resolved = self._part_key(properties)
+            else:
+                resolved = _KEY_BUILDERS[label](properties)
+            if resolved is not None:
+                occurrence = (properties.get(DOC_KEY), properties.get(identifier_keys()[label][0]))
+                self.occurrences[label][occurrence] = resolved[0]
+            return resolved
+
+    def stats(self) -> dict:
+        with self._lock:
+            by_label = {
+                label: {"occurrences": len(self.occurrences[label]), "canonical": len(set(self.occurrences[label].values()))}
+                for label in RESOLVED_LABELS
+            }
+            occurrences = sum(counts["occurrences"] for counts in by_label.values())
+            canonical = sum(counts["canonical"] for counts in by_label.values())
+            return {
+                "occurrences": occurrences,
+                "canonical": canonical,
+                "dedup_ratio": 1 - canonical / occurrences if occurrences else 0.0,
+                "comparisons": self.comparisons,
+                "fuzzy_matches": self.fuzzy_matches,
+                "by_label": by_label,
+            }
+
+
+_KEY_BUILDERS = {"Material": material_key, "Process": process_key, "WeldSpec": weldspec_key}
+
+
+def build_resolution_query(label: str, id_key: str) -> str:
+    """
+    Links each occurrence row.id of label in row.source_doc_id to the canonical node for
+    row.key, creating it with row.canonical on first use, and drops any RESOLVES_TO edge
+    left over from an earlier key.
+    """
+    canonical = canonical_label(label)
+    return (
+        "UNWIND $rows AS row "
+        f"MATCH (n:{_quote(label)} {{ {DOC_KEY}: row.{DOC_KEY}, {_quote(id_key)}: row.id }}) "
+        f"MERGE (c:{_quote(canonical)} {{ {CANONICAL_KEY}: row.key }}) "
+        "ON CREATE SET c += row.canonical "
+        f"MERGE (n)-[:{CANONICAL_RELATIONSHIP}]->(c) "
+        "WITH n, c "
+        f"OPTIONAL MATCH (n)-[old:{CANONICAL_RELATIONSHIP}]->(other:{_quote(canonical)}) "
+        f"WHERE other.{CANONICAL_KEY} <> c.{CANONICAL_KEY} "
+        "DELETE old"
+    )
+
+
+def _load_index(index: "ResolutionIndex") -> None:
+    records, _ = get_backend().run(
+        f"MATCH (c:{canonical_label('Part')}) RETURN c.part_id AS part_id, c.name AS name, c.{CANONICAL_KEY} AS key"
+    )
+    for record in records:
+        if record["part_id"] and record["name"]:
+            index.add_part(record["part_id"], record["name"], record["key"])
+
+
+def get_resolution_index() -> ResolutionIndex:
+    """
+    The shared index. On first use it is seeded with the canonical parts already in the
+    graph, so fuzzy part matches carry across runs; exact keys need no seeding since the
+    canonical nodes are MERGEd on them.
+    """
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                index = ResolutionIndex()
+                _load_index(index)
+                _index = index
+    return _index
+
+
+def reset_resolution_index() -> None:
+    global _index
+    with _lock:
+        _index = None
+
+
+def resolution_rows(entities: Iterable[dict], index: ResolutionIndex) -> dict[str, list]:
+    """
+    One row per resolvable occurrence: {source_doc_id, id, key, canonical}, grouped by label.
+    """
+    ids = identifier_keys()
+    rows: dict[str, list] = {}
+    for entity in entities:
+        label = entity.get("type")
+        if label not in RESOLVED_LABELS:
+            continue
+        properties = entity.get("properties") or {}
+        id_key = ids[label][0]
+        if properties.get(DOC_KEY) is None or properties.get(id_key) is None:
+            continue
+        resolved = index.resolve(label, properties)
+        if resolved is None:
+            continue
+        key, canonical = resolved
+        rows.setdefault(label, []).append({
+            DOC_KEY: properties[DOC_KEY],
+            "id": properties[id_key],
+            "key": key,
+            "canonical": {name: value for name, value in canonical.items() if value is not None},
+        })
+    return rows
+
+
+def resolve_entities(db_objects: dict, batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    """
+    Resolves the Material, Process, WeldSpec and Part entities of one loaded payload against
+    the shared index and writes their RESOLVES_TO links in batch_size batches. Returns the
+    payload's occurrence and canonical counts, the canonical nodes created, the dedup ratio
+    (1 - canonical / occurrences) and the elapsed time.
+    """
+    start = time.perf_counter()
+    index = get_resolution_index()
+    with span("resolve") as resolve_span:
+        groups = resolution_rows(db_objects.get("entities", []), index)
+        ids = identifier_keys()
+        queries = {label: (f"resolve-{label}", build_resolution_query(label, ids[label][0])) for label in groups}
+        with graph_session():
+            batches = _write_groups(queries, groups, batch_size) if groups else []
+        occurrences = sum(len(rows) for rows in groups.values())
+        canonical = len({(label, row["key"]) for label, rows in groups.items() for row in rows})
+        resolve_span.set(occurrences=occurrences, canonical=canonical)
+    return {
+        "occurrences": occurrences,
+        "canonical": canonical,
+        "created": sum(batch["counters"]["nodes_created"] for batch in batches),
+        "dedup_ratio": 1 - canonical / occurrences if occurrences else 0.0,
+        "elapsed_ms": 1000 * (time.perf_counter() - start),
+        "batches": batches,
+    }
+
+
+def resolution_stats() -> dict:
+    """
+    Totals for everything resolved by this process; see ResolutionIndex.stats.
+    """
+    return _index.stats() if _index is not None else ResolutionIndex().stats()
+
+
+def resolve_graph(batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    """
+    Backfill: resolves every stored occurrence, one label at a time.
+    """
+    start = time.perf_counter()
+    created = 0
+    for label in RESOLVED_LABELS:
+        records, _ = get_backend().run(f"MATCH (n:{_quote(label)}) RETURN properties(n) AS properties")
+        report = resolve_entities({"entities": [{"type": label, "properties": record["properties"]} for record in records]}, batch_size)
+        created += report["created"]
+    return {**resolution_stats(), "created": created, "elapsed_s": time.perf_counter() - start}
+
+
+if __name__ == "__main__":
+    report = resolve_graph()
+    print(
+        f"{report['occurrences']} occurrences -> {report['canonical']} canonical nodes "
+        f"({report['dedup_ratio']:.1%} deduplicated, {report['created']} created) in {report['elapsed_s']:.1f}s"
+    )
+    for label, counts in report["by_label"].items():
+        print(f"  {label:<9} {counts['occurrences']:>8} -> {counts['canonical']}")
+    print(f"  part-name comparisons: {report['comparisons']} ({report['fuzzy_matches']} fuzzy matches)")
@@ -0,0 +1,290 @@
+import importlib.util
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Iterable, Optional, get_args, get_type_hints
+
+from ai.PROMPT import ENTITIES_AND_RELATIONSHIPS
+from lib.db import build_unwind_relationship_query, graph_session, uses_neo4j
+
+ROOT = Path(__file__).resolve().parent.parent
+DOC_KEY = "source_doc_id"
+
+FULLTEXT_INDEX = "drawing_text"
+FULLTEXT_LABELS = ("Note", "ToleranceSpec", "InspectionRequirement", "WeldSpec", "Dimension", "Callout")
+FULLTEXT_PROPERTIES = ("text", "source_snippet", "text_snippet", "source_text", "standard_ref", "value", "tolerance")
+TERMS_INDEX = "drawing_terms"
+TERMS_PROPERTIES = ("label", "name", "title", "part_id", "feature_id", "note_id", "dimension_id", "weldspec_id")
+NUMERIC_PROPERTIES = {"Dimension": ("value_nominal", "value_min", "value_max")}
+CONFLICT_RELATIONSHIP = "CONFLICTS_WITH"
+CONFLICT_PASS_LABEL = "ConflictPass"
+RESOLVED_LABELS = ("Material", "Process", "WeldSpec", "Part")
+CANONICAL_RELATIONSHIP = "RESOLVES_TO"
+CANONICAL_KEY = "key"
+
+_RELATIONSHIP_PATTERN = re.compile(
+    r"- (\w+) -\[(\w+)\]-> (\w+)\s*\n"
+    r"\s*- source_properties: \{([^}]*)\}\s*\n"
+    r"\s*- target_properties: \{([^}]*)\}"
+)
+
+
+@lru_cache(maxsize=1)
+def _types_module() -> Any:
+    """
+    types.py, loaded by path because its name shadows the standard library.
+    """
+    spec = importlib.util.spec_from_file_location("_drawing_types", ROOT / "types.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_entity_types() -> tuple[str, ...]:
+    """
+    Reads the EntityType literal from types.py.
+    """
+    return get_args(_types_module().EntityType)
+
+
+def load_property_types() -> dict[str, dict[str, type]]:
+    """
+    Declared property types per entity type, from the <Type>Properties TypedDicts in types.py.
+    """
+    module = _types_module()
+    return {
+        label: get_type_hints(getattr(module, f"{label}Properties"), globalns=vars(module))
+        for label in load_entity_types()
+        if hasattr(module, f"{label}Properties")
+    }
+
+
+def load_provenance_fields() -> dict[str, type]:
+    """
+    The provenance fields types.py declares on Entity itself (source_doc_id, bounding_box,
+    ...), without the type and properties fields.
+    """
+    module = _types_module()
+    hints = get_type_hints(module.Entity, globalns=vars(module))
+    return {key: value for key, value in hints.items() if key not in ("type", "properties")}
+
+
+def canonical_label(label: str) -> str:
+    return f"Canonical{label}"
+
+
+def _split_keys(keys: str) -> tuple[str, ...]:
+    return tuple(key.strip() for key in keys.split(",") if key.strip())
+
+
+def documented_relationships(schema_text: str = ENTITIES_AND_RELATIONSHIPS) -> list[tuple]:
+    """
+    Parses (source, relationship, target, source keys, target keys) from the LLM schema text.
+    These are the shapes the loader's MATCH clauses use.
+    """
+    return [
+        (source, relationship, target, tuple(sorted(_split_keys(source_keys))), tuple(sorted(_split_keys(target_keys))))
+        for source, relationship, target, source_keys, target_keys in _RELATIONSHIP_PATTERN.findall(schema_text)
+    ]
+
+
+def identifier_keys(schema_text: str = ENTITIES_AND_RELATIONSHIPS) -> dict[str, tuple[str, ...]]:
+    """
+    Per-type identifier keys (excluding source_doc_id), collected from every place a type
+    is matched in the documented relationships.
+    """
+    keys: dict[str, list[str]] = {}
+    for source, _, target, source_keys, target_keys in documented_relationships(schema_text):
+        for label, label_keys in ((source, source_keys), (target, target_keys)):
+            bucket = keys.setdefault(label, [])
+            for key in label_keys:
+                if key != DOC_KEY and key not in bucket:
+                    bucket.append(key)
+    return {label: tuple(label_keys) for label, label_keys in keys.items()}
+
+
+@lru_cache(maxsize=1)
+def node_keys() -> dict[str, tuple[str, ...]]:
+    """
+    The properties each documented type is merged on: source_doc_id plus its identifier
+    keys, i.e. the node key schema_statements creates.
+    """
+    return {label: (DOC_KEY,) + keys for label, keys in identifier_keys().items()}
+
+
+def schema_statements(entity_types: Optional[Iterable[str]] = None) -> list[dict]:
+    """
+    Builds the idempotent index/constraint plan for every entity type:
+    - a (source_doc_id, <id>) node key, falling back to a composite index when the
+      server cannot create the constraint (Community Edition or existing violations);
+    - a single-property index on <id>, since relationship targets are matched by id alone;
+    - a source_doc_id index for types without a documented id;
+    - the full-text and numeric range indexes from search_index_statements;
+    - the per-document indexes lib.conflicts reads from conflict_index_statements;
+    - the canonical-node keys lib.resolution merges on from resolution_index_statements.
+    """
+    ids = identifier_keys()
+    statements = []
+    for label in entity_types or load_entity_types():
+        name = label.lower()
+        label_ids = ids.get(label, ())
+        if not label_ids:
+            statements.append({
+                "name": f"{name}_doc",
+                "label": label,
+                "properties": (DOC_KEY,),
+                "cypher": f"CREATE INDEX {name}_doc IF NOT EXISTS FOR (n:{label}) ON (n.{DOC_KEY})",
+            })
+            continue
+        for key in label_ids:
+            properties = (DOC_KEY, key)
+            on = ", ".join(f"n.{prop}" for prop in properties)
+            statements.append({
+                "name": f"{name}_{key}_key",
+                "label": label,
+                "properties": properties,
+                "cypher": f"CREATE CONSTRAINT {name}_{key}_key IF NOT EXISTS FOR (n:{label}) REQUIRE ({on}) IS NODE KEY",
+                "fallback": f"CREATE INDEX {name}_{key}_key IF NOT EXISTS FOR (n:{label}) ON ({on})",
+            })
+            statements.append({
+                "name": f"{name}_{key}",
+                "label": label,
+                "properties": (key,),
+                "cypher": f"CREATE INDEX {name}_{key} IF NOT EXISTS FOR (n:{label}) ON (n.{key})",
+            })
+    statements.extend(search_index_statements())
+    statements.extend(conflict_index_statements())
+    statements.extend(resolution_index_statements())
+    return statements
+
+
+def search_index_statements() -> list[dict]:
+    """
+    Full-text indexes over note, spec and source-text fields (drawing_text) and over every
+    type's names and identifiers (drawing_terms, which ai/retrieval.py seeds from), and range
+    indexes over the numeric fields lib.numeric derives for dimensions.
+    """
+    statements = []
+    for name, label_names, properties in (
+        (FULLTEXT_INDEX, FULLTEXT_LABELS, FULLTEXT_PROPERTIES),
+        (TERMS_INDEX, load_entity_types(), TERMS_PROPERTIES),
+    ):
+        labels = "|".join(label_names)
+        fields = ", ".join(f"n.{prop}" for prop in properties)
+        statements.append({
+            "name": name,
+            "label": labels,
+            "properties": properties,
+            "cypher": f"CREATE FULLTEXT INDEX {name} IF NOT EXISTS FOR (n:{labels}) ON EACH [{fields}]",
+        })
+    for label, properties in NUMERIC_PROPERTIES.items():
+        for prop in properties:
+            name = f"{label.lower()}_{prop}"
+            statements.append({
+                "name": name,
+                "label": label,
+                "properties": (prop,),
+                "cypher": f"CREATE RANGE INDEX {name} IF NOT EXISTS FOR (n:{label}) ON (n.{prop})",
+            })
+    return statements
+
+
+def conflict_index_statements() -> list[dict]:
+    """
+    source_doc_id indexes on materialized CONFLICTS_WITH edges and on the ConflictPass
+    nodes that hold each document's input fingerprint.
+    """
+    relationship_index = f"{CONFLICT_RELATIONSHIP.lower()}_doc"
+    pass_index = f"{CONFLICT_PASS_LABEL.lower()}_doc"
+    return [
+        {
+            "name": relationship_index,
+            "label": CONFLICT_RELATIONSHIP,
+            "properties": (DOC_KEY,),
+            "cypher": f"CREATE INDEX {relationship_index} IF NOT EXISTS FOR ()-[r:{CONFLICT_RELATIONSHIP}]-() ON (r.{DOC_KEY})",
+        },
+        {
+            "name": pass_index,
+            "label": CONFLICT_PASS_LABEL,
+            "properties": (DOC_KEY,),
+            "cypher": f"CREATE INDEX {pass_index} IF NOT EXISTS FOR (n:{CONFLICT_PASS_LABEL}) ON (n.{DOC_KEY})",
+        },
+    ]
+
+
+def resolution_index_statements() -> list[dict]:
+    """
+    A unique key on each canonical label (CanonicalMaterial, ...), falling back to an index
+    where the constraint cannot be created.
+    """
+    statements = []
+    for label in RESOLVED_LABELS:
+        canonical = canonical_label(label)
+        name = f"{canonical.lower()}_{CANONICAL_KEY}"
+        statements.append({
+            "name": name,
+            "label": canonical,
+            "properties": (CANONICAL_KEY,),
+            "cypher": f"CREATE CONSTRAINT {name} IF NOT EXISTS FOR (n:{canonical}) REQUIRE n.{CANONICAL_KEY} IS UNIQUE",
+            "fallback": f"CREATE INDEX {name} IF NOT EXISTS FOR (n:{canonical}) ON (n.{CANONICAL_KEY})",
+        })
+    return statements
+
+
+def bootstrap_schema(entity_types: Optional[Iterable[str]] = None) -> list[dict]:
+    """
+    Creates the indexes and constraints from schema_statements. Safe to run before every load.
+    A no-op on the in-memory backend, which builds its own indexes on first lookup.
+    """
+    if not uses_neo4j():
+        return []
+    report = []
+    with graph_session() as session:
+        for statement in schema_statements(entity_types):
+            try:
+                session.run(statement["cypher"]).consume()
+                status = "ok"
+            except Exception as e:
+                if "fallback" not in statement:
+                    report.append({**statement, "status": "error", "error": str(e)})
+                    continue
+                session.run(statement["fallback"]).consume()
+                status = "index"
+            report.append({**statement, "status": status})
+    return report
+
+
+def _index_seeks(plan: dict) -> list[str]:
+    details = []
+    if "Index" in plan.get("operatorType", ""):
+        details.append(str(plan.get("args", {}).get("Details", "")))
+    for child in plan.get("children", []):
+        details.extend(_index_seeks(child))
+    return details
+
+
+def index_usage(queries: Optional[Iterable[str]] = None) -> dict[str, list[str]]:
+    """
+    EXPLAINs the loader's relationship queries and maps each provisioned index to the
+    queries whose plans seek it. Indexes mapped to an empty list are never used by the loader.
+    """
+    if queries is None:
+        queries = [build_unwind_relationship_query(*shape) for shape in documented_relationships()]
+    statements = schema_statements()
+    usage = {statement["name"]: [] for statement in statements}
+    with graph_session() as session:
+        for query in queries:
+            plan = session.run(f"EXPLAIN {query}", rows=[]).consume().plan or {}
+            for detail in _index_seeks(plan):
+                for statement in statements:
+                    signature = f":{statement['label']}({', '.join(statement['properties'])})"
+                    if signature in detail:
+                        usage[statement["name"]].append(query)
+    return usage
+
+
+if __name__ == "__main__":
+    for item in bootstrap_schema():
+        print(f"{item['status']:>5}  {item['name']}")
+    for name, queries in index_usage().items():
+        print(f"{len(queries):>5}  {name}")
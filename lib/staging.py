@@ -0,0 +1,625 @@
+"""
+Staging for extraction payloads. Every entity and relationship is checked against types.py
+(the EntityType literal, the declared property types and Entity's provenance fields) and
+repaired or rejected before anything is written. Accepted entities are held column-wise
+per label and relationships column-wise per (source, target) label pair: each column is an
+array of 4-byte codes into that column's distinct values, which is much smaller than a list
+of dicts while payloads wait between pipeline stages, and rows come back out already in the
+groups lib.db's batched UNWIND writes need.
+
+    python -m lib.staging data/db_objects.json
+"""
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+from array import array
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional
+
+from lib.db import DEFAULT_BATCH_SIZE, _write_groups, build_unwind_relationship_query, entity_group_queries, graph_session, scope_endpoints
+from lib.numeric import enrich_entity
+from lib.schema import DOC_KEY, identifier_keys, load_entity_types, load_property_types, load_provenance_fields, node_keys
+from lib.tracing import span
+
+MAX_ISSUE_SAMPLES = 20
+
+_RELATIONSHIP_TYPE = re.compile(r"^[A-Z][A-Z0-9_]*$")
+_lock = threading.Lock()
+_totals: Counter = Counter()
+_samples: list[dict] = []
+
+
+class StagingError(ValueError):
+    """
+    A row that cannot be repaired; kind names the check it failed.
+    """
+
+    def __init__(self, kind: str, detail: str):
+        super().__init__(detail)
+        self.kind = kind
+
+
+def _fold(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+@lru_cache(maxsize=1)
+def _schema() -> dict:
+    labels = load_entity_types()
+    return {
+        "labels": set(labels),
+        "folded": {_fold(label): label for label in labels},
+        "properties": load_property_types(),
+        "provenance": tuple(load_provenance_fields()),
+        # Identifiers are matched by value across entities and relationship endpoints, so they
+        # are always strings: a part_id of 100 in one row and "100" in another would not join.
+        "ids": {DOC_KEY, "source_view_id"} | {key for keys in identifier_keys().values() for key in keys},
+        # The keys bulk loads MERGE on; a row without them could only be created, never updated.
+        "keys": node_keys(),
+    }
+
+
+def _label(name: Any, repairs: set) -> str:
+    schema = _schema()
+    if isinstance(name, str):
+        if name in schema["labels"]:
+            return name
+        label = schema["folded"].get(_fold(name))
+        if label is not None:
+            repairs.add("label_spelling")
+            return label
+    raise StagingError("unknown_label", f"unknown entity type {name!r}")
+
+
+def _scalar(value: Any) -> bool:
+    return isinstance(value, (str, int, float, bool))
+
+
+def _text(value: str, repairs: set) -> str:
+    stripped = value.strip()
+    if stripped is not value:
+        repairs.add("whitespace")
+    return stripped
+
+
+@lru_cache(maxsize=1024)
+def _relationship_type(name: str) -> str:
+    """
+    The folded type, or "" when it is still not a valid relationship type.
+    """
+    folded = re.sub(r"[^A-Z0-9]+", "_", name.strip().upper()).strip("_")
+    return sys.intern(folded) if _RELATIONSHIP_TYPE.match(folded) else ""
+
+
+def _normalize_value(value: Any, expected: Optional[type], repairs: set) -> Any:
+    """
+    A value Neo4j can store as a property: a string, number or boolean, or a list of one of
+    those. Declared strings are coerced, lists of mixed ints and floats become floats, and
+    maps or nested lists are JSON-encoded.
+    """
+    if isinstance(value, str):
+        return _text(value, repairs)
+    if _scalar(value):
+        if expected is str:
+            repairs.add("coerced_str")
+            return str(value)
+        return value
+    if isinstance(value, (list, tuple)):
+        first = type(value[0]) if value else None
+        if expected is not str and (first is int or first is float) and all(type(item) is first for item in value):
+            return list(value)
+        if all(_scalar(item) for item in value):
+            if expected is str:
+                repairs.add("joined_list")
+                return ", ".join(str(item).strip() for item in value)
+            kinds = {bool if isinstance(item, bool) else float if isinstance(item, (int, float)) else str for item in value}
+            if len(kinds) <= 1:
+                if any(isinstance(item, float) for item in value) and any(type(item) is int for item in value):
+                    repairs.add("coerced_number")
+                    return [float(item) for item in value]
+                return [_text(item, repairs) if isinstance(item, str) else item for item in value]
+    repairs.add("json_encoded")
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, default=str)
+
+
+def _normalize_properties(raw: dict, declared: dict, ids: set, repairs: set) -> dict:
+    """
+    Values are not interned: Columns stores each distinct value once per column anyway.
+    """
+    properties = {}
+    for key, value in raw.items():
+        if type(value) is str:
+            # Strings are most values; this is _text inlined. str.strip returns the same
+            # object when there is nothing to strip.
+            text = value.strip()
+            if text is not value:
+                repairs.add("whitespace")
+        elif value is None:
+            continue
+        else:
+            text = None
+        name = key.strip() if type(key) is str else str(key)
+        if name is not key and name != key:
+            repairs.add("key_name")
+        if not name:
+            repairs.add("dropped_value")
+            continue
+        properties[name] = text if text is not None else _normalize_value(value, str if name in ids else declared.get(name), repairs)
+    return properties
+
+
+def normalize_entity(entity: Any) -> tuple[str, dict, set[str]]:
+    """
+    Returns the entity's label, its normalized properties (provenance fields given next to
+    type/properties moved inside, numeric Dimension fields added) and the kinds of repair
+    applied. Raises StagingError for an entity that cannot be repaired, including one
+    without source_doc_id or its type's identifier keys (lib.schema.node_keys).
+    """
+    if not isinstance(entity, dict):
+        raise StagingError("not_an_object", "entity is not an object")
+    schema = _schema()
+    repairs: set[str] = set()
+    label = _label(entity.get("type"), repairs)
+    raw = entity.get("properties")
+    if raw is None:
+        raw = {}
+    if not isinstance(raw, dict):
+        raise StagingError("bad_properties", f"{label} properties is not an object")
+    if len(entity) != 2 or "properties" not in entity:
+        raw = dict(raw)
+        for field in schema["provenance"]:
+            if entity.get(field) is not None and raw.get(field) is None:
+                raw[field] = entity[field]
+                repairs.add("provenance_hoisted")
+    properties = _normalize_properties(raw, schema["properties"].get(label, {}), schema["ids"], repairs)
+    if not properties:
+        raise StagingError("no_properties", f"{label} has no properties to write")
+    missing = [key for key in schema["keys"].get(label, (DOC_KEY,)) if key not in properties]
+    if missing:
+        raise StagingError("missing_key", f"{label} has no {', '.join(missing)}, so it cannot be merged")
+    if label == "Dimension":
+        properties = enrich_entity({"type": label, "properties": properties})["properties"]
+    return label, properties, repairs
+
+
+_NO_DECLARED: dict = {}
+
+
+def normalize_relationship(relationship: Any) -> tuple[str, str, str, dict, dict, set[str]]:
+    """
+    Returns (source label, relationship type, target label, source keys, target keys, repairs).
+    The type is upper-cased with runs of other characters folded to "_". An endpoint without
+    source_doc_id gets the other endpoint's (lib.db.scope_endpoints), and both must then carry
+    their type's node key, so an edge can only join nodes of one drawing; an empty map would
+    MATCH every node of the label. Raises StagingError for a relationship that cannot be
+    repaired.
+    """
+    if not isinstance(relationship, dict):
+        raise StagingError("not_an_object", "relationship is not an object")
+    schema = _schema()
+    ids = schema["ids"]
+    repairs: set[str] = set()
+    source = _label(relationship.get("source"), repairs)
+    target = _label(relationship.get("target"), repairs)
+    name = relationship.get("relationship")
+    folded = _relationship_type(name) if isinstance(name, str) else ""
+    if not folded:
+        raise StagingError("bad_relationship_type", f"invalid relationship type {name!r}")
+    if folded != name:
+        repairs.add("relationship_type")
+    endpoints = []
+    for side, label in (("source_properties", source), ("target_properties", target)):
+        raw = relationship.get(side)
+        if type(raw) is not dict:
+            raise StagingError("bad_endpoint", f"{side} is not an object")
+        properties = _normalize_properties(raw, _NO_DECLARED, ids, repairs)
+        if not properties:
+            raise StagingError("unbounded_endpoint", f"{side} is empty, so it would match every {label} node")
+        endpoints.append(properties)
+    source_keys, target_keys = scope_endpoints(endpoints[0], endpoints[1])
+    for side, label, properties in (("source_properties", source, source_keys), ("target_properties", target, target_keys)):
+        missing = [key for key in schema["keys"].get(label, (DOC_KEY,)) if key not in properties]
+        if missing:
+            raise StagingError("missing_key", f"{side} has no {', '.join(missing)}, so it could match {label} nodes of other drawings")
+    return source, folded, target, source_keys, target_keys, repairs
+
+
+def _value_key(value: Any) -> Any:
+    """
+    The dictionary key a column stores a non-string value under (strings are their own key):
+    tagged with its type so True, 1 and 1.0 stay distinct, with lists as tuples.
+    """
+    return (type(value), tuple(value) if type(value) is list else value)
+
+
+class Columns:
+    """
+    Property maps stored column-wise. Each column is dictionary-encoded: an array of 4-byte
+    codes into the column's distinct values, 0 where a row lacks the key. A column's array
+    stops at its last present row; rows past the end are absent. Each row's sorted key set
+    (its "shape") is kept as an index into shapes.
+    """
+
+    __slots__ = ("keys", "codes", "values", "_encoders", "shapes", "shape_ids", "_shape_index")
+
+    def __init__(self):
+        self.keys: dict[str, int] = {}
+        self.codes: list[array] = []
+        self.values: list[list] = []
+        self._encoders: dict[str, tuple[array, list, dict]] = {}
+        self.shapes: list[tuple[str, ...]] = []
+        self.shape_ids = array("I")
+        self._shape_index: dict[tuple[str, ...], int] = {}
+
+    def __len__(self) -> int:
+        return len(self.shape_ids)
+
+    def _encoder(self, key: str) -> tuple[array, list, dict]:
+        index = self.keys.get(key)
+        if index is None:
+            index = self.keys[key] = len(self.codes)
+            self.codes.append(array("I"))
+            self.values.append([None])
+        values = self.values[index]
+        lookup = {value if type(value) is str else _value_key(value): code for code, value in enumerate(values) if code}
+        encoder = self._encoders[key] = (self.codes[index], values, lookup)
+        return encoder
+
+    def compact(self) -> None:
+        """
+        Drops the value-to-code lookups append uses, which for a column of unique
+        identifiers are larger than the column itself. A later append rebuilds them.
+        """
+        self._encoders = {}
+
+    def append(self, properties: dict) -> None:
+        row = len(self.shape_ids)
+        encoders = self._encoders
+        for key, value in properties.items():
+            encoder = encoders.get(key) or self._encoder(key)
+            codes, values, lookup = encoder
+            if len(codes) != row:
+                codes.frombytes(bytes(codes.itemsize * (row - len(codes))))
+            value_key = value if type(value) is str else _value_key(value)
+            code = lookup.get(value_key)
+            if code is None:
+                code = lookup[value_key] = len(values)
+                values.append(value)
+            codes.append(code)
+        # Rows from one payload mostly list their keys in the same order, so the unsorted
+        # tuple finds the shape without sorting.
+        order = tuple(properties)
+        shape_id = self._shape_index.get(order)
+        if shape_id is None:
+            shape = tuple(sorted(order))
+            shape_id = self._shape_index.get(shape)
+            if shape_id is None:
+                shape_id = self._shape_index[shape] = len(self.shapes)
+                self.shapes.append(shape)
+            self._shape_index[order] = shape_id
+        self.shape_ids.append(shape_id)
+
+    def row(self, index: int) -> dict:
+        row = {}
+        for key in self.shapes[self.shape_ids[index]]:
+            column = self.keys[key]
+            row[key] = self.values[column][self.codes[column][index]]
+        return row
+
+    def rows(self) -> Iterator[dict]:
+        return (self.row(index) for index in range(len(self)))
+
+    def column(self, key: str) -> list:
+        """
+        One value per row, None where the row lacks key.
+        """
+        if key not in self.keys:
+            return []
+        index = self.keys[key]
+        values = self.values[index]
+        codes = self.codes[index]
+        return [values[code] for code in codes] + [None] * (len(self) - len(codes))
+
+    def distinct(self, key: str) -> list:
+        """
+        The distinct values of key's column, without decoding the rows.
+        """
+        return self.values[self.keys[key]][1:] if key in self.keys else []
+
+    def groups(self) -> dict[tuple[str, ...], list[dict]]:
+        """
+        Rows grouped by shape, the grouping lib.db.group_entities makes for UNWIND.
+        """
+        groups: dict = {}
+        for index, shape_id in enumerate(self.shape_ids):
+            groups.setdefault(self.shapes[shape_id], []).append(self.row(index))
+        return groups
+
+
+class RelationshipColumns:
+    """
+    Relationships between one (source, target) label pair: their types (as codes into
+    type_names) and both endpoints' key maps, each column-wise.
+    """
+
+    __slots__ = ("type_ids", "type_names", "_type_index", "source", "target")
+
+    def __init__(self):
+        self.type_ids = array("I")
+        self.type_names: list[str] = []
+        self._type_index: dict[str, int] = {}
+        self.source = Columns()
+        self.target = Columns()
+
+    def __len__(self) -> int:
+        return len(self.type_ids)
+
+    @property
+    def types(self) -> list[str]:
+        return [self.type_names[type_id] for type_id in self.type_ids]
+
+    def append(self, relationship_type: str, source: dict, target: dict) -> None:
+        type_id = self._type_index.get(relationship_type)
+        if type_id is None:
+            type_id = self._type_index[relationship_type] = len(self.type_names)
+            self.type_names.append(relationship_type)
+        self.type_ids.append(type_id)
+        self.source.append(source)
+        self.target.append(target)
+
+
+def _new_report() -> dict:
+    return {
+        "entities": 0,
+        "relationships": 0,
+        "staged_entities": 0,
+        "staged_relationships": 0,
+        "repaired": 0,
+        "rejected": 0,
+        "issues": Counter(),
+        "samples": [],
+        "elapsed_ms": 0.0,
+    }
+
+
+class StagedPayload:
+    """
+    A validated extraction payload: entities in one Columns per label, relationships in one
+    RelationshipColumns per (source, target) label pair, and a report of what was repaired
+    or rejected (report["samples"] keeps the first MAX_ISSUE_SAMPLES with the item and why).
+    """
+
+    def __init__(self):
+        self.entities: dict[str, Columns] = {}
+        self.relationships: dict[tuple[str, str], RelationshipColumns] = {}
+        self.report = _new_report()
+
+    def _note(self, item: str, repairs: set, error: Optional[StagingError] = None) -> None:
+        if error is None and not repairs:
+            return
+        kinds = [error.kind] if error is not None else sorted(repairs)
+        if error is not None:
+            self.report["rejected"] += 1
+        elif repairs:
+            self.report["repaired"] += 1
+        self.report["issues"].update(kinds)
+        if kinds and len(self.report["samples"]) < MAX_ISSUE_SAMPLES:
+            self.report["samples"].append({
+                "item": item,
+                "action": "rejected" if error is not None else "repaired",
+                "kinds": kinds,
+                "detail": str(error) if error is not None else None,
+            })
+
+    def validate_entity(self, entity: Any, index: int) -> Optional[dict]:
+        """
+        The normalized entity, or None if it was rejected; either way it is counted in the
+        report. Does not buffer it (see add_entity).
+        """
+        self.report["entities"] += 1
+        try:
+            label, properties, repairs = normalize_entity(entity)
+        except StagingError as e:
+            self._note(f"entities[{index}]", set(), e)
+            return None
+        self._note(f"entities[{index}]", repairs)
+        return {"type": label, "properties": properties}
+
+    def validate_relationship(self, relationship: Any, index: int) -> Optional[dict]:
+        self.report["relationships"] += 1
+        try:
+            source, relationship_type, target, source_keys, target_keys, repairs = normalize_relationship(relationship)
+        except StagingError as e:
+            self._note(f"relationships[{index}]", set(), e)
+            return None
+        self._note(f"relationships[{index}]", repairs)
+        return {
+            "source": source,
+            "relationship": relationship_type,
+            "target": target,
+            "source_properties": source_keys,
+            "target_properties": target_keys,
+        }
+
+    def add_entity(self, entity: Any, index: int) -> bool:
+        self.report["entities"] += 1
+        try:
+            label, properties, repairs = normalize_entity(entity)
+        except StagingError as e:
+            self._note(f"entities[{index}]", set(), e)
+            return False
+        self._note(f"entities[{index}]", repairs)
+        columns = self.entities.get(label)
+        if columns is None:
+            columns = self.entities[label] = Columns()
+        columns.append(properties)
+        self.report["staged_entities"] += 1
+        return True
+
+    def add_relationship(self, relationship: Any, index: int) -> bool:
+        self.report["relationships"] += 1
+        try:
+            source, relationship_type, target, source_keys, target_keys, repairs = normalize_relationship(relationship)
+        except StagingError as e:
+            self._note(f"relationships[{index}]", set(), e)
+            return False
+        self._note(f"relationships[{index}]", repairs)
+        bucket = self.relationships.get((source, target))
+        if bucket is None:
+            bucket = self.relationships[(source, target)] = RelationshipColumns()
+        bucket.append(relationship_type, source_keys, target_keys)
+        self.report["staged_relationships"] += 1
+        return True
+
+    def entity_groups(self) -> dict:
+        """
+        The staged entities grouped as lib.db.group_entities groups them: keyed upserts for
+        rows carrying their node key, (label, keys) groups for the rest.
+        """
+        merge_keys = node_keys()
+        groups: dict = {}
+        for label, columns in self.entities.items():
+            keys = merge_keys.get(label)
+            for shape, rows in columns.groups().items():
+                if keys is not None and set(keys).issubset(shape):
+                    groups.setdefault(("upsert", label, keys), []).extend(
+                        {"key": {key: row[key] for key in keys}, "properties": row} for row in rows
+                    )
+                else:
+                    groups[(label, shape)] = rows
+        return groups
+
+    def relationship_groups(self) -> dict:
+        """
+        {(source, type, target, source keys, target keys): [{"source", "target"}, ...]}, as
+        lib.db.group_relationships returns.
+        """
+        groups: dict = {}
+        for (source, target), bucket in self.relationships.items():
+            for index, type_id in enumerate(bucket.type_ids):
+                source_keys = bucket.source.row(index)
+                target_keys = bucket.target.row(index)
+                key = (source, bucket.type_names[type_id], target, bucket.source.shapes[bucket.source.shape_ids[index]], bucket.target.shapes[bucket.target.shape_ids[index]])
+                groups.setdefault(key, []).append({"source": source_keys, "target": target_keys})
+        return groups
+
+    def payload(self, labels: Optional[Iterable[str]] = None) -> dict:
+        """
+        The staged rows as a plain {"entities", "relationships"} payload, for the loaders that
+        work on dicts. labels limits the entities (and drops relationships).
+        """
+        if labels is not None:
+            wanted = set(labels)
+            return {
+                "entities": [{"type": label, "properties": row} for label, columns in self.entities.items() if label in wanted for row in columns.rows()],
+                "relationships": [],
+            }
+        return {
+            "entities": [{"type": label, "properties": row} for label, columns in self.entities.items() for row in columns.rows()],
+            "relationships": [
+                {
+                    "source": source,
+                    "relationship": relationship_type,
+                    "target": target,
+                    "source_properties": bucket.source.row(index),
+                    "target_properties": bucket.target.row(index),
+                }
+                for (source, target), bucket in self.relationships.items()
+                for index, relationship_type in enumerate(bucket.types)
+            ],
+        }
+
+    def compact(self) -> None:
+        """
+        Frees the columns' append-time lookups (see Columns.compact) once staging is done.
+        """
+        for columns in self.entities.values():
+            columns.compact()
+        for bucket in self.relationships.values():
+            bucket.source.compact()
+            bucket.target.compact()
+
+    def documents(self) -> set[str]:
+        return {value for columns in self.entities.values() for value in columns.distinct(DOC_KEY)}
+
+
+def record_staging(report: dict) -> None:
+    """
+    Adds one payload's report to the totals staging_stats() returns.
+    """
+    with _lock:
+        for key in ("entities", "relationships", "staged_entities", "staged_relationships", "repaired", "rejected"):
+            _totals[key] += report[key]
+        _totals["payloads"] += 1
+        _totals["elapsed_ms"] += report["elapsed_ms"]
+        for kind, count in report["issues"].items():
+            _totals[f"issue:{kind}"] += count
+        _samples.extend(report["samples"][:MAX_ISSUE_SAMPLES - len(_samples)])
+
+
+def staging_stats() -> dict:
+    with _lock:
+        stats = {key: _totals[key] for key in ("payloads", "entities", "relationships", "staged_entities", "staged_relationships", "repaired", "rejected", "elapsed_ms")}
+        stats["issues"] = {key.split(":", 1)[1]: count for key, count in sorted(_totals.items()) if key.startswith("issue:")}
+        stats["samples"] = list(_samples)
+    return stats
+
+
+def reset_staging_stats() -> None:
+    with _lock:
+        _totals.clear()
+        _samples.clear()
+
+
+def stage_payload(db_objects: dict) -> StagedPayload:
+    """
+    Validates and normalizes an extraction payload into a StagedPayload, with no I/O.
+    Rejected rows are left out and reported; the report is added to staging_stats().
+    """
+    entities = db_objects.get("entities") or []
+    relationships = db_objects.get("relationships") or []
+    if not isinstance(entities, list) or not isinstance(relationships, list):
+        raise ValueError("entities and relationships must be lists")
+    start = time.perf_counter()
+    staged = StagedPayload()
+    with span("stage", entities=len(entities), relationships=len(relationships)) as stage_span:
+        for index, entity in enumerate(entities):
+            staged.add_entity(entity, index)
+        for index, relationship in enumerate(relationships):
+            staged.add_relationship(relationship, index)
+        staged.compact()
+        stage_span.set(repaired=staged.report["repaired"], rejected=staged.report["rejected"])
+    staged.report["elapsed_ms"] = 1000 * (time.perf_counter() - start)
+    record_staging(staged.report)
+    return staged
+
+
+def write_staged(staged: StagedPayload, batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    """
+    Writes a StagedPayload with the UNWIND statements lib.db.bulk_load uses, nodes before
+    relationships; returns per-batch counters in the same shape.
+    """
+    node_groups = staged.entity_groups()
+    relationship_groups = staged.relationship_groups()
+    with graph_session():
+        return {
+            "nodes": _write_groups(entity_group_queries(node_groups), node_groups, batch_size),
+            "relationships": _write_groups(
+                {key: ("-".join(key[:3]), build_unwind_relationship_query(*key)) for key in relationship_groups},
+                relationship_groups,
+                batch_size,
+            ),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate an extraction payload without writing it.")
+    parser.add_argument("payload", type=Path)
+    args = parser.parse_args()
+    stage_payload(json.loads(args.payload.read_text(encoding="utf-8")))
+    print(json.dumps(staging_stats(), indent=2))
@@ -0,0 +1,330 @@
+"""
+Lightweight tracing: spans with durations and attributes, written as JSON lines or as
+OTLP/JSON (the OpenTelemetry file exporter format, one ExportTraceServiceRequest per line).
+Off unless TRACE_FILE is set or configure() is called; a disabled span() is a shared no-op.
+
+    python pipeline.py drawings/ --trace trace.jsonl        # or TRACE_FILE=trace.jsonl
+    python lib/tracing.py trace.jsonl --top 10
+"""
+import argparse
+import atexit
+import contextvars
+import json
+import os
+import random
+import re
+import statistics
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+FORMATS = ("jsonl", "otlp")
+FLUSH_EVERY = 256
+MAX_ATTRIBUTE_CHARS = 500
+SERVICE_NAME = "tech-doc-reasoner"
+
+_current: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+_lock = threading.Lock()
+_exporter: Optional["SpanExporter"] = None
+_configured = False
+
+
+class SpanExporter:
+    """
+    Buffers finished spans and appends them to path, FLUSH_EVERY at a time and at exit.
+    """
+
+    def __init__(self, path: str | Path, trace_format: str = "jsonl"):
+        if trace_format not in FORMATS:
+            raise ValueError(f"unknown trace format {trace_format!r}; expected one of {FORMATS}")
+        self.path = Path(path)
+        self.format = trace_format
+        self._buffer: list[dict] = []
+
+    def export(self, record: dict) -> None:
+        with _lock:
+            self._buffer.append(record)
+            if len(self._buffer) >= FLUSH_EVERY:
+                self._flush_locked()
+
+    def flush(self) -> None:
+        with _lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._buffer:
+            return
+        if self.format == "otlp":
+            lines = [json.dumps(to_otlp(self._buffer), ensure_ascii=False)]
+        else:
+            lines = [json.dumps(record, ensure_ascii=False, default=str) for record in self._buffer]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as handle:
+            handle.write("\n".join(lines) + "\n")
+        self._buffer = []
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attributes", "start_ns", "_start", "_token")
+
+    def __init__(self, name: str, attributes: dict):
+        parent = _current.get()
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = attributes
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self)
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        duration_ms = 1000 * (time.perf_counter() - self._start)
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # Closed from another context, e.g. a streaming generator abandoned mid-stream.
+            pass
+        exporter = _exporter
+        if exporter is None:
+            return
+        record = {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_unix_ns": self.start_ns,
+            "duration_ms": duration_ms,
+            "attributes": {key: _attribute(value) for key, value in self.attributes.items() if value is not None},
+            "status": "ok" if exc_type is None else "error",
+        }
+        if exc is not None:
+            record["error"] = _attribute(f"{exc_type.__name__}: {exc}")
+        exporter.export(record)
+
+
+class _NoopSpan:
+    def set(self, **attributes) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def _attribute(value: Any) -> Any:
+    if isinstance(value, (bool, int, float)):
+        return value
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+    return text if len(text) <= MAX_ATTRIBUTE_CHARS else text[:MAX_ATTRIBUTE_CHARS] + "..."
+
+
+def configure(path: Optional[str | Path] = None, trace_format: Optional[str] = None) -> None:
+    """
+    Starts (or, with no path and no TRACE_FILE, stops) exporting spans. Defaults come from
+    TRACE_FILE and TRACE_FORMAT (jsonl or otlp).
+    """
+    global _exporter, _configured
+    path = path or os.getenv("TRACE_FILE")
+    if _exporter is not None:
+        _exporter.flush()
+    _exporter = SpanExporter(path, trace_format or os.getenv("TRACE_FORMAT", "jsonl")) if path else None
+    _configured = True
+
+
+def enabled() -> bool:
+    if not _configured:
+        configure()
+    return _exporter is not None
+
+
+def span(name: str, /, **attributes):
+    """
+    Context manager timing one unit of work. Spans opened inside it (on the same thread or
+    in a context copied with contextvars.copy_context) become its children. Attributes can
+    be added while it runs with .set(); None values are dropped.
+    """
+    if not enabled():
+        return _NOOP
+    return Span(name, attributes)
+
+
+def flush() -> None:
+    if _exporter is not None:
+        _exporter.flush()
+
+
+atexit.register(flush)
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(records: list[dict]) -> dict:
+    spans = []
+    for record in records:
+        end_ns = record["start_unix_ns"] + int(record["duration_ms"] * 1_000_000)
+        item = {
+            "traceId": record["trace_id"],
+            "spanId": record["span_id"],
+            "name": record["name"],
+            "kind": 1,
+            "startTimeUnixNano": str(record["start_unix_ns"]),
+            "endTimeUnixNano": str(end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in record["attributes"].items()],
+            "status": {"code": 1} if record["status"] == "ok" else {"code": 2, "message": record.get("error", "")},
+        }
+        if record["parent_id"]:
+            item["parentSpanId"] = record["parent_id"]
+        spans.append(item)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "lib.tracing"}, "spans": spans}],
+        }]
+    }
+
+
+def _from_otlp_value(value: dict) -> Any:
+    if "intValue" in value:
+        return int(value["intValue"])
+    for key in ("boolValue", "doubleValue", "stringValue"):
+        if key in value:
+            return value[key]
+    return None
+
+
+def _from_otlp(request: dict) -> Iterator[dict]:
+    for resource_spans in request.get("resourceSpans", []):
+        for scope_spans in resource_spans.get("scopeSpans", []):
+            for item in scope_spans.get("spans", []):
+                start = int(item["startTimeUnixNano"])
+                yield {
+                    "trace_id": item["traceId"],
+                    "span_id": item["spanId"],
+                    "parent_id": item.get("parentSpanId"),
+                    "name": item["name"],
+                    "start_unix_ns": start,
+                    "duration_ms": (int(item["endTimeUnixNano"]) - start) / 1_000_000,
+                    "attributes": {attribute["key"]: _from_otlp_value(attribute["value"]) for attribute in item.get("attributes", [])},
+                    "status": "error" if item.get("status", {}).get("code") == 2 else "ok",
+                }
+
+
+def read_spans(path: str | Path) -> Iterator[dict]:
+    """
+    Reads a trace file in either format.
+    """
+    with Path(path).open(encoding="utf-8") as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "resourceSpans" in record:
+                yield from _from_otlp(record)
+            else:
+                yield record
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))]
+
+
+def _normalize_statement(cypher: str) -> str:
+    return re.sub(r"\s+", " ", cypher).strip()
+
+
+def summarize(records: Iterator[dict], top: int = 10) -> dict:
+    """
+    Per span name: count, total, p50, p95 and max duration, sorted by total time. Cypher
+    spans are also grouped by statement text, with the server's result_available_after_ms.
+    """
+    stages: dict[str, list[float]] = defaultdict(list)
+    statements: dict[str, dict] = defaultdict(lambda: {"durations": [], "server_ms": [], "rows": 0})
+    errors: dict[str, int] = defaultdict(int)
+    for record in records:
+        stages[record["name"]].append(record["duration_ms"])
+        if record["status"] == "error":
+            errors[record["name"]] += 1
+        statement = record["attributes"].get("cypher")
+        if statement:
+            entry = statements[_normalize_statement(statement)]
+            entry["durations"].append(record["duration_ms"])
+            entry["rows"] += record["attributes"].get("rows", 0)
+            if record["attributes"].get("result_available_after_ms") is not None:
+                entry["server_ms"].append(record["attributes"]["result_available_after_ms"])
+
+    def describe(durations: list[float]) -> dict:
+        return {
+            "count": len(durations),
+            "total_ms": sum(durations),
+            "p50_ms": statistics.median(durations),
+            "p95_ms": _percentile(durations, 95),
+            "max_ms": max(durations),
+        }
+
+    stage_rows = sorted(
+        ({"name": name, "errors": errors.get(name, 0), **describe(durations)} for name, durations in stages.items()),
+        key=lambda row: row["total_ms"],
+        reverse=True,
+    )
+    statement_rows = sorted(
+        (
+            {
+                "cypher": cypher,
+                "rows": entry["rows"],
+                "server_p95_ms": _percentile(entry["server_ms"], 95) if entry["server_ms"] else None,
+                **describe(entry["durations"]),
+            }
+            for cypher, entry in statements.items()
+        ),
+        key=lambda row: row["total_ms"],
+        reverse=True,
+    )
+    return {"stages": stage_rows, "statements": statement_rows[:top]}
+
+
+def print_summary(summary: dict) -> None:
+    print(f"{'stage':<22} {'count':>7} {'total ms':>10} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'errors':>6}")
+    for row in summary["stages"]:
+        print(
+            f"{row['name']:<22} {row['count']:>7} {row['total_ms']:>10.1f} {row['p50_ms']:>9.2f} "
+            f"{row['p95_ms']:>9.2f} {row['max_ms']:>9.2f} {row['errors']:>6}"
+        )
+    print()
+    print("slowest statements (by total time)")
+    for row in summary["statements"]:
+        server = f"{row['server_p95_ms']:.0f}" if row["server_p95_ms"] is not None else "-"
+        print(
+            f"{row['total_ms']:>10.1f} ms  n={row['count']:<5} p95={row['p95_ms']:.2f} ms  "
+            f"server p95={server} ms  rows={row['rows']}  {row['cypher'][:120]}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a trace file written with TRACE_FILE.")
+    parser.add_argument("trace", type=Path)
+    parser.add_argument("--top", type=int, default=10, help="Number of statements to list.")
+    args = parser.parse_args()
+    print_summary(summarize(read_spans(args.trace), top=args.top))
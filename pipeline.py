@@ -1,12 +1,42 @@
 from __future__ import annotations
 
+import argparse
+import glob
 import json
+import queue
 import re
+import threading
+import time
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Iterable, Iterator
 
-from ai.client import call_openai_with_image
-from lib.db import create_node, create_relationship
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from ai.client import (
+    call_openai_with_image,
+    call_openai_with_image_bytes,
+    get_extraction_cache,
+    preprocess_reports,
+)
+from lib.conflicts import changed_documents, materialize_conflicts
+from lib.incremental import load_incremental
+from lib.json_stream import extract_first_json
+from lib.pdf import PdfPage, assign_document, iter_pages
+from lib.resolution import resolution_stats, resolve_entities
+from lib.schema import RESOLVED_LABELS, bootstrap_schema
+from lib.staging import StagedPayload, stage_payload, staging_stats, write_staged
+from lib import tracing
+from lib.tracing import span
+from lib.db import (
+    DEFAULT_BATCH_SIZE,
+    create_node,
+    create_relationship,
+    graph_session,
+    statement_cache_stats,
+)
 
 def extract_json_from_text(text: str) -> Any | None:
     code_fence_pattern = re.compile(r"```(?:json)?\s*([\s\S]*?)```", re.IGNORECASE)
@@ -19,20 +49,273 @@ def extract_json_from_text(text: str) -> Any | None:
         except json.JSONDecodeError:
             continue
 
-    decoder = json.JSONDecoder()
-    for index, char in enumerate(text):
-        if char not in "{[":
-            continue
+    return extract_first_json([text])
+
+def load_db_objects(
+    db_objects: dict | StagedPayload,
+    bulk: bool = True,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    incremental: bool = False,
+    conflicts: bool = True,
+    resolve: bool = True,
+) -> dict | None:
+    """
+    Loads one extraction payload, links its materials, processes, welds and parts to their
+    shared canonical nodes (lib.resolution), then re-materializes CONFLICTS_WITH edges for its
+    documents (lib.conflicts). Incremental loads only re-check documents whose diff wrote
+    something. All writes for the payload share one graph session.
+    A plain payload is validated and normalized first (lib.staging), so rows that cannot be
+    repaired are dropped before any write; bulk loads write from the staged columns.
+    """
+    staged = db_objects if isinstance(db_objects, StagedPayload) else stage_payload(db_objects)
+    with span(
+        "load",
+        entities=staged.report["staged_entities"],
+        relationships=staged.report["staged_relationships"],
+        rejected=staged.report["rejected"],
+        mode="incremental" if incremental else "bulk" if bulk else "single",
+    ), graph_session():
+        if incremental:
+            db_objects = staged.payload()
+            documents = load_incremental(db_objects, batch_size=batch_size)
+            if resolve:
+                resolve_entities(db_objects, batch_size=batch_size)
+            if conflicts:
+                for doc_id, report in materialize_conflicts(changed_documents(documents), batch_size=batch_size).items():
+                    documents[doc_id]["conflicts"] = report
+            return documents
+        if bulk:
+            summary = write_staged(staged, batch_size=batch_size)
+            summary["staging"] = staged.report
+            if resolve:
+                summary["resolution"] = resolve_entities(staged.payload(RESOLVED_LABELS), batch_size=batch_size)
+            if conflicts:
+                summary["conflicts"] = materialize_conflicts(staged.documents(), batch_size=batch_size)
+            return summary
+        db_objects = staged.payload()
+        for entity in db_objects["entities"]:
+            create_node(entity["type"], entity["properties"])
+        for relationship in db_objects["relationships"]:
+            source = relationship["source"]
+            target = relationship["target"]
+            source_properties = relationship["source_properties"]
+            target_properties = relationship["target_properties"]
+            create_relationship(source, source_properties, relationship["relationship"], target, target_properties)
+        if resolve:
+            resolve_entities(db_objects, batch_size=batch_size)
+        if conflicts:
+            materialize_conflicts(staged.documents(), batch_size=batch_size)
+        return None
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+PDF_SUFFIXES = {".pdf"}
+_DONE = object()
+
+def discover_drawings(source: str) -> list[Path]:
+    """
+    Expands a directory (non-recursive) or a glob pattern into a sorted list of image and PDF paths.
+    """
+    path = Path(source)
+    if path.is_dir():
+        candidates = path.iterdir()
+    else:
+        candidates = (Path(match) for match in glob.glob(source, recursive=True))
+    return sorted(candidate for candidate in candidates if candidate.suffix.lower() in IMAGE_SUFFIXES | PDF_SUFFIXES)
+
+def expand_pages(paths: Iterable[Path]) -> Iterator[Path | PdfPage]:
+    """
+    Yields image paths as they are and each PDF as one PdfPage per sheet. Pages are
+    produced lazily, so a package is never rasterized or held in memory as a whole.
+    """
+    for path in paths:
+        if path.suffix.lower() in PDF_SUFFIXES:
+            yield from iter_pages(path)
+        else:
+            yield path
+
+def extract_pdf_page(page: PdfPage, use_cache: bool = True) -> str:
+    return call_openai_with_image_bytes(page.render(), "image/png", str(page), use_cache=use_cache)
+
+def _parse_payload(text: str) -> dict:
+    with span("json.extract", chars=len(text)) as parse_span:
+        payload = extract_json_from_text(text)
+        if not isinstance(payload, dict):
+            raise ValueError("no JSON object in model output")
+        parse_span.set(entities=len(payload.get("entities", [])), relationships=len(payload.get("relationships", [])))
+    return payload
+
+def _new_stage_stats(workers: int) -> dict:
+    return {"workers": workers, "items": 0, "errors": [], "busy_s": 0.0, "latencies_ms": [], "first_start": None, "last_end": None}
+
+def _stage_worker(name: str, fn: Callable, inbox: queue.Queue, outbox: queue.Queue | None, stats: dict, lock: threading.Lock) -> None:
+    while True:
+        item = inbox.get()
+        if item is _DONE:
+            inbox.put(_DONE)
+            return
+        path, value = item
+        start = time.perf_counter()
         try:
-            result, _ = decoder.raw_decode(text[index:])
-        except json.JSONDecodeError:
-            continue
-        return result
+            with span(f"stage.{name}", item=str(path)):
+                result = fn(path, value)
+        except Exception as e:
+            result = _DONE
+            with lock:
+                stats["errors"].append({"path": str(path), "error": str(e)})
+        end = time.perf_counter()
+        with lock:
+            stats["items"] += 1
+            stats["busy_s"] += end - start
+            stats["latencies_ms"].append(1000 * (end - start))
+            stats["first_start"] = start if stats["first_start"] is None else min(stats["first_start"], start)
+            stats["last_end"] = end if stats["last_end"] is None else max(stats["last_end"], end)
+        if result is not _DONE and outbox is not None:
+            outbox.put((path, result))
 
-    return None
+def _finish_stage_stats(stats: dict) -> dict:
+    wall = (stats.pop("last_end") or 0.0) - (stats.pop("first_start") or 0.0)
+    stats["wall_s"] = wall
+    stats["items_per_s"] = stats["items"] / wall if wall > 0 else 0.0
+    return stats
 
-if __name__ == "__main__":
+def ingest_many(
+    paths: Iterable[Path | PdfPage],
+    extract: Callable[[str], str] = call_openai_with_image,
+    load: Callable[[StagedPayload], Any] = load_db_objects,
+    extract_page: Callable[[PdfPage], str] = extract_pdf_page,
+    extract_workers: int = 4,
+    parse_workers: int = 2,
+    write_workers: int = 1,
+    queue_size: int = 8,
+    output_dir: Path | None = None,
+) -> dict:
+    """
+    Runs extraction, JSON parsing and graph writes as overlapping stages.
+    Each stage has its own worker count; stages are joined by bounded queues of queue_size,
+    so a slow writer throttles parsing and extraction instead of buffering every response.
+    extract and load are injectable, which lets the pipeline run against a fake client and
+    an in-memory graph.
+    PDF pages (see expand_pages) are rendered inside the extract stage by extract_page and
+    scoped to their sheet's source_doc_id before loading, so each page is written as soon
+    as it is parsed and at most extract_workers rasters exist at a time.
+    The parse stage also validates each payload (lib.staging.stage_payload), so load
+    receives a StagedPayload and bad rows are dropped before the write stage.
+    Each stage's stats include latencies_ms, the time spent on every item; with tracing on
+    (lib/tracing.py) every item is also a "stage.<name>" span.
+    """
+    def extract_stage(path: Path | PdfPage, _) -> str:
+        text = extract_page(path) if isinstance(path, PdfPage) else extract(str(path))
+        if output_dir is not None:
+            (output_dir / f"{path.stem}.txt").write_text(text, encoding="utf-8")
+        return text
+
+    def parse_stage(path: Path | PdfPage, text: str) -> StagedPayload:
+        payload = _parse_payload(text)
+        return stage_payload(assign_document(payload, path) if isinstance(path, PdfPage) else payload)
+
+    if output_dir is not None:
+        output_dir.mkdir(parents=True, exist_ok=True)
+    stages = [
+        ("extract", extract_stage, extract_workers),
+        ("parse", parse_stage, parse_workers),
+        ("write", lambda _, payload: load(payload), write_workers),
+    ]
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    lock = threading.Lock()
+    stats = {}
+    threads = []
+    for index, (name, fn, workers) in enumerate(stages):
+        stats[name] = _new_stage_stats(workers)
+        outbox = queues[index + 1] if index + 1 < len(stages) else None
+        stage_threads = [
+            threading.Thread(target=_stage_worker, args=(name, fn, queues[index], outbox, stats[name], lock), daemon=True)
+            for _ in range(workers)
+        ]
+        for thread in stage_threads:
+            thread.start()
+        threads.append(stage_threads)
+
+    start = time.perf_counter()
+    count = 0
+    for path in paths:
+        queues[0].put((path, path))
+        count += 1
+    for index, stage_threads in enumerate(threads):
+        queues[index].put(_DONE)
+        for thread in stage_threads:
+            thread.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "drawings": count,
+        "loaded": stats["write"]["items"] - len(stats["write"]["errors"]),
+        "elapsed_s": elapsed,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else None,
+        "stages": {name: _finish_stage_stats(stage) for name, stage in stats.items()},
+    }
+
+def print_ingest_summary(summary: dict) -> None:
+    print(f"Loaded {summary['loaded']}/{summary['drawings']} drawings in {summary['elapsed_s']:.1f}s")
+    if summary.get("peak_rss_mb") is not None:
+        print(f"Peak RSS: {summary['peak_rss_mb']:.0f} MB")
+    for name, stage in summary["stages"].items():
+        print(
+            f"  {name:<8} workers={stage['workers']} items={stage['items']} errors={len(stage['errors'])} "
+            f"busy={stage['busy_s']:.1f}s wall={stage['wall_s']:.1f}s rate={stage['items_per_s']:.2f}/s"
+        )
+        for error in stage["errors"]:
+            print(f"    {error['path']}: {error['error']}")
+
+def print_resolution_summary(stats: dict) -> None:
+    """
+    Occurrences linked to canonical nodes by lib.resolution, per label.
+    """
+    if not stats["occurrences"]:
+        return
+    print(
+        f"Resolution: {stats['occurrences']} occurrences -> {stats['canonical']} canonical "
+        f"({stats['dedup_ratio']:.1%} deduplicated, {stats['fuzzy_matches']} fuzzy part matches "
+        f"in {stats['comparisons']} comparisons)"
+    )
+    for label, counts in stats["by_label"].items():
+        if counts["occurrences"]:
+            print(f"  {label:<9} {counts['occurrences']} -> {counts['canonical']}")
+
+def print_staging_summary(stats: dict) -> None:
+    """
+    Rows kept, repaired and rejected by lib.staging, by issue kind, with the first samples.
+    """
+    if not stats["payloads"]:
+        return
+    print(
+        f"Staging: {stats['staged_entities']}/{stats['entities']} entities, "
+        f"{stats['staged_relationships']}/{stats['relationships']} relationships kept; "
+        f"{stats['repaired']} repaired, {stats['rejected']} rejected in {stats['elapsed_ms']:.0f} ms"
+    )
+    for kind, count in stats["issues"].items():
+        print(f"  {kind:<22} {count}")
+    for sample in stats["samples"]:
+        detail = f": {sample['detail']}" if sample["detail"] else ""
+        print(f"    {sample['action']} {sample['item']} ({', '.join(sample['kinds'])}){detail}")
+
+def print_preprocess_summary(reports: dict[str, dict]) -> None:
+    """
+    Bytes read from disk vs bytes uploaded per drawing (see ai/preprocess.py).
+    """
+    if not reports:
+        return
+    before = sum(report["bytes_before"] for report in reports.values())
+    after = sum(report["bytes_after"] for report in reports.values())
+    print(f"Image bytes: {before} -> {after} ({after / before:.1%} of original)" if before else "Image bytes: 0")
+    for path, report in sorted(reports.items()):
+        print(
+            f"  {Path(path).name}: {report['bytes_before']} -> {report['bytes_after']} bytes, "
+            f"{report['tiles']} tile(s), {report['mime_type']}, {report['elapsed_ms']:.0f} ms"
+        )
+
+def _single_drawing() -> None:
     response = call_openai_with_image("data/Cage Filter.jpg")
+    print_preprocess_summary(preprocess_reports)
     output_path = Path("ai/output.txt")
     output_path.write_text(response, encoding="utf-8")
     json_payload = extract_json_from_text(response)
@@ -44,11 +327,55 @@ if __name__ == "__main__":
         )
     with open("./data/db_objects.json", "r") as f:
         db_objects = json.load(f)
-    for entity in db_objects["entities"]:
-        create_node(entity["type"], entity["properties"])
-    for relationship in db_objects["relationships"]:
-        source = relationship["source"]
-        target = relationship["target"]
-        source_properties = relationship["source_properties"]
-        target_properties = relationship["target_properties"]
-        create_relationship(source, source_properties, relationship["relationship"], target, target_properties)
+    bootstrap_schema()
+    load_summary = load_db_objects(db_objects)
+    for batch in load_summary["nodes"] + load_summary["relationships"]:
+        print(f"{batch['group']}: {batch['rows']} rows, {batch['counters']['nodes_created']} nodes, {batch['counters']['relationships_created']} relationships")
+    print(f"Statement cache hit rate: {statement_cache_stats()['hit_rate']:.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract technical drawings and load them into Neo4j.")
+    parser.add_argument("source", nargs="?", help="Directory or glob of drawing images and PDF packages. Omit to run the sample drawing.")
+    parser.add_argument("--extract-workers", type=int, default=4)
+    parser.add_argument("--parse-workers", type=int, default=2)
+    parser.add_argument("--write-workers", type=int, default=1)
+    parser.add_argument("--queue-size", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--output-dir", type=Path, default=Path("ai/output"))
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the on-disk extraction cache.")
+    parser.add_argument("--incremental", action="store_true", help="Diff each drawing against the graph and write only changes.")
+    parser.add_argument("--skip-conflicts", action="store_true", help="Do not re-materialize CONFLICTS_WITH edges after loading.")
+    parser.add_argument("--skip-resolution", action="store_true", help="Do not link entities to shared canonical nodes.")
+    parser.add_argument("--trace", type=Path, help="Write spans to this file (see lib/tracing.py); defaults to TRACE_FILE.")
+    parser.add_argument("--trace-format", choices=tracing.FORMATS, help="jsonl (default) or otlp.")
+    args = parser.parse_args()
+    if args.trace is not None:
+        tracing.configure(args.trace, args.trace_format)
+    if args.source is None:
+        _single_drawing()
+    else:
+        bootstrap_schema()
+        summary = ingest_many(
+            expand_pages(discover_drawings(args.source)),
+            extract=lambda path: call_openai_with_image(path, use_cache=not args.no_cache),
+            extract_page=lambda page: extract_pdf_page(page, use_cache=not args.no_cache),
+            load=lambda payload: load_db_objects(
+                payload,
+                batch_size=args.batch_size,
+                incremental=args.incremental,
+                conflicts=not args.skip_conflicts,
+                resolve=not args.skip_resolution,
+            ),
+            extract_workers=args.extract_workers,
+            parse_workers=args.parse_workers,
+            write_workers=args.write_workers,
+            queue_size=args.queue_size,
+            output_dir=args.output_dir,
+        )
+        print_ingest_summary(summary)
+        print_staging_summary(staging_stats())
+        print_resolution_summary(resolution_stats())
+        print_preprocess_summary(preprocess_reports)
+        cache_stats = get_extraction_cache().stats()
+        print(f"Extraction cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['bytes']} bytes")
+        print(f"Statement cache hit rate: {statement_cache_stats()['hit_rate']:.2f}")
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class ReasoningService:
+    """
+    Runs many reasoning sessions on one event loop. At most max_concurrency questions are
+    answered at once; the rest wait on a semaphore and their queue time is recorded. Each
+    question gets timeout_s from arrival (queue time included).
+    """
+
+    def __init__(self, answer: Callable[[str], Awaitable[str]], max_concurrency: int = 16, timeout_s: float = 120.0):
+        self.answer = answer
+        self.max_concurrency = max_concurrency
+        self.timeout_s = timeout_s
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.queue_ms: list[float] = []
+        self.latency_ms: list[float] = []
+
+    async def _answer(self, question: str, arrived: float) -> tuple[str, float]:
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+        queue_ms = 1000 * (time.perf_counter() - arrived)
+        self.queue_ms.append(queue_ms)
+        self.in_flight += 1
+        try:
+            return await self.answer(question), queue_ms
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    async def handle(self, request: dict) -> dict:
+        arrived = time.perf_counter()
+        response: dict = {"id": request.get("id")}
+        try:
+            answer, queue_ms = await asyncio.wait_for(self._answer(request["question"], arrived), self.timeout_s)
+            response.update({"answer": answer, "queue_ms": queue_ms})
+            self.completed += 1
+        except asyncio.TimeoutError:
+            response["error"] = f"timed out after {self.timeout_s}s"
+            self.timeouts += 1
+        except Exception as e:
+            response["error"] = str(e)
+            self.errors += 1
+        latency_ms = 1000 * (time.perf_counter() - arrived)
+        self.latency_ms.append(latency_ms)
+        response["latency_ms"] = latency_ms
+        return response
+
+    def metrics(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "max_concurrency": self.max_concurrency,
+            "completed": self.completed,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "queue_p50_ms": percentile(self.queue_ms, 50),
+            "queue_p95_ms": percentile(self.queue_ms, 95),
+            "latency_p50_ms": percentile(self.latency_ms, 50),
+            "latency_p95_ms": percentile(self.latency_ms, 95),
+        }
+
+    async def _handle_line(self, line: bytes, writer: asyncio.StreamWriter, write_lock: asyncio.Lock) -> None:
+        request = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                response = {"error": f"expected a JSON object, got {type(request).__name__}"}
+            elif request.get("metrics"):
+                response = {"id": request.get("id"), "metrics": self.metrics()}
+            elif "question" not in request:
+                response = {"id": request.get("id"), "error": "missing 'question'"}
+            else:
+                response = await self.handle(request)
+        except json.JSONDecodeError as e:
+            response = {"error": f"invalid JSON: {e}"}
+        except Exception as e:
+            response = {"id": request.get("id") if isinstance(request, dict) else None, "error": str(e)}
+            self.errors += 1
+        async with write_lock:
+            writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+            await writer.drain()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        JSON-lines protocol: one {"id", "question"} or {"metrics": true} object per line.
+        Requests on one connection are answered concurrently, so responses may come back
+        out of order; match them by id.
+        """
+        write_lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+                task = asyncio.create_task(self._handle_line(line, writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+
+async def serve(service: ReasoningService, host: str, port: int) -> asyncio.Server:
+    return await asyncio.start_server(service.handle_connection, host, port)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    from ai.async_client import async_call_openai_with_graph_reasoning
+    from lib.async_db import async_run_cypher, close_async_driver
+
+    async def answer(question: str) -> str:
+        return await async_call_openai_with_graph_reasoning(question, run_query=async_run_cypher)
+
+    service = ReasoningService(answer, max_concurrency=args.concurrency, timeout_s=args.timeout)
+    server = await serve(service, args.host, args.port)
+    print(f"Serving on {args.host}:{args.port} (concurrency {args.concurrency}, timeout {args.timeout}s)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await close_async_driver()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JSON-lines reasoning service over TCP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    asyncio.run(_main(parser.parse_args()))
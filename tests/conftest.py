@@ -0,0 +1,80 @@
+"""
+Shared fixtures. The repository root is appended to sys.path, not prepended, so types.py
+does not shadow the standard library's types module. Run with `pytest` from the root.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from lib.db import clear_result_cache, set_backend  # noqa: E402
+from lib.memory_graph import MemoryGraph  # noqa: E402
+
+DOC = "FD-1"
+
+
+@pytest.fixture
+def graph():
+    """
+    A fresh MemoryGraph installed as the lib.db backend for the test.
+    """
+    backend = MemoryGraph()
+    previous = set_backend(backend)
+    yield backend
+    set_backend(previous)
+    clear_result_cache()
+
+
+def _entity(label: str, /, **properties) -> dict:
+    return {"type": label, "properties": {"source_doc_id": DOC, **properties}}
+
+
+def _relationship(source: str, relationship: str, target: str, source_properties: dict, target_properties: dict) -> dict:
+    return {
+        "source": source,
+        "relationship": relationship,
+        "target": target,
+        "source_properties": {"source_doc_id": DOC, **source_properties},
+        "target_properties": target_properties,
+    }
+
+
+@pytest.fixture
+def drawing() -> dict:
+    """
+    One small drawing in the extraction format, with the relationship shapes documented in
+    ai/PROMPT.py. It holds one conflict of each kind lib.conflicts looks for.
+    """
+    return {
+        "entities": [
+            _entity("Drawing", drawing_number=DOC, revision="A", title="BRACKET ASSY"),
+            _entity("View", source_view_id="V1", label="FRONT VIEW"),
+            _entity("Part", part_id="P-100", name="BRKT ASSY"),
+            _entity("Feature", feature_id="F1", geometry_type="hole"),
+            _entity("Feature", feature_id="F2", geometry_type="plate"),
+            _entity("Dimension", dimension_id="D1", value="12.5 ±0.2", type="diameter", unit="mm"),
+            _entity("Dimension", dimension_id="D2", value="4", type="thickness", unit="mm"),
+            _entity("ToleranceSpec", tolspec_id="T1", text="X.X ±0.1"),
+            _entity("Note", note_id="N1", text="WALL THICKNESS 3 MAX"),
+            _entity("Note", note_id="N2", text="WELD SIZE 5 MAX"),
+            _entity("WeldSpec", weldspec_id="W1", size="6", type="fillet", standard_ref="AWS D1.1"),
+            _entity("Material", material_id="M1", grade="SS 316 L", spec="ASTM-A240/A240M"),
+            _entity("Process", process_id="PR1", name="Passivation per ASTM A967"),
+        ],
+        "relationships": [
+            _relationship("Drawing", "HAS_VIEW", "View", {}, {"source_view_id": "V1"}),
+            _relationship("View", "DEPICTS", "Part", {"source_view_id": "V1"}, {"part_id": "P-100"}),
+            _relationship("Part", "HAS_FEATURE", "Feature", {"part_id": "P-100"}, {"feature_id": "F1"}),
+            _relationship("Part", "HAS_FEATURE", "Feature", {"part_id": "P-100"}, {"feature_id": "F2"}),
+            _relationship("Feature", "HAS_DIMENSION", "Dimension", {"feature_id": "F1"}, {"dimension_id": "D1"}),
+            _relationship("Feature", "HAS_DIMENSION", "Dimension", {"feature_id": "F2"}, {"dimension_id": "D2"}),
+            _relationship("Dimension", "GOVERNED_BY", "ToleranceSpec", {"dimension_id": "D1"}, {"tolspec_id": "T1"}),
+            _relationship("Note", "APPLIES_TO", "Part", {"note_id": "N1"}, {"part_id": "P-100"}),
+            _relationship("Note", "APPLIES_TO", "WeldSpec", {"note_id": "N2"}, {"weldspec_id": "W1"}),
+            _relationship("Feature", "HAS_WELD", "WeldSpec", {"feature_id": "F2"}, {"weldspec_id": "W1"}),
+            _relationship("Part", "MADE_OF", "Material", {"part_id": "P-100"}, {"material_id": "M1"}),
+            _relationship("Feature", "REQUIRES_PROCESS", "Process", {"feature_id": "F2"}, {"process_id": "PR1"}),
+        ],
+    }
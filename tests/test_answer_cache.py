@@ -0,0 +1,55 @@
+"""
+Answer cache: exact and near-duplicate hits, and invalidation by version stamp and TTL.
+"""
+from ai.answer_cache import AnswerCache, normalize_question
+
+
+def test_normalized_questions_hit_under_the_same_version():
+    cache = AnswerCache(version=lambda: 1)
+    cache.put("What's the OD of the funnel?", 1, "50 mm")
+    assert normalize_question("What's the OD of the funnel?") == "what s the od of the funnel"
+    assert cache.get("what's the od of the FUNNEL", 1) == "50 mm"
+    assert cache.get("What's the OD of the funnel?", 2) is None
+
+
+def test_similar_questions_must_name_the_same_identifiers():
+    cache = AnswerCache(version=lambda: 1, similarity_threshold=0.7)
+    cache.put("what material is part 12 made of", 1, "316L")
+    assert cache.get("what material is part 13 made of", 1) is None
+    assert cache.get("what material is part 12 made from", 1) == "316L"
+    assert cache.get("what material is the part made of", 1) is None
+    assert cache.stats()["similar_hits"] == 1
+
+
+def test_similar_questions_must_share_every_content_word():
+    cache = AnswerCache(version=lambda: 1, similarity_threshold=0.5)
+    cache.put("which welds violate note 3", 1, "W1 and W4")
+    assert cache.get("which welds satisfy note 3", 1) is None
+    assert cache.get("which welds do not violate note 3", 1) is None
+    assert cache.get("welds that violate note 3", 1) == "W1 and W4"
+    cache.put("What's the OD of the funnel?", 1, "50 mm")
+    assert cache.get("what is the funnel OD", 1) == "50 mm"
+    assert cache.stats()["similar_hits"] == 2
+
+
+def test_entries_expire_and_evict():
+    cache = AnswerCache(version=lambda: 1, max_entries=1, ttl_s=0.0)
+    cache.put("first", 1, "a")
+    cache.put("second", 1, "b")
+    assert cache.stats()["evictions"] == 1
+    assert cache.get("second", 1) is None and cache.stats()["expirations"] == 1
+
+
+def test_get_or_compute_recomputes_after_a_version_change():
+    version = [1]
+    calls = []
+    cache = AnswerCache(version=lambda: version[0])
+
+    def compute(question):
+        calls.append(question)
+        return f"answer {len(calls)}"
+
+    assert cache.get_or_compute("q", compute) == "answer 1"
+    assert cache.get_or_compute("q", compute) == "answer 1"
+    version[0] = 2
+    assert cache.get_or_compute("q", compute) == "answer 2"
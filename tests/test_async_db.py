@@ -0,0 +1,35 @@
+"""
+lib.async_db imports without the neo4j package and shares run_cypher's result cache and
+write tracking.
+"""
+import asyncio
+import subprocess
+import sys
+from pathlib import Path
+
+from lib.async_db import async_run_cypher
+from lib.db import bulk_load, graph_version, result_cache_stats
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_import_does_not_load_neo4j():
+    code = "import sys; sys.path.append(sys.argv[1]); import lib.async_db; print('neo4j' in sys.modules)"
+    output = subprocess.run([sys.executable, "-c", code, str(ROOT)], capture_output=True, text=True, check=True, cwd="/")
+    assert output.stdout.strip() == "False"
+
+
+def test_async_run_cypher_uses_the_result_cache_and_records_writes(graph, drawing):
+    bulk_load(drawing)
+    query = "MATCH (p:Part) RETURN p.part_id AS id"
+    first = asyncio.run(async_run_cypher(query))
+    second = asyncio.run(async_run_cypher(query))
+    assert first["records"] == second["records"] == [{"id": "P-100"}]
+    assert second["summary"]["cache"]["hit"]
+
+    version = graph_version()
+    invalidations = result_cache_stats()["invalidations"]
+    asyncio.run(async_run_cypher("MATCH (p:Part) SET p.name = 'PLATE'"))
+    assert graph_version() != version
+    assert result_cache_stats()["invalidations"] == invalidations + 1
+    assert not asyncio.run(async_run_cypher(query))["summary"]["cache"]["hit"]
@@ -0,0 +1,47 @@
+"""
+The on-disk extraction cache: content-addressed keys, hits and misses, and LRU eviction
+past max_bytes without listing the directory on every put.
+"""
+import os
+
+from ai.cache import ExtractionCache, extraction_cache_key
+
+PROMPT = "Extract entities."
+
+
+def test_keys_change_with_image_bytes_model_and_prompt(tmp_path):
+    cache = ExtractionCache(tmp_path)
+    key = extraction_cache_key(b"sheet", "gpt-5-mini", PROMPT)
+    cache.put(key, '{"entities": []}')
+    assert cache.get(extraction_cache_key(b"sheet", "gpt-5-mini", PROMPT)) == '{"entities": []}'
+    for other in (
+        extraction_cache_key(b"sheet2", "gpt-5-mini", PROMPT),
+        extraction_cache_key(b"sheet", "gpt-5.2", PROMPT),
+        extraction_cache_key(b"sheet", "gpt-5-mini", PROMPT + " Strictly."),
+        extraction_cache_key(b"sheet", "gpt-5-mini", PROMPT, detail="low"),
+    ):
+        assert other != key and cache.get(other) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 4, 1)
+
+
+def test_least_recently_used_entries_are_evicted_past_max_bytes(tmp_path, monkeypatch):
+    cache = ExtractionCache(tmp_path, max_bytes=250)
+    scans = []
+    entries = cache._entries
+    monkeypatch.setattr(cache, "_entries", lambda: scans.append(1) or entries())
+    for index, key in enumerate(["aa1", "bb2"]):
+        cache.put(key, "x" * 100)
+        os.utime(cache._path(key), (index, index))
+    cache.put("aa1", "y" * 100)
+    assert cache.get("aa1") == "y" * 100
+    # One scan to size the directory; overwriting and touching entries does not list it again.
+    assert len(scans) == 1 and cache._bytes == 200
+
+    cache.put("cc3", "z" * 100)
+    assert len(scans) == 2
+    assert cache.get("bb2") is None
+    assert cache.get("aa1") == "y" * 100 and cache.get("cc3") == "z" * 100
+    assert (cache.evictions, cache._bytes, cache.stats()["bytes"]) == (1, 200, 200)
+    cache.clear()
+    assert cache.stats()["entries"] == 0 and cache._bytes == 0
@@ -0,0 +1,214 @@
+"""
+Tiled extraction: a tile whose output cannot be parsed fails the whole image instead of
+being merged (and cached) as an empty result.
+"""
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from ai import client
+
+
+class _Cache:
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def put(self, key, value):
+        self.entries[key] = value
+
+
+@pytest.fixture
+def tiled(monkeypatch):
+    cache = _Cache()
+    tiles = [
+        {"bytes": b"left", "mime_type": "image/png", "box": (0, 0, 10, 10), "sheet_size": (20, 10), "bytes_after": 4, "elapsed_ms": 0.0},
+        {"bytes": b"right", "mime_type": "image/png", "box": (10, 0, 20, 10), "sheet_size": (20, 10), "bytes_after": 5, "elapsed_ms": 0.0},
+    ]
+    monkeypatch.setattr(client, "preprocess_tiles", lambda image_bytes, mime_type: tiles)
+    monkeypatch.setattr(client, "get_extraction_cache", lambda: cache)
+    monkeypatch.setattr(client, "_extraction_cache_key", lambda *args: "sheet")
+    return cache
+
+
+def _respond(monkeypatch, outputs: dict):
+    def create_response(purpose, **request):
+        text = request["input"][1]["content"][1]["image_url"]
+        return SimpleNamespace(output_text=next(output for key, output in outputs.items() if key in text))
+    monkeypatch.setattr(client, "_create_response", create_response)
+
+
+def test_tiles_are_merged_and_cached(monkeypatch, tiled):
+    entity = {"type": "Note", "properties": {"source_doc_id": "FD-1", "note_id": "N1", "text": "DEBURR"}}
+    _respond(monkeypatch, {
+        client._encode_image_base64(b"left"): json.dumps({"entities": [entity], "relationships": []}),
+        client._encode_image_base64(b"right"): json.dumps({"entities": [entity], "relationships": []}),
+    })
+    output = client.call_openai_with_image_bytes(b"sheet", "image/png", "sheet.png")
+    assert json.loads(output)["entities"] == [entity]
+    assert tiled.entries == {"sheet": output}
+
+
+def test_unparseable_tile_fails_the_image_and_is_not_cached(monkeypatch, tiled):
+    _respond(monkeypatch, {
+        client._encode_image_base64(b"left"): json.dumps({"entities": [], "relationships": []}),
+        client._encode_image_base64(b"right"): "I could not read this region.",
+    })
+    with pytest.raises(ValueError, match=r"tile \(10, 0, 20, 10\)"):
+        client.call_openai_with_image_bytes(b"sheet", "image/png", "sheet.png")
+    assert tiled.entries == {}
+
+
+def test_reasoning_reports_are_kept_per_thread(graph, drawing):
+    from concurrent.futures import ThreadPoolExecutor
+    from threading import Barrier
+
+    from lib.db import bulk_load
+
+    bulk_load(drawing)
+    barrier = Barrier(2)
+
+    def ask(question):
+        answer = client.call_openai_with_graph_reasoning(question, retrieve=False, mode="adaptive")
+        barrier.wait()
+        return answer, client.reasoning_report()["question"]
+
+    questions = ["show part P-100", "show note N1"]
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = list(pool.map(ask, questions))
+    assert [question for _, question in results] == questions
+    assert all(answer for answer, _ in results)
+    assert client.reasoning_report() == {} and client.reasoning_rounds() == []
+
+
+class _Responses:
+    """
+    A stub responses API: the first call asks for a two-query graph_query_plan, the next
+    one answers with the tool outputs it was sent.
+    """
+
+    def __init__(self):
+        self.requests = []
+
+    def _respond(self, request):
+        self.requests.append(request)
+        if "previous_response_id" not in request:
+            plan = {"queries": [
+                {"cypher": "MATCH (p:Part) RETURN p.part_id AS id"},
+                {"cypher": "MATCH (n:Note) RETURN n.note_id AS id"},
+            ]}
+            call = {"type": "function_call", "name": "graph_query_plan", "call_id": "call-1", "arguments": json.dumps(plan)}
+            return {"id": "resp-1", "output": [call], "output_text": ""}
+        return {"id": "resp-2", "output": [], "output_text": request["input"][0]["output"]}
+
+    def create(self, **request):
+        return self._respond(request)
+
+
+class _AsyncResponses(_Responses):
+    async def create(self, **request):
+        return self._respond(request)
+
+
+def test_async_reasoning_drives_the_same_rounds_as_the_sync_loop(monkeypatch, graph, drawing):
+    import asyncio
+
+    from ai.async_client import async_call_openai_with_graph_reasoning
+    from lib.db import bulk_load
+
+    bulk_load(drawing)
+    question = "which parts carry notes?"
+    responses = _Responses()
+    monkeypatch.setattr(client, "_get_client", lambda: SimpleNamespace(responses=responses))
+    answer = client.call_openai_with_graph_reasoning(question, retrieve=False, mode="adaptive")
+    report = client.reasoning_report()
+
+    async_responses = _AsyncResponses()
+    async_answer = asyncio.run(async_call_openai_with_graph_reasoning(
+        question, client=SimpleNamespace(responses=async_responses), retrieve=False, mode="adaptive",
+    ))
+    assert async_answer == answer and "P-100" in answer
+    assert async_responses.requests == responses.requests
+    assert [request["model"] for request in responses.requests] == [client.default_model()] * 2
+    assert {tool["name"] for tool in responses.requests[0]["tools"]} == {"graph_query", "graph_query_plan"}
+    assert (report["rounds"], report["queries"], report["stopped"]) == (1, 2, "answered")
+
+
+def test_streamed_done_text_is_every_token_across_rounds(graph, drawing):
+    from lib.db import bulk_load
+
+    bulk_load(drawing)
+    call = {"type": "function_call", "name": "graph_query", "call_id": "call-1",
+            "arguments": json.dumps({"cypher": "MATCH (p:Part) RETURN p.part_id AS id"})}
+    rounds = [(["Checking ", "the parts. "], [call]), (["Part ", "P-100."], [])]
+
+    def create(stream=False, **request):
+        deltas, output = rounds.pop(0)
+        response = {"id": "resp", "output": output, "output_text": "".join(deltas)}
+        return iter([*({"type": "response.output_text.delta", "delta": delta} for delta in deltas),
+                     {"type": "response.completed", "response": response}])
+
+    stub = SimpleNamespace(responses=SimpleNamespace(create=create))
+    events = list(client.stream_openai_with_graph_reasoning("which parts are there?", client=stub, retrieve=False, mode="fixed"))
+    tokens = [event["text"] for event in events if event["type"] == "token"]
+    assert [event["type"] for event in events] == ["token", "token", "tool_call_start", "tool_call_end", "token", "token", "done"]
+    assert events[-1]["text"] == "".join(tokens) == "Checking the parts. Part P-100."
+
+    template = list(client.stream_openai_with_graph_reasoning("show part P-100", retrieve=False, mode="adaptive"))
+    assert [event["type"] for event in template] == ["token", "done"]
+    assert template[0]["text"] == template[1]["text"] and "P-100" in template[1]["text"]
+
+
+def test_tool_round_runs_writes_after_earlier_reads_and_keeps_call_order(monkeypatch):
+    import threading
+    import time
+
+    events = []
+    lock = threading.Lock()
+
+    def run_tool_call(payload):
+        name = payload["cypher"].split()[-1]
+        with lock:
+            events.append(("start", name))
+        # Earlier reads take longer, so finishing out of order would show.
+        time.sleep(payload.get("delay", 0))
+        with lock:
+            events.append(("end", name))
+        return {"records": [{"name": name}]}, 1.0
+
+    monkeypatch.setattr(client, "_run_tool_call", run_tool_call)
+    calls = [
+        {"type": "function_call", "name": "graph_query", "call_id": f"call-{index}", "arguments": json.dumps(arguments)}
+        for index, arguments in enumerate([
+            {"cypher": "MATCH (n) RETURN r1", "delay": 0.05},
+            {"cypher": "MATCH (n) RETURN r2", "delay": 0.02},
+            {"cypher": "MATCH (n) SET n.x = 1 RETURN w1"},
+            {"cypher": "MATCH (n) RETURN r3", "delay": 0.01},
+            {"cypher": "MATCH (n) RETURN r4"},
+        ])
+    ]
+    outputs, stats = client._run_tool_round(calls)
+
+    position = {event: index for index, event in enumerate(events)}
+    assert position[("start", "w1")] > max(position[("end", "r1")], position[("end", "r2")])
+    assert min(position[("start", "r3")], position[("start", "r4")]) > position[("end", "w1")]
+    # The reads before the write ran together.
+    assert position[("start", "r2")] < position[("end", "r1")]
+    assert [output["call_id"] for output in outputs] == [f"call-{index}" for index in range(5)]
+    assert [json.loads(output["output"])["rows"][0][0] for output in outputs] == ["r1", "r2", "w1", "r3", "r4"]
+    assert (stats["reads"], stats["writes"], stats["calls"]) == (4, 1, 5)
+
+
+def test_preprocess_reports_keep_the_most_recent_drawings(monkeypatch):
+    from collections import OrderedDict
+
+    monkeypatch.setattr(client, "PREPROCESS_REPORTS_SIZE", 2)
+    monkeypatch.setattr(client, "preprocess_reports", OrderedDict())
+    part = {"bytes_after": 3, "mime_type": "image/png", "elapsed_ms": 1.0}
+    for name in ("a.png", "b.png", "a.png", "c.png"):
+        client._record_preprocess(name, b"12345", [part])
+    assert list(client.preprocess_reports) == ["a.png", "c.png"]
+    assert client.preprocess_reports["c.png"] == {"bytes_before": 5, "bytes_after": 3, "tiles": 1, "mime_type": "image/png", "elapsed_ms": 1.0}
@@ -0,0 +1,57 @@
+"""
+Conflict materialization: the rules on their own, and the pass against a loaded drawing.
+"""
+from lib.conflicts import RELATIONSHIP, _kind, changed_documents, materialize_conflicts, note_conflicts
+from lib.db import bulk_load
+from lib.numeric import enrich_entity
+
+DOC = "FD-1"
+
+
+def _conflicts(graph) -> list:
+    records, _ = graph.run(f"MATCH (a)-[r:{RELATIONSHIP}]->(b) RETURN r.rule AS rule, r.source_doc_id AS doc ORDER BY rule")
+    return records
+
+
+def test_kind_matches_whole_words_only():
+    assert _kind("Outside diameter") == "diameter"
+    assert _kind("RECTANGLE 40 X 20") is None
+    assert _kind("angle") == "angle"
+    assert _kind("WALL THK") == "thickness"
+
+
+def test_note_limit_needs_a_matching_kind():
+    dimension = {
+        "id": "d", "key": "D1", "value": "4", "kind": "rectangle", "nominal": 4.0, "min": None, "max": None,
+        "specs": [], "features": [], "parts": ["p"],
+    }
+    note = {"id": "n", "key": "N1", "text": "ANGLE 3 MAX", "targets": [{"id": "p", "label": "Part"}]}
+    assert note_conflicts([note], [dimension], []) == []
+    assert len(note_conflicts([note], [{**dimension, "kind": "angle"}], [])) == 1
+
+
+def test_changed_documents_ignores_skipped_counts():
+    unchanged = {"nodes_inserted": 0, "nodes_updated": 0, "nodes_deleted": 0, "nodes_skipped": 12,
+                 "relationships_inserted": 0, "relationships_deleted": 0, "relationships_skipped": 9}
+    report = {
+        "FD-1": {"counts": unchanged},
+        "FD-2": {"counts": {**unchanged, "nodes_updated": 1}},
+        "FD-3": {"counts": {**unchanged, "relationships_deleted": 2}},
+    }
+    assert changed_documents(report) == ["FD-2", "FD-3"]
+
+
+def test_materialize_conflicts_writes_once_per_change(graph, drawing):
+    bulk_load({**drawing, "entities": [enrich_entity(entity) for entity in drawing["entities"]]})
+    report = materialize_conflicts([DOC])[DOC]
+    assert report["status"] == "updated" and report["conflicts"] == 4
+    assert [record["rule"] for record in _conflicts(graph)] == [
+        "note_limit", "tolerance_exceeds_spec", "weld_exceeds_thickness", "weld_note_limit",
+    ]
+    assert materialize_conflicts([DOC])[DOC]["status"] == "unchanged"
+
+    graph.run("MATCH (n:Note {note_id: 'N1'}) SET n.text = 'WALL THICKNESS 5 MAX'")
+    report = materialize_conflicts([DOC])[DOC]
+    assert report["status"] == "updated" and report["conflicts"] == 3
+    assert "note_limit" not in [record["rule"] for record in _conflicts(graph)]
+    assert {record["doc"] for record in _conflicts(graph)} == {DOC}
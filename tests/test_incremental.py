@@ -0,0 +1,74 @@
+"""
+Incremental re-ingestion: diffing a revised extraction against the stored subgraph, and
+writing only the changes.
+"""
+import copy
+
+from lib.db import bulk_load
+from lib.incremental import _current_subgraph_query, diff_document, fetch_document, load_incremental, node_identity
+from lib.schema import identifier_keys
+
+DOC = "FD-1"
+
+
+def _revise(drawing: dict) -> dict:
+    revised = copy.deepcopy(drawing)
+    entities = revised["entities"]
+    for entity in entities:
+        if entity["properties"].get("part_id") == "P-100":
+            entity["properties"]["name"] = "BRACKET"
+    revised["entities"] = [entity for entity in entities if entity["properties"].get("process_id") != "PR1"]
+    revised["entities"].append({"type": "Note", "properties": {"source_doc_id": DOC, "note_id": "N3", "text": "DEBURR"}})
+    revised["relationships"] = [
+        relationship for relationship in revised["relationships"] if relationship["relationship"] != "REQUIRES_PROCESS"
+    ]
+    return revised
+
+
+def test_node_identity_uses_document_and_identifier():
+    ids = identifier_keys()
+    assert node_identity("Part", {"source_doc_id": DOC, "part_id": "P-100", "name": "X"}, ids) == ("Part", DOC, "P-100")
+    assert node_identity("Part", {"source_doc_id": DOC, "name": "X"}, ids)[1].startswith("{")
+
+
+def test_subgraph_query_is_a_plain_union(graph, drawing):
+    bulk_load(drawing)
+    query = _current_subgraph_query(["Part", "Note", "Part"])
+    assert query.count("UNION ALL") == 1 and "CALL" not in query
+    nodes, relationships = fetch_document(DOC, ["Part", "Note"])
+    assert sorted(node["label"] for node in nodes) == ["Note", "Note", "Part"]
+    assert sorted(relationship["type"] for relationship in relationships) == [
+        "APPLIES_TO", "APPLIES_TO", "HAS_FEATURE", "HAS_FEATURE", "MADE_OF",
+    ]
+    assert fetch_document("FD-2", ["Part"]) == ([], [])
+
+
+def test_diff_against_an_unchanged_document_writes_nothing(graph, drawing):
+    bulk_load(drawing)
+    nodes, relationships = fetch_document(DOC, {entity["type"] for entity in drawing["entities"]})
+    diff = diff_document(drawing, DOC, nodes, relationships, identifier_keys())
+    assert diff["counts"] == {
+        "nodes_inserted": 0,
+        "nodes_updated": 0,
+        "nodes_deleted": 0,
+        "nodes_skipped": len(drawing["entities"]),
+        "relationships_inserted": 0,
+        "relationships_deleted": 0,
+        "relationships_skipped": len(drawing["relationships"]),
+    }
+
+
+def test_load_incremental_writes_only_the_changes(graph, drawing):
+    bulk_load(drawing)
+    before = graph.counts()
+    report = load_incremental(_revise(drawing))
+    counts = report[DOC]["counts"]
+    assert (counts["nodes_inserted"], counts["nodes_updated"], counts["nodes_deleted"]) == (1, 1, 1)
+    assert (counts["relationships_inserted"], counts["relationships_deleted"]) == (0, 1)
+    assert graph.counts() == (before[0], before[1] - 1)
+    records, _ = graph.run("MATCH (p:Part {part_id: 'P-100'}) RETURN p.name AS name")
+    assert records == [{"name": "BRACKET"}]
+    assert graph.run("MATCH (p:Process) RETURN p")[0] == []
+
+    again = load_incremental(_revise(drawing))[DOC]["counts"]
+    assert again["nodes_skipped"] == len(drawing["entities"]) and again["nodes_updated"] == 0
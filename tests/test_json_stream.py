@@ -0,0 +1,78 @@
+"""
+The streaming JSON scanner: the first complete JSON value in model output, however the
+output is split into chunks, and items streamed out of the entities/relationships arrays.
+"""
+import json
+import random
+
+import pytest
+
+from lib.json_stream import extract_first_json, iter_json_items
+
+PAYLOAD = {
+    "entities": [
+        {"type": "Note", "properties": {"note_id": "N1", "text": "BREAK {ALL} EDGES", "checked": True}},
+        {"type": "Dimension", "properties": {"dimension_id": "D1", "value": "12.5", "tolerance": None, "x": -1.5e3}},
+    ],
+    "relationships": [
+        {"source": "Note", "relationship": "APPLIES_TO", "target": "Dimension",
+         "source_properties": {"note_id": "N1"}, "target_properties": {"dimension_id": "D1"}},
+    ],
+}
+
+
+def _splits(text: str):
+    yield [text]
+    yield list(text)
+    yield [text[start:start + 7] for start in range(0, len(text), 7)]
+
+
+def _legacy(text: str):
+    decoder = json.JSONDecoder()
+    for index, char in enumerate(text):
+        if char in "{[":
+            try:
+                return decoder.raw_decode(text[index:])[0]
+            except json.JSONDecodeError:
+                continue
+    return None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Here is the extraction:\n" + json.dumps(PAYLOAD) + "\nDone.", PAYLOAD),
+    ('[see {"a": 1}]', {"a": 1}),
+    ('note {see 3} then {"a": 1}', {"a": 1}),
+    ('in view { then {"a": 1}', {"a": 1}),
+    ('[{"a": 1} xyz]', {"a": 1}),
+    ('prefix {"k": "v" junk} {"z": null, "t": true, "f": false}', {"z": None, "t": True, "f": False}),
+    ('{"s": "}{[", "e": "\\"]"}', {"s": "}{[", "e": '"]'}),
+    ("x [1, 2]", [1, 2]),
+    ('x {: ["P-1"] {y', ["P-1"]),
+    ('{"a": {1} [2]}', [2]),
+    ("[ see", None),
+    ("no json here", None),
+])
+def test_extract_first_json_matches_a_raw_decode_scan(text, expected):
+    assert _legacy(text) == expected
+    for chunks in _splits(text):
+        assert extract_first_json(chunks) == expected
+
+
+def test_malformed_output_matches_a_raw_decode_scan():
+    rng = random.Random(7)
+    alphabet = ['{', '}', '[', ']', '"', ':', ',', ' ', '1', 'x', '\\', 'true', '"a"']
+    for _ in range(3000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 14)))
+        for chunks in _splits(text):
+            assert extract_first_json(chunks) == _legacy(text), text
+
+
+def test_items_stream_before_the_object_closes():
+    text = "```json\n" + json.dumps(PAYLOAD, indent=2) + "\n```"
+    for chunks in _splits(text):
+        items = list(iter_json_items(chunks))
+        assert items == [("entities", entity) for entity in PAYLOAD["entities"]] + [
+            ("relationships", relationship) for relationship in PAYLOAD["relationships"]
+        ]
+    truncated = json.dumps(PAYLOAD)[:-40]
+    assert [key for key, _ in iter_json_items([truncated])][:2] == ["entities", "entities"]
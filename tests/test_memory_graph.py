@@ -0,0 +1,273 @@
+"""
+MemoryGraph's Cypher subset, and every statement the loader, incremental diff, conflict pass,
+resolution pass and planner build, run against it.
+"""
+import re
+
+import pytest
+
+from ai.planner import answer_lookup, lookup_query, route_question
+from lib import conflicts
+from lib.db import (
+    GRAPH_COUNTS_QUERY,
+    build_unwind_node_query,
+    build_unwind_upsert_query,
+    bulk_load,
+    clear_statement_cache,
+    create_node,
+    create_relationship,
+    delete_node,
+    delete_relationship,
+    run_cypher,
+    statement_cache_stats,
+)
+from lib.incremental import CURRENT_RELATIONSHIPS_QUERY, DELETE_NODES_QUERY, DELETE_RELATIONSHIPS_QUERY
+from lib.memory_graph import UnsupportedCypher
+from lib.numeric import enrich_entity
+from lib.resolution import build_resolution_query, reset_resolution_index, resolve_entities, resolve_graph
+
+DOC = "FD-1"
+
+
+@pytest.fixture
+def loaded(graph, drawing):
+    bulk_load({**drawing, "entities": [enrich_entity(entity) for entity in drawing["entities"]]})
+    return graph
+
+
+def _ids(graph, label: str, key: str) -> dict:
+    records, _ = graph.run(f"MATCH (n:{label}) RETURN elementId(n) AS id, n.{key} AS key")
+    return {record["key"]: record["id"] for record in records}
+
+
+def test_union_all_keeps_duplicates_and_union_drops_them(graph):
+    graph.run("CREATE (:Part {part_id: 'P1'}), (:Part {part_id: 'P2'}), (:Note {note_id: 'N1'})")
+    union_all, _ = graph.run("MATCH (n:Part) RETURN 'x' AS kind UNION ALL MATCH (n:Note) RETURN 'x' AS kind")
+    union, _ = graph.run("MATCH (n:Part) RETURN 'x' AS kind UNION MATCH (n:Note) RETURN 'x' AS kind")
+    assert union_all == [{"kind": "x"}] * 3
+    assert union == [{"kind": "x"}]
+    with pytest.raises(UnsupportedCypher, match="same columns"):
+        graph.run("MATCH (n:Part) RETURN n.part_id AS a UNION MATCH (n:Note) RETURN n.note_id AS b")
+
+
+def test_patterns_walk_from_a_node_bound_at_either_end(graph):
+    graph.run(
+        "CREATE (:Part {part_id: 'P1'})-[:HAS_FEATURE]->(f:Feature {feature_id: 'F1'})-[:HAS_DIMENSION]->(:Dimension {dimension_id: 'D1'}), "
+        "(:Feature {feature_id: 'F2'})-[:HAS_DIMENSION]->(:Dimension {dimension_id: 'D2'})"
+    )
+    records, _ = graph.run(
+        "MATCH (d:Dimension) OPTIONAL MATCH (p:Part)-[:HAS_FEATURE]->(f:Feature)-[:HAS_DIMENSION]->(d) "
+        "RETURN d.dimension_id AS d, f.feature_id AS f, p.part_id AS p ORDER BY d"
+    )
+    assert records == [{"d": "D1", "f": "F1", "p": "P1"}, {"d": "D2", "f": None, "p": None}]
+    records, _ = graph.run("MATCH (d:Dimension {dimension_id: 'D2'}) MATCH (f:Feature)-[:HAS_DIMENSION]-(d) RETURN f.feature_id AS f")
+    assert records == [{"f": "F2"}]
+
+
+def test_case_list_comprehension_and_label_predicate(graph):
+    graph.run("CREATE (:Part {part_id: 'P1'})-[:HAS_FEATURE]->(:Feature {feature_id: 'F1'})")
+    records, _ = graph.run(
+        "MATCH (n) WITH collect(n) AS nodes "
+        "RETURN [x IN nodes WHERE NOT x:Feature | x.part_id] AS parts, "
+        "[x IN nodes | CASE WHEN x:Part THEN 'part' ELSE 'other' END] AS kinds, "
+        "CASE size(nodes) WHEN 2 THEN 'two' WHEN 3 THEN 'three' END AS count"
+    )
+    assert records == [{"parts": ["P1"], "kinds": ["part", "other"], "count": "two"}]
+
+
+@pytest.mark.parametrize("cypher, feature", [
+    (GRAPH_COUNTS_QUERY, "CALL subqueries"),
+    ("CALL db.labels()", "CALL subqueries or procedures"),
+    ("MATCH p = (n)-->() RETURN p", "path variables"),
+    ("MATCH (n)-[*1..2]-(m) RETURN m", "variable-length relationships"),
+    ("MATCH (n) WHERE EXISTS { MATCH (n)-->() } RETURN n", "EXISTS subqueries"),
+    ("MATCH (n) WHERE (n)-[:HAS_FEATURE]->() RETURN n", "pattern predicates"),
+    ("MATCH (n) RETURN [(n)-->(m) | m] AS m", "pattern comprehensions"),
+    ("MATCH (n) RETURN n {.name} AS n", "map projections"),
+    ("MATCH (n) RETURN any(x IN [1] WHERE x = 1) AS a", "any() list predicates"),
+    ("MATCH (n) RETURN count(n) + 1 AS c", "aggregates inside expressions"),
+    ("FOREACH (x IN [1] | CREATE (:A))", "FOREACH"),
+    ("CREATE INDEX part_id FOR (n:Part) ON (n.part_id)", "index and constraint commands"),
+])
+def test_unsupported_syntax_names_the_feature(graph, cypher, feature):
+    with pytest.raises(UnsupportedCypher, match=re.escape(f"MemoryGraph does not support {feature}")):
+        graph.run(cypher)
+
+
+def test_single_statement_builders(graph):
+    create_node("Part", {"part_id": "P-100", "source_doc_id": DOC, "name": None})
+    create_node("Feature", {"feature_id": "F1", "source_doc_id": DOC})
+    create_relationship("Part", {"part_id": "P-100", "source_doc_id": DOC}, "HAS_FEATURE", "Feature", {"feature_id": "F1"})
+    create_node("Part", {"part_id": "P-100", "source_doc_id": DOC})
+    assert graph.counts() == (2, 1)
+    delete_relationship("Part", "HAS_FEATURE", "Feature")
+    delete_node("Feature", {"feature_id": "F1"})
+    assert graph.counts() == (1, 0)
+
+
+def test_statement_builders_reuse_the_built_text(graph, drawing):
+    clear_statement_cache()
+    keys = ("source_doc_id", "part_id")
+    first = build_unwind_node_query("Part", keys)
+    assert build_unwind_node_query("Part", keys) is first
+    assert build_unwind_node_query("Part", ("source_doc_id", "name")) is not first
+    info = build_unwind_node_query.cache_info()
+    assert (info.hits, info.misses) == (1, 2)
+
+    # A second load of the same drawing builds no new statements.
+    bulk_load(drawing)
+    misses = statement_cache_stats()["misses"]
+    bulk_load(drawing)
+    stats = statement_cache_stats()
+    assert stats["misses"] == misses and stats["hits"] > 0
+    clear_statement_cache()
+    assert statement_cache_stats()["hits"] == statement_cache_stats()["misses"] == 0
+
+
+def test_bulk_builders_are_idempotent(loaded, drawing):
+    nodes, relationships = loaded.counts()
+    assert (nodes, relationships) == (len(drawing["entities"]), len(drawing["relationships"]))
+    bulk_load(drawing)
+    assert loaded.counts() == (nodes, relationships)
+
+
+def test_bulk_load_updates_a_revised_drawing_in_place(loaded, drawing):
+    nodes, relationships = loaded.counts()
+    revised = {**drawing, "entities": [
+        {**entity, "properties": {**entity["properties"], "name": "BRACKET"}} if entity["type"] == "Part" else entity
+        for entity in drawing["entities"]
+    ]}
+    bulk_load(revised)
+    assert loaded.counts() == (nodes, relationships)
+    records, _ = loaded.run("MATCH (p:Part) RETURN p.part_id AS id, p.name AS name")
+    assert records == [{"id": "P-100", "name": "BRACKET"}]
+
+
+def _as_document(drawing: dict, doc: str) -> dict:
+    def scoped(properties: dict) -> dict:
+        return {**properties, "source_doc_id": doc} if "source_doc_id" in properties else properties
+
+    return {
+        "entities": [{**entity, "properties": scoped(entity["properties"])} for entity in drawing["entities"]],
+        "relationships": [
+            {**relationship, "source_properties": scoped(relationship["source_properties"]), "target_properties": scoped(relationship["target_properties"])}
+            for relationship in drawing["relationships"]
+        ],
+    }
+
+
+def test_relationships_stay_inside_their_drawing(loaded, drawing):
+    nodes, relationships = loaded.counts()
+    bulk_load(_as_document(drawing, "FD-2"))
+    assert loaded.counts() == (2 * nodes, 2 * relationships)
+    records, _ = loaded.run(
+        "MATCH (a)-[r]->(b) WHERE a.source_doc_id <> b.source_doc_id RETURN type(r) AS type"
+    )
+    assert records == []
+    create_relationship("Part", {"source_doc_id": "FD-2", "part_id": "P-100"}, "CHECKED_BY", "Note", {"note_id": "N1"})
+    records, _ = loaded.run("MATCH (:Part)-[:CHECKED_BY]->(n:Note) RETURN n.source_doc_id AS doc")
+    assert records == [{"doc": "FD-2"}]
+
+
+def test_upsert_builder_replaces_properties(loaded):
+    rows = [{"key": {"source_doc_id": DOC, "part_id": "P-100"}, "properties": {"source_doc_id": DOC, "part_id": "P-100", "name": "BRACKET"}}]
+    loaded.run(build_unwind_upsert_query("Part", ("part_id", "source_doc_id")), {"rows": rows})
+    records, _ = loaded.run("MATCH (p:Part) RETURN properties(p) AS p")
+    assert records == [{"p": rows[0]["properties"]}]
+
+
+def test_run_cypher_caches_reads_until_a_write(loaded):
+    query = "MATCH (p:Part) RETURN p.part_id AS id"
+    assert not run_cypher(query)["summary"]["cache"]["hit"]
+    assert run_cypher(query)["summary"]["cache"]["hit"]
+    run_cypher("MATCH (p:Part) SET p.checked = true")
+    assert not run_cypher(query)["summary"]["cache"]["hit"]
+
+
+def test_cached_reads_overlapping_a_write_or_mutated_by_callers_stay_correct(loaded, monkeypatch):
+    query = "MATCH (p:Part) RETURN p.part_id AS id, p.name AS name"
+    records = run_cypher(query)["records"]
+    records[0]["name"] = "MUTATED"
+    cached = run_cypher(query)
+    assert cached["summary"]["cache"]["hit"] and cached["records"][0]["name"] != "MUTATED"
+    cached["records"].clear()
+    assert run_cypher(query)["records"]
+
+    # A write landing while a read runs: the read is returned but not cached.
+    run = loaded.run
+
+    def run_during_write(cypher, parameters=None):
+        monkeypatch.setattr(loaded, "run", run)
+        result = run(cypher, parameters)
+        run_cypher("MATCH (p:Part) SET p.name = 'PLATE'")
+        return result
+
+    monkeypatch.setattr(loaded, "run", run_during_write)
+    stale = run_cypher(query + " ORDER BY id")
+    assert stale["records"][0]["name"] != "PLATE"
+    fresh = run_cypher(query + " ORDER BY id")
+    assert not fresh["summary"]["cache"]["hit"] and fresh["records"][0]["name"] == "PLATE"
+
+
+def test_incremental_statements(loaded):
+    parts = _ids(loaded, "Part", "part_id")
+    records, _ = loaded.run(CURRENT_RELATIONSHIPS_QUERY, {"ids": list(parts.values())})
+    assert sorted(record["type"] for record in records) == ["HAS_FEATURE", "HAS_FEATURE", "MADE_OF"]
+    loaded.run(DELETE_RELATIONSHIPS_QUERY, {"rows": [record["id"] for record in records]})
+    loaded.run(DELETE_NODES_QUERY, {"rows": list(parts.values())})
+    assert _ids(loaded, "Part", "part_id") == {}
+    assert loaded.run(CURRENT_RELATIONSHIPS_QUERY, {"ids": list(parts.values())})[0] == []
+
+
+def test_conflict_statements(loaded):
+    inputs = {
+        name: loaded.run(query, {"doc": DOC})[0]
+        for name, query in (("dimensions", conflicts.DIMENSIONS_QUERY), ("notes", conflicts.NOTES_QUERY), ("welds", conflicts.WELDS_QUERY))
+    }
+    dimensions = {record["key"]: record for record in inputs["dimensions"]}
+    assert [spec["text"] for spec in dimensions["D1"]["specs"]] == ["X.X ±0.1"]
+    assert dimensions["D2"]["specs"] == [] and len(dimensions["D2"]["parts"]) == 1
+    notes = {record["key"]: record for record in inputs["notes"]}
+    assert [target["label"] for target in notes["N1"]["targets"]] == ["Part"]
+    assert [target["label"] for target in notes["N2"]["targets"]] == ["WeldSpec"]
+
+    found = conflicts.find_conflicts(inputs)
+    assert sorted(conflict["rule"] for conflict in found) == [
+        "note_limit", "tolerance_exceeds_spec", "weld_exceeds_thickness", "weld_note_limit",
+    ]
+    rows = [{**conflict, "source_doc_id": DOC} for conflict in found]
+    loaded.run(conflicts.WRITE_QUERY, {"rows": rows})
+    loaded.run(conflicts.WRITE_QUERY, {"rows": rows})
+    assert loaded.run(f"MATCH ()-[r:{conflicts.RELATIONSHIP}]->() RETURN count(r) AS n")[0] == [{"n": 4}]
+    loaded.run(conflicts.REPLACE_QUERY, {"doc": DOC, "fingerprint": "abc"})
+    assert loaded.run(conflicts.FINGERPRINT_QUERY, {"doc": DOC})[0] == [{"fingerprint": "abc"}]
+    assert loaded.run(f"MATCH ()-[r:{conflicts.RELATIONSHIP}]->() RETURN count(r) AS n")[0] == [{"n": 0}]
+    assert loaded.run(conflicts.DOCUMENTS_QUERY)[0] == [{"doc": DOC}]
+
+
+def test_resolution_statements(loaded, drawing):
+    reset_resolution_index()
+    try:
+        report = resolve_entities(drawing)
+        assert report["occurrences"] == 4 and report["created"] == 4
+        records, _ = loaded.run("MATCH (m:Material)-[:RESOLVES_TO]->(c:CanonicalMaterial) RETURN c.key AS key")
+        assert records == [{"key": "316L|ASTM A240"}]
+        loaded.run(build_resolution_query("Material", "material_id"), {"rows": [
+            {"source_doc_id": DOC, "id": "M1", "key": "304|ASTM A240", "canonical": {"grade": "304"}},
+        ]})
+        records, _ = loaded.run("MATCH (m:Material)-[:RESOLVES_TO]->(c) RETURN c.key AS key")
+        assert records == [{"key": "304|ASTM A240"}]
+        reset_resolution_index()
+        assert resolve_graph()["occurrences"] == 4
+    finally:
+        reset_resolution_index()
+
+
+def test_planner_lookup(loaded):
+    route = route_question(f"show part P-100 in {DOC}")
+    assert route["strategy"] == "template"
+    assert route["cypher"] == lookup_query("Part", "part_id", scoped=True)
+    answer = answer_lookup(route)
+    assert answer.startswith(f"Part P-100 (BRKT ASSY) in {DOC}:")
+    assert "-> HAS_FEATURE Feature F1" in answer and "<- DEPICTS View V1" in answer
+    assert answer_lookup(route_question("show part P-999")) is None
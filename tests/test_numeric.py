@@ -0,0 +1,44 @@
+"""
+Numeric fields derived from dimension values, tolerances and note limits.
+"""
+import pytest
+
+from lib.numeric import enrich_entity, parse_dimension, parse_limits, parse_number, parse_spec_tolerance, parse_tolerance
+
+
+@pytest.mark.parametrize("value, tolerance, expected", [
+    ("Ø12.5 ±0.1", None, {"value_nominal": 12.5, "value_min": 12.4, "value_max": 12.6}),
+    ("12.4-12.6", None, {"value_nominal": 12.5, "value_min": 12.4, "value_max": 12.6}),
+    ("3X R5", None, {"value_nominal": 5.0, "value_min": 5.0, "value_max": 5.0}),
+    ("45°", "+0.2/-0", {"value_nominal": 45.0, "value_min": 45.0, "value_max": 45.2}),
+    ("1 1/2", None, {"value_nominal": 1.5, "value_min": 1.5, "value_max": 1.5}),
+    ("Ø12 H7", None, {"value_nominal": 12.0}),
+    ("Ø12", "H7", {"value_nominal": 12.0}),
+    ("Ø12 H7", "±0.1", {"value_nominal": 12.0, "value_min": 11.9, "value_max": 12.1}),
+    ("1/0", None, {"value_nominal": 1.0}),
+    ("SEE NOTE", None, {}),
+])
+def test_parse_dimension(value, tolerance, expected):
+    assert parse_dimension(value, tolerance) == pytest.approx(expected)
+
+
+def test_parse_number_rejects_a_zero_denominator():
+    assert parse_number("-3/8") == -0.375
+    with pytest.raises(ValueError, match="zero denominator"):
+        parse_number("1/0")
+    assert parse_tolerance("1/0") is None
+
+
+def test_tolerances_limits_and_specs():
+    assert parse_tolerance("-0 +0.05") == (0.0, 0.05)
+    assert parse_tolerance("H7") is None
+    assert parse_limits("WALL 3 MAX, AT LEAST 1.5") == [("max", 3.0), ("min", 1.5)]
+    assert parse_spec_tolerance("X.X ±0.1  X.XX ±0.05", decimals=2) == 0.05
+    assert parse_spec_tolerance("X.X ±0.1", decimals=3) is None
+
+
+def test_enrich_entity_only_touches_dimensions():
+    note = {"type": "Note", "properties": {"value": "3"}}
+    assert enrich_entity(note) is note
+    dimension = enrich_entity({"type": "Dimension", "properties": {"value": "4", "tolerance": "±0.5"}})
+    assert dimension["properties"]["value_min"] == 3.5
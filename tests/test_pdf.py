@@ -0,0 +1,62 @@
+"""
+PDF drawing packages: one PdfPage per sheet, and each page's extraction scoped to its
+sheet's source_doc_id.
+"""
+from pathlib import Path
+
+import pytest
+
+from lib.pdf import PdfPage, assign_document
+
+
+def test_pages_are_named_after_their_sheet():
+    page = PdfPage(Path("drawings/PKG-7.pdf"), 1, 12)
+    assert (page.sheet_number, page.source_doc_id, page.stem) == (2, "PKG-7-sheet-002", "PKG-7-sheet-002")
+    assert str(page) == "drawings/PKG-7.pdf#page=2"
+
+
+def test_assign_document_scopes_entities_and_both_endpoints():
+    page = PdfPage(Path("PKG-7.pdf"), 2, 3)
+    payload = {
+        "entities": [
+            {"type": "Drawing", "properties": {"source_doc_id": "PKG-7", "title": "BRACKET"}},
+            {"type": "Part", "properties": {"part_id": "P-1"}},
+            {"type": "Note"},
+        ],
+        "relationships": [{
+            "source": "Drawing", "relationship": "HAS_PART", "target": "Part",
+            "source_properties": {"source_doc_id": "wrong"}, "target_properties": {"part_id": "P-1"},
+        }, {
+            "source": "Part", "relationship": "HAS_NOTE", "target": "Note", "source_properties": None,
+        }],
+        "model": "kept",
+    }
+    scoped = assign_document(payload, page)
+    doc = "PKG-7-sheet-003"
+    assert scoped["entities"] == [
+        {"type": "Drawing", "properties": {"source_doc_id": doc, "title": "BRACKET", "sheet_number": 3, "sheet_count": 3}},
+        {"type": "Part", "properties": {"part_id": "P-1", "source_doc_id": doc}},
+        {"type": "Note", "properties": {"source_doc_id": doc}},
+    ]
+    assert [(r["source_properties"], r["target_properties"]) for r in scoped["relationships"]] == [
+        ({"source_doc_id": doc}, {"part_id": "P-1", "source_doc_id": doc}),
+        ({"source_doc_id": doc}, {"source_doc_id": doc}),
+    ]
+    assert scoped["model"] == "kept"
+    assert payload["entities"][0]["properties"]["source_doc_id"] == "PKG-7"
+
+
+def test_packages_split_into_lazily_rendered_pages(tmp_path):
+    pymupdf = pytest.importorskip("pymupdf")
+    from pipeline import expand_pages
+
+    package = tmp_path / "PKG-7.pdf"
+    with pymupdf.open() as document:
+        for sheet in range(3):
+            document.new_page(width=200, height=100).insert_text((20, 50), f"SHEET {sheet + 1}")
+        document.save(package)
+    image = tmp_path / "FD-1.png"
+    pages = list(expand_pages([package, image]))
+    assert [str(page) for page in pages] == [f"{package}#page={number}" for number in (1, 2, 3)] + [str(image)]
+    assert {page.sheet_count for page in pages[:3]} == {3}
+    assert pages[1].render(dpi=36).startswith(b"\x89PNG")
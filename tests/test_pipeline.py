@@ -0,0 +1,67 @@
+"""
+ingest_many: stage ordering, backpressure from the bounded queues, and one bad drawing not
+stopping the others.
+"""
+import json
+import threading
+import time
+from pathlib import Path
+
+from pipeline import ingest_many, load_db_objects
+
+
+def _extract(path: str) -> str:
+    doc = Path(path).stem
+    if doc == "BAD":
+        return "The drawing could not be read."
+    return json.dumps({
+        "entities": [
+            {"type": "Drawing", "properties": {"source_doc_id": doc, "title": f"Sheet {doc}"}},
+            {"type": "Part", "properties": {"source_doc_id": doc, "part_id": "P-1"}},
+        ],
+        "relationships": [],
+    })
+
+
+def test_documents_are_written_in_order_and_failures_stay_isolated(graph):
+    written = []
+
+    def load(staged):
+        written.extend(sorted(staged.documents()))
+        return load_db_objects(staged, resolve=False, conflicts=False)
+
+    paths = [Path(f"{name}.png") for name in ("FD-1", "FD-2", "BAD", "FD-3", "FD-4")]
+    summary = ingest_many(paths, extract=_extract, load=load, extract_workers=1, parse_workers=1, write_workers=1, queue_size=2)
+    assert written == ["FD-1", "FD-2", "FD-3", "FD-4"]
+    assert (summary["drawings"], summary["loaded"]) == (5, 4)
+    stages = summary["stages"]
+    assert [stages[name]["items"] for name in ("extract", "parse", "write")] == [5, 5, 4]
+    assert stages["parse"]["errors"] == [{"path": "BAD.png", "error": "no JSON object in model output"}]
+    assert stages["extract"]["errors"] == stages["write"]["errors"] == []
+    records, _ = graph.run("MATCH (p:Part) RETURN p.source_doc_id AS doc ORDER BY doc")
+    assert [record["doc"] for record in records] == ["FD-1", "FD-2", "FD-3", "FD-4"]
+
+
+def test_a_blocked_writer_throttles_extraction():
+    release = threading.Event()
+    extracted = []
+
+    def extract(path):
+        extracted.append(path)
+        return _extract(path)
+
+    def load(staged):
+        release.wait(5)
+
+    paths = [Path(f"FD-{index}.png") for index in range(20)]
+    summary = {}
+    runner = threading.Thread(target=lambda: summary.update(ingest_many(
+        paths, extract=extract, load=load, extract_workers=1, parse_workers=1, write_workers=1, queue_size=1,
+    )))
+    runner.start()
+    time.sleep(0.3)
+    # One item in the writer, one in each queue and one held by each upstream worker.
+    assert 1 <= len(extracted) <= 5
+    release.set()
+    runner.join(5)
+    assert len(extracted) == 20 and summary["loaded"] == 20
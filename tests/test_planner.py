@@ -0,0 +1,82 @@
+"""
+Question routing and the adaptive reasoning budget.
+"""
+import math
+
+import pytest
+
+from ai.planner import FIXED_MAX_ROUNDS, ReasoningBudget, answer_lookup, lookup_query, reasoning_mode, route_question
+from lib.db import bulk_load
+
+DOC = "FD-1"
+
+
+@pytest.mark.parametrize("question, label, identifier, doc", [
+    ("show part P-100", "Part", "P-100", None),
+    ("What is dimension D1 in FD-1?", "Dimension", "D1", "FD-1"),
+    ("details of weld spec w1", "WeldSpec", "w1", None),
+    ("look up note #N2 on drawing FD-7.", "Note", "N2", "FD-7"),
+])
+def test_identifier_lookups_use_the_template(question, label, identifier, doc):
+    route = route_question(question)
+    assert route["strategy"] == "template"
+    assert (route["label"], route["id"]) == (label, identifier)
+    assert route["parameters"]["ids"] == sorted({identifier, identifier.upper()})
+    assert route["parameters"].get("doc") == doc
+    assert ("$doc" in route["cypher"]) == (doc is not None)
+
+
+@pytest.mark.parametrize("question, strategy", [
+    ("show part bracket", "light"),
+    ("what material is the bracket made of?", "light"),
+    ("which notes conflict with the weld size?", "full"),
+    ("show part P-100 and part P-200", "full"),
+    ("how many holes does P-100 have", "full"),
+    (" ".join(["word"] * 15), "full"),
+])
+def test_other_questions_go_to_a_model(question, strategy):
+    assert route_question(question) == {"strategy": strategy}
+
+
+def test_lookup_query_scopes_to_a_document():
+    assert "n.`part_id` IN $ids" in lookup_query("Part", "part_id", scoped=False)
+    assert "$doc" not in lookup_query("Part", "part_id", scoped=False)
+    assert "n.source_doc_id = $doc" in lookup_query("Part", "part_id", scoped=True)
+
+
+def test_answer_lookup_matches_identifiers_case_insensitively(graph, drawing):
+    bulk_load(drawing)
+    answer = answer_lookup(route_question("describe feature f1"))
+    assert answer.startswith(f"Feature F1 in {DOC}:") and "geometry_type: hole" in answer
+    assert answer_lookup(route_question("show part P-100 in FD-2")) is None
+
+
+def test_reasoning_mode_rejects_unknown_modes(monkeypatch):
+    monkeypatch.setenv("REASONING_MODE", "fixed")
+    assert reasoning_mode() == "fixed"
+    with pytest.raises(ValueError):
+        reasoning_mode("eager")
+
+
+def test_budget_stops_on_rounds_tokens_and_latency():
+    budget = ReasoningBudget(latency_s=math.inf, tokens=1000, max_rounds=2)
+    assert budget.stop_reason() is None
+    budget.charge(300, 100)
+    # The next round is projected to cost as much as the largest so far: 400 + 400 fits.
+    assert budget.stop_reason() is None
+    budget.charge(200, 50)
+    assert (budget.model_calls, budget.input_tokens, budget.output_tokens) == (2, 500, 150)
+    assert budget.stop_reason() == "tokens"
+    budget.rounds = 2
+    assert budget.stop_reason() == "max_rounds"
+
+    budget = ReasoningBudget(latency_s=0.0, tokens=1000, max_rounds=2)
+    assert budget.stop_reason() == "latency"
+
+
+def test_fixed_budget_only_counts_rounds():
+    budget = ReasoningBudget.fixed()
+    budget.charge(10**9, 10**9)
+    assert budget.stop_reason() is None
+    budget.rounds = FIXED_MAX_ROUNDS
+    assert budget.stop_reason() == "max_rounds"
@@ -0,0 +1,90 @@
+"""
+Entity resolution: canonical keys for materials, processes and welds, and the blocked
+fuzzy matching of part names.
+"""
+from lib.resolution import (
+    ResolutionIndex,
+    canonical_grade,
+    canonical_standards,
+    material_key,
+    part_blocks,
+    part_name,
+    part_number,
+    process_key,
+    resolution_rows,
+    weldspec_key,
+)
+
+
+def test_canonical_standards_and_grades():
+    assert canonical_standards("ASTM-A240/A240M", "astm a240", "per MIL-STD-810G") == ["ASTM A240", "MIL STD810G"]
+    assert canonical_grade("SS 316 L") == canonical_grade("Type 316L") == "316L"
+    assert canonical_grade("ASTM A36") == "A36"
+
+
+def test_spelling_variants_share_a_key():
+    assert material_key({"grade": "SS 316 L", "spec": "ASTM-A240/A240M"})[0] == material_key({"grade": "316L", "spec": "ASTM A240"})[0]
+    assert material_key({"grade": None, "spec": None}) is None
+    assert process_key({"name": "Passivation per ASTM A967"})[0] == process_key({"name": "PASSIVATE, ASTM-A967"})[0]
+    weld = weldspec_key({"type": "Fillet", "size": "6mm", "standard_ref": "AWS D1.1"})
+    assert weld[0] == weldspec_key({"type": "fillets", "size": "6", "standard_ref": "aws d1.1"})[0]
+    assert weld[1]["size"] == 6.0
+
+
+def test_part_numbers_and_names_are_normalized():
+    assert part_number(" p_100 - 10 ") == "P-100-10"
+    assert part_number("P-10010") != part_number("P-100-10")
+    assert part_name("Brkt Assy") == "BRACKET ASSEMBLY"
+    assert part_blocks("P-100", "BRACKET ASSEMBLY") == {("P-100", "BRA"), ("P-100", "ASS")}
+
+
+def test_fuzzy_part_matches_stay_inside_blocks():
+    index = ResolutionIndex()
+    first, _ = index.resolve("Part", {"part_id": "P-100", "name": "MOUNTING BRACKET"})
+    assert index.resolve("Part", {"part_id": "P-100", "name": "MOUNTNG BRACKET"})[0] == first
+    assert index.fuzzy_matches == 1
+    # Same name under another part number shares no block, so it is never compared.
+    comparisons = index.comparisons
+    assert index.resolve("Part", {"part_id": "P-200", "name": "MOUNTNG BRACKET"})[0] != first
+    assert index.comparisons == comparisons
+    # A typo in the first letters of every word hides the match by design.
+    assert index.resolve("Part", {"part_id": "P-100", "name": "NOUNTING VRACKET"})[0] != first
+
+
+def test_blocks_are_capped():
+    index = ResolutionIndex(max_block=2)
+    for number in range(4):
+        index.resolve("Part", {"source_doc_id": f"FD-{number}", "part_id": "P-1", "name": f"PLATE {number}X"})
+    assert len(index.blocks[("P-1", "PLA")]) == 2
+    assert index.stats()["by_label"]["Part"] == {"occurrences": 4, "canonical": 4}
+
+
+def test_reingesting_a_drawing_does_not_count_its_occurrences_again():
+    index = ResolutionIndex()
+    entities = [
+        {"type": "Material", "properties": {"source_doc_id": "FD-1", "material_id": "M1", "grade": "316L"}},
+        {"type": "Material", "properties": {"source_doc_id": "FD-2", "material_id": "M1", "grade": "SS 316 L"}},
+        {"type": "Part", "properties": {"source_doc_id": "FD-1", "part_id": "P-1", "name": "PLATE"}},
+    ]
+    resolution_rows(entities, index)
+    stats = index.stats()
+    resolution_rows(entities, index)
+    assert index.stats() == stats
+    assert (stats["occurrences"], stats["canonical"]) == (3, 2)
+    # A revised drawing replaces its occurrence's key instead of adding one.
+    resolution_rows([{"type": "Material", "properties": {"source_doc_id": "FD-2", "material_id": "M1", "grade": "304"}}], index)
+    assert index.stats()["by_label"]["Material"] == {"occurrences": 2, "canonical": 2}
+
+
+def test_resolution_rows_skip_unresolvable_occurrences():
+    entities = [
+        {"type": "Material", "properties": {"source_doc_id": "FD-1", "material_id": "M1", "grade": "316L"}},
+        {"type": "Material", "properties": {"source_doc_id": "FD-2", "material_id": "M1", "grade": "SS 316L"}},
+        {"type": "Material", "properties": {"source_doc_id": "FD-3", "material_id": "M1"}},
+        {"type": "Process", "properties": {"source_doc_id": "FD-1", "name": "ANODIZE"}},
+        {"type": "Note", "properties": {"source_doc_id": "FD-1", "note_id": "N1"}},
+    ]
+    rows = resolution_rows(entities, ResolutionIndex())
+    assert list(rows) == ["Material"]
+    assert [row["key"] for row in rows["Material"]] == ["316L|", "316L|"]
+    assert rows["Material"][0]["canonical"] == {"grade": "316L"}
@@ -0,0 +1,24 @@
+"""
+Retrieval seeds: question terms become a full-text query; the in-memory backend, which has
+no full-text indexes, retrieves nothing.
+"""
+from ai.retrieval import SEED_QUERY, retrieve_context, search_query
+from lib.db import bulk_load, is_read_only
+from lib.schema import FULLTEXT_INDEX, TERMS_INDEX, search_index_statements
+
+
+def test_search_query_quotes_each_term():
+    assert search_query("What is the OD/ID of part P-100?") == '"id" OR "od" OR "od/id" OR "p-100" OR "part"'
+    assert search_query("is it the") == ""
+
+
+def test_seed_query_reads_both_full_text_indexes():
+    assert is_read_only(SEED_QUERY)
+    names = {statement["name"] for statement in search_index_statements()}
+    assert {FULLTEXT_INDEX, TERMS_INDEX} <= names
+    assert f"'{FULLTEXT_INDEX}'" in SEED_QUERY and f"'{TERMS_INDEX}'" in SEED_QUERY
+
+
+def test_memory_backend_retrieves_nothing(graph, drawing):
+    bulk_load(drawing)
+    assert retrieve_context("show part P-100") == ""
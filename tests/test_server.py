@@ -0,0 +1,52 @@
+"""
+The JSON-lines server answers every line, including ones that are not request objects or
+whose handling fails, without dropping the connection.
+"""
+import asyncio
+import json
+
+from server import ReasoningService, serve
+
+
+async def _exchange(service: ReasoningService, lines: list[bytes]) -> list[dict]:
+    server = await serve(service, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        responses = []
+        for line in lines:
+            writer.write(line + b"\n")
+            await writer.drain()
+            responses.append(json.loads(await reader.readline()))
+        writer.close()
+    return responses
+
+
+def test_bad_lines_get_error_responses():
+    async def answer(question):
+        if question == "boom":
+            raise RuntimeError("model unavailable")
+        return question.upper()
+
+    service = ReasoningService(answer)
+    original_handle = service.handle
+
+    async def handle(request):
+        if request.get("id") == "crash":
+            raise KeyError("id")
+        return await original_handle(request)
+
+    service.handle = handle
+    responses = asyncio.run(_exchange(service, [
+        b"[1]", b'"hi"', b"null", b"{not json", b'{"id": 1}',
+        b'{"id": "crash", "question": "q"}',
+        b'{"id": 2, "question": "boom"}',
+        b'{"id": 3, "question": "still here"}',
+    ]))
+    assert [response.get("error", "")[:18] for response in responses[:3]] == ["expected a JSON ob"] * 3
+    assert responses[3]["error"].startswith("invalid JSON")
+    assert responses[4] == {"id": 1, "error": "missing 'question'"}
+    assert responses[5] == {"id": "crash", "error": "'id'"}
+    assert (responses[6]["id"], responses[6]["error"]) == (2, "model unavailable")
+    assert (responses[7]["id"], responses[7]["answer"]) == (3, "STILL HERE")
+    assert service.errors == 2
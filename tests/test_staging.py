@@ -0,0 +1,119 @@
+"""
+Staging: repairs and rejections, the dictionary-encoded columns, and writing straight from
+them with the same groups as the dict loader.
+"""
+import pytest
+
+from lib.db import bulk_load, group_entities, group_relationships
+from lib.numeric import enrich_entity
+from lib.staging import Columns, StagingError, normalize_entity, normalize_relationship, stage_payload, write_staged
+
+DOC = "FD-1"
+
+
+def test_normalize_entity_repairs_label_whitespace_and_types():
+    label, properties, repairs = normalize_entity({
+        "type": "weldspec",
+        "source_doc_id": DOC,
+        "properties": {" weldspec_id ": 7, "size": " 6 ", "meta": {"a": 1}, "empty": None},
+    })
+    assert label == "WeldSpec"
+    assert properties == {"weldspec_id": "7", "size": "6", "meta": '{"a": 1}', "source_doc_id": DOC}
+    assert repairs == {"label_spelling", "key_name", "coerced_str", "whitespace", "json_encoded", "provenance_hoisted"}
+
+
+def test_normalize_entity_enriches_dimensions():
+    _, properties, repairs = normalize_entity({"type": "Dimension", "properties": {"source_doc_id": DOC, "dimension_id": "D1", "value": "12.5 ±0.2"}})
+    assert properties["value_min"] == pytest.approx(12.3) and properties["value_max"] == pytest.approx(12.7)
+    assert repairs == set()
+
+
+@pytest.mark.parametrize("entity, kind", [
+    ({"type": "Gizmo", "properties": {"source_doc_id": DOC}}, "unknown_label"),
+    ({"type": "Part", "properties": []}, "bad_properties"),
+    ({"type": "Part", "properties": {"": "x"}}, "no_properties"),
+    ({"type": "Part", "properties": {"source_doc_id": DOC, "name": "BRKT"}}, "missing_key"),
+    ({"type": "Drawing", "properties": {"drawing_number": DOC}}, "missing_key"),
+    ("Part", "not_an_object"),
+])
+def test_normalize_entity_rejects(entity, kind):
+    with pytest.raises(StagingError) as error:
+        normalize_entity(entity)
+    assert error.value.kind == kind
+
+
+def test_normalize_relationship_scopes_endpoints_and_rejects_unkeyed_ones():
+    relationship = {
+        "source": "part",
+        "relationship": "has feature",
+        "target": "Feature",
+        "source_properties": {"source_doc_id": DOC, "part_id": 100},
+        "target_properties": {"feature_id": "F1"},
+    }
+    source, relationship_type, target, source_keys, target_keys, repairs = normalize_relationship(relationship)
+    assert (source, relationship_type, target) == ("Part", "HAS_FEATURE", "Feature")
+    assert source_keys == {"source_doc_id": DOC, "part_id": "100"}
+    assert target_keys == {"source_doc_id": DOC, "feature_id": "F1"}
+    assert repairs == {"label_spelling", "relationship_type", "coerced_str"}
+    for broken, kind in (
+        ({**relationship, "target_properties": {}}, "unbounded_endpoint"),
+        ({**relationship, "target_properties": {"geometry_type": "hole"}}, "missing_key"),
+        ({**relationship, "source_properties": {"part_id": "P-100"}}, "missing_key"),
+        ({**relationship, "relationship": "--"}, "bad_relationship_type"),
+        ({**relationship, "source_properties": "P-100"}, "bad_endpoint"),
+    ):
+        with pytest.raises(StagingError) as error:
+            normalize_relationship(broken)
+        assert error.value.kind == kind
+
+
+def test_columns_round_trip_rows_with_different_keys():
+    rows = [
+        {"a": "x", "b": 1},
+        {"c": [1.0, 2.0]},
+        {"b": True, "a": "x"},
+        {"a": "y", "b": 1.0},
+        {"c": [1.0, 2.0], "b": 1},
+    ]
+    columns = Columns()
+    for index, row in enumerate(rows):
+        columns.append(row)
+        if index == 2:
+            columns.compact()
+    assert list(columns.rows()) == rows
+    assert [type(row["b"]) for row in columns.rows() if "b" in row] == [int, bool, float, int]
+    assert columns.column("a") == ["x", None, "x", "y", None]
+    assert columns.column("missing") == []
+    assert columns.distinct("a") == ["x", "y"]
+    assert len(columns.shapes) == 3 and len(columns) == 5
+    assert columns.codes[columns.keys["a"]].tolist() == [1, 0, 1, 2]
+
+
+def test_stage_payload_reports_repairs_and_rejections(drawing):
+    drawing["entities"].append({"type": "Gizmo", "properties": {"source_doc_id": DOC}})
+    drawing["entities"].append({"type": "Note", "properties": {"source_doc_id": DOC, "text": "NO ID"}})
+    drawing["entities"][2]["properties"]["name"] = " BRKT ASSY "
+    drawing["relationships"][0]["target_properties"] = {}
+    staged = stage_payload(drawing)
+    report = staged.report
+    assert (report["staged_entities"], report["staged_relationships"]) == (13, 11)
+    assert (report["repaired"], report["rejected"]) == (1, 3)
+    assert report["issues"] == {"whitespace": 1, "unknown_label": 1, "missing_key": 1, "unbounded_endpoint": 1}
+    assert staged.documents() == {DOC}
+
+
+def test_staged_groups_match_the_dict_loader(drawing):
+    staged = stage_payload(drawing)
+    expected = group_entities(enrich_entity(entity) for entity in drawing["entities"])
+    assert staged.entity_groups() == expected
+    assert staged.relationship_groups() == group_relationships(drawing["relationships"])
+
+
+def test_write_staged_loads_the_same_graph_as_bulk_load(graph, drawing):
+    bulk_load(drawing)
+    expected = graph.counts()
+    graph.run("MATCH (n) DETACH DELETE n")
+    write_staged(stage_payload(drawing))
+    assert graph.counts() == expected
+    write_staged(stage_payload(drawing))
+    assert graph.counts() == expected
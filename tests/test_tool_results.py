@@ -0,0 +1,73 @@
+"""
+Tool results sent back to the model: the columns/same/rows layout, truncation, and that
+the layout decodes back to the records it came from.
+"""
+import json
+
+from ai.tool_results import SNIPPET_CHARS, encode_tool_result
+
+
+def _decode(text: str) -> list[dict]:
+    """
+    Rebuilds flat records ({"column" or "column.key": value}) from an encoded result.
+    """
+    payload = json.loads(text)
+    return [{**payload.get("same", {}), **dict(zip(payload.get("columns", []), row))} for row in payload["rows"]]
+
+
+def _flatten(record: dict, columns: list[str]) -> dict:
+    flat = {}
+    for column in columns:
+        name, _, key = column.partition(".")
+        value = record.get(name)
+        flat[column] = (value.get(key) if isinstance(value, dict) else None) if key else value
+    return flat
+
+
+def test_layout_splits_property_maps_and_hoists_constant_columns():
+    result = {
+        "records": [
+            {"p": {"part_id": "P-1", "source_doc_id": "FD-1"}, "qty": 2, "x": 28.619999999999997},
+            {"p": {"part_id": "P-2", "source_doc_id": "FD-1"}, "qty": 2, "x": 1.5},
+        ],
+        "summary": {"counters": {"nodes_created": 0, "properties_set": 3, "contains_updates": True}, "result_available_after_ms": 4},
+    }
+    payload = json.loads(encode_tool_result(result))
+    assert payload == {
+        "columns": ["p.part_id", "x"],
+        "same": {"p.source_doc_id": "FD-1", "qty": 2},
+        "rows": [["P-1", 28.62], ["P-2", 1.5]],
+        "counters": {"properties_set": 3},
+    }
+
+
+def test_mixed_and_missing_keys_round_trip():
+    records = [
+        {"n": {"note_id": "N1", "text": "DEBURR"}, "label": "Note"},
+        {"n": {"note_id": "N2"}, "extra": [1, 2]},
+        {"n": None, "label": "Note", "extra": {"a": 1}},
+        {"label": "Part"},
+    ]
+    encoded = encode_tool_result({"records": records})
+    columns = json.loads(encoded)["columns"]
+    assert columns == ["n.note_id", "n.text", "label", "extra"]
+    assert _decode(encoded) == [_flatten(record, columns) for record in records]
+
+
+def test_rows_past_the_budget_are_reported_as_truncated():
+    records = [{"id": f"P-{index}", "source_text": f"hole {index} " * 40} for index in range(50)]
+    payload = json.loads(encode_tool_result({"records": records}, max_tokens=300))
+    shown = len(payload["rows"])
+    assert 0 < shown < 50
+    assert payload["truncated"].startswith(f"{50 - shown} more rows not shown")
+    assert all(len(row[1]) < SNIPPET_CHARS + 20 and row[1].endswith(" chars)") for row in payload["rows"])
+    assert "truncated" not in json.loads(encode_tool_result({"records": records[:2]}))
+
+    # The first row is always kept, however large.
+    assert len(json.loads(encode_tool_result({"records": records}, max_tokens=1))["rows"]) == 1
+
+
+def test_errors_and_raw_json():
+    assert json.loads(encode_tool_result({"error": "x" * 1000}))["error"].endswith("(+600 chars)")
+    result = {"records": [{"a": 1}], "summary": {"counters": {}}}
+    assert json.loads(encode_tool_result(result, result_format="json")) == result
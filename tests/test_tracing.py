@@ -0,0 +1,169 @@
+"""
+Tracing: span nesting and status, JSONL and OTLP export, the trace summary, and the spans
+around streamed model calls.
+"""
+import contextvars
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from lib import tracing
+from lib.tracing import SpanExporter, read_spans, span, summarize
+
+
+class _MemoryExporter(SpanExporter):
+    def __init__(self):
+        super().__init__("unused.jsonl")
+        self.records = []
+
+    def export(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def spans(monkeypatch):
+    exporter = _MemoryExporter()
+    monkeypatch.setattr(tracing, "_exporter", exporter)
+    monkeypatch.setattr(tracing, "_configured", True)
+    return exporter.records
+
+
+def _by_name(records):
+    return {record["name"]: record for record in records}
+
+
+def test_spans_nest_across_copied_contexts(spans):
+    def work():
+        with span("worker"):
+            pass
+
+    with span("outer", question="q", dropped=None) as outer:
+        with span("inner") as inner:
+            inner.set(rows=3, text="x" * 600)
+        worker = threading.Thread(target=contextvars.copy_context().run, args=(work,))
+        worker.start()
+        worker.join()
+        outer.set(done=True)
+    with pytest.raises(KeyError):
+        with span("failed"):
+            raise KeyError("part")
+    records = _by_name(spans)
+    assert [record["name"] for record in spans] == ["inner", "worker", "outer", "failed"]
+    assert records["inner"]["parent_id"] == records["worker"]["parent_id"] == records["outer"]["span_id"]
+    assert records["inner"]["trace_id"] == records["outer"]["trace_id"] != records["failed"]["trace_id"]
+    assert records["outer"]["parent_id"] is None
+    assert records["outer"]["attributes"] == {"question": "q", "done": True}
+    assert records["inner"]["attributes"]["text"].endswith("...") and len(records["inner"]["attributes"]["text"]) == 503
+    assert (records["failed"]["status"], records["failed"]["error"]) == ("error", "KeyError: 'part'")
+    assert records["outer"]["status"] == "ok" and "error" not in records["outer"]
+
+
+def test_disabled_spans_are_a_shared_noop(monkeypatch):
+    monkeypatch.setattr(tracing, "_exporter", None)
+    monkeypatch.setattr(tracing, "_configured", True)
+    assert span("a") is span("b") is tracing._NOOP
+
+
+@pytest.mark.parametrize("trace_format", ["jsonl", "otlp"])
+def test_export_round_trips_through_read_spans(tmp_path, monkeypatch, trace_format):
+    path = tmp_path / f"trace.{trace_format}"
+    monkeypatch.setattr(tracing, "_exporter", None)
+    tracing.configure(path, trace_format)
+    try:
+        with span("load", entities=2, ratio=0.5, bulk=True):
+            with span("cypher", cypher="MATCH (n) RETURN n"):
+                pass
+        tracing.flush()
+    finally:
+        tracing.configure(None)
+        monkeypatch.delenv("TRACE_FILE", raising=False)
+    lines = path.read_text().splitlines()
+    assert len(lines) == (1 if trace_format == "otlp" else 2)
+    if trace_format == "otlp":
+        assert json.loads(lines[0])["resourceSpans"][0]["resource"]["attributes"][0]["value"] == {"stringValue": tracing.SERVICE_NAME}
+    records = _by_name(read_spans(path))
+    assert records["load"]["attributes"] == {"entities": 2, "ratio": 0.5, "bulk": True}
+    assert records["cypher"]["parent_id"] == records["load"]["span_id"]
+    assert records["load"]["duration_ms"] >= records["cypher"]["duration_ms"] >= 0
+
+
+def test_summarize_groups_stages_and_statements():
+    def record(name, duration_ms, status="ok", **attributes):
+        return {"name": name, "duration_ms": duration_ms, "status": status, "attributes": attributes}
+
+    summary = summarize([
+        record("cypher", 5.0, cypher="MATCH (n)\n RETURN n", rows=2, result_available_after_ms=1),
+        record("cypher", 15.0, cypher="MATCH (n) RETURN n", rows=3, result_available_after_ms=4),
+        record("cypher", 1.0, cypher="MATCH (p:Part) RETURN p"),
+        record("model.call", 100.0),
+        record("model.call", 50.0, status="error"),
+    ], top=1)
+    stages = {row["name"]: row for row in summary["stages"]}
+    assert [row["name"] for row in summary["stages"]] == ["model.call", "cypher"]
+    assert (stages["model.call"]["count"], stages["model.call"]["errors"], stages["model.call"]["p50_ms"]) == (2, 1, 75.0)
+    assert (stages["cypher"]["total_ms"], stages["cypher"]["max_ms"]) == (21.0, 15.0)
+    assert summary["statements"] == [{
+        "cypher": "MATCH (n) RETURN n", "rows": 5, "server_p95_ms": 4,
+        "count": 2, "total_ms": 20.0, "p50_ms": 10.0, "p95_ms": 15.0, "max_ms": 15.0,
+    }]
+
+
+class _StreamingResponses:
+    def __init__(self, rounds):
+        self.rounds = list(rounds)
+
+    def create(self, stream=False, **request):
+        assert stream
+        text, output = self.rounds.pop(0)
+        response = {"id": f"resp-{len(self.rounds)}", "output": output, "output_text": text,
+                    "usage": {"input_tokens": 10, "output_tokens": 2}}
+        events = [{"type": "response.output_text.delta", "delta": word} for word in text.split(" ") if text]
+        return iter([*events, {"type": "response.completed", "response": response}])
+
+
+def test_streamed_model_calls_get_model_call_spans(spans, monkeypatch, graph, drawing):
+    from ai import client
+    from lib.db import bulk_load
+
+    bulk_load(drawing)
+    call = {"type": "function_call", "name": "graph_query", "call_id": "call-1",
+            "arguments": json.dumps({"cypher": "MATCH (p:Part) RETURN p.part_id AS id"})}
+    responses = _StreamingResponses([("", [call]), ("P-100", [])])
+    events = list(client.stream_openai_with_graph_reasoning(
+        "which parts are there?", client=SimpleNamespace(responses=responses), retrieve=False, mode="fixed",
+    ))
+    assert events[-1] == {"type": "done", "text": "P-100"}
+    calls = [record for record in spans if record["name"] == "model.call"]
+    assert [record["attributes"]["purpose"] for record in calls] == ["reasoning", "reasoning"]
+    assert all(record["attributes"]["stream"] and record["attributes"]["input_tokens"] == 10 for record in calls)
+    assert [record["attributes"]["output_chars"] for record in calls] == [0, 5]
+    assert {record["name"] for record in spans} >= {"reasoning.round", "cypher"}
+
+
+def test_streamed_image_extraction_is_traced(spans, monkeypatch, tmp_path):
+    from ai import client
+
+    image = tmp_path / "sheet.png"
+    image.write_bytes(b"\x89PNG\r\n\x1a\n" + b"0" * 32)
+    monkeypatch.setattr(client, "_get_client", lambda: SimpleNamespace(responses=_StreamingResponses([('{"entities": []}', [])])))
+    assert "".join(client.stream_openai_with_image(str(image), use_cache=False)) == '{"entities":[]}'
+    records = _by_name(spans)
+    assert records["model.call"]["parent_id"] == records["extract.image"]["span_id"]
+    assert records["image.preprocess"]["parent_id"] == records["extract.image"]["span_id"]
+    assert records["model.call"]["attributes"]["purpose"] == "extraction"
+    assert records["extract.image"]["attributes"]["output_chars"] == len('{"entities":[]}')
+
+
+def test_retrieval_failures_are_recorded_on_the_span_not_printed(spans, monkeypatch, capsys):
+    from ai import client
+
+    def fail(question):
+        raise ConnectionError("graph unavailable")
+
+    monkeypatch.setattr(client, "retrieve_context", fail)
+    request_input = client._reasoning_input("which parts are there?", retrieve=True)
+    assert "retrieved for this question" not in request_input[0]["content"]
+    assert capsys.readouterr().out == ""
+    assert _by_name(spans)["retrieve"]["attributes"] == {"error": "ConnectionError: graph unavailable", "context_chars": 0}